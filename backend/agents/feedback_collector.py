@@ -1,42 +1,133 @@
-from ..kg.queries import (
-    get_historical_decisions,
-    update_agent_stats,
-    update_routing_outcome,
-)
+import sys
+import warnings
+from typing import Dict, List, Tuple
 
+from ..kg import async_queries
+from ..kg.context_accuracy import record_feedback_changes
+from ..kg.queries import apply_feedback
+from ..telemetry import timed_stage
 
-def record_feedback(routing_decision_id: str, agent_name: str, success: bool) -> dict:
-    """
-    Record feedback and return impact information showing how the feedback affects agent stats.
-    
-    Returns:
-    - before_stats: Agent stats before feedback
-    - after_stats: Agent stats after feedback
-    - impact: Change in historical accuracy
-    """
-    # Get before stats
-    historical = get_historical_decisions(agent_name, limit=1)
-    before_accuracy = 0.5  # Default
-    if historical:
-        # Calculate current accuracy from recent decisions
-        # This is approximate; actual calculation happens in update_agent_stats
-        pass
-    
-    # Update KG
-    outcome = "SUCCESS" if success else "FAILURE"
-    update_routing_outcome(routing_decision_id, outcome)
-    update_agent_stats(agent_name, success)
-    
-    # Get after stats (approximate - would need to query agent node directly)
-    # For now, return basic impact info
+
+def _applied(agent_results: List[dict]) -> List[dict]:
+    # Keep the per-context accuracy used for scoring in step with the graph
+    record_feedback_changes(agent_results)
+    return agent_results
+
+
+def _impact(agent_result: dict) -> dict:
+    before = agent_result["before_accuracy"]
+    after = agent_result["after_accuracy"]
+    return {
+        "before_accuracy": before,
+        "after_accuracy": after,
+        "accuracy_change": after - before,
+        "message": f"Updated {agent_result['agent_name']} historical accuracy from {before:.3f} to {after:.3f}.",
+        "feedback_applied": True,
+    }
+
+
+def _feedback_result(routing_decision_id: str, success: bool, agent_results: List[dict]) -> dict | None:
+    if not agent_results:
+        return None
+    agent_result = agent_results[0]
     return {
         "routing_decision_id": routing_decision_id,
-        "agent_name": agent_name,
-        "outcome": outcome,
-        "impact": {
-            "message": f"Updated {agent_name} statistics. Historical accuracy will be recalculated based on new success/failure counts.",
-            "feedback_applied": True,
-        },
+        "agent_name": agent_result["agent_name"],
+        "outcome": "SUCCESS" if success else "FAILURE",
+        "impact": _impact(agent_result),
     }
 
 
+def _batch_result(feedback: List[Tuple[str, bool]], agent_results: List[dict]) -> dict:
+    applied = {rd_id for result in agent_results for rd_id in result["routing_decision_ids"]}
+    not_found = list(dict.fromkeys(rd_id for rd_id, _ in feedback if rd_id not in applied))
+    agents: Dict[str, dict] = {}
+    for result in agent_results:
+        agents[result["agent_name"]] = {
+            "successes": result["successes"],
+            "failures": result["failures"],
+            **_impact(result),
+        }
+    return {
+        "applied": len(feedback) - sum(1 for rd_id, _ in feedback if rd_id not in applied),
+        "not_found": not_found,
+        "agents": agents,
+    }
+
+
+def _caller_stacklevel() -> int:
+    """warnings.warn stacklevel of the first frame outside this module and the timed_stage wrapper."""
+    internal = {__file__, timed_stage.__code__.co_filename}
+    frame, level = sys._getframe(1), 1
+    while frame is not None and frame.f_code.co_filename in internal:
+        frame, level = frame.f_back, level + 1
+    return level
+
+
+def _success_argument(function: str, args: tuple, success: bool | None, agent_name: str | None) -> bool:
+    """
+    `success` from either call form: (routing_decision_id, success) or the
+    deprecated (routing_decision_id, agent_name, success), with any of them
+    passed by keyword. The agent is the one the decision was routed to, so a
+    passed agent_name is ignored.
+    """
+    legacy = agent_name is not None
+    if len(args) == 2 or (len(args) == 1 and isinstance(args[0], str)):
+        # agent_name passed positionally
+        legacy = True
+        args = args[1:]
+    if legacy:
+        warnings.warn(
+            f"{function}(routing_decision_id, agent_name, success) is deprecated and agent_name is ignored; "
+            f"call {function}(routing_decision_id, success)",
+            DeprecationWarning,
+            stacklevel=_caller_stacklevel(),
+        )
+    if len(args) > 1 or (args and success is not None):
+        raise TypeError(f"{function}() takes routing_decision_id and success")
+    if args:
+        success = args[0]
+    if success is None:
+        raise TypeError(f"{function}() missing required argument: 'success'")
+    return bool(success)
+
+
+@timed_stage("record_feedback")
+def record_feedback(routing_decision_id: str, *args, success: bool | None = None, agent_name: str | None = None) -> dict | None:
+    """
+    Record feedback in a single write transaction and return its impact.
+    Called as record_feedback(routing_decision_id, success); the old
+    (routing_decision_id, agent_name, success) form still works but warns.
+
+    Returns None when the routing decision does not exist, otherwise:
+    - agent_name: Agent the decision was routed to
+    - outcome: SUCCESS or FAILURE
+    - impact: historical accuracy before and after the feedback
+    """
+    success = _success_argument("record_feedback", args, success, agent_name)
+    return _feedback_result(routing_decision_id, success, _applied(apply_feedback([(routing_decision_id, success)])))
+
+
+@timed_stage("record_feedback")
+async def record_feedback_async(routing_decision_id: str, *args, success: bool | None = None,
+                                agent_name: str | None = None) -> dict | None:
+    """Async variant of record_feedback using the async Neo4j driver."""
+    success = _success_argument("record_feedback_async", args, success, agent_name)
+    agent_results = _applied(await async_queries.apply_feedback([(routing_decision_id, success)]))
+    return _feedback_result(routing_decision_id, success, agent_results)
+
+
+@timed_stage("record_feedback_batch")
+def record_feedback_batch(feedback: List[Tuple[str, bool]]) -> dict:
+    """
+    Apply many (routing_decision_id, success) pairs in one transaction.
+    Returns the number applied, ids that were not found and the
+    per-agent accuracy change.
+    """
+    return _batch_result(feedback, _applied(apply_feedback(feedback)))
+
+
+@timed_stage("record_feedback_batch")
+async def record_feedback_batch_async(feedback: List[Tuple[str, bool]]) -> dict:
+    """Async variant of record_feedback_batch."""
+    return _batch_result(feedback, _applied(await async_queries.apply_feedback(feedback)))
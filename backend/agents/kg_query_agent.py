@@ -1,11 +1,21 @@
 from typing import List, Tuple
 
+from ..config import settings
+from ..kg import async_queries
+from ..kg.context_accuracy import get_context_accuracy_store
 from ..kg.queries import get_agents_by_task_type
 from ..models.domain import Agent
 from ..models.schemas import AnalyzedQuery
+from .scoring import rank_agents
+from ..telemetry import stage
 
 
-def score_agent(agent: Agent, analyzed: AnalyzedQuery, historical_score: float | None = None) -> tuple[float, dict]:
+def score_agent(
+    agent: Agent,
+    analyzed: AnalyzedQuery,
+    historical_score: float | None = None,
+    text_relevance: float | None = None,
+) -> tuple[float, dict]:
     hist = historical_score if historical_score is not None else agent.historical_accuracy
     
     if agent.domain_expertise == analyzed.domain:
@@ -34,6 +44,9 @@ def score_agent(agent: Agent, analyzed: AnalyzedQuery, historical_score: float |
         0.05 * reliability_score +
         0.05 * specialization_score
     )
+    if text_relevance is not None:
+        # BM25 relevance of the agent's text fields to the raw query (kg/retrieval.py)
+        score = (1 - settings.retrieval_score_weight) * score + settings.retrieval_score_weight * text_relevance
     
     tie_breaking = {
         "capability_level": agent.capability_level,
@@ -47,38 +60,50 @@ def score_agent(agent: Agent, analyzed: AnalyzedQuery, historical_score: float |
         "reliability": reliability_score,
         "specialization_score": specialization_score,
     }
+    if text_relevance is not None:
+        tie_breaking["text_relevance"] = text_relevance
     
     return (score, tie_breaking)
 
 
-def query_kg_for_agents(analyzed: AnalyzedQuery) -> List[Tuple[Agent, float, dict]]:
+def context_historical_scores(candidates: List[Agent], analyzed: AnalyzedQuery) -> List[float] | None:
+    """
+    Time-decayed accuracy of each candidate for the query's task type and
+    domain (kg/context_accuracy.py), or None to keep the lifetime
+    historicalAccuracy.
+    """
+    store = get_context_accuracy_store()
+    if store is None:
+        return None
+    return store.historical_scores(candidates, analyzed.task_type, analyzed.domain)
+
+
+def query_kg_for_agents(analyzed: AnalyzedQuery, top_k: int | None = None) -> List[Tuple[Agent, float, dict]]:
     """
     Query KG for agents and score them with tie-breaking information.
+    The historical accuracy feature is the agent's decayed accuracy for this
+    task type and domain where feedback exists, its lifetime accuracy otherwise.
+    Scoring is vectorized (see scoring.py); tie-breaking info is only built
+    for the top_k agents that are returned (all agents when top_k is None).
     Returns: List of (Agent, score, tie_breaking_info) tuples
     """
     # Pass domain to prioritize domain-specific agents in the initial query
-    candidates = get_agents_by_task_type(analyzed.task_type, domain=analyzed.domain)
-    scored: List[Tuple[Agent, float, dict]] = [
-        (agent, score, tie_info) 
-        for agent in candidates 
-        for score, tie_info in [score_agent(agent, analyzed)]
-    ]
-    
-    # Sort by score, then by tie-breaking criteria (multi-axis sorting)
-    # Domain exact match is now prioritized higher to ensure domain-specific agents are preferred
-    scored.sort(
-        key=lambda x: (
-            x[1],  # Primary: overall score
-            x[2]["domain_exact_match"],  # Secondary: exact domain match (moved up from 6th)
-            x[2]["capability_level"],  # Tertiary: capability level
-            x[2]["historical_accuracy"],  # Quaternary: historical accuracy
-            x[2]["reliability"],  # Quinary: reliability
-            x[2]["specialization_score"],  # Senary: specialization
-            x[2]["response_time_score"],  # Septenary: response time
-            x[2]["cost_efficiency"],  # Octonary: cost efficiency
-        ),
-        reverse=True,
-    )
-    return scored
+    with stage("get_agents_by_task_type"):
+        candidates = get_agents_by_task_type(analyzed.task_type, domain=analyzed.domain, query_text=analyzed.raw_text)
+    # Sort by score, then by tie-breaking criteria (multi-axis sorting):
+    # domain exact match, capability level, historical accuracy, reliability,
+    # specialization, response time, cost efficiency
+    with stage("score_agents"):
+        historical = context_historical_scores(candidates, analyzed)
+        return rank_agents(candidates, analyzed, top_k=top_k, historical_scores=historical)
 
 
+async def query_kg_for_agents_async(analyzed: AnalyzedQuery, top_k: int | None = None) -> List[Tuple[Agent, float, dict]]:
+    """Async variant of query_kg_for_agents using the async Neo4j driver."""
+    with stage("get_agents_by_task_type"):
+        candidates = await async_queries.get_agents_by_task_type(
+            analyzed.task_type, domain=analyzed.domain, query_text=analyzed.raw_text
+        )
+    with stage("score_agents"):
+        historical = context_historical_scores(candidates, analyzed)
+        return rank_agents(candidates, analyzed, top_k=top_k, historical_scores=historical)
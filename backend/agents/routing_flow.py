@@ -0,0 +1,225 @@
+"""
+The routing pipeline used by the API: extraction -> candidate lookup ->
+scoring -> fallback -> RoutingDecision.
+
+It does not depend on CrewAI. The CrewAI agents and Crew that describe the
+same pipeline live in crew/, which is only imported when orchestration is
+actually needed, so API workers and scripts start without loading crewai.
+"""
+
+from .kg_query_agent import context_historical_scores, query_kg_for_agents, query_kg_for_agents_async
+from .scoring import rank_agents_batch
+from ..config import settings
+from ..extraction.llm_extractor import extract_query, extract_query_async, extract_queries_async
+from ..kg import async_queries
+from ..kg.queries import create_routing_decision, get_fallback_agent
+from ..kg.rationale import build_rationale
+from ..kg.snapshot import get_snapshot
+from ..telemetry import collect_stages, stage
+
+
+def _top_candidates(ranked) -> list[dict]:
+    return [
+        {
+            "name": agent.name,
+            "score": score,
+            "tie_breaking": tie_info,
+        }
+        for agent, score, tie_info in ranked[:3]
+    ]
+
+
+def _rationale(analyzed, chosen_name, candidates, tie_breaking_info) -> dict | None:
+    # Stored with the decision, so explaining it later is a single read
+    return build_rationale(analyzed, chosen_name, candidates, tie_breaking_info, get_snapshot())
+
+
+def _with_stage_timings(result: dict, stages: dict) -> dict:
+    result["stage_timings_ms"] = {name: seconds * 1000 for name, seconds in stages.items()}
+    return result
+
+
+def _result_payload(rd_id, chosen_name, confidence, analyzed, candidates, tie_breaking_info) -> dict:
+    return {
+        "routing_decision_id": rd_id,
+        "chosen_agent": chosen_name,
+        "confidence": confidence,
+        "analyzed_query": analyzed,
+        "top_candidates": candidates,
+        "tie_breaking_info": tie_breaking_info,
+    }
+
+
+def run_routing_flow(user_query: str) -> dict:
+    """
+    Route one query. The result carries `stage_timings_ms`, the time spent
+    in each telemetry stage while handling this query.
+    """
+    with collect_stages() as stages:
+        with stage("routing_flow"):
+            result = _route(user_query)
+    return _with_stage_timings(result, stages)
+
+
+def _route(user_query: str) -> dict:
+    with stage("extract_query"):
+        analyzed = extract_query(user_query)
+    ranked = query_kg_for_agents(analyzed, top_k=3)
+
+    if not ranked:
+        chosen_name = "PerplexityFallbackAgent"
+        confidence = 0.5
+        candidates: list[dict] = []
+        tie_breaking_info = {}
+    else:
+        top_agent, top_score, tie_breaking_info = ranked[0]
+        chosen_name = top_agent.name
+        confidence = top_score
+
+        if confidence < settings.low_conf_threshold:
+            with stage("get_fallback_agent"):
+                fb = get_fallback_agent(chosen_name)
+            if fb:
+                chosen_name = fb.name
+                confidence = max(confidence, 0.6)
+
+        candidates = _top_candidates(ranked)
+
+    rationale = _rationale(analyzed, chosen_name, candidates, tie_breaking_info)
+    with stage("create_routing_decision"):
+        rd_id = create_routing_decision(
+            user_query, chosen_name, confidence, analyzed.task_type, analyzed.domain, rationale
+        )
+    return _result_payload(rd_id, chosen_name, confidence, analyzed, candidates, tie_breaking_info)
+
+
+async def run_routing_flow_async(user_query: str) -> dict:
+    """
+    Same flow as run_routing_flow, but awaits the LLM and Neo4j instead of
+    holding a threadpool thread for the whole request.
+    """
+    with collect_stages() as stages:
+        with stage("routing_flow"):
+            result = await _route_async(user_query)
+    return _with_stage_timings(result, stages)
+
+
+async def _route_async(user_query: str) -> dict:
+    with stage("extract_query"):
+        analyzed = await extract_query_async(user_query)
+    ranked = await query_kg_for_agents_async(analyzed, top_k=3)
+
+    if not ranked:
+        chosen_name = "PerplexityFallbackAgent"
+        confidence = 0.5
+        candidates: list[dict] = []
+        tie_breaking_info = {}
+    else:
+        top_agent, top_score, tie_breaking_info = ranked[0]
+        chosen_name = top_agent.name
+        confidence = top_score
+
+        if confidence < settings.low_conf_threshold:
+            with stage("get_fallback_agent"):
+                fb = await async_queries.get_fallback_agent(chosen_name)
+            if fb:
+                chosen_name = fb.name
+                confidence = max(confidence, 0.6)
+
+        candidates = _top_candidates(ranked)
+
+    rationale = _rationale(analyzed, chosen_name, candidates, tie_breaking_info)
+    with stage("create_routing_decision"):
+        rd_id = await async_queries.create_routing_decision(
+            user_query, chosen_name, confidence, analyzed.task_type, analyzed.domain, rationale
+        )
+    return _result_payload(rd_id, chosen_name, confidence, analyzed, candidates, tie_breaking_info)
+
+
+async def run_batch_routing_flow_async(user_queries: list[str]) -> list[dict | Exception]:
+    """
+    Route many queries at once.
+
+    Extractions are packed into multi-query LLM prompts, analyzed queries are
+    grouped by (task_type, domain) so each group's candidates are fetched and
+    scored once, and every RoutingDecision is written in a single UNWIND
+    transaction. Results are in input order; a failed item is its exception.
+    """
+    results: list[dict | Exception | None] = [None] * len(user_queries)
+    with stage("extract_queries"):
+        extracted = await extract_queries_async(user_queries)
+
+    groups: dict[tuple[str, str], list[int]] = {}
+    for i, analyzed in enumerate(extracted):
+        if isinstance(analyzed, Exception):
+            results[i] = analyzed
+        else:
+            groups.setdefault((analyzed.task_type, analyzed.domain), []).append(i)
+
+    ranked_by_index: dict[int, list] = {}
+    for (task_type, domain), indices in groups.items():
+        try:
+            with stage("get_agents_by_task_type"):
+                per_query = await async_queries.get_agents_for_queries(
+                    task_type, [extracted[i].raw_text for i in indices], domain=domain
+                )
+            # Queries of a group share their candidates unless the retrieval
+            # tier answered them; score each distinct candidate list once
+            subgroups: dict[tuple[str, ...], tuple[list, list[int]]] = {}
+            for i, candidates in zip(indices, per_query):
+                subgroups.setdefault(tuple(a.name for a in candidates), (candidates, []))[1].append(i)
+            with stage("score_agents_batch"):
+                for candidates, sub_indices in subgroups.values():
+                    group = [extracted[i] for i in sub_indices]
+                    rankings = rank_agents_batch(
+                        candidates, group, top_k=3, historical_scores=context_historical_scores(candidates, group[0])
+                    )
+                    ranked_by_index.update(zip(sub_indices, rankings))
+        except Exception as e:
+            for i in indices:
+                results[i] = e
+                ranked_by_index.pop(i, None)
+            continue
+
+    fallbacks: dict[str, object] = {}
+    selections: dict[int, tuple] = {}
+    for i, ranked in ranked_by_index.items():
+        if not ranked:
+            selections[i] = ("PerplexityFallbackAgent", 0.5, [], {})
+            continue
+        top_agent, top_score, tie_breaking_info = ranked[0]
+        chosen_name = top_agent.name
+        confidence = top_score
+
+        if confidence < settings.low_conf_threshold:
+            if chosen_name not in fallbacks:
+                with stage("get_fallback_agent"):
+                    fallbacks[chosen_name] = await async_queries.get_fallback_agent(chosen_name)
+            fb = fallbacks[chosen_name]
+            if fb:
+                chosen_name = fb.name
+                confidence = max(confidence, 0.6)
+
+        selections[i] = (chosen_name, confidence, _top_candidates(ranked), tie_breaking_info)
+
+    order = sorted(selections)
+    try:
+        with stage("create_routing_decisions"):
+            rd_ids = await async_queries.create_routing_decisions(
+                [
+                    (
+                        user_queries[i], selections[i][0], selections[i][1], extracted[i].task_type, extracted[i].domain,
+                        _rationale(extracted[i], selections[i][0], selections[i][2], selections[i][3]),
+                    )
+                    for i in order
+                ]
+            )
+    except Exception as e:
+        for i in order:
+            results[i] = e
+        return results
+
+    for i, rd_id in zip(order, rd_ids):
+        chosen_name, confidence, candidates, tie_breaking_info = selections[i]
+        results[i] = _result_payload(rd_id, chosen_name, confidence, extracted[i], candidates, tie_breaking_info)
+    return results
@@ -0,0 +1,264 @@
+"""
+Vectorized agent scoring.
+
+Agent features are kept as a column matrix so a whole candidate set (or a
+batch of analyzed queries) is scored with one weighted matrix product instead
+of calling `score_agent` once per agent. The weights and tie-breaking order
+are the same as in `kg_query_agent.score_agent` / `query_kg_for_agents`.
+
+When the candidates come from the catalog, the BM25 relevance of each agent
+to the raw query text (kg/retrieval.py) is blended into the score with
+RETRIEVAL_SCORE_WEIGHT and reported as `text_relevance`.
+"""
+
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..kg.retrieval import AgentRetrievalIndex
+from ..kg.snapshot import get_snapshot
+from ..models.domain import Agent
+from ..models.schemas import AnalyzedQuery
+
+# Column layout of AgentFeatures.matrix
+CAPABILITY_LEVEL = 0
+HISTORICAL_ACCURACY = 1
+RESPONSE_TIME_SCORE = 2
+COST_EFFICIENCY = 3
+RELIABILITY = 4
+SPECIALIZATION_SCORE = 5
+
+FEATURE_WEIGHTS = np.array([0.25, 0.20, 0.10, 0.10, 0.05, 0.05])
+DOMAIN_WEIGHT = 0.25
+SCORE_DECIMALS = 12
+
+
+class AgentFeatures:
+    """Column matrix of scoring features for a fixed list of agents."""
+
+    def __init__(self, agents: Sequence[Agent]):
+        self.agents = list(agents)
+        self.index: Dict[str, int] = {agent.name: i for i, agent in enumerate(self.agents)}
+        self.matrix = np.array(
+            [
+                (
+                    a.capability_level,
+                    a.historical_accuracy,
+                    1.0 - a.response_time,
+                    a.cost_efficiency,
+                    a.reliability,
+                    a.specialization_score,
+                )
+                for a in self.agents
+            ],
+            dtype=np.float64,
+        ).reshape(len(self.agents), len(FEATURE_WEIGHTS))
+
+        self.domain_codes: Dict[str, int] = {}
+        self.domains = np.array(
+            [self.domain_codes.setdefault(a.domain_expertise, len(self.domain_codes)) for a in self.agents],
+            dtype=np.int64,
+        )
+        self.is_general = np.array([a.domain_expertise == "general" for a in self.agents], dtype=bool)
+        self.text_input = np.array([a.input_format == "text" for a in self.agents], dtype=bool)
+        self.output_formats = [a.output_format for a in self.agents]
+        # Set on the catalog matrix, whose rows are in the same order as the index
+        self.retrieval: AgentRetrievalIndex | None = None
+
+    def rows_for(self, agents: Sequence[Agent]) -> np.ndarray:
+        return np.fromiter((self.index[a.name] for a in agents), dtype=np.int64, count=len(agents))
+
+    def domain_code(self, domain: str) -> int:
+        # -1 never matches an agent, so unknown domains score as "other"
+        return self.domain_codes.get(domain, -1)
+
+    def score(
+        self,
+        analyzed: Sequence[AnalyzedQuery],
+        rows: np.ndarray | None = None,
+        historical: np.ndarray | None = None,
+        relevance: np.ndarray | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score `rows` (default: every agent) against a batch of analyzed queries.
+
+        Returns (scores, domain_match), both shaped (len(rows), len(analyzed)).
+        `historical` optionally overrides the historical accuracy column.
+        `relevance` (same shape as the result, NaN where unknown) is blended
+        in with RETRIEVAL_SCORE_WEIGHT.
+        """
+        features = self.matrix if rows is None else self.matrix[rows]
+        domains = self.domains if rows is None else self.domains[rows]
+        is_general = self.is_general if rows is None else self.is_general[rows]
+        if historical is not None:
+            features = features.copy()
+            features[:, HISTORICAL_ACCURACY] = historical
+
+        query_domains = np.array([self.domain_code(q.domain) for q in analyzed], dtype=np.int64)
+        exact = domains[:, None] == query_domains[None, :]
+        domain_match = np.where(exact, 1.0, np.where(is_general, 0.6, 0.3)[:, None])
+
+        scores = (features @ FEATURE_WEIGHTS)[:, None] + DOMAIN_WEIGHT * domain_match
+        if relevance is not None:
+            weight = settings.retrieval_score_weight
+            scores = np.where(np.isnan(relevance), scores, (1 - weight) * scores + weight * np.nan_to_num(relevance))
+        return scores, domain_match
+
+    def relevance(self, analyzed: Sequence[AnalyzedQuery], rows: np.ndarray | None = None) -> np.ndarray | None:
+        """
+        Text relevance of `rows` to each query, shaped (len(rows), len(analyzed)),
+        NaN for queries without an indexed term. None when retrieval is off or
+        this matrix has no index.
+        """
+        if self.retrieval is None or not settings.retrieval_enabled:
+            return None
+        columns = []
+        for query in analyzed:
+            relevance = self.retrieval.relevance(query.raw_text)
+            if relevance is None:
+                columns.append(np.full(len(self.agents), np.nan))
+            else:
+                columns.append(relevance)
+        matrix = np.column_stack(columns) if columns else np.empty((len(self.agents), 0))
+        return matrix if rows is None else matrix[rows]
+
+    def rank(
+        self,
+        analyzed: AnalyzedQuery,
+        rows: np.ndarray,
+        top_k: int | None = None,
+        historical: np.ndarray | None = None,
+        scores: np.ndarray | None = None,
+        domain_match: np.ndarray | None = None,
+        relevance: np.ndarray | None = None,
+    ) -> List[Tuple[Agent, float, dict]]:
+        """
+        Rank `rows` for one analyzed query and return the top_k as
+        (Agent, score, tie_breaking_info). Pre-computed `scores`,
+        `domain_match` and `relevance` columns (from a batch `score` call)
+        may be passed in.
+        """
+        if len(rows) == 0:
+            return []
+        if scores is None or domain_match is None:
+            relevance = self.relevance([analyzed], rows)
+            scores, domain_match = self.score([analyzed], rows, historical, relevance)
+            scores, domain_match = scores[:, 0], domain_match[:, 0]
+            relevance = relevance[:, 0] if relevance is not None else None
+
+        features = self.matrix[rows]
+        if historical is not None:
+            features = features.copy()
+            features[:, HISTORICAL_ACCURACY] = historical
+        exact = (self.domains[rows] == self.domain_code(analyzed.domain)).astype(np.float64)
+
+        # np.lexsort sorts by the last key first; keys are negated for descending order.
+        # Scores are rounded so summation-order noise does not beat the tie-breakers.
+        order = np.lexsort(
+            (
+                -features[:, COST_EFFICIENCY],
+                -features[:, RESPONSE_TIME_SCORE],
+                -features[:, SPECIALIZATION_SCORE],
+                -features[:, RELIABILITY],
+                -features[:, HISTORICAL_ACCURACY],
+                -features[:, CAPABILITY_LEVEL],
+                -exact,
+                -np.round(scores, SCORE_DECIMALS),
+            )
+        )
+        if top_k is not None:
+            order = order[:top_k]
+
+        ranked: List[Tuple[Agent, float, dict]] = []
+        for pos in order:
+            row = int(rows[pos])
+            values = features[pos]
+            output_format = self.output_formats[row]
+            tie_breaking = {
+                "capability_level": float(values[CAPABILITY_LEVEL]),
+                "historical_accuracy": float(values[HISTORICAL_ACCURACY]),
+                "domain_match": float(domain_match[pos]),
+                "domain_exact_match": float(exact[pos]),
+                "input_format_match": 1.0 if self.text_input[row] or analyzed.output_format is None else 0.8,
+                "output_format_match": 1.0 if output_format == analyzed.output_format or analyzed.output_format is None else 0.7,
+                "response_time_score": float(values[RESPONSE_TIME_SCORE]),
+                "cost_efficiency": float(values[COST_EFFICIENCY]),
+                "reliability": float(values[RELIABILITY]),
+                "specialization_score": float(values[SPECIALIZATION_SCORE]),
+            }
+            if relevance is not None and not np.isnan(relevance[pos]):
+                tie_breaking["text_relevance"] = float(relevance[pos])
+            ranked.append((self.agents[row], float(scores[pos]), tie_breaking))
+        return ranked
+
+
+_catalog_lock = threading.Lock()
+_catalog: Tuple[int, AgentFeatures] | None = None
+
+
+def get_catalog_features() -> AgentFeatures | None:
+    """Feature matrix for the whole agent catalog, rebuilt once per snapshot version."""
+    global _catalog
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    with _catalog_lock:
+        if _catalog is None or _catalog[0] != snapshot.version:
+            features = AgentFeatures(snapshot.ranked_agents)
+            features.retrieval = snapshot.retrieval_index()
+            _catalog = (snapshot.version, features)
+        return _catalog[1]
+
+
+def features_for(candidates: Sequence[Agent]) -> Tuple[AgentFeatures, np.ndarray]:
+    """
+    Return a feature matrix covering `candidates` and the row index of each.
+    Uses the cached catalog matrix when every candidate is in it.
+    """
+    catalog = get_catalog_features()
+    if catalog is not None:
+        try:
+            return catalog, catalog.rows_for(candidates)
+        except KeyError:
+            pass
+    features = AgentFeatures(candidates)
+    return features, np.arange(len(candidates), dtype=np.int64)
+
+
+def rank_agents(
+    candidates: Sequence[Agent],
+    analyzed: AnalyzedQuery,
+    top_k: int | None = None,
+    historical_scores: Sequence[float] | None = None,
+) -> List[Tuple[Agent, float, dict]]:
+    features, rows = features_for(candidates)
+    historical = np.asarray(historical_scores, dtype=np.float64) if historical_scores is not None else None
+    return features.rank(analyzed, rows, top_k=top_k, historical=historical)
+
+
+def rank_agents_batch(
+    candidates: Sequence[Agent],
+    analyzed: Sequence[AnalyzedQuery],
+    top_k: int | None = None,
+    historical_scores: Sequence[float] | None = None,
+) -> List[List[Tuple[Agent, float, dict]]]:
+    """
+    Rank one candidate set for several analyzed queries, scoring them all
+    with a single matrix product. Returns one ranking per analyzed query.
+    `historical_scores` (one per candidate) applies to every query.
+    """
+    if not analyzed:
+        return []
+    features, rows = features_for(candidates)
+    historical = np.asarray(historical_scores, dtype=np.float64) if historical_scores is not None else None
+    relevance = features.relevance(analyzed, rows)
+    scores, domain_match = features.score(analyzed, rows, historical, relevance)
+    return [
+        features.rank(
+            query, rows, top_k=top_k, historical=historical, scores=scores[:, i], domain_match=domain_match[:, i],
+            relevance=relevance[:, i] if relevance is not None else None,
+        )
+        for i, query in enumerate(analyzed)
+    ]
@@ -0,0 +1,191 @@
+"""
+Conditional responses for polled read endpoints.
+
+Dashboards poll /agents/, /agents/{name}, /metrics/ and
+/visualization/kg/visualization every few seconds, and between two polls the
+graph has usually not changed. `cached_json` keeps the last serialized body
+of each request (path and query string) together with the graph version it
+was built at and serves it again while the version is the same, so a
+repeated poll runs no query and serializes nothing.
+
+The version pairs this process's write counter (kg/graph_version.py) with
+state every API worker shares: the global MetricsRollup counters, which move
+whenever any process writes or relabels a decision. They are re-read at most
+every HTTP_CACHE_VERSION_CHECK_SECONDS, so a decision written by another
+worker shows up within that time. Changes the counters do not cover (agent
+edits by another process are picked up by the snapshot reload, which bumps
+the local version) and setups without rollups fall back to rebuilding a body
+after HTTP_CACHE_MAX_AGE_SECONDS.
+
+Concurrent misses for the same request and version share one build, so a
+burst of polls after a write runs the query once.
+
+Every response carries an ETag, a hash of the body, and `Cache-Control:
+no-cache`: clients keep the body and revalidate each time, and a request
+whose If-None-Match matches is answered 304 with no body. Because the ETag
+is derived from the body, two API workers that built the same body agree on
+it.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from ..config import settings
+from ..kg.async_queries import get_shared_graph_version
+from ..kg.graph_version import graph_version
+
+CACHE_CONTROL = "no-cache"
+
+
+@dataclass
+class CachedBody:
+    version: Hashable
+    stored_at: float
+    body: bytes
+    etag: str
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _serialize(content: Any) -> bytes:
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires: W/ prefixes are ignored, "*" matches anything."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Bounded LRU of serialized bodies by request key, valid for one graph version."""
+
+    def __init__(self, max_entries: int, max_age_seconds: float):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "coalesced": 0}
+
+    def get(self, key: str, version: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or time.monotonic() - entry.stored_at > self.max_age_seconds:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, key: str, version: Hashable, body: bytes) -> CachedBody:
+        entry = CachedBody(version=version, stored_at=time.monotonic(), body=body, etag=_etag(body))
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+
+_cache = ResponseCache(settings.http_cache_max_entries, settings.http_cache_max_age_seconds)
+
+
+def get_response_cache() -> ResponseCache:
+    return _cache
+
+
+def _request_key(request: Request) -> str:
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+
+_inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+_shared_version: Tuple[float, Any] | None = None
+
+
+def _forget(flight: Hashable, task: "asyncio.Future[Any]") -> None:
+    if _inflight.get(flight) is task:
+        del _inflight[flight]
+    if not task.cancelled():
+        # Marks the exception retrieved when every waiter has gone away
+        task.exception()
+
+
+async def _single_flight(flight: Hashable, run: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Await `run()`, or the call already running under `flight`. The call runs
+    as its own task, so a waiter that is cancelled (a client that hung up)
+    does not cancel it for the others.
+    """
+    task = _inflight.get(flight)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(run())
+        _inflight[flight] = task
+        task.add_done_callback(lambda done: _forget(flight, done))
+    return await asyncio.shield(task)
+
+
+async def _current_version() -> Tuple[int, Any]:
+    """This process's write counter and the shared rollup counters, re-read every HTTP_CACHE_VERSION_CHECK_SECONDS."""
+    global _shared_version
+    local = graph_version()
+    now = time.monotonic()
+    if _shared_version is None or now - _shared_version[0] >= settings.http_cache_version_check_seconds:
+        _shared_version = (now, await _single_flight("shared-version", get_shared_graph_version))
+    return local, _shared_version[1]
+
+
+async def cached_json(request: Request, build: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    The JSON body `build` returns, reused while the graph version is unchanged,
+    with ETag and Cache-Control; 304 when If-None-Match already has it.
+    Concurrent misses share one `build` call. Exceptions from `build` (e.g. an
+    HTTPException for a 404) propagate to every waiter and nothing is cached.
+    """
+    if not settings.http_cache_enabled:
+        return Response(_serialize(await build()), media_type="application/json")
+
+    key = _request_key(request)
+    # Read before building: a write that lands meanwhile leaves the body under the older version
+    version = await _current_version()
+    entry = _cache.get(key, version)
+    if entry is None:
+        async def build_and_store() -> CachedBody:
+            return _cache.put(key, version, _serialize(await build()))
+
+        if (key, version) in _inflight:
+            _cache.count("coalesced")
+        entry = await _single_flight((key, version), build_and_store)
+
+    headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
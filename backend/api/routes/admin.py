@@ -0,0 +1,38 @@
+from typing import Literal
+
+from fastapi import APIRouter, Query
+
+from ...kg.profiler import get_profiler
+
+router = APIRouter()
+
+
+@router.get("/queries/top")
+def top_queries(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: Literal["total_client_ms", "total_server_ms", "calls", "max_client_ms", "rows", "slow_calls"] = "total_client_ms",
+):
+    """
+    Cypher statements ranked by cost since startup (or the last reset).
+
+    Each entry has the logical query name (the constant holding the
+    statement, or inline:<hash>), the statement, calls, errors, rows,
+    total/mean/max client time, total/mean server time and slow calls.
+    """
+    return {"queries": get_profiler().top(limit=limit, order_by=order_by)}
+
+
+@router.get("/queries/slow")
+def slow_queries():
+    """
+    Most recent calls over KG_SLOW_QUERY_MS, newest first. Sampled entries
+    carry the PROFILE (reads) or EXPLAIN (writes) plan once it is captured.
+    """
+    return {"slow_queries": get_profiler().slow_queries()}
+
+
+@router.delete("/queries/stats")
+def reset_query_stats():
+    """Clear the query statistics and the slow-query log."""
+    get_profiler().reset()
+    return {"status": "ok"}
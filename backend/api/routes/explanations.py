@@ -1,13 +1,15 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
 
-from ...kg.queries import get_routing_explanation, get_routing_path
+from ...kg.async_queries import get_routing_details, get_routing_explanation, get_routing_path
 from ...models.schemas import AnalyzedQuery
 
 router = APIRouter()
 
 
 @router.get("/routing/{routing_decision_id}/explanation")
-def get_routing_explanation_endpoint(routing_decision_id: str, task_type: str):
+async def get_routing_explanation_endpoint(routing_decision_id: str, task_type: Optional[str] = None):
     """
     Returns the graph traversal path explaining WHY an agent was chosen.
     
@@ -15,15 +17,19 @@ def get_routing_explanation_endpoint(routing_decision_id: str, task_type: str):
     Query -> TaskType -> Required Capabilities -> Agent Capabilities -> Selected Agent
     
     This demonstrates explainable routing by walking the knowledge graph.
+    It is read from the rationale stored with the decision; `task_type` is
+    only needed to explain it against another task type than the one routed.
     """
     try:
-        explanation = get_routing_explanation(routing_decision_id, task_type)
+        explanation = await get_routing_explanation(routing_decision_id, task_type)
         if not explanation:
             raise HTTPException(
                 status_code=404,
                 detail=f"Routing decision {routing_decision_id} not found or invalid task_type {task_type}",
             )
         return explanation
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -32,7 +38,7 @@ def get_routing_explanation_endpoint(routing_decision_id: str, task_type: str):
 
 
 @router.get("/routing/{routing_decision_id}/path")
-def get_routing_path_endpoint(routing_decision_id: str, task_type: str):
+async def get_routing_path_endpoint(routing_decision_id: str, task_type: Optional[str] = None):
     """
     Returns the full graph traversal path for visualization.
     
@@ -44,7 +50,7 @@ def get_routing_path_endpoint(routing_decision_id: str, task_type: str):
     - Agent capabilities
     - Matching capabilities (intersection)
     """
-    path = get_routing_path(routing_decision_id, task_type)
+    path = await get_routing_path(routing_decision_id, task_type)
     if not path:
         raise HTTPException(
             status_code=404,
@@ -52,3 +58,20 @@ def get_routing_path_endpoint(routing_decision_id: str, task_type: str):
         )
     return path
 
+
+@router.get("/routing/{routing_decision_id}/details")
+async def get_routing_details_endpoint(routing_decision_id: str, task_type: Optional[str] = None, limit: int = 5):
+    """
+    Everything the result panel shows for a routing decision, in one request:
+    - Required capabilities of the task type
+    - Capabilities of the selected agent, and the matching ones
+    - Complementary agents providing the missing capabilities (up to `limit`)
+    - The routing explanation
+    """
+    details = await get_routing_details(routing_decision_id, task_type, limit)
+    if not details:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Routing decision {routing_decision_id} not found",
+        )
+    return details
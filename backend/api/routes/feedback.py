@@ -1,42 +1,29 @@
 from fastapi import APIRouter, HTTPException
 
-from ...agents.feedback_collector import record_feedback
-from ...kg.queries import _session  # type: ignore[attr-defined]
-from ...models.schemas import FeedbackRequest
+from ...agents.feedback_collector import record_feedback_async, record_feedback_batch_async
+from ...config import settings
+from ...models.schemas import BatchFeedbackRequest, FeedbackRequest
 
 router = APIRouter()
 
 
-def _get_agent_name_for_routing_decision(routing_decision_id: str) -> str | None:
-    cypher = """
-    MATCH (rd:RoutingDecision {id: $id})-[:ROUTED_TO]->(a:Agent)
-    RETURN a.name AS name
-    """
-    with _session() as session:  # reuse the same helper as other KG queries
-        record = session.run(cypher, id=routing_decision_id).single()
-        if not record:
-            return None
-        return record["name"]
-
-
 @router.post("/")
-def submit_feedback(feedback: FeedbackRequest) -> dict:
+async def submit_feedback(feedback: FeedbackRequest) -> dict:
     """
     Submit feedback for a routing decision.
     Returns impact information showing how feedback affects agent performance.
     """
     try:
-        agent_name = _get_agent_name_for_routing_decision(feedback.routing_decision_id)
-        if not agent_name:
+        result = await record_feedback_async(feedback.routing_decision_id, feedback.success)
+        if result is None:
             raise HTTPException(status_code=404, detail="RoutingDecision not found")
 
-        impact = record_feedback(feedback.routing_decision_id, agent_name, feedback.success)
         return {
             "status": "ok",
             "routing_decision_id": feedback.routing_decision_id,
-            "agent_name": agent_name,
+            "agent_name": result["agent_name"],
             "feedback_applied": True,
-            "impact": impact.get("impact", {}),
+            "impact": result["impact"],
         }
     except HTTPException:
         raise
@@ -47,3 +34,24 @@ def submit_feedback(feedback: FeedbackRequest) -> dict:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@router.post("/batch")
+async def submit_feedback_batch(batch: BatchFeedbackRequest) -> dict:
+    """
+    Apply many feedback events in one transaction (bulk labeling).
+    Unknown routing decision ids are reported in `not_found` and skipped.
+    """
+    if len(batch.feedback) > settings.feedback_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.feedback_batch_max_items} feedback items per batch",
+        )
+    try:
+        result = await record_feedback_batch_async(
+            [(item.routing_decision_id, item.success) for item in batch.feedback]
+        )
+        return {"status": "ok", **result}
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in batch feedback endpoint: {error_trace}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
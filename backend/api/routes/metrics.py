@@ -1,20 +1,32 @@
-from fastapi import APIRouter
+from typing import Literal
 
-from ...kg.queries import get_routing_metrics
+from fastapi import APIRouter, Query, Request
+
+from ..http_cache import cached_json
+from ...kg.async_queries import get_routing_metrics
 
 router = APIRouter()
 
 
 @router.get("/")
-def get_routing_metrics_endpoint():
+async def get_routing_metrics_endpoint(
+    request: Request,
+    days: int = Query(30, ge=1, le=3650),
+    granularity: Literal["day", "hour"] = "day",
+):
     """
     Returns routing metrics for dashboard display.
+
+    Query parameters:
+    - days: Size of the accuracy trend window (default 30)
+    - granularity: "day" or "hour" buckets for the trend; hourly entries
+      carry an "hour" key instead of "day"
     
     Returns:
     - total_decisions: Total number of routing decisions made
     - average_confidence: Average confidence score across all decisions
     - agent_performance: List of agents with success rates
-    - recent_accuracy_trend: Daily accuracy trends over last 30 days
+    - recent_accuracy_trend: Accuracy per bucket over the requested window
     
     Example response:
     {
@@ -40,9 +52,12 @@ def get_routing_metrics_endpoint():
             ...
         ]
     }
+
+    The body is served with an ETag and rebuilt only after the graph
+    changed; a request whose If-None-Match matches gets 304.
     """
     try:
-        return get_routing_metrics()
+        return await cached_json(request, lambda: get_routing_metrics(days=days, granularity=granularity))
     except Exception as e:
         from fastapi import HTTPException
         raise HTTPException(
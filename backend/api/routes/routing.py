@@ -1,31 +1,75 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 import traceback
 
-from ...crew.crew_config import run_routing_flow
-from ...models.schemas import RouteRequest, RoutingResult
+from ...config import settings
+from ...agents.routing_flow import run_batch_routing_flow_async, run_routing_flow_async
+from ...models.schemas import (
+    BatchRouteItem,
+    BatchRouteRequest,
+    BatchRoutingResult,
+    RouteRequest,
+    RoutingResult,
+)
 
 router = APIRouter()
 
 
+def _routing_result(result: dict, include_stages: bool = False) -> RoutingResult:
+    analyzed = result["analyzed_query"]
+    rationale = {
+        "analyzed_query": analyzed.dict(),
+        "top_candidates": result["top_candidates"],
+        "task_type": analyzed.task_type,
+        "tie_breaking_info": result.get("tie_breaking_info", {}),
+    }
+    if include_stages:
+        rationale["stage_timings_ms"] = result.get("stage_timings_ms", {})
+    return RoutingResult(
+        routing_decision_id=result["routing_decision_id"],
+        chosen_agent=result["chosen_agent"],
+        confidence=result["confidence"],
+        rationale=rationale,
+    )
+
+
 @router.post("/", response_model=RoutingResult)
-def route(route_request: RouteRequest) -> RoutingResult:
+async def route(
+    route_request: RouteRequest,
+    include_stages: bool = Query(False, description="Add per-stage timings (ms) to the rationale"),
+) -> RoutingResult:
     try:
-        result = run_routing_flow(route_request.query)
-        analyzed = result["analyzed_query"]
-        return RoutingResult(
-            routing_decision_id=result["routing_decision_id"],
-            chosen_agent=result["chosen_agent"],
-            confidence=result["confidence"],
-            rationale={
-                "analyzed_query": analyzed.dict(),
-                "top_candidates": result["top_candidates"],
-                "task_type": analyzed.task_type,
-                "tie_breaking_info": result.get("tie_breaking_info", {}),
-            },
-        )
+        result = await run_routing_flow_async(route_request.query)
+        return _routing_result(result, include_stages)
     except Exception as e:
         error_trace = traceback.format_exc()
         print(f"Error in routing endpoint: {error_trace}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@router.post("/batch", response_model=BatchRoutingResult)
+async def route_batch(batch_request: BatchRouteRequest) -> BatchRoutingResult:
+    """
+    Route many queries in one call (offline re-routing and evaluation jobs).
+
+    Results come back in input order. A query that fails carries an `error`
+    instead of a `result`; the other queries are unaffected.
+    """
+    if len(batch_request.queries) > settings.routing_batch_max_queries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.routing_batch_max_queries} queries per batch",
+        )
+    try:
+        outcomes = await run_batch_routing_flow_async(batch_request.queries)
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"Error in batch routing endpoint: {error_trace}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    items = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, Exception):
+            items.append(BatchRouteItem(index=index, error=str(outcome)))
+        else:
+            items.append(BatchRouteItem(index=index, result=_routing_result(outcome)))
+    return BatchRoutingResult(results=items)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ...telemetry import render_prometheus
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    """
+    Stage and HTTP latency histograms in the Prometheus text exposition format.
+    This is the scrape target for monitoring; /metrics/ is the routing dashboard.
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
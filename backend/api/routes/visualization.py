@@ -1,19 +1,56 @@
-from fastapi import APIRouter
+import json
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from ...kg.queries import get_kg_for_visualization
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..http_cache import cached_json
+from ...kg.async_queries import get_kg_for_visualization, iter_kg_for_visualization
+from ...kg.queries import MAX_NEIGHBOURHOOD_HOPS
 
 router = APIRouter()
 
 
+async def _ndjson_lines(filters: dict):
+    async for kind, item in iter_kg_for_visualization(**filters):
+        yield json.dumps({kind: item}, default=str) + "\n"
+
+
 @router.get("/kg/visualization")
-def get_kg_visualization():
+async def get_kg_visualization(
+    request: Request,
+    labels: Optional[List[str]] = Query(None),
+    rel_types: Optional[List[str]] = Query(None),
+    node_id: Optional[str] = None,
+    hops: int = Query(1, ge=0, le=MAX_NEIGHBOURHOOD_HOPS),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    format: Literal["json", "ndjson"] = "json",
+):
     """
     Returns graph data in format suitable for visualization (e.g., vis.js, D3.js, react-force-graph).
-    
+
+    Query parameters (all optional; without any the whole graph is returned):
+    - labels: Only nodes with one of these labels (repeatable)
+    - rel_types: Only relationships of these types (repeatable)
+    - node_id, hops: Only the `hops`-neighbourhood of this node
+    - since, until: Time range applied to RoutingDecision nodes
+    - limit, cursor: Page through nodes; each page carries the edges leaving
+      its nodes and a `next_cursor` to pass back (null on the last page)
+    - format: "ndjson" streams one JSON object per line ({"node": ...},
+      {"edge": ...}, then {"next_cursor": ...}) as rows arrive from Neo4j
+
+    JSON responses carry an ETag and are rebuilt only after the graph
+    changed; a request whose If-None-Match matches gets 304.
+
     Returns:
     - nodes: List of nodes (agents, capabilities, task types) with properties
     - edges: List of edges (relationships) connecting nodes
-    
+    - next_cursor: Cursor for the next page, or null
+
     Node format:
     {
         "id": "node_id",
@@ -21,7 +58,7 @@ def get_kg_visualization():
         "type": "Agent|Capability|TaskType|Query|RoutingDecision",
         "properties": {...}
     }
-    
+
     Edge format:
     {
         "id": "edge_id",
@@ -31,12 +68,28 @@ def get_kg_visualization():
         "properties": {...}
     }
     """
+    # Validate ids up front: a streamed response cannot change status later
+    for name, value in (("node_id", node_id), ("cursor", cursor)):
+        if value is not None and not value.isdigit():
+            raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+
+    filters = {
+        "labels": labels,
+        "rel_types": rel_types,
+        "node_id": node_id,
+        "hops": hops,
+        "since": since,
+        "until": until,
+        "cursor": cursor,
+        "limit": limit,
+    }
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_lines(filters), media_type="application/x-ndjson")
+
     try:
-        return get_kg_for_visualization()
+        return await cached_json(request, lambda: get_kg_for_visualization(**filters))
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching visualization data: {str(e)}",
         )
-
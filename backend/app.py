@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 
-from .api.routes import agents, explanations, feedback, metrics, routing, visualization
-from .kg.client import close_driver, get_driver
+from .api.routes import admin, agents, explanations, feedback, metrics, routing, telemetry, visualization
+from .config import settings
+from .extraction.cache import close_extraction_cache
+from .kg.backend import is_embedded
+from .kg.client import close_async_driver, close_driver, get_async_driver, get_driver
+from .kg.context_accuracy import start_context_accuracy_flusher, stop_context_accuracy_flusher
+from .kg.decision_writer import DecisionWriteError, start_decision_writer, stop_decision_writer
+from .kg.migrations import run_migrations
+from .kg.snapshot import get_snapshot, start_snapshot_refresher, stop_snapshot_refresher
+from .telemetry import HTTP_REQUEST_SECONDS
+from .warmup import warmup
 
 app = FastAPI(title="Smart Agentic Router")
 
@@ -16,14 +28,62 @@ app.add_middleware(
 )
 
 
+def _route_template(request: Request) -> str:
+    # Label by route template, not raw path, to keep the series count bounded
+    if request.scope.get("route") is None:
+        return "unmatched"
+    path = request.scope["path"]
+    for name, value in request.scope.get("path_params", {}).items():
+        path = path.replace(str(value), "{" + name + "}", 1)
+    return path
+
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    if settings.telemetry_enabled:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            _route_template(request),
+            str(response.status_code),
+        )
+    return response
+
+
 @app.on_event("startup")
-def on_startup() -> None:
-    get_driver()
+async def on_startup() -> None:
+    if not is_embedded():
+        get_driver()
+        get_async_driver()
+        if settings.schema_migrations_on_startup:
+            try:
+                await asyncio.to_thread(run_migrations)
+            except Exception as e:
+                # Serve with the schema as it is rather than not at all
+                print(f"Warning: schema migrations failed: {e}")
+    if settings.startup_warmup_enabled:
+        await warmup()
+    else:
+        get_snapshot()
+    start_snapshot_refresher()
+    start_decision_writer()
+    start_context_accuracy_flusher()
 
 
 @app.on_event("shutdown")
-def on_shutdown() -> None:
+async def on_shutdown() -> None:
+    stop_snapshot_refresher()
+    try:
+        await stop_decision_writer()
+    except DecisionWriteError as e:
+        # Close the drivers regardless; the decisions are in the dead-letter file
+        print(f"Warning: {e}")
+    stop_context_accuracy_flusher()
+    await close_async_driver()
     close_driver()
+    close_extraction_cache()
 
 
 @app.get("/")
@@ -37,5 +97,7 @@ app.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
 app.include_router(agents.router, prefix="/agents", tags=["agents"])
 app.include_router(visualization.router, prefix="/visualization", tags=["visualization"])
 app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+app.include_router(telemetry.router, prefix="/telemetry", tags=["telemetry"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 
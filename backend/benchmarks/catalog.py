@@ -0,0 +1,382 @@
+"""
+Synthetic agent catalogs for scale testing.
+
+`generate_catalog(agents, decisions_per_agent)` builds a catalog shaped like
+the seed graph, at any size:
+
+- domains follow the seed's own mix (general agents are the most common);
+- every agent has a handful of capabilities, mostly from its own domain's
+  cluster, picked with Zipf weights so a few capabilities are very common
+  and the rest form a long tail; the pool grows with the catalog;
+- the five extraction task types require the seed's capabilities, so the
+  task-match tier of get_agents_by_task_type is exercised;
+- fallbacks point at a strong agent of the same domain or a general one;
+- decision traffic is Zipf-distributed over agents, spread over the last
+  90 days, re-uses a pool of query texts, and 60% of decisions have an
+  outcome drawn from the agent's accuracy.
+
+The catalog is plain parameter rows, written either into a fresh
+EmbeddedGraph (`load_into_embedded`) or into Neo4j with batched `UNWIND`
+transactions, run in parallel by the bulk loader (`load_into_neo4j`).
+MetricsRollup counters are written with the decisions so /metrics/ stays
+consistent. --output saves the catalog as JSON, which kg/bulk_load.py reads
+(agents, capabilities, task types and their relationships; not decisions).
+
+    python -m backend.benchmarks.catalog --agents 10000 --decisions-per-agent 50 --neo4j
+    python -m backend.benchmarks.catalog --agents 5000 --decisions-per-agent 0 --output catalog.json
+"""
+
+import argparse
+import json
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+# Share of each domain among the seed agents
+DOMAIN_WEIGHTS = {
+    "general": 8, "development": 5, "analytics": 4, "content": 3, "research": 2, "media": 2,
+    "automation": 1, "education": 1, "finance": 1, "legal": 1, "medical": 1, "security": 1, "technical": 1,
+}
+
+# The seed's task types and the capabilities they require
+TASK_TYPES = {
+    "WebSearchTask": (0.3, ["WebSearching", "FactRetrieval", "Research"]),
+    "CodeDebuggingTask": (0.8, ["CodeUnderstanding", "DebuggingAssistance", "SecurityScanning", "CodeGeneration"]),
+    "SummarizationTask": (0.5, ["DocumentSummarization", "TextAnalysis"]),
+    "VisualizationTask": (0.7, ["DataVisualization", "DataAnalysis"]),
+    "OtherTask": (0.5, ["GeneralKnowledge", "ConversationalAI"]),
+}
+TASK_WEIGHTS = {"WebSearchTask": 0.3, "SummarizationTask": 0.25, "OtherTask": 0.2, "CodeDebuggingTask": 0.15, "VisualizationTask": 0.1}
+
+# Which seed capabilities belong to which domain's cluster
+DOMAIN_CAPABILITIES = {
+    "general": ["WebSearching", "FactRetrieval", "GeneralKnowledge", "ConversationalAI"],
+    "development": ["CodeUnderstanding", "DebuggingAssistance", "CodeGeneration"],
+    "security": ["SecurityScanning", "CodeUnderstanding"],
+    "analytics": ["DataAnalysis", "DataVisualization"],
+    "research": ["Research", "FactRetrieval", "DocumentSummarization"],
+    "content": ["DocumentSummarization", "TextAnalysis"],
+}
+
+SKILLS = [
+    "Analysis", "Extraction", "Forecasting", "Classification", "Translation", "Review", "Planning",
+    "Monitoring", "Compliance", "Reporting", "Search", "Generation", "Validation", "Optimization",
+    "Transcription", "Tagging", "Scheduling", "Auditing", "Modeling", "Drafting",
+]
+ROLES = ["Analyzer", "Assistant", "Expert", "Pro", "Agent", "Copilot", "Engine", "Specialist"]
+FORMATS = ["text", "json", "markdown", "html", "chart", "image", "audio", "video"]
+FORMAT_WEIGHTS = [0.45, 0.3, 0.1, 0.04, 0.04, 0.03, 0.02, 0.02]
+
+QUERY_TEMPLATES = {
+    "WebSearchTask": ["find the latest {topic} news", "search for {topic} sources", "what is the current state of {topic}"],
+    "CodeDebuggingTask": ["fix the {topic} bug in my code", "why does my {topic} function crash", "review this {topic} code for vulnerabilities"],
+    "SummarizationTask": ["summarize this {topic} report", "give me the key points of the {topic} document", "tl;dr of the {topic} paper"],
+    "VisualizationTask": ["plot {topic} over time", "create a chart of {topic}", "visualize the {topic} dataset"],
+    "OtherTask": ["help me with {topic}", "explain {topic} simply", "draft an email about {topic}"],
+}
+
+HISTORY_DAYS = 90
+JUDGED_SHARE = 0.6
+
+
+def _zipf_weights(n: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _capability_pool(agents: int) -> Dict[str, List[str]]:
+    """Capability names per domain cluster: the seed's plus a synthetic long tail."""
+    per_domain = max(4, int(4 * np.sqrt(agents) / len(DOMAIN_WEIGHTS)))
+    pool = {}
+    for domain in DOMAIN_WEIGHTS:
+        synthetic = [f"{domain.capitalize()}{skill}" for skill in SKILLS]
+        while len(synthetic) < per_domain:
+            synthetic += [f"{name}{len(synthetic) // len(SKILLS)}" for name in synthetic[: len(SKILLS)]]
+        pool[domain] = DOMAIN_CAPABILITIES.get(domain, []) + synthetic[:per_domain]
+    return pool
+
+
+def generate_catalog(agents: int, decisions_per_agent: float = 20, seed: int = 0, now: datetime | None = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Rows for capabilities, task types, agents, their edges and routing decisions."""
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now(timezone.utc)
+    domains = list(DOMAIN_WEIGHTS)
+    domain_p = np.array(list(DOMAIN_WEIGHTS.values()), dtype=np.float64)
+    domain_p /= domain_p.sum()
+
+    pool = _capability_pool(agents)
+    capabilities = sorted({name for names in pool.values() for name in names} | {c for _, caps in TASK_TYPES.values() for c in caps})
+    every_capability = np.array(capabilities)
+    tail_p = _zipf_weights(len(every_capability), 0.8)
+
+    agent_domains = rng.choice(len(domains), size=agents, p=domain_p)
+    capability_counts = 1 + rng.poisson(2.5, size=agents)
+    accuracy = rng.beta(8, 2, size=agents)
+    capability_level = rng.beta(8, 2, size=agents)
+    volume = rng.lognormal(4.0, 1.0, size=agents).astype(np.int64) + 1
+    output_formats = rng.choice(len(FORMATS), size=agents, p=FORMAT_WEIGHTS)
+
+    agent_rows, agent_capabilities = [], []
+    for i in range(agents):
+        domain = domains[agent_domains[i]]
+        own = pool[domain]
+        own_p = _zipf_weights(len(own))
+        picked = set()
+        for _ in range(int(capability_counts[i])):
+            if rng.random() < 0.7:
+                picked.add(own[rng.choice(len(own), p=own_p)])
+            else:
+                picked.add(str(every_capability[rng.choice(len(every_capability), p=tail_p)]))
+        skill = SKILLS[i % len(SKILLS)]
+        name = f"{domain.capitalize()} {skill} {ROLES[i % len(ROLES)]} {i:06d}"
+        successes = int(volume[i] * accuracy[i])
+        agent_rows.append({
+            "name": name,
+            "description": f"{skill} for {domain} work: " + ", ".join(sorted(picked)),
+            "capabilityLevel": round(float(capability_level[i]), 3),
+            "domainExpertise": domain,
+            "inputFormat": "text",
+            "outputFormat": FORMATS[output_formats[i]],
+            "historicalAccuracy": round(float(accuracy[i]), 3),
+            "responseTime": round(float(rng.beta(2, 5)), 3),
+            "costEfficiency": round(float(rng.beta(5, 2)), 3),
+            "reliability": round(float(rng.beta(9, 1)), 3),
+            "specializationScore": round(float(rng.beta(6, 2)), 3),
+            "successCount": successes,
+            "failureCount": int(volume[i]) - successes,
+            "keywords": [skill.lower(), domain],
+            "tags": [f"domain:{domain}", f"capability:{skill.lower()}"],
+        })
+        agent_capabilities += [{"agent": name, "capability": capability} for capability in sorted(picked)]
+
+    # Fallbacks: the strongest agents of each domain, and the general ones
+    by_domain: Dict[str, List[int]] = {}
+    for i in np.argsort(-accuracy):
+        by_domain.setdefault(domains[agent_domains[i]], []).append(int(i))
+    fallbacks = []
+    for i, row in enumerate(agent_rows):
+        targets = by_domain.get(row["domainExpertise"], [])[:5] + by_domain.get("general", [])[:5]
+        targets = [t for t in targets if t != i]
+        for t in rng.choice(targets, size=min(2, len(targets)), replace=False) if targets else []:
+            fallbacks.append({"agent": row["name"], "fallback": agent_rows[int(t)]["name"]})
+
+    return {
+        "capabilities": [{"name": name} for name in capabilities],
+        "task_types": [
+            {"name": name, "complexityLevel": complexity, "capabilities": caps}
+            for name, (complexity, caps) in TASK_TYPES.items()
+        ],
+        "agents": agent_rows,
+        "agent_capabilities": agent_capabilities,
+        "fallbacks": fallbacks,
+        "decisions": list(_decisions(rng, agent_rows, int(agents * decisions_per_agent), now)),
+    }
+
+
+def _decisions(rng: np.random.Generator, agents: List[Dict[str, Any]], count: int, now: datetime) -> Iterator[Dict[str, Any]]:
+    from ..kg.queries import query_hash
+
+    if not agents or count <= 0:
+        return
+    popularity = _zipf_weights(len(agents))
+    ranks = rng.permutation(len(agents))
+    chosen = ranks[rng.choice(len(agents), size=count, p=popularity)]
+    task_names = list(TASK_WEIGHTS)
+    tasks = rng.choice(len(task_names), size=count, p=list(TASK_WEIGHTS.values()))
+    ages = rng.uniform(0, HISTORY_DAYS * 86400, size=count)
+    judged = rng.random(count) < JUDGED_SHARE
+    draws = rng.random(count)
+    confidence = rng.beta(6, 2, size=count)
+    # Real traffic repeats itself: about one distinct query text per five decisions
+    topics = max(1, count // 15)
+    topic_ids = rng.integers(0, topics, size=count)
+    templates = rng.integers(0, 3, size=count)
+
+    for n in range(count):
+        agent = agents[chosen[n]]
+        task_type = task_names[tasks[n]]
+        outcome = "PENDING"
+        if judged[n]:
+            outcome = "SUCCESS" if draws[n] < agent["historicalAccuracy"] else "FAILURE"
+        topic = f"{agent['domainExpertise']} topic {topic_ids[n]}"
+        query_text = QUERY_TEMPLATES[task_type][templates[n]].format(topic=topic)
+        yield {
+            "id": str(uuid.UUID(bytes=rng.bytes(16), version=4)),
+            "timestamp": now - timedelta(seconds=float(ages[n])),
+            "queryText": query_text,
+            "queryHash": query_hash(query_text),
+            "agentName": agent["name"],
+            "confidence": round(float(confidence[n]), 4),
+            "taskType": task_type,
+            "domain": agent["domainExpertise"],
+            "outcome": outcome,
+        }
+
+
+def catalog_rollups(decisions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """MetricsRollup deltas for decisions that already carry their outcome."""
+    from ..kg.metrics_rollups import history_rollups
+
+    return history_rollups(decisions)
+
+
+def catalog_summary(catalog: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {name: len(rows) for name, rows in catalog.items()}
+    summary["domains"] = dict(Counter(a["domainExpertise"] for a in catalog["agents"]).most_common())
+    summary["outcomes"] = dict(Counter(d["outcome"] for d in catalog["decisions"]))
+    return summary
+
+
+# ----------------------------------------------------------------------
+# Loading
+# ----------------------------------------------------------------------
+
+
+def load_into_embedded(catalog: Dict[str, List[Dict[str, Any]]]):
+    """A fresh EmbeddedGraph holding the catalog (and the seed's schema only)."""
+    from ..kg.embedded import EmbeddedGraph
+
+    graph = EmbeddedGraph()
+    capabilities = {row["name"]: graph.create_node(["Capability"], row) for row in catalog["capabilities"]}
+    for row in catalog["task_types"]:
+        task = graph.create_node(["TaskType"], {"name": row["name"], "complexityLevel": row["complexityLevel"]})
+        for name in row["capabilities"]:
+            graph.create_relationship(task, "REQUIRES_CAPABILITY", capabilities[name])
+    agents = {row["name"]: graph.create_node(["Agent"], row) for row in catalog["agents"]}
+    for row in catalog["agent_capabilities"]:
+        graph.create_relationship(agents[row["agent"]], "HAS_CAPABILITY", capabilities[row["capability"]])
+    for row in catalog["fallbacks"]:
+        graph.create_relationship(agents[row["agent"]], "FALLBACK_AGENT", agents[row["fallback"]])
+    for d in catalog["decisions"]:
+        query = graph.merge_node("Query", {"hash": d["queryHash"], "text": d["queryText"]})
+        rd = graph.create_node(["RoutingDecision"], {
+            "id": d["id"], "timestamp": d["timestamp"], "confidence": d["confidence"],
+            "taskType": d["taskType"], "domain": d["domain"], "outcome": d["outcome"],
+        })
+        graph.create_relationship(rd, "SOURCE_QUERY", query)
+        graph.create_relationship(rd, "ROUTED_TO", agents[d["agentName"]])
+    graph._apply_rollups(catalog_rollups(catalog["decisions"]))
+    return graph
+
+
+CATALOG_CAPABILITIES_CYPHER = """
+UNWIND $rows AS row
+MERGE (c:Capability {name: row.name})
+"""
+
+CATALOG_TASK_TYPES_CYPHER = """
+UNWIND $rows AS row
+MERGE (t:TaskType {name: row.name})
+SET t.complexityLevel = row.complexityLevel
+WITH t, row
+UNWIND row.capabilities AS capability
+MATCH (c:Capability {name: capability})
+MERGE (t)-[:REQUIRES_CAPABILITY]->(c)
+"""
+
+CATALOG_AGENTS_CYPHER = """
+UNWIND $rows AS row
+MERGE (a:Agent {name: row.name})
+SET a += row
+"""
+
+CATALOG_AGENT_CAPABILITIES_CYPHER = """
+UNWIND $rows AS row
+MATCH (a:Agent {name: row.agent}), (c:Capability {name: row.capability})
+MERGE (a)-[:HAS_CAPABILITY]->(c)
+"""
+
+CATALOG_FALLBACKS_CYPHER = """
+UNWIND $rows AS row
+MATCH (a:Agent {name: row.agent}), (fb:Agent {name: row.fallback})
+MERGE (a)-[:FALLBACK_AGENT]->(fb)
+"""
+
+CATALOG_DECISIONS_CYPHER = """
+UNWIND $rows AS d
+MATCH (agent:Agent {name: d.agentName})
+MERGE (q:Query {hash: d.queryHash})
+ON CREATE SET q.text = d.queryText
+CREATE (rd:RoutingDecision {
+    id: d.id,
+    timestamp: d.timestamp,
+    confidence: d.confidence,
+    taskType: d.taskType,
+    domain: d.domain,
+    outcome: d.outcome
+})
+CREATE (rd)-[:SOURCE_QUERY]->(q)
+CREATE (rd)-[:ROUTED_TO]->(agent)
+"""
+
+def load_into_neo4j(catalog: Dict[str, List[Dict[str, Any]]], batch_size: int = 5000, clear: bool = True,
+                    workers: int | None = None) -> Dict[str, float]:
+    """
+    Write the catalog with the bulk loader (kg/bulk_load.py): one UNWIND
+    transaction per batch, the batches of a phase in parallel. Returns the
+    seconds spent clearing and on each phase.
+    """
+    from ..kg.bulk_load import WriteGroup, clear_graph, write_phases
+    from ..kg.client import get_driver
+    from ..kg.metrics_rollups import ROLLUP_INCREMENT_CYPHER
+    from ..kg.migrations import run_migrations
+
+    timings: Dict[str, float] = {}
+    driver = get_driver()
+    if clear:
+        started = time.perf_counter()
+        with driver.session() as session:
+            clear_graph(session)
+        timings["clear"] = time.perf_counter() - started
+    run_migrations(driver=driver)
+
+    phases = [
+        [
+            WriteGroup("capabilities", CATALOG_CAPABILITIES_CYPHER, catalog["capabilities"]),
+            WriteGroup("agents", CATALOG_AGENTS_CYPHER, catalog["agents"]),
+            WriteGroup("rollups", ROLLUP_INCREMENT_CYPHER, catalog_rollups(catalog["decisions"]), parameter="rollups"),
+        ],
+        # Everything that matches the nodes above
+        [
+            WriteGroup("task_types", CATALOG_TASK_TYPES_CYPHER, catalog["task_types"]),
+            WriteGroup("agent_capabilities", CATALOG_AGENT_CAPABILITIES_CYPHER, catalog["agent_capabilities"]),
+            WriteGroup("fallbacks", CATALOG_FALLBACKS_CYPHER, catalog["fallbacks"]),
+            WriteGroup("decisions", CATALOG_DECISIONS_CYPHER, catalog["decisions"]),
+        ],
+    ]
+    report = write_phases(phases, batch_size, workers, progress=None, driver=driver)
+    if report["errors"]:
+        raise RuntimeError(f"Catalog load failed: {report['errors'][0]}")
+    for phase in report["phases"]:
+        timings["+".join(phase["groups"])] = phase["seconds"]
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--decisions-per-agent", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None, help="Parallel sessions (default BULK_LOAD_WORKERS)")
+    parser.add_argument("--neo4j", action="store_true", help="Replace the configured Neo4j database's content with the catalog")
+    parser.add_argument("--output", type=Path, help="Write the catalog as JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog = generate_catalog(args.agents, args.decisions_per_agent, args.seed)
+    print(f"Generated in {time.perf_counter() - started:.1f}s: {catalog_summary(catalog)}")
+    if args.output:
+        args.output.write_text(json.dumps(catalog, default=str), encoding="utf-8")
+    if args.neo4j:
+        for name, seconds in load_into_neo4j(catalog, args.batch_size, workers=args.workers).items():
+            print(f"{name}: {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+End-to-end load test.
+
+Runs the FastAPI app in-process against the embedded graph (KG_BACKEND=embedded)
+and a stub LLM that replays the recorded extraction responses in
+fixtures/llm_responses.json with injected latency. The stub replaces only the
+Gemini transport of the LLM client, so its concurrency limit, coalescing,
+deadlines and hedging stay in the measured path. Workers drive /routing/,
+/feedback/, /agents/ and /metrics/ at a fixed concurrency. The report holds
+throughput and p50/p95/p99 latency per endpoint and per routing stage, and is
+written as JSON so runs can be compared.
+
+    python -m backend.benchmarks.load --concurrency 32 --duration 30
+    python -m backend.benchmarks.load --llm-latency-ms 400 --output baseline.json
+    python -m backend.benchmarks.load --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, List
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures" / "llm_responses.json"
+
+# Share of requests sent to each endpoint
+DEFAULT_MIX = {"routing": 0.6, "feedback": 0.2, "agents": 0.1, "metrics": 0.1}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of unsorted samples (0.0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, ok: bool = True) -> None:
+        self.latencies.setdefault(name, [])
+        self.errors.setdefault(name, 0)
+        if ok:
+            self.latencies[name].append(seconds)
+        else:
+            self.errors[name] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        return {name: summarize(self.latencies[name], self.errors[name], elapsed) for name in sorted(self.latencies)}
+
+
+class StubLLM:
+    """
+    Replays recorded extraction responses. The response whose query text
+    appears in the prompt is returned; unknown prompts get the fixtures in
+    turn. Each call sleeps for a normally distributed latency.
+    """
+
+    def __init__(self, fixtures: List[Dict[str, Any]], latency_ms: float, jitter_ms: float, seed: int = 0):
+        self.responses = {f["query"]: json.dumps(f["response"]) for f in fixtures}
+        self._ordered = list(self.responses.values())
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: Path, latency_ms: float, jitter_ms: float, seed: int = 0) -> "StubLLM":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")), latency_ms, jitter_ms, seed)
+
+    def _delay(self) -> float:
+        return max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+
+    def _response(self, prompt: str) -> str:
+        self.calls += 1
+        for query, response in self.responses.items():
+            if query in prompt:
+                return response
+        return self._ordered[self.calls % len(self._ordered)]
+
+    def send(self, prompt: str, max_output_tokens: int, timeout: float) -> str:
+        time.sleep(self._delay())
+        return self._response(prompt)
+
+    async def send_async(self, prompt: str, max_output_tokens: int) -> str:
+        await asyncio.sleep(self._delay())
+        return self._response(prompt)
+
+    def install(self) -> None:
+        from ..extraction import llm_client
+
+        client = llm_client.get_llm_client()
+        client.send = self.send
+        client.send_async = self.send_async
+        # Keep the warmup from importing the Gemini SDK for a key that is never used
+        llm_client.warm_up = lambda: None
+
+
+def _timed(func, name: str, recorder: Recorder):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            recorder.record(name, time.perf_counter() - started, ok=False)
+            raise
+        recorder.record(name, time.perf_counter() - started)
+        return result
+    return wrapper
+
+
+def instrument_stages(recorder: Recorder) -> None:
+    """Time the stages of the routing and feedback paths by wrapping the functions they call."""
+    from ..agents import routing_flow
+    from ..api.routes import feedback
+    from ..kg import async_queries
+
+    stages = {
+        "extraction": (routing_flow, "extract_query_async"),
+        "candidates_and_scoring": (routing_flow, "query_kg_for_agents_async"),
+        "fallback_lookup": (async_queries, "get_fallback_agent"),
+        "decision_write": (async_queries, "create_routing_decision"),
+        "feedback_apply": (feedback, "record_feedback_async"),
+    }
+    for name, (module, attribute) in stages.items():
+        setattr(module, attribute, _timed(getattr(module, attribute), name, recorder))
+
+
+async def _worker(client, queries: List[str], mix: Dict[str, float], deadline: float, budget: Dict[str, int],
+                  decisions: deque, recorder: Recorder, rng: random.Random) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        if budget["remaining"] is not None:
+            if budget["remaining"] <= 0:
+                return
+            budget["remaining"] -= 1
+
+        endpoint = rng.choices(names, weights)[0]
+        if endpoint == "feedback" and not decisions:
+            endpoint = "routing"
+
+        started = time.perf_counter()
+        if endpoint == "routing":
+            response = await client.post("/routing/", json={"query": rng.choice(queries)})
+        elif endpoint == "feedback":
+            response = await client.post(
+                "/feedback/",
+                json={"routing_decision_id": rng.choice(decisions), "success": rng.random() < 0.7},
+            )
+        else:
+            response = await client.get(f"/{endpoint}/")
+        elapsed = time.perf_counter() - started
+
+        ok = response.status_code == 200
+        recorder.record(endpoint, elapsed, ok)
+        if ok and endpoint == "routing":
+            decisions.append(response.json()["routing_decision_id"])
+
+
+async def run_load(
+    concurrency: int,
+    duration: float,
+    requests: int | None,
+    mix: Dict[str, float],
+    llm: StubLLM,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    import httpx
+
+    from ..app import app
+    from ..config import settings
+    from ..telemetry import LLM_CLIENT_EVENTS_TOTAL
+
+    llm.install()
+    endpoints, stages = Recorder(), Recorder()
+    instrument_stages(stages)
+    queries = list(llm.responses)
+    decisions: deque = deque(maxlen=10000)
+    budget = {"remaining": requests}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*(
+                _worker(client, queries, mix, deadline, budget, decisions, endpoints, random.Random(seed + n))
+                for n in range(concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in endpoints.latencies.values())
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": concurrency,
+            "duration_seconds": duration,
+            "requests": requests,
+            "mix": mix,
+            "llm_latency_ms": llm.latency_ms,
+            "llm_jitter_ms": llm.jitter_ms,
+            "kg_backend": settings.kg_backend,
+            "extraction_cache_enabled": settings.extraction_cache_enabled,
+            "extraction_local_enabled": settings.extraction_local_enabled,
+            "llm_max_concurrency": settings.llm_max_concurrency,
+            "llm_timeout_seconds": settings.llm_timeout_seconds,
+            "llm_hedging_enabled": settings.llm_hedging_enabled,
+            "seed": seed,
+        },
+        "elapsed_seconds": elapsed,
+        "total_requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "llm_calls": llm.calls,
+        "llm_client": {labels[0]: count for labels, count in sorted(LLM_CLIENT_EVENTS_TOTAL.snapshot().items())},
+        "endpoints": endpoints.report(elapsed),
+        "stages": stages.report(elapsed),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change (current / baseline - 1) of throughput and latency percentiles."""
+    def _delta(old: float, new: float) -> float | None:
+        return new / old - 1 if old else None
+
+    changes: Dict[str, Any] = {"throughput_rps": _delta(baseline["throughput_rps"], current["throughput_rps"])}
+    for section in ("endpoints", "stages"):
+        changes[section] = {
+            name: {
+                metric: _delta(baseline[section][name][metric], stats[metric])
+                for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+            }
+            for name, stats in current[section].items()
+            if name in baseline.get(section, {})
+        }
+    return changes
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests (within --duration)")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help="Endpoint weights, e.g. routing=6,feedback=2,agents=1,metrics=1")
+    parser.add_argument("--llm-latency-ms", type=float, default=250.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_PATH, help="Recorded extraction responses")
+    parser.add_argument("--extraction-cache", action="store_true",
+                        help="Keep the extraction cache on (by default every routing request reaches the stub LLM)")
+    parser.add_argument("--no-local-extraction", action="store_true",
+                        help="Turn the local extraction classifier off so every cache miss reaches the stub LLM")
+    parser.add_argument("--neo4j", action="store_true", help="Use the configured Neo4j instead of the embedded graph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Where to write the JSON report")
+    parser.add_argument("--compare", type=Path, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure the environment before loading the app
+    os.environ["KG_BACKEND"] = "neo4j" if args.neo4j else "embedded"
+    os.environ["LLM_API_KEY"] = "load-test-stub"
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "true" if args.extraction_cache else "false"
+    os.environ["EXTRACTION_CACHE_PATH"] = ""
+    os.environ["EXTRACTION_LOCAL_ENABLED"] = "false" if args.no_local_extraction else "true"
+
+    llm = StubLLM.from_file(args.fixtures, args.llm_latency_ms, args.llm_jitter_ms, args.seed)
+    report = asyncio.run(run_load(args.concurrency, args.duration, args.requests, args.mix, llm, args.seed))
+    if args.compare:
+        report["comparison"] = {
+            "baseline": str(args.compare),
+            "changes": compare(json.loads(args.compare.read_text(encoding="utf-8")), report),
+        }
+
+    output = args.output or Path(".cache") / "benchmarks" / f"load-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
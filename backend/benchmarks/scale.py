@@ -0,0 +1,238 @@
+"""
+Catalog scale benchmark.
+
+For each catalog size, a synthetic catalog (catalog.py) is generated and
+loaded, then every public kg.queries function and the ranking path are
+called with arguments drawn from the catalog. The report holds, per scale,
+the generate/load times, process memory, and per case the p50/p95/p99
+latency and the peak memory allocated by one call; `curves` lists p95 and
+allocation per case across the scales so the first thing to break stands out.
+
+Runs against the embedded graph by default; --neo4j replaces the content of
+the configured database at every scale.
+
+    python -m backend.benchmarks.scale --scales 1000,10000
+    python -m backend.benchmarks.scale --scales 1000,10000,100000 --decisions-per-agent 20 --output scale.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from .catalog import catalog_summary, generate_catalog, load_into_embedded, load_into_neo4j
+from .load import summarize
+
+Case = Tuple[str, Callable[[random.Random], Any]]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+
+        # Peak, not current, where /proc is not available (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cases(catalog: Dict[str, List[Dict[str, Any]]]) -> List[Case]:
+    from ..agents.kg_query_agent import query_kg_for_agents
+    from ..agents.scoring import rank_agents, rank_agents_batch
+    from ..kg import queries
+    from ..kg.snapshot import get_snapshot, load_snapshot
+    from ..models.schemas import AnalyzedQuery
+
+    agents = [a["name"] for a in catalog["agents"]]
+    domains = sorted({a["domainExpertise"] for a in catalog["agents"]})
+    task_types = [t["name"] for t in catalog["task_types"]]
+    decisions = catalog["decisions"]
+    decision_ids = [d["id"] for d in decisions] or [""]
+    # Neighbourhoods are addressed by graph node id, not agent name
+    agent_node_ids = [node["id"] for node in queries.get_kg_for_visualization(labels=["Agent"], limit=500)["nodes"]]
+
+    def analyzed(rng: random.Random) -> AnalyzedQuery:
+        decision = rng.choice(decisions) if decisions else None
+        return AnalyzedQuery(
+            raw_text=decision["queryText"] if decision else "summarize this report",
+            task_type=decision["taskType"] if decision else rng.choice(task_types),
+            complexity=0.5,
+            domain=decision["domain"] if decision else rng.choice(domains),
+        )
+
+    def new_decisions(rng: random.Random) -> List[tuple]:
+        return [
+            (f"scale benchmark query {rng.random()}", rng.choice(agents), 0.8, rng.choice(task_types), rng.choice(domains))
+            for _ in range(100)
+        ]
+
+    return [
+        ("snapshot_load", lambda rng: load_snapshot()),
+        ("get_agents_by_task_type", lambda rng: queries.get_agents_by_task_type(rng.choice(task_types), domain=rng.choice(domains))),
+        ("get_agents_by_task_type.retrieval", lambda rng: queries.get_agents_by_task_type(
+            "UnknownTask", domain=rng.choice(domains), query_text=analyzed(rng).raw_text)),
+        ("get_fallback_agent", lambda rng: queries.get_fallback_agent(rng.choice(agents))),
+        ("get_required_capabilities_for_task", lambda rng: queries.get_required_capabilities_for_task(rng.choice(task_types))),
+        ("get_agent_capabilities", lambda rng: queries.get_agent_capabilities(rng.choice(agents))),
+        ("get_agents_by_domain", lambda rng: queries.get_agents_by_domain(rng.choice(domains))),
+        ("list_agents", lambda rng: queries.list_agents()),
+        ("get_agent_details", lambda rng: queries.get_agent_details(rng.choice(agents))),
+        ("get_similar_agents", lambda rng: queries.get_similar_agents(rng.choice(agents))),
+        ("get_complementary_agents", lambda rng: queries.get_complementary_agents(rng.choice(agents), rng.choice(task_types))),
+        ("get_historical_decisions", lambda rng: queries.get_historical_decisions(rng.choice(agents))),
+        ("get_routed_queries", lambda rng: queries.get_routed_queries(limit=1000)),
+        ("get_agent_name_for_routing_decision", lambda rng: queries.get_agent_name_for_routing_decision(rng.choice(decision_ids))),
+        # Catalog decisions carry no rationale: these measure the traversal fallback
+        ("get_routing_explanation", lambda rng: queries.get_routing_explanation(rng.choice(decision_ids))),
+        ("get_routing_path", lambda rng: queries.get_routing_path(rng.choice(decision_ids))),
+        ("get_kg_for_visualization", lambda rng: queries.get_kg_for_visualization()),
+        ("get_kg_for_visualization.neighbourhood", lambda rng: queries.get_kg_for_visualization(
+            node_id=rng.choice(agent_node_ids), hops=2)),
+        ("get_routing_metrics", lambda rng: queries.get_routing_metrics()),
+        ("get_routing_metrics.hourly", lambda rng: queries.get_routing_metrics(days=7, granularity="hour")),
+        ("get_context_accuracy", lambda rng: queries.get_context_accuracy()),
+        ("query_kg_for_agents", lambda rng: query_kg_for_agents(analyzed(rng), top_k=3)),
+        ("rank_agents.catalog", lambda rng: rank_agents(get_snapshot().ranked_agents, analyzed(rng), top_k=3)),
+        ("rank_agents_batch.catalog.50", lambda rng: rank_agents_batch(
+            get_snapshot().ranked_agents, [analyzed(rng) for _ in range(50)], top_k=3)),
+        # Writes last: feedback changes agent accuracy, which invalidates the snapshot
+        ("create_routing_decisions.100", lambda rng: queries.create_routing_decisions(new_decisions(rng))),
+        ("apply_feedback.100", lambda rng: queries.apply_feedback(
+            [(rng.choice(decision_ids), rng.random() < 0.7) for _ in range(100)])),
+        ("update_routing_outcome", lambda rng: queries.update_routing_outcome(rng.choice(decision_ids), "SUCCESS")),
+        ("query_kg_for_agents.after_writes", lambda rng: query_kg_for_agents(analyzed(rng), top_k=3)),
+    ]
+
+
+def _measure(name: str, call: Callable[[random.Random], Any], rng: random.Random, iterations: int,
+             budget_seconds: float, memory: bool) -> Dict[str, Any]:
+    samples: List[float] = []
+    errors = 0
+    error = None
+    started = time.perf_counter()
+    while len(samples) + errors < iterations and (not samples or time.perf_counter() - started < budget_seconds):
+        call_started = time.perf_counter()
+        try:
+            call(rng)
+        except Exception as e:
+            errors += 1
+            error = f"{type(e).__name__}: {e}"
+            if errors >= 3 and not samples:
+                break
+            continue
+        samples.append(time.perf_counter() - call_started)
+    stats = summarize(samples, errors, time.perf_counter() - started)
+    if error:
+        stats["last_error"] = error
+    if memory and samples:
+        # A separate call: tracemalloc slows allocation-heavy code down several times
+        gc.collect()
+        tracemalloc.start()
+        try:
+            call(rng)
+            stats["peak_alloc_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        except Exception:
+            pass
+        finally:
+            tracemalloc.stop()
+    print(f"  {name}: p50 {stats['p50_ms']:.2f}ms p95 {stats['p95_ms']:.2f}ms ({stats['count']} calls)")
+    return stats
+
+
+def run_scale(agents: int, decisions_per_agent: float, neo4j: bool, iterations: int, budget_seconds: float,
+              memory: bool, seed: int) -> Dict[str, Any]:
+    from ..kg.embedded import set_embedded_graph
+    from ..kg.snapshot import load_snapshot
+
+    result: Dict[str, Any] = {"agents": agents}
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    catalog = generate_catalog(agents, decisions_per_agent, seed)
+    result["generate_seconds"] = time.perf_counter() - started
+    result["catalog"] = catalog_summary(catalog)
+
+    started = time.perf_counter()
+    if neo4j:
+        result["load_parts_seconds"] = load_into_neo4j(catalog)
+    else:
+        set_embedded_graph(load_into_embedded(catalog))
+    result["load_seconds"] = time.perf_counter() - started
+    rows = sum(len(rows) for rows in catalog.values())
+    result["load_rows_per_second"] = rows / result["load_seconds"] if result["load_seconds"] else 0.0
+    load_snapshot()
+    gc.collect()
+    result["rss_mb"] = _rss_mb()
+    result["rss_growth_mb"] = result["rss_mb"] - rss_before
+
+    print(f"{agents} agents, {len(catalog['decisions'])} decisions: loaded in {result['load_seconds']:.1f}s")
+    rng = random.Random(seed)
+    result["cases"] = {
+        name: _measure(name, call, rng, iterations, budget_seconds, memory)
+        for name, call in _cases(catalog)
+    }
+    del catalog
+    return result
+
+
+def curves(scales: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Per case, its p95 latency and allocation at each scale."""
+    by_case: Dict[str, List[Dict[str, Any]]] = {}
+    for scale in scales:
+        for name, stats in scale["cases"].items():
+            by_case.setdefault(name, []).append({
+                "agents": scale["agents"],
+                "p95_ms": stats["p95_ms"],
+                "peak_alloc_kb": stats.get("peak_alloc_kb"),
+            })
+    return by_case
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,10000", help="Comma-separated agent counts")
+    parser.add_argument("--decisions-per-agent", type=float, default=20)
+    parser.add_argument("--iterations", type=int, default=50, help="Calls per case (fewer when --case-budget runs out)")
+    parser.add_argument("--case-budget", type=float, default=5.0, help="Seconds per case at most")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--neo4j", action="store_true", help="Use (and overwrite) the configured Neo4j instead of the embedded graph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure the environment before loading the backend
+    os.environ["KG_BACKEND"] = "neo4j" if args.neo4j else "embedded"
+    os.environ["KG_PROFILER_ENABLED"] = "false"
+
+    scales = [
+        run_scale(int(n), args.decisions_per_agent, args.neo4j, args.iterations, args.case_budget, not args.no_memory, args.seed)
+        for n in args.scales.split(",")
+    ]
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "scales": [s["agents"] for s in scales],
+            "decisions_per_agent": args.decisions_per_agent,
+            "iterations": args.iterations,
+            "case_budget_seconds": args.case_budget,
+            "kg_backend": os.environ["KG_BACKEND"],
+            "seed": args.seed,
+        },
+        "scales": scales,
+        "curves": curves(scales),
+    }
+
+    output = args.output or Path(".cache") / "benchmarks" / f"scale-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str) + "\n", encoding="utf-8")
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark.
+
+Each run starts a fresh interpreter and measures:
+- import_seconds: `import backend.app`
+- startup_seconds: FastAPI startup hooks (driver setup, warmup, background tasks)
+- first_request_seconds: the first request to --path after startup
+
+and which heavy SDKs ended up imported. Results are printed as JSON with the
+per-run values and their medians.
+
+    python -m backend.benchmarks.startup --runs 5
+    python -m backend.benchmarks.startup --no-warmup --path /agents/
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("crewai", "litellm", "google.generativeai")
+
+
+def _measure(path: str) -> dict:
+    started = time.perf_counter()
+    from backend.app import app
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    ready_started = time.perf_counter()
+    with client:
+        ready = time.perf_counter()
+        status = client.get(path, follow_redirects=False).status_code
+        first_request = time.perf_counter()
+
+    return {
+        "import_seconds": imported - started,
+        "startup_seconds": ready - ready_started,
+        "first_request_seconds": first_request - ready,
+        "status_code": status,
+        "imported_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def run(runs: int, path: str, warmup: bool) -> dict:
+    env = dict(os.environ, STARTUP_WARMUP_ENABLED="true" if warmup else "false")
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "backend.benchmarks.startup", "--child", "--path", path],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        # Startup logs go to stdout as well; the measurement is the last line
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    summary = {
+        key: statistics.median(sample[key] for sample in samples)
+        for key in ("import_seconds", "startup_seconds", "first_request_seconds")
+    }
+    return {"path": path, "warmup": warmup, "runs": samples, "median": summary}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/openapi.json", help="Endpoint for the first request")
+    parser.add_argument("--no-warmup", action="store_true", help="Disable the startup warmup hook")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_measure(args.path)))
+        return
+    print(json.dumps(run(args.runs, args.path, warmup=not args.no_warmup), indent=2))
+
+
+if __name__ == "__main__":
+    main()
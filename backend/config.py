@@ -7,9 +7,66 @@ class Settings(BaseSettings):
     neo4j_password: str = "password"
     neo4j_client_id: str | None = None
     neo4j_client_secret: str | None = None
+    kg_backend: str = "neo4j"
+    kg_embedded_source: str | None = None
     low_conf_threshold: float = 0.6
     llm_api_key: str | None = None
     llm_model: str = "gemini-2.0-flash"
+    llm_batch_size: int = 20
+    llm_max_concurrency: int = 16
+    llm_timeout_seconds: float = 10.0
+    llm_hedging_enabled: bool = True
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_min_delay_ms: float = 200.0
+    routing_batch_max_queries: int = 1000
+    feedback_batch_max_items: int = 10000
+    extraction_cache_enabled: bool = True
+    extraction_cache_size: int = 4096
+    extraction_cache_ttl_seconds: float = 3600.0
+    extraction_cache_path: str | None = ".cache/extraction_cache.sqlite3"
+    extraction_cache_disk_ttl_seconds: float = 7 * 24 * 3600.0
+    extraction_cache_disk_max_entries: int = 100000
+    extraction_local_enabled: bool = True
+    extraction_local_confidence_threshold: float = 0.7
+    extraction_local_model_path: str | None = ".cache/extraction_classifier.npz"
+    kg_snapshot_enabled: bool = True
+    kg_snapshot_refresh_seconds: float = 30.0
+    kg_snapshot_retry_seconds: float = 1.0
+    retrieval_enabled: bool = True
+    retrieval_top_k: int = 10
+    retrieval_score_weight: float = 0.1
+    metrics_rollups_enabled: bool = True
+    context_accuracy_enabled: bool = True
+    context_accuracy_half_life_days: float = 14.0
+    context_accuracy_prior_weight: float = 4.0
+    context_accuracy_flush_seconds: float = 5.0
+    decision_write_behind_enabled: bool = True
+    decision_flush_interval_seconds: float = 0.5
+    decision_flush_batch_size: int = 500
+    decision_queue_max_size: int = 10000
+    decision_write_max_retries: int = 3
+    decision_retry_backoff_seconds: float = 0.5
+    decision_dead_letter_path: str = ".cache/decision_dead_letter.jsonl"
+    retention_days: int = 90
+    retention_batch_size: int = 1000
+    retention_archive_dir: str = ".cache/archive"
+    retention_archive_format: str = "jsonl"
+    schema_migrations_on_startup: bool = True
+    explanation_cache_size: int = 10000
+    http_cache_enabled: bool = True
+    http_cache_max_entries: int = 256
+    http_cache_max_age_seconds: float = 30.0
+    http_cache_version_check_seconds: float = 1.0
+    bulk_load_batch_size: int = 1000
+    bulk_load_workers: int = 4
+    startup_warmup_enabled: bool = True
+    warmup_pool_connections: int = 4
+    warmup_step_timeout_seconds: float = 5.0
+    telemetry_enabled: bool = True
+    kg_profiler_enabled: bool = True
+    kg_slow_query_ms: float = 200.0
+    kg_profile_sample_rate: float = 0.1
+    kg_slow_query_log_size: int = 100
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
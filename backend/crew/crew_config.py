@@ -10,10 +10,13 @@ from .agents import (
     summarization_agent,
     web_search_agent,
 )
-from ..agents.kg_query_agent import query_kg_for_agents
-from ..config import settings
-from ..extraction.llm_extractor import extract_query
-from ..kg.queries import create_routing_decision, get_fallback_agent
+# The routing pipeline itself lives in agents/routing_flow.py; re-exported here
+# for callers that still import it from the crew module.
+from ..agents.routing_flow import (  # noqa: F401
+    run_batch_routing_flow_async,
+    run_routing_flow,
+    run_routing_flow_async,
+)
 
 router_crew = Crew(
     name="SmartAgenticRouterCrew",
@@ -28,47 +31,3 @@ router_crew = Crew(
         feedback_agent,
     ],
 )
-
-
-def run_routing_flow(user_query: str) -> dict:
-    analyzed = extract_query(user_query)
-    ranked = query_kg_for_agents(analyzed)
-
-    if not ranked:
-        chosen_name = "PerplexityFallbackAgent"
-        confidence = 0.5
-        candidates: list[dict] = []
-        tie_breaking_info = {}
-    else:
-        top_agent, top_score, tie_breaking_info = ranked[0]
-        chosen_name = top_agent.name
-        confidence = top_score
-
-        if confidence < settings.low_conf_threshold:
-            fb = get_fallback_agent(chosen_name)
-            if fb:
-                chosen_name = fb.name
-                confidence = max(confidence, 0.6)
-
-        candidates = [
-            {
-                "name": agent.name,
-                "score": score,
-                "tie_breaking": tie_info,
-            }
-            for agent, score, tie_info in ranked[:3]
-        ]
-
-    rd_id = create_routing_decision(user_query, chosen_name, confidence)
-
-    result_payload = {
-        "routing_decision_id": rd_id,
-        "chosen_agent": chosen_name,
-        "confidence": confidence,
-        "analyzed_query": analyzed,
-        "top_candidates": candidates,
-        "tie_breaking_info": tie_breaking_info,
-    }
-    return result_payload
-
-
@@ -1,6 +1,6 @@
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
 
-from .kg.client import get_driver
+from .kg.client import get_async_driver, get_driver
 
 
 def get_neo4j_driver() -> Driver:
@@ -8,3 +8,6 @@ def get_neo4j_driver() -> Driver:
     return get_driver()
 
 
+def get_async_neo4j_driver() -> AsyncDriver:
+    """FastAPI dependency for accessing the shared async Neo4j driver."""
+    return get_async_driver()
@@ -0,0 +1,354 @@
+"""
+Two-tier cache for LLM extraction results.
+
+Tier 1 is a bounded in-process LRU with a TTL; tier 2 is a SQLite file that
+survives restarts. Entries are keyed on the normalized query text, a hash of
+the prompt template and the model name, so changing either one naturally
+invalidates old results, and results of the single-query and the batch
+prompt never stand in for each other.
+
+The disk tier stays off the request path. `set` only queues the row: one
+writer thread commits queued rows in batches (WAL journal, so reads are not
+blocked by a commit) and every PRUNE_INTERVAL_SECONDS deletes expired rows and
+the oldest ones beyond EXTRACTION_CACHE_DISK_MAX_ENTRIES. The async
+extraction path reads the disk tier with `get_async` and `get_many_async`, in
+a worker thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+from .prompt_templates import BATCH_EXTRACTION_PROMPT_TEMPLATE, EXTRACTION_PROMPT_TEMPLATE
+
+TEMPLATE_HASH = hashlib.sha256(EXTRACTION_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:16]
+BATCH_TEMPLATE_HASH = hashlib.sha256(BATCH_EXTRACTION_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:16]
+
+# Rows per disk transaction, and how long the writer waits for more
+WRITE_BATCH_SIZE = 500
+WRITE_INTERVAL_SECONDS = 0.5
+PRUNE_INTERVAL_SECONDS = 60.0
+# How long `flush` waits for the writer, and how often it checks the writer is still running
+FLUSH_TIMEOUT_SECONDS = 30.0
+FLUSH_POLL_SECONDS = 0.1
+# Keys per SELECT ... IN, below SQLite's bound-variable limit
+READ_BATCH_SIZE = 500
+
+_STOP = object()
+
+
+def normalize_query(query_text: str) -> str:
+    return " ".join(query_text.split()).casefold()
+
+
+def cache_key(query_text: str, model: str | None = None, template_hash: str = TEMPLATE_HASH) -> str:
+    model = model or settings.llm_model
+    raw = f"{model}\x00{template_hash}\x00{normalize_query(query_text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl_seconds: float = 3600.0,
+        path: str | None = None,
+        disk_ttl_seconds: float = 7 * 24 * 3600.0,
+        disk_max_entries: int = 100000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_ttl_seconds = disk_ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_writes": 0,
+            "disk_pruned": 0,
+        }
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: threading.Thread | None = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._path = path
+            # Reads; the writer thread has its own connection
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS extraction_cache_created_at ON extraction_cache (created_at)")
+            self._db.commit()
+            self._writer = threading.Thread(target=self._write_loop, name="extraction-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _memory_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        # Call with self._lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if now - stored_at <= self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return dict(value)
+        del self._entries[key]
+        self._counters["expirations"] += 1
+        return None
+
+    def _disk_rows(self, keys: List[str]) -> Dict[str, tuple]:
+        rows: Dict[str, tuple] = {}
+        with self._db_lock:
+            if self._db is None:
+                return rows
+            for start in range(0, len(keys), READ_BATCH_SIZE):
+                batch = keys[start:start + READ_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                for key, value, created_at in self._db.execute(
+                    f"SELECT key, value, created_at FROM extraction_cache WHERE key IN ({placeholders})", batch
+                ):
+                    rows[key] = (value, created_at)
+        return rows
+
+    def _from_disk_rows(self, keys: List[str], rows: Dict[str, tuple], now: float) -> Optional[Dict[str, Any]]:
+        """The first of `keys` with a live row; one hit or one miss either way."""
+        with self._lock:
+            for key in keys:
+                row = rows.get(key)
+                if row is None:
+                    continue
+                if now - row[1] <= self.disk_ttl_seconds:
+                    value = json.loads(row[0])
+                    self._put(key, value, now)
+                    self._counters["disk_hits"] += 1
+                    return dict(value)
+                # Deleted by the next prune
+                self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Blocking lookup, for scripts and the sync extraction path."""
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                return value
+            if self._db is None:
+                self._counters["misses"] += 1
+                return None
+        return self._from_disk_rows([key], self._disk_rows([key]), now)
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        """Same as `get`, with the disk read in a worker thread instead of on the event loop."""
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                return value
+            if self._db is None:
+                self._counters["misses"] += 1
+                return None
+        return self._from_disk_rows([key], await asyncio.to_thread(self._disk_rows, [key]), now)
+
+    async def get_many_async(self, key_groups: List[List[str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        For each group of keys, the value of the first key in it that has one.
+        Keys not in memory are read from disk together, in one worker-thread
+        call; each group counts as one lookup, so one hit or one miss.
+        """
+        now = time.time()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(key_groups)
+        on_disk: List[int] = []
+        with self._lock:
+            for i, keys in enumerate(key_groups):
+                for key in keys:
+                    results[i] = self._memory_get(key, now)
+                    if results[i] is not None:
+                        break
+                else:
+                    if self._db is None:
+                        self._counters["misses"] += 1
+                    else:
+                        on_disk.append(i)
+        if on_disk:
+            rows = await asyncio.to_thread(self._disk_rows, [key for i in on_disk for key in key_groups[i]])
+            for i in on_disk:
+                results[i] = self._from_disk_rows(key_groups[i], rows, now)
+        return results
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._put(key, dict(value), now)
+        if self._writer is not None:
+            self._writes.put((key, json.dumps(value, sort_keys=True), now))
+
+    def _put(self, key: str, value: Dict[str, Any], now: float) -> None:
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _next_writes(self) -> List[Any]:
+        """Block for the first queued item, then collect more for up to WRITE_INTERVAL_SECONDS."""
+        items = [self._writes.get()]
+        deadline = time.monotonic() + WRITE_INTERVAL_SECONDS
+        while len(items) < WRITE_BATCH_SIZE and isinstance(items[-1], tuple):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._writes.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        pruned = db.execute("DELETE FROM extraction_cache WHERE created_at < ?", (time.time() - self.disk_ttl_seconds,)).rowcount
+        excess = db.execute("SELECT count(*) FROM extraction_cache").fetchone()[0] - self.disk_max_entries
+        if excess > 0:
+            pruned += db.execute(
+                "DELETE FROM extraction_cache WHERE key IN "
+                "(SELECT key FROM extraction_cache ORDER BY created_at LIMIT ?)",
+                (excess,),
+            ).rowcount
+        db.commit()
+        with self._lock:
+            self._counters["disk_pruned"] += pruned
+
+    def _write_rows(self, db: sqlite3.Connection, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        db.executemany("INSERT OR REPLACE INTO extraction_cache (key, value, created_at) VALUES (?, ?, ?)", rows)
+        db.commit()
+        with self._lock:
+            self._counters["disk_writes"] += len(rows)
+
+    def _write_loop(self) -> None:
+        db = sqlite3.connect(self._path)
+        db.execute("PRAGMA synchronous=NORMAL")
+        self._prune(db)
+        last_prune = time.monotonic()
+        try:
+            while True:
+                items = self._next_writes()
+                # Rows are (key, value, created_at); anything else is a command, applied in order
+                rows: List[tuple] = []
+                for item in items:
+                    if isinstance(item, tuple):
+                        rows.append(item)
+                        continue
+                    self._write_rows(db, rows)
+                    rows = []
+                    if item == "clear":
+                        db.execute("DELETE FROM extraction_cache")
+                        db.commit()
+                    elif item == "prune":
+                        self._prune(db)
+                        last_prune = time.monotonic()
+                    elif isinstance(item, threading.Event):
+                        item.set()
+                self._write_rows(db, rows)
+                if time.monotonic() - last_prune >= PRUNE_INTERVAL_SECONDS:
+                    self._prune(db)
+                    last_prune = time.monotonic()
+                if items[-1] is _STOP:
+                    return
+        finally:
+            db.close()
+
+    def flush(self, prune: bool = False, timeout: float = FLUSH_TIMEOUT_SECONDS) -> bool:
+        """
+        Wait until every queued row is on disk; with `prune`, prune right after.
+        Gives up after `timeout` seconds or as soon as the writer thread is
+        found dead, and returns whether the queue was flushed.
+        """
+        writer = self._writer
+        if writer is None:
+            return True
+        if prune:
+            self._writes.put("prune")
+        done = threading.Event()
+        self._writes.put(done)
+        deadline = time.monotonic() + timeout
+        while not done.wait(min(FLUSH_POLL_SECONDS, max(0.0, deadline - time.monotonic()))):
+            if not writer.is_alive():
+                print("Warning: the extraction cache writer thread has stopped; queued rows were not written")
+                return False
+            if time.monotonic() >= deadline:
+                print(f"Warning: extraction cache flush timed out after {timeout}s")
+                return False
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._writer is not None:
+            self._writes.put("clear")
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._entries)
+            stats["disk_queued"] = self._writes.qsize()
+            return stats
+
+    def close(self) -> None:
+        """Write what is queued and close the database."""
+        if self._writer is not None:
+            self._writes.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: ExtractionCache | None = None
+
+
+def get_extraction_cache() -> ExtractionCache | None:
+    global _cache
+    if not settings.extraction_cache_enabled:
+        return None
+    if _cache is None:
+        _cache = ExtractionCache(
+            max_entries=settings.extraction_cache_size,
+            ttl_seconds=settings.extraction_cache_ttl_seconds,
+            path=settings.extraction_cache_path,
+            disk_ttl_seconds=settings.extraction_cache_disk_ttl_seconds,
+            disk_max_entries=settings.extraction_cache_disk_max_entries,
+        )
+    return _cache
+
+
+def close_extraction_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
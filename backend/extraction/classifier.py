@@ -0,0 +1,461 @@
+"""
+Local extraction tier that runs before the LLM.
+
+Two CPU-only classifiers predict task_type and domain:
+
+- rules: the keyword lists of the extraction prompt's domain rules
+  (prompt_templates._DOMAIN_RULES) plus task-type patterns, with fixed
+  confidences;
+- model: softmax regression over hashed word and character n-grams, trained
+  from routed query history and saved to EXTRACTION_LOCAL_MODEL_PATH.
+
+Where both have an opinion their distributions are averaged. The confidence
+of a prediction is P(task_type) * P(domain); `classify_locally` returns an
+AnalyzedQuery only when it reaches EXTRACTION_LOCAL_CONFIDENCE_THRESHOLD, and
+the caller asks the LLM otherwise.
+
+    python -m backend.extraction.classifier train
+    python -m backend.extraction.classifier train --labels backend/benchmarks/fixtures/llm_responses.json
+    python -m backend.extraction.classifier eval --labels labelled.jsonl
+
+`train` labels the stored Query texts with the LLM (through the extraction
+cache), holds out a share of them to report accuracy and coverage, then fits
+on everything and saves the model.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..models.schemas import AnalyzedQuery
+from .prompt_templates import _DOMAIN_RULES, _EXTRACTION_FIELDS
+
+RULES = "rules"
+MODEL = "model"
+HEADS = ("task_type", "domain")
+
+
+def _template_choices(field: str) -> List[str]:
+    match = re.search(rf"- {field}: one of (\[[^\]]*\])", _EXTRACTION_FIELDS)
+    return json.loads(match.group(1))
+
+
+TASK_TYPES = _template_choices("task_type")
+DOMAINS = _template_choices("domain")
+DEFAULT_DOMAIN = "general"
+LABELS = {"task_type": TASK_TYPES, "domain": DOMAINS}
+
+# complexityLevel of the TaskType nodes in kg/seed_data.cypher
+TASK_COMPLEXITY = {
+    "WebSearchTask": 0.3,
+    "CodeDebuggingTask": 0.8,
+    "SummarizationTask": 0.5,
+    "VisualizationTask": 0.7,
+    "OtherTask": 0.5,
+}
+
+TASK_PATTERNS = {
+    "WebSearchTask": r"search|look up|lookup|find|latest|news|browse|who is|what is|what are|where is|when did",
+    "CodeDebuggingTask": r"debug\w*|bugs?|errors?|exceptions?|traceback|stack ?trace|crash\w*|segfault|\w+error|fix (?:this|my|the) code",
+    "SummarizationTask": r"summar\w*|tl;?dr|condense|key points|recap|gist",
+    "VisualizationTask": r"charts?|plot|plots|plotting|visuali[sz]\w*|diagrams?|dashboards?|histogram|heatmap|infographic",
+}
+
+OUTPUT_FORMAT_PATTERNS = [
+    (r"charts?|plot|graph", "chart"),
+    (r"table|tabular", "table"),
+    (r"bullet\w*|list (?:the|all)", "bullet list"),
+    (r"(?:as|in|to) json", "json"),
+    (r"csv|spreadsheet", "spreadsheet"),
+]
+
+# Share of the probability given to the classes a rule fires for
+RULE_CONFIDENCE = 0.9
+# The prompt's "if no specific domain matches, use general" rule
+DEFAULT_DOMAIN_CONFIDENCE = 0.75
+
+
+def _compile(alternatives: str) -> re.Pattern:
+    return re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+
+def _domain_rules() -> List[Tuple[re.Pattern, str]]:
+    """One (pattern, domain) per keyword line of the prompt's domain rules."""
+    rules = []
+    for match in re.finditer(r"mentioning (?P<keywords>.*?), etc\., use domain: (?P<domains>.*)$", _DOMAIN_RULES, re.MULTILINE):
+        keywords = re.findall(r'"([^"]+)"', match.group("keywords"))
+        # A rule offering two domains ("technical" or "development") votes for the first
+        domain = re.findall(r'"([^"]+)"', match.group("domains"))[0]
+        alternatives = "|".join(re.escape(keyword) + r"(?:s|es|ed|ing)?" for keyword in keywords)
+        rules.append((_compile(alternatives), domain))
+    return rules
+
+
+DOMAIN_RULES = _domain_rules()
+TASK_RULES = [(_compile(pattern), task_type) for task_type, pattern in TASK_PATTERNS.items()]
+OUTPUT_FORMAT_RULES = [(_compile(pattern), output_format) for pattern, output_format in OUTPUT_FORMAT_PATTERNS]
+
+
+def _rule_distribution(labels: List[str], hits: List[str], confidence: float) -> np.ndarray:
+    dist = np.full(len(labels), (1.0 - confidence) / max(1, len(labels) - len(hits)))
+    for label in hits:
+        dist[labels.index(label)] = confidence / len(hits)
+    return dist
+
+
+def rule_predictions(text: str) -> Dict[str, Optional[np.ndarray]]:
+    """Per-head distribution from the keyword rules; None where no rule fired."""
+    task_hits = [task_type for pattern, task_type in TASK_RULES if pattern.search(text)]
+    domain_hits = sorted({domain for pattern, domain in DOMAIN_RULES if pattern.search(text)})
+    return {
+        "task_type": _rule_distribution(TASK_TYPES, task_hits, RULE_CONFIDENCE) if task_hits else None,
+        "domain": _rule_distribution(DOMAINS, domain_hits, RULE_CONFIDENCE) if domain_hits else None,
+    }
+
+
+def output_format_for(text: str) -> Optional[str]:
+    for pattern, output_format in OUTPUT_FORMAT_RULES:
+        if pattern.search(text):
+            return output_format
+    return None
+
+
+# ----------------------------------------------------------------------
+# Hashed n-gram model
+# ----------------------------------------------------------------------
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def hashed_features(text: str, n_features: int) -> np.ndarray:
+    """Sorted unique feature indices for word unigrams, bigrams and character trigrams."""
+    tokens = _TOKEN.findall(text.casefold())
+    grams = [f"w:{token}" for token in tokens]
+    grams += [f"b:{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    # crc32 rather than hash(): the indices must be stable across processes
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams), dtype=np.int64, count=len(grams)))
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max())
+    return exp / exp.sum()
+
+
+class HashedLinearClassifier:
+    """Softmax regression over hashed n-gram features, one weight matrix per head."""
+
+    def __init__(self, n_features: int = 2 ** 16):
+        self.n_features = n_features
+        self.labels = {head: list(labels) for head, labels in LABELS.items()}
+        self.weights = {head: np.zeros((n_features, len(labels)), dtype=np.float32) for head, labels in self.labels.items()}
+        self.bias = {head: np.zeros(len(labels), dtype=np.float32) for head, labels in self.labels.items()}
+        # Mean LLM complexity per task type in the training data
+        self.complexity: Dict[str, float] = {}
+
+    def _encode(self, text: str) -> Tuple[np.ndarray, float]:
+        indices = hashed_features(text, self.n_features)
+        return indices, 1.0 / np.sqrt(max(1, len(indices)))
+
+    def predict_proba(self, text: str) -> Dict[str, np.ndarray]:
+        indices, value = self._encode(text)
+        return {
+            head: _softmax(self.weights[head][indices].sum(axis=0) * value + self.bias[head])
+            for head in self.labels
+        }
+
+    def fit(self, texts: List[str], targets: Dict[str, List[str]], complexities: List[float] | None = None,
+            epochs: int = 10, learning_rate: float = 0.5, seed: int = 0) -> "HashedLinearClassifier":
+        encoded = [self._encode(text) for text in texts]
+        rng = random.Random(seed)
+        order = list(range(len(texts)))
+        for head, labels in self.labels.items():
+            weights, bias = self.weights[head], self.bias[head]
+            classes = [labels.index(label) for label in targets[head]]
+            for epoch in range(epochs):
+                rng.shuffle(order)
+                rate = learning_rate / (1 + epoch)
+                for i in order:
+                    indices, value = encoded[i]
+                    gradient = _softmax(weights[indices].sum(axis=0) * value + bias)
+                    gradient[classes[i]] -= 1.0
+                    weights[indices] -= (rate * value) * gradient
+                    bias -= rate * gradient
+
+        if complexities:
+            totals: Dict[str, List[float]] = {}
+            for task_type, complexity in zip(targets["task_type"], complexities):
+                totals.setdefault(task_type, []).append(complexity)
+            self.complexity = {task_type: sum(values) / len(values) for task_type, values in totals.items()}
+        return self
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {f"{head}_weights": self.weights[head] for head in self.labels}
+        arrays |= {f"{head}_bias": self.bias[head] for head in self.labels}
+        meta = {"n_features": self.n_features, "labels": self.labels, "complexity": self.complexity}
+        with open(path, "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedLinearClassifier":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(n_features=meta["n_features"])
+            model.labels = meta["labels"]
+            model.complexity = meta["complexity"]
+            model.weights = {head: data[f"{head}_weights"] for head in model.labels}
+            model.bias = {head: data[f"{head}_bias"] for head in model.labels}
+        return model
+
+
+class LocalClassifier:
+    """The rules, plus the trained model when one has been saved."""
+
+    def __init__(self, model: HashedLinearClassifier | None = None):
+        self.model = model
+
+    def predict(self, text: str) -> Tuple[AnalyzedQuery, float, str]:
+        """Best guess for `text`, its confidence, and which tier produced it."""
+        rules = rule_predictions(text)
+        model = self.model.predict_proba(text) if self.model is not None else None
+
+        confidence = 1.0
+        predicted: Dict[str, str] = {}
+        for head in HEADS:
+            labels = LABELS[head]
+            rule = rules[head]
+            if rule is not None and model is not None:
+                dist = (rule + model[head]) / 2
+            elif model is not None:
+                dist = model[head]
+            elif rule is not None:
+                dist = rule
+            elif head == "domain":
+                dist = _rule_distribution(DOMAINS, [DEFAULT_DOMAIN], DEFAULT_DOMAIN_CONFIDENCE)
+            else:
+                dist = np.full(len(labels), 1.0 / len(labels))
+            best = int(np.argmax(dist))
+            predicted[head] = labels[best]
+            confidence *= float(dist[best])
+
+        task_type = predicted["task_type"]
+        complexity = TASK_COMPLEXITY.get(task_type, 0.5)
+        if model is not None:
+            complexity = self.model.complexity.get(task_type, complexity)
+        analyzed = AnalyzedQuery(
+            raw_text=text,
+            task_type=task_type,
+            complexity=round(complexity, 2),
+            domain=predicted["domain"],
+            output_format=output_format_for(text),
+        )
+        return analyzed, confidence, MODEL if model is not None else RULES
+
+
+_classifier: LocalClassifier | None = None
+_classifier_lock = threading.Lock()
+
+
+def get_local_classifier() -> LocalClassifier | None:
+    global _classifier
+    if not settings.extraction_local_enabled:
+        return None
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                model = None
+                path = settings.extraction_local_model_path
+                if path and os.path.exists(path):
+                    try:
+                        model = HashedLinearClassifier.load(path)
+                    except Exception as e:
+                        print(f"Warning: could not load extraction classifier from {path}, using rules only: {e}")
+                    if model is not None and model.labels != LABELS:
+                        # The prompt's task types or domains changed since training
+                        print(f"Warning: extraction classifier {path} was trained on other labels, using rules only")
+                        model = None
+                _classifier = LocalClassifier(model)
+    return _classifier
+
+
+def reset_local_classifier() -> None:
+    global _classifier
+    _classifier = None
+
+
+def classify_locally(query_text: str, threshold: float | None = None) -> Optional[AnalyzedQuery]:
+    """
+    The local prediction when its confidence reaches the threshold, else None.
+    The returned query carries `extraction_tier` and `extraction_confidence`.
+    """
+    classifier = get_local_classifier()
+    if classifier is None:
+        return None
+    if threshold is None:
+        threshold = settings.extraction_local_confidence_threshold
+    analyzed, confidence, tier = classifier.predict(query_text)
+    if confidence < threshold:
+        return None
+    analyzed.extraction_tier = tier
+    analyzed.extraction_confidence = confidence
+    return analyzed
+
+
+# ----------------------------------------------------------------------
+# Training and evaluation
+# ----------------------------------------------------------------------
+
+
+def load_labels(path: Path) -> List[Dict[str, Any]]:
+    """
+    Labelled queries from a JSON array or JSON-lines file. Items hold "query"
+    and either the extraction fields or a "response" object with them, so the
+    recorded LLM fixtures of the load test can be used as they are.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    items = json.loads(text) if text.lstrip().startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    examples = []
+    for item in items:
+        fields = item.get("response", item)
+        examples.append({
+            "query": item["query"],
+            "task_type": fields["task_type"],
+            "domain": fields["domain"],
+            "complexity": float(fields.get("complexity", 0.5)),
+        })
+    return examples
+
+
+def labels_from_history(limit: int) -> List[Dict[str, Any]]:
+    """
+    Label the stored Query texts with the LLM extractor (cache first). Queries
+    whose every routing decision failed are left out.
+    """
+    from ..kg.queries import get_routed_queries
+    from .llm_extractor import DEFAULT, _cache_lookup, _extract_with_llm
+
+    if not settings.llm_api_key:
+        raise SystemExit("LLM_API_KEY is not set, so history cannot be labelled; pass --labels instead")
+
+    outcomes: Dict[str, set] = {}
+    for row in get_routed_queries(limit):
+        if row.get("query"):
+            outcomes.setdefault(row["query"], set()).add(row.get("outcome"))
+
+    examples = []
+    for query, seen in outcomes.items():
+        if seen == {"FAILURE"}:
+            continue
+        cache, key, analyzed = _cache_lookup(query)
+        if analyzed is None:
+            try:
+                analyzed = _extract_with_llm(query, cache, key)
+            except Exception as e:
+                print(f"Warning: could not label {query!r}: {e}")
+                continue
+        if analyzed.extraction_tier == DEFAULT or analyzed.task_type not in TASK_TYPES or analyzed.domain not in DOMAINS:
+            continue
+        examples.append({
+            "query": query,
+            "task_type": analyzed.task_type,
+            "domain": analyzed.domain,
+            "complexity": analyzed.complexity,
+        })
+    return examples
+
+
+def split(examples: List[Dict[str, Any]], test_share: float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Deterministic split on a hash of the query text, so reruns hold out the same queries."""
+    train, test = [], []
+    for example in examples:
+        bucket = zlib.crc32(example["query"].encode("utf-8")) % 1000 / 1000
+        (test if bucket < test_share else train).append(example)
+    return train, test
+
+
+def train_model(examples: List[Dict[str, Any]], n_features: int, epochs: int, seed: int = 0) -> HashedLinearClassifier:
+    return HashedLinearClassifier(n_features=n_features).fit(
+        [e["query"] for e in examples],
+        {head: [e[head] for e in examples] for head in HEADS},
+        [e["complexity"] for e in examples],
+        epochs=epochs,
+        seed=seed,
+    )
+
+
+def evaluate(classifier: LocalClassifier, examples: List[Dict[str, Any]], thresholds=(0.5, 0.6, 0.7, 0.8, 0.9)) -> Dict[str, Any]:
+    """
+    Accuracy of the local tier on labelled examples, overall and for the share
+    it would answer at each confidence threshold (the rest go to the LLM).
+    """
+    predictions = []
+    for example in examples:
+        analyzed, confidence, _ = classifier.predict(example["query"])
+        correct = analyzed.task_type == example["task_type"] and analyzed.domain == example["domain"]
+        predictions.append((confidence, correct, analyzed.task_type == example["task_type"], analyzed.domain == example["domain"]))
+
+    total = len(predictions) or 1
+    report: Dict[str, Any] = {
+        "examples": len(predictions),
+        "accuracy": sum(p[1] for p in predictions) / total,
+        "task_type_accuracy": sum(p[2] for p in predictions) / total,
+        "domain_accuracy": sum(p[3] for p in predictions) / total,
+        "thresholds": {},
+    }
+    for threshold in thresholds:
+        answered = [p for p in predictions if p[0] >= threshold]
+        report["thresholds"][str(threshold)] = {
+            "local_share": len(answered) / total,
+            "local_accuracy": sum(p[1] for p in answered) / len(answered) if answered else None,
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train", "eval"])
+    parser.add_argument("--labels", type=Path, help="Labelled queries (JSON or JSON lines) instead of the routing history")
+    parser.add_argument("--limit", type=int, default=10000, help="Most recent routed queries to read")
+    parser.add_argument("--test-share", type=float, default=0.2, help="Share of examples held out when training")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--features", type=int, default=2 ** 16, help="Hashed feature space size")
+    parser.add_argument("--output", default=settings.extraction_local_model_path, help="Where the model is read from and saved to")
+    args = parser.parse_args()
+
+    examples = load_labels(args.labels) if args.labels else labels_from_history(args.limit)
+    if not examples:
+        raise SystemExit("No labelled queries to work with")
+
+    if args.command == "eval":
+        model = HashedLinearClassifier.load(args.output) if args.output and os.path.exists(args.output) else None
+        report = {"model": args.output if model is not None else None, **evaluate(LocalClassifier(model), examples)}
+        print(json.dumps(report, indent=2))
+        return
+
+    train, test = split(examples, args.test_share)
+    report: Dict[str, Any] = {"examples": len(examples), "train": len(train), "test": len(test)}
+    if train and test:
+        report["rules_only"] = evaluate(LocalClassifier(), test)
+        report["held_out"] = evaluate(LocalClassifier(train_model(train, args.features, args.epochs)), test)
+    model = train_model(examples, args.features, args.epochs)
+    model.save(args.output)
+    report["saved_to"] = args.output
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
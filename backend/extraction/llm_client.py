@@ -0,0 +1,344 @@
+"""
+Long-lived client for the extraction LLM.
+
+One LLMClient per process holds the configured Gemini model (built once, on
+first use) and wraps every call with:
+
+- a concurrency limit of LLM_MAX_CONCURRENCY calls in flight;
+- single-flight coalescing: concurrent calls with the same prompt share one
+  request and all receive its response;
+- a deadline of LLM_TIMEOUT_SECONDS per call, including time spent waiting
+  for a slot, after which LLMDeadlineExceeded is raised;
+- hedging (async path, LLM_HEDGING_ENABLED): when the first request has not
+  answered after the LLM_HEDGE_QUANTILE latency of recent calls, a second
+  identical request is sent and whichever answers first wins. The request
+  that loses (or runs into the deadline) is kept as a censored sample: its
+  latency is only known to exceed the time it ran. The quantile is a
+  Kaplan-Meier estimate over both kinds, so slow calls cut short by hedging
+  still count and the hedge delay does not drift down.
+
+The transport is a pair of plain functions, `send(prompt, max_output_tokens,
+timeout)` and `send_async(prompt, max_output_tokens)`, so the load test can
+replace Gemini while keeping the limits, coalescing and hedging in the path.
+Counts of each event are exported as `router_llm_client_events_total`.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from ..telemetry import LLM_CLIENT_EVENTS_TOTAL
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+# Hedging waits until this many latencies have been observed
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 500
+
+SendFn = Callable[[str, int, float], str]
+AsyncSendFn = Callable[[str, int], Awaitable[str]]
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class LLMDeadlineExceeded(ExtractionError):
+    pass
+
+
+# ----------------------------------------------------------------------
+# Gemini transport
+# ----------------------------------------------------------------------
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model() -> "genai.GenerativeModel":
+    """The configured Gemini model, created once per process."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                # Imported on first use: the SDK takes most of a second to import
+                import google.generativeai as genai
+
+                genai.configure(api_key=settings.llm_api_key)
+
+                model_name = settings.llm_model.replace("gemini/", "") if settings.llm_model.startswith("gemini/") else settings.llm_model
+                if not model_name.startswith("models/"):
+                    model_name = f"models/{model_name}"
+                _model = genai.GenerativeModel(model_name)
+    return _model
+
+
+def warm_up() -> None:
+    """Create the Gemini model ahead of the first extraction; a no-op without an API key."""
+    if settings.llm_api_key:
+        _get_model()
+
+
+def _generation_config(max_output_tokens: int = 500) -> "genai.types.GenerationConfig":
+    import google.generativeai as genai
+
+    return genai.types.GenerationConfig(
+        temperature=0.3,
+        max_output_tokens=max_output_tokens,
+        response_mime_type="application/json",
+    )
+
+
+def _response_text(response) -> str:
+    if response.text:
+        text = response.text.strip()
+        if text.startswith("```json"):
+            text = text[7:]
+        if text.startswith("```"):
+            text = text[3:]
+        if text.endswith("```"):
+            text = text[:-3]
+        return text.strip()
+    else:
+        raise ExtractionError("Empty response from Gemini")
+
+
+def _is_timeout(error: Exception) -> bool:
+    # google.api_core raises DeadlineExceeded; the transport may raise plain timeouts
+    return isinstance(error, TimeoutError) or type(error).__name__ == "DeadlineExceeded"
+
+
+def gemini_send(prompt: str, max_output_tokens: int, timeout: float) -> str:
+    try:
+        response = _get_model().generate_content(
+            prompt,
+            generation_config=_generation_config(max_output_tokens),
+            request_options={"timeout": timeout},
+        )
+    except Exception as e:
+        if _is_timeout(e):
+            raise LLMDeadlineExceeded(f"Gemini did not answer within {timeout:.1f}s") from e
+        raise ExtractionError(f"Gemini API error: {e}") from e
+    return _response_text(response)
+
+
+async def gemini_send_async(prompt: str, max_output_tokens: int) -> str:
+    try:
+        response = await _get_model().generate_content_async(prompt, generation_config=_generation_config(max_output_tokens))
+    except Exception as e:
+        raise ExtractionError(f"Gemini API error: {e}") from e
+    return _response_text(response)
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+
+class _LoopState:
+    """Async primitives are bound to an event loop, so each loop gets its own."""
+
+    def __init__(self, max_concurrency: int):
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+
+
+class LLMClient:
+    def __init__(
+        self,
+        send: SendFn = gemini_send,
+        send_async: AsyncSendFn = gemini_send_async,
+        max_concurrency: int = 16,
+        timeout_seconds: float = 10.0,
+        hedging: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay_seconds: float = 0.2,
+    ):
+        self.send = send
+        self.send_async = send_async
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies are known."""
+        if not self.hedging:
+            return None
+        # (seconds, censored): at equal times completed calls sort first, as Kaplan-Meier requires
+        samples = sorted(self._latencies)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        at_risk = len(samples)
+        survival = 1.0
+        for seconds, censored in samples:
+            if not censored:
+                survival *= 1 - 1 / at_risk
+                if 1 - survival >= self.hedge_quantile:
+                    return max(self.hedge_min_delay_seconds, seconds)
+            at_risk -= 1
+        # Too many calls were cut short to place the quantile: at least the longest of them
+        return max(self.hedge_min_delay_seconds, samples[-1][0])
+
+    def _observe(self, seconds: float, censored: bool = False) -> None:
+        """Record a call's latency; `censored` when it was cut short after `seconds`."""
+        self._latencies.append((seconds, censored))
+
+    # -- sync ----------------------------------------------------------
+
+    def generate(self, prompt: str, max_output_tokens: int = 500) -> str:
+        key = (prompt, max_output_tokens)
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                future = self._inflight[key] = Future()
+        if shared is not None:
+            LLM_CLIENT_EVENTS_TOTAL.inc("coalesced")
+            try:
+                return shared.result(timeout=self.timeout_seconds)
+            except FutureTimeoutError as e:
+                LLM_CLIENT_EVENTS_TOTAL.inc("deadline_exceeded")
+                raise LLMDeadlineExceeded(f"LLM call exceeded its {self.timeout_seconds}s deadline") from e
+
+        try:
+            result = self._call(prompt, max_output_tokens)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _call(self, prompt: str, max_output_tokens: int) -> str:
+        deadline = time.monotonic() + self.timeout_seconds
+        if not self._slots.acquire(timeout=self.timeout_seconds):
+            LLM_CLIENT_EVENTS_TOTAL.inc("deadline_exceeded")
+            raise LLMDeadlineExceeded(f"No LLM slot became free within {self.timeout_seconds}s")
+        try:
+            LLM_CLIENT_EVENTS_TOTAL.inc("calls")
+            started = time.perf_counter()
+            result = self.send(prompt, max_output_tokens, max(0.001, deadline - time.monotonic()))
+            self._observe(time.perf_counter() - started)
+            return result
+        except LLMDeadlineExceeded:
+            self._observe(time.perf_counter() - started, censored=True)
+            LLM_CLIENT_EVENTS_TOTAL.inc("deadline_exceeded")
+            raise
+        except Exception:
+            LLM_CLIENT_EVENTS_TOTAL.inc("errors")
+            raise
+        finally:
+            self._slots.release()
+
+    # -- async ---------------------------------------------------------
+
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState(self.max_concurrency)
+        return state
+
+    async def generate_async(self, prompt: str, max_output_tokens: int = 500) -> str:
+        state = self._loop_state()
+        key = (prompt, max_output_tokens)
+        task = state.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._with_deadline(state, prompt, max_output_tokens))
+            state.inflight[key] = task
+            task.add_done_callback(lambda done: _forget(state.inflight, key, done))
+        else:
+            LLM_CLIENT_EVENTS_TOTAL.inc("coalesced")
+        # Shielded so one waiter going away does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _with_deadline(self, state: _LoopState, prompt: str, max_output_tokens: int) -> str:
+        try:
+            return await asyncio.wait_for(self._hedged(state, prompt, max_output_tokens), self.timeout_seconds)
+        except asyncio.TimeoutError as e:
+            LLM_CLIENT_EVENTS_TOTAL.inc("deadline_exceeded")
+            raise LLMDeadlineExceeded(f"LLM call exceeded its {self.timeout_seconds}s deadline") from e
+
+    async def _attempt(self, state: _LoopState, prompt: str, max_output_tokens: int) -> str:
+        async with state.slots:
+            LLM_CLIENT_EVENTS_TOTAL.inc("calls")
+            started = time.perf_counter()
+            try:
+                result = await self.send_async(prompt, max_output_tokens)
+            except asyncio.CancelledError:
+                # Lost to a hedge or hit the deadline: slower than this, by an unknown amount
+                self._observe(time.perf_counter() - started, censored=True)
+                raise
+            except Exception:
+                LLM_CLIENT_EVENTS_TOTAL.inc("errors")
+                raise
+            self._observe(time.perf_counter() - started)
+            return result
+
+    async def _hedged(self, state: _LoopState, prompt: str, max_output_tokens: int) -> str:
+        attempts = [asyncio.ensure_future(self._attempt(state, prompt, max_output_tokens))]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done:
+                    LLM_CLIENT_EVENTS_TOTAL.inc("hedged")
+                    attempts.append(asyncio.ensure_future(self._attempt(state, prompt, max_output_tokens)))
+
+            pending = set(attempts)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not attempts[0]:
+                            LLM_CLIENT_EVENTS_TOTAL.inc("hedge_won")
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+
+def _forget(inflight: Dict, key, task: asyncio.Future) -> None:
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        # Mark the exception as retrieved when every waiter has gone away
+        task.exception()
+
+
+_client: LLMClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    max_concurrency=settings.llm_max_concurrency,
+                    timeout_seconds=settings.llm_timeout_seconds,
+                    hedging=settings.llm_hedging_enabled,
+                    hedge_quantile=settings.llm_hedge_quantile,
+                    hedge_min_delay_seconds=settings.llm_hedge_min_delay_ms / 1000,
+                )
+    return _client
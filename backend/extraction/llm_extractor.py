@@ -1,78 +1,286 @@
+import asyncio
 import json
-from typing import Any
-
-import google.generativeai as genai
+from typing import Any, List
 
 from ..config import settings
 from ..models.schemas import AnalyzedQuery
-from .prompt_templates import EXTRACTION_PROMPT_TEMPLATE
+from ..telemetry import EXTRACTION_TIER_TOTAL, stage
+from .cache import BATCH_TEMPLATE_HASH, cache_key, get_extraction_cache
+from .classifier import classify_locally
+from .llm_client import ExtractionError, LLMDeadlineExceeded, get_llm_client
+from .prompt_templates import BATCH_EXTRACTION_PROMPT_TEMPLATE, EXTRACTION_PROMPT_TEMPLATE
+
+CACHE = "cache"
+LLM = "llm"
+# The fixed extraction used without an API key or when the LLM misses its deadline
+DEFAULT = "default"
+
+# Which tier an extraction came from is request metadata, not part of the cached result
+_UNCACHED_FIELDS = {"raw_text", "extraction_tier", "extraction_confidence"}
+
+_SYSTEM_PREFIX = "You are a JSON-only task extraction model. "
 
 
-class ExtractionError(Exception):
-    pass
+def _fallback_response(prompt: str) -> str:
+    fallback = {
+        "task_type": "WebSearchTask",
+        "complexity": 0.5,
+        "domain": "general",
+        "output_format": None,
+        "free_text": prompt,
+        "default": True,
+    }
+    return json.dumps(fallback)
 
 
 def call_llm(prompt: str) -> str:
     if not settings.llm_api_key:
-        fallback = {
-            "task_type": "WebSearchTask",
-            "complexity": 0.5,
-            "domain": "general",
-            "output_format": None,
-            "free_text": prompt,
-        }
-        return json.dumps(fallback)
-
-    genai.configure(api_key=settings.llm_api_key)
-    
-    model_name = settings.llm_model.replace("gemini/", "") if settings.llm_model.startswith("gemini/") else settings.llm_model
-    if not model_name.startswith("models/"):
-        model_name = f"models/{model_name}"
-    model = genai.GenerativeModel(model_name)
-    
-    full_prompt = f"You are a JSON-only task extraction model. {prompt}"
-    
+        return _fallback_response(prompt)
+
     try:
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=500,
-                response_mime_type="application/json",
-            ),
-        )
-        
-        if response.text:
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            return text.strip()
-        else:
-            raise ExtractionError("Empty response from Gemini")
-            
-    except Exception as e:
-        raise ExtractionError(f"Gemini API error: {e}") from e
+        return get_llm_client().generate(_SYSTEM_PREFIX + prompt)
+    except LLMDeadlineExceeded as e:
+        print(f"Warning: {e}; using the default extraction")
+        return _fallback_response(prompt)
 
 
-def extract_query(query_text: str) -> AnalyzedQuery:
-    prompt = EXTRACTION_PROMPT_TEMPLATE.format(query=query_text)
-    raw_response = call_llm(prompt)
+async def call_llm_async(prompt: str, max_output_tokens: int = 500, default_on_deadline: bool = True) -> str:
+    """
+    Same as call_llm, but awaits Gemini instead of blocking a thread.
+    With `default_on_deadline=False` a missed deadline raises LLMDeadlineExceeded.
+    """
+    if not settings.llm_api_key:
+        return _fallback_response(prompt)
+
+    try:
+        return await get_llm_client().generate_async(_SYSTEM_PREFIX + prompt, max_output_tokens)
+    except LLMDeadlineExceeded as e:
+        if not default_on_deadline:
+            raise
+        print(f"Warning: {e}; using the default extraction")
+        return _fallback_response(prompt)
+
 
+def _parse_extraction(query_text: str, raw_response: str) -> AnalyzedQuery:
     try:
         data: dict[str, Any] = json.loads(raw_response)
     except json.JSONDecodeError as exc:
         raise ExtractionError(f"Invalid JSON from LLM: {exc}") from exc
 
+    return _analyzed_from_data(query_text, data)
+
+
+def _analyzed_from_data(query_text: str, data: dict[str, Any]) -> AnalyzedQuery:
     return AnalyzedQuery(
         raw_text=query_text,
         task_type=data.get("task_type", "WebSearchTask"),
         complexity=float(data.get("complexity", 0.5)),
         domain=data.get("domain", "general"),
         output_format=data.get("output_format"),
+        extraction_tier=DEFAULT if data.get("default") else LLM,
     )
 
 
+def _cache():
+    # Without an API key call_llm returns a fixed default, so there is nothing worth caching
+    return get_extraction_cache() if settings.llm_api_key else None
+
+
+def _cache_hit(query_text: str, cached) -> AnalyzedQuery | None:
+    if cached is None:
+        return None
+    return AnalyzedQuery(**dict(cached, raw_text=query_text, extraction_tier=CACHE))
+
+
+def _cache_lookup(query_text: str):
+    cache = _cache()
+    if not cache:
+        return None, None, None
+    key = cache_key(query_text)
+    return cache, key, _cache_hit(query_text, cache.get(key))
+
+
+async def _cache_lookup_async(query_text: str):
+    """_cache_lookup for the event loop: a disk-tier read runs in a worker thread."""
+    cache = _cache()
+    if not cache:
+        return None, None, None
+    key = cache_key(query_text)
+    return cache, key, _cache_hit(query_text, await cache.get_async(key))
+
+
+async def _cache_lookups_async(query_texts: List[str]) -> List[AnalyzedQuery | None]:
+    """Cached answers for many queries, with one disk read for all of them."""
+    cache = _cache()
+    if not cache:
+        return [None] * len(query_texts)
+    # A single-query answer is as good for a batch; the reverse does not hold
+    key_groups = [[cache_key(q), cache_key(q, template_hash=BATCH_TEMPLATE_HASH)] for q in query_texts]
+    cached = await cache.get_many_async(key_groups)
+    return [_cache_hit(query_text, value) for query_text, value in zip(query_texts, cached)]
+
+
+def _local_threshold() -> float:
+    # Without an API key the LLM tier is a fixed default, so any local guess is better
+    return settings.extraction_local_confidence_threshold if settings.llm_api_key else 0.0
+
+
+def _answered(analyzed: AnalyzedQuery) -> AnalyzedQuery:
+    EXTRACTION_TIER_TOTAL.inc(analyzed.extraction_tier)
+    return analyzed
+
+
+def _store(cache, key: str, analyzed: AnalyzedQuery) -> None:
+    # A default extraction (missed deadline) must not stick for the cache TTL
+    if cache and analyzed.extraction_tier == LLM:
+        cache.set(key, analyzed.model_dump(exclude=_UNCACHED_FIELDS))
+
+
+def _extract_with_llm(query_text: str, cache, key) -> AnalyzedQuery:
+    prompt = EXTRACTION_PROMPT_TEMPLATE.format(query=query_text)
+    with stage("extract_query.llm"):
+        raw_response = call_llm(prompt)
+    with stage("extract_query.parse"):
+        analyzed = _parse_extraction(query_text, raw_response)
+    _store(cache, key, analyzed)
+    return analyzed
+
+
+def extract_query(query_text: str) -> AnalyzedQuery:
+    """
+    Cache, then the local classifier (extraction/classifier.py), then the LLM.
+    The first tier with an answer wins; `extraction_tier` records which one.
+    """
+    with stage("extract_query.cache_lookup"):
+        cache, key, cached = _cache_lookup(query_text)
+    if cached is not None:
+        return _answered(cached)
+
+    with stage("extract_query.local"):
+        local = classify_locally(query_text, _local_threshold())
+    if local is not None:
+        return _answered(local)
+
+    return _answered(_extract_with_llm(query_text, cache, key))
+
+
+async def extract_query_async(query_text: str) -> AnalyzedQuery:
+    with stage("extract_query.cache_lookup"):
+        cache, key, cached = await _cache_lookup_async(query_text)
+    if cached is not None:
+        return _answered(cached)
+
+    with stage("extract_query.local"):
+        local = classify_locally(query_text, _local_threshold())
+    if local is not None:
+        return _answered(local)
+
+    prompt = EXTRACTION_PROMPT_TEMPLATE.format(query=query_text)
+    with stage("extract_query.llm"):
+        raw_response = await call_llm_async(prompt)
+    with stage("extract_query.parse"):
+        analyzed = _parse_extraction(query_text, raw_response)
+    _store(cache, key, analyzed)
+    return _answered(analyzed)
+
+
+def _parse_batch_extraction(query_texts: List[str], raw_response: str) -> List[AnalyzedQuery | None]:
+    """
+    Map a JSON array from the batch prompt back onto its queries.
+    Items are matched on their 1-based "index" when present, else by position;
+    queries without a usable item come back as None.
+    """
+    try:
+        items = json.loads(raw_response)
+    except json.JSONDecodeError as exc:
+        raise ExtractionError(f"Invalid JSON from LLM: {exc}") from exc
+    if not isinstance(items, list):
+        raise ExtractionError("Expected a JSON array from the batch extraction prompt")
+
+    parsed: List[AnalyzedQuery | None] = [None] * len(query_texts)
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index", position + 1)
+        if not isinstance(index, int) or not 1 <= index <= len(query_texts):
+            continue
+        try:
+            parsed[index - 1] = _analyzed_from_data(query_texts[index - 1], item)
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+
+async def _extract_chunk_async(query_texts: List[str]) -> List[AnalyzedQuery | Exception]:
+    numbered = "\n".join(f"{n}. {json.dumps(text)}" for n, text in enumerate(query_texts, start=1))
+    prompt = BATCH_EXTRACTION_PROMPT_TEMPLATE.format(count=len(query_texts), queries=numbered)
+    try:
+        with stage("extract_queries.llm"):
+            raw_response = await call_llm_async(prompt, max_output_tokens=100 + 80 * len(query_texts), default_on_deadline=False)
+        with stage("extract_queries.parse"):
+            parsed = _parse_batch_extraction(query_texts, raw_response)
+    except LLMDeadlineExceeded as e:
+        # Retrying one by one would only wait out more deadlines
+        print(f"Warning: {e}; using the default extraction for {len(query_texts)} queries")
+        parsed = [_parse_extraction(query_text, _fallback_response(query_text)) for query_text in query_texts]
+    except ExtractionError as e:
+        print(f"Warning: batch extraction failed, retrying queries one by one: {e}")
+        parsed = [None] * len(query_texts)
+
+    cache = _cache()
+    results: List[AnalyzedQuery | Exception] = []
+    for query_text, analyzed in zip(query_texts, parsed):
+        if analyzed is None:
+            # The model skipped or mangled this item; fall back to the single-query prompt
+            try:
+                analyzed = await extract_query_async(query_text)
+            except Exception as e:
+                results.append(e)
+                continue
+        else:
+            # Keyed on the batch prompt: its answers must not stand in for the single-query prompt's
+            _store(cache, cache_key(query_text, template_hash=BATCH_TEMPLATE_HASH), analyzed)
+            _answered(analyzed)
+        results.append(analyzed)
+    return results
+
+
+async def extract_queries_async(query_texts: List[str]) -> List[AnalyzedQuery | Exception]:
+    """
+    Extract many queries with as few LLM calls as possible.
+
+    Cache hits and confident local classifications are served directly; the
+    rest are packed into multi-query prompts of up to `settings.llm_batch_size`
+    queries, sent concurrently. Results are in input order; a failed item is
+    returned as its exception.
+    """
+    results: List[AnalyzedQuery | Exception | None] = [None] * len(query_texts)
+    pending: List[int] = []
+    threshold = _local_threshold()
+    with stage("extract_queries.cache_lookup"):
+        cached = await _cache_lookups_async(query_texts)
+    for i, (query_text, analyzed) in enumerate(zip(query_texts, cached)):
+        if analyzed is None:
+            with stage("extract_queries.local"):
+                analyzed = classify_locally(query_text, threshold)
+        if analyzed is not None:
+            results[i] = _answered(analyzed)
+        else:
+            pending.append(i)
+
+    if not settings.llm_api_key:
+        # No LLM configured: the single-query path returns defaults without I/O
+        for i in pending:
+            results[i] = await extract_query_async(query_texts[i])
+        return results
+
+    chunk_size = max(1, settings.llm_batch_size)
+    chunks = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+    chunk_results = await asyncio.gather(
+        *(_extract_chunk_async([query_texts[i] for i in chunk]) for chunk in chunks)
+    )
+
+    for chunk, extracted in zip(chunks, chunk_results):
+        for i, analyzed in zip(chunk, extracted):
+            results[i] = analyzed
+    return results
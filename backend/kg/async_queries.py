@@ -0,0 +1,480 @@
+"""
+Async counterparts of the functions in queries.py, backed by the async Neo4j
+driver. They run the same Cypher statements and use the same record mappers;
+only the I/O differs. The sync functions in queries.py remain the API for
+scripts and offline jobs.
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from neo4j import AsyncSession
+
+from .backend import backend_dispatch
+from .client import get_async_driver
+from .decision_writer import get_decision_writer
+from .metrics_rollups import (
+    DAY,
+    ROLLUP_AGENTS_CYPHER,
+    ROLLUP_GLOBAL_CYPHER,
+    ROLLUP_MERGE_CYPHER,
+    ROLLUP_TREND_CYPHER,
+    ROLLUP_VERSION_CYPHER,
+    rollups_gate_async,
+)
+from .key_queries import (
+    QUERY_1_FIND_AGENTS_BY_TASK,
+    QUERY_5_ROUTING_EXPLANATION,
+    QUERY_6_ROUTING_PATH,
+)
+from .queries import (
+    AGENT_CAPABILITIES_CYPHER,
+    AGENT_DETAILS_CYPHER,
+    AGENTS_BY_TASK_AND_DOMAIN_CYPHER,
+    ALL_AGENTS_CYPHER,
+    APPLY_FEEDBACK_CYPHER,
+    COMPLEMENTARY_AGENTS_CYPHER,
+    CREATE_ROUTING_DECISIONS_CYPHER,
+    FALLBACK_AGENT_CYPHER,
+    FALLBACK_AGENTS_CYPHER,
+    KG_EDGES_CYPHER,
+    KG_NODES_CYPHER,
+    KG_NODES_PAGE_CYPHER,
+    LIST_AGENTS_CYPHER,
+    METRICS_AVG_CONFIDENCE_CYPHER,
+    METRICS_BY_AGENT_CYPHER,
+    METRICS_RECENT_ACCURACY_CYPHER,
+    METRICS_TOTAL_CYPHER,
+    REQUIRED_CAPABILITIES_CYPHER,
+    ROUTING_DECISION_AGENT_CYPHER,
+    ROUTING_DETAILS_CYPHER,
+    ROUTING_RATIONALE_CYPHER,
+    UPDATE_AGENT_ACCURACY_CYPHER,
+    UPDATE_AGENT_COUNTS_CYPHER,
+    UPDATE_ROUTING_OUTCOME_CYPHER,
+    _agent_details_from_record,
+    _complementary_from_records,
+    _details_from_record,
+    _edge_to_dict,
+    _explanation_from_record,
+    _feedback_from_records,
+    _feedback_params,
+    _feedback_rollups,
+    _live_decision_rollups,
+    _metrics_from_records,
+    _metrics_window,
+    _neighbourhood_cypher,
+    _next_cursor,
+    _node_to_dict,
+    _path_from_record,
+    _rollup_global_values,
+    _visualization_params,
+    new_decision,
+)
+from .profiler import profiled_async_session
+from .rationale import decision_view, details_from_snapshot, explanation_from_decision, get_decision_cache, path_from_decision
+from .graph_version import bump_graph_version
+from .snapshot import TIER_ALL_AGENTS, TIER_FALLBACK, TIER_TASK_MATCH, agent_from_node, get_snapshot, mark_snapshot_stale
+from ..config import settings
+from ..models.domain import Agent
+from ..telemetry import stage, timed_stage
+
+
+def _session() -> AsyncSession:
+    return profiled_async_session(get_async_driver().session())
+
+
+async def _records(session: AsyncSession, cypher: str, **params) -> list:
+    result = await session.run(cypher, **params)
+    return [record async for record in result]
+
+
+async def _single(session: AsyncSession, cypher: str, **params):
+    result = await session.run(cypher, **params)
+    return await result.single()
+
+
+@backend_dispatch
+async def get_agents_by_task_type(
+    task_type_name: str,
+    min_threshold: float = 0.0,
+    domain: str | None = None,
+    query_text: str | None = None,
+) -> List[Agent]:
+    """
+    Candidate agents for a task type. `query_text` enables the retrieval tier,
+    which needs the snapshot; without one, the Cypher tiers are used.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_agents_by_task_type(task_type_name, min_threshold=min_threshold, domain=domain, query_text=query_text)
+
+    async with _session() as session:
+        with stage(TIER_TASK_MATCH):
+            if domain:
+                records = await _records(
+                    session,
+                    AGENTS_BY_TASK_AND_DOMAIN_CYPHER,
+                    taskType=task_type_name,
+                    minThreshold=min_threshold,
+                    domain=domain,
+                )
+            else:
+                records = await _records(
+                    session,
+                    QUERY_1_FIND_AGENTS_BY_TASK,
+                    taskType=task_type_name,
+                    minThreshold=min_threshold,
+                )
+        if records:
+            return [agent_from_node(record["agent"]) for record in records]
+
+        with stage(TIER_FALLBACK):
+            records = await _records(session, FALLBACK_AGENTS_CYPHER, minThreshold=min_threshold, domain=domain)
+        if not records:
+            with stage(TIER_ALL_AGENTS):
+                records = await _records(session, ALL_AGENTS_CYPHER)
+        return [agent_from_node(record["agent"]) for record in records]
+
+
+@backend_dispatch
+async def get_agents_for_queries(
+    task_type_name: str,
+    query_texts: List[str | None],
+    min_threshold: float = 0.0,
+    domain: str | None = None,
+) -> List[List[Agent]]:
+    """
+    get_agents_by_task_type for each query of a batch group (one task type
+    and domain). The Cypher tiers ignore the text, so without a snapshot
+    they run once for the whole group.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_agents_for_queries(task_type_name, query_texts, min_threshold=min_threshold, domain=domain)
+    agents = await get_agents_by_task_type.__wrapped__(task_type_name, min_threshold=min_threshold, domain=domain)
+    return [agents] * len(query_texts)
+
+
+@backend_dispatch
+async def get_fallback_agent(agent_name: str) -> Agent | None:
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_fallback_agent(agent_name)
+
+    async with _session() as session:
+        record = await _single(session, FALLBACK_AGENT_CYPHER, name=agent_name)
+        if not record:
+            return None
+        return agent_from_node(record["fb"])
+
+
+@backend_dispatch
+async def write_routing_decisions(decisions: List[Dict[str, Any]]) -> None:
+    if not decisions:
+        return
+
+    async def _write(tx):
+        gate = await rollups_gate_async(tx) if settings.metrics_rollups_enabled else None
+        result = await tx.run(CREATE_ROUTING_DECISIONS_CYPHER, decisions=decisions)
+        await result.consume()
+        rollups = _live_decision_rollups(decisions, gate) if gate is not None else []
+        if rollups:
+            result = await tx.run(ROLLUP_MERGE_CYPHER, rollups=rollups)
+            await result.consume()
+
+    async with _session() as session:
+        await session.execute_write(_write)
+    bump_graph_version()
+
+
+@backend_dispatch
+async def create_routing_decision(
+    query_text: str,
+    agent_name: str,
+    confidence: float,
+    task_type: str | None = None,
+    domain: str | None = None,
+    rationale: Dict[str, Any] | None = None,
+) -> str:
+    """
+    Returns the new decision id immediately when the write-behind buffer is
+    running (the write happens in a later batch), otherwise writes inline.
+    """
+    decision = new_decision(query_text, agent_name, confidence, task_type, domain, rationale)
+    writer = get_decision_writer()
+    if writer is not None:
+        await writer.enqueue(decision)
+    else:
+        await write_routing_decisions([decision])
+    return decision["id"]
+
+
+@backend_dispatch
+async def create_routing_decisions(decisions: List[Tuple]) -> List[str]:
+    params = [new_decision(*decision) for decision in decisions]
+    await write_routing_decisions(params)
+    return [decision["id"] for decision in params]
+
+
+async def _ensure_decision_written(rd_id: str) -> None:
+    # Reads and updates by id must not miss a decision still sitting in the buffer
+    writer = get_decision_writer()
+    if writer is not None:
+        await writer.ensure_written(rd_id)
+
+
+async def _ensure_decisions_written(rd_ids: List[str]) -> None:
+    writer = get_decision_writer()
+    if writer is None:
+        return
+    for rd_id in rd_ids:
+        if writer.pending_decision(rd_id) is not None or writer.failure(rd_id) is not None:
+            await writer.ensure_written(rd_id)
+
+
+@backend_dispatch
+async def update_routing_outcome(rd_id: str, outcome: str) -> None:
+    await _ensure_decision_written(rd_id)
+    async with _session() as session:
+        result = await session.run(UPDATE_ROUTING_OUTCOME_CYPHER, id=rd_id, outcome=outcome)
+        await result.consume()
+    bump_graph_version()
+
+
+@backend_dispatch
+async def update_agent_stats(agent_name: str, success: bool) -> None:
+    async with _session() as session:
+        result = await session.run(UPDATE_AGENT_COUNTS_CYPHER, name=agent_name, success=success)
+        await result.consume()
+        result = await session.run(UPDATE_AGENT_ACCURACY_CYPHER, name=agent_name)
+        await result.consume()
+    bump_graph_version()
+    mark_snapshot_stale()
+
+
+@backend_dispatch
+async def apply_feedback(feedback: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    if not feedback:
+        return []
+    await _ensure_decisions_written([rd_id for rd_id, _ in feedback])
+
+    async def _write(tx):
+        gate = await rollups_gate_async(tx) if settings.metrics_rollups_enabled else None
+        result = await tx.run(APPLY_FEEDBACK_CYPHER, feedback=_feedback_params(feedback))
+        records = [record async for record in result]
+        rollups = _feedback_rollups(records, gate) if gate is not None else []
+        if rollups:
+            result = await tx.run(ROLLUP_MERGE_CYPHER, rollups=rollups)
+            await result.consume()
+        return records
+
+    async with _session() as session:
+        records = await session.execute_write(_write)
+    if records:
+        bump_graph_version()
+        mark_snapshot_stale()
+    return _feedback_from_records(records)
+
+
+@backend_dispatch
+async def get_agent_name_for_routing_decision(routing_decision_id: str) -> str | None:
+    writer = get_decision_writer()
+    pending = writer.pending_decision(routing_decision_id) if writer is not None else None
+    if pending is not None:
+        return pending["agentName"]
+    if writer is not None:
+        writer.raise_if_failed(routing_decision_id)
+
+    async with _session() as session:
+        record = await _single(session, ROUTING_DECISION_AGENT_CYPHER, id=routing_decision_id)
+        if not record:
+            return None
+        return record["name"]
+
+
+@backend_dispatch
+async def list_agents() -> List[Dict[str, Any]]:
+    async with _session() as session:
+        records = await _records(session, LIST_AGENTS_CYPHER)
+        return [_agent_details_from_record(record, include_query_matching=True) for record in records]
+
+
+@backend_dispatch
+async def get_agent_details(agent_name: str) -> Optional[Dict[str, Any]]:
+    async with _session() as session:
+        record = await _single(session, AGENT_DETAILS_CYPHER, name=agent_name)
+        if not record:
+            return None
+        return _agent_details_from_record(record)
+
+
+async def _routing_decision(rd_id: str) -> Optional[Dict[str, Any]]:
+    cache = get_decision_cache()
+    decision = cache.get(rd_id)
+    if decision is not None:
+        return decision
+    writer = get_decision_writer()
+    pending = writer.pending_decision(rd_id) if writer is not None else None
+    if pending is not None:
+        # Still buffered: its rationale is right here, no need to flush it first
+        decision = decision_view(pending)
+    else:
+        if writer is not None:
+            writer.raise_if_failed(rd_id)
+        async with _session() as session:
+            decision = decision_view(await _single(session, ROUTING_RATIONALE_CYPHER, rdId=rd_id))
+    cache.put(rd_id, decision)
+    return decision
+
+
+@backend_dispatch
+async def get_routing_explanation(rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]:
+    decision = await _routing_decision(rd_id)
+    if decision is None:
+        return None
+    explanation = explanation_from_decision(decision, task_type)
+    if explanation is not None:
+        return explanation
+    await _ensure_decision_written(rd_id)
+    async with _session() as session:
+        record = await _single(session, QUERY_5_ROUTING_EXPLANATION, rdId=rd_id, taskType=task_type or decision["taskType"])
+        return _explanation_from_record(record)
+
+
+@backend_dispatch
+async def get_routing_path(rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]:
+    decision = await _routing_decision(rd_id)
+    if decision is None:
+        return None
+    path = path_from_decision(decision, task_type)
+    if path is not None:
+        return path
+    await _ensure_decision_written(rd_id)
+    async with _session() as session:
+        record = await _single(session, QUERY_6_ROUTING_PATH, rdId=rd_id, taskType=task_type or decision["taskType"])
+        return _path_from_record(record)
+
+
+@backend_dispatch
+async def get_routing_details(rd_id: str, task_type: str | None = None, limit: int = 5) -> Optional[Dict[str, Any]]:
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        decision = await _routing_decision(rd_id)
+        if decision is None or decision["agentName"] is None:
+            return None
+        return details_from_snapshot(decision, task_type, snapshot, limit)
+    await _ensure_decision_written(rd_id)
+    async with _session() as session:
+        record = await _single(session, ROUTING_DETAILS_CYPHER, rdId=rd_id, taskType=task_type, limit=limit)
+    return _details_from_record(record, task_type)
+
+
+@backend_dispatch
+async def iter_kg_for_visualization(
+    node_id: Optional[str] = None,
+    hops: int = 1,
+    **filters,
+) -> AsyncIterator[Tuple[str, Any]]:
+    params = _visualization_params(**filters)
+    async with _session() as session:
+        if node_id is not None:
+            record = await _single(session, _neighbourhood_cypher(hops), nodeId=int(node_id), relTypes=params["relTypes"])
+            params["scopeIds"] = record["ids"] if record else []
+
+        page_ids: List[int] = []
+        cypher = KG_NODES_CYPHER if params["limit"] is None else KG_NODES_PAGE_CYPHER
+        result = await session.run(cypher, **params)
+        async for record in result:
+            node = record["n"]
+            page_ids.append(node.id)
+            yield "node", _node_to_dict(node)
+
+        if params["limit"] is not None:
+            params["pageIds"] = page_ids
+        result = await session.run(KG_EDGES_CYPHER, **params)
+        async for record in result:
+            yield "edge", _edge_to_dict(record["r"], str(record["source"]), str(record["target"]))
+
+        yield "next_cursor", _next_cursor(params, page_ids)
+
+
+@backend_dispatch
+async def get_kg_for_visualization(**filters) -> Dict[str, Any]:
+    graph: Dict[str, Any] = {"nodes": [], "edges": [], "next_cursor": None}
+    async for kind, item in iter_kg_for_visualization(**filters):
+        if kind == "next_cursor":
+            graph["next_cursor"] = item
+        else:
+            graph[kind + "s"].append(item)
+    return graph
+
+
+@timed_stage("get_routing_metrics")
+@backend_dispatch
+async def get_routing_metrics(days: int = 30, granularity: str = DAY) -> Dict[str, Any]:
+    window = _metrics_window(days, granularity)
+    async with _session() as session:
+        if settings.metrics_rollups_enabled:
+            with stage("get_routing_metrics.rollups"):
+                global_record = await _single(session, ROLLUP_GLOBAL_CYPHER)
+                if global_record is not None:
+                    total_decisions, avg_confidence = _rollup_global_values(global_record)
+                    agent_records = await _records(session, ROLLUP_AGENTS_CYPHER)
+                    recent_records = await _records(session, ROLLUP_TREND_CYPHER, **window)
+                    return _metrics_from_records(total_decisions, avg_confidence, agent_records, recent_records, granularity)
+
+        with stage("get_routing_metrics.full_scan"):
+            total_result = await _single(session, METRICS_TOTAL_CYPHER)
+            avg_conf_result = await _single(session, METRICS_AVG_CONFIDENCE_CYPHER)
+            agent_records = await _records(session, METRICS_BY_AGENT_CYPHER)
+            recent_records = await _records(session, METRICS_RECENT_ACCURACY_CYPHER, **window)
+        return _metrics_from_records(
+            total_result["total_decisions"] if total_result else 0,
+            avg_conf_result["avg_confidence"] if avg_conf_result else 0.0,
+            agent_records,
+            recent_records,
+            granularity,
+        )
+
+
+@backend_dispatch
+async def get_shared_graph_version() -> Tuple[int, int, int] | None:
+    if not settings.metrics_rollups_enabled:
+        return None
+    async with _session() as session:
+        record = await _single(session, ROLLUP_VERSION_CYPHER)
+    if record is None:
+        return None
+    return record["decisions"], record["successes"], record["failures"]
+
+
+@backend_dispatch
+async def get_required_capabilities_for_task(task_type: str) -> List[str]:
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_required_capabilities_for_task(task_type)
+
+    async with _session() as session:
+        records = await _records(session, REQUIRED_CAPABILITIES_CYPHER, taskType=task_type)
+        return [record["capability"] for record in records]
+
+
+@backend_dispatch
+async def get_agent_capabilities(agent_name: str) -> List[str]:
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_agent_capabilities(agent_name)
+
+    async with _session() as session:
+        records = await _records(session, AGENT_CAPABILITIES_CYPHER, name=agent_name)
+        return [record["capability"] for record in records]
+
+
+@backend_dispatch
+async def get_complementary_agents(agent_name: str, task_type: str | None = None, limit: int = 5) -> List[Dict[str, Any]]:
+    if not task_type:
+        return []
+
+    async with _session() as session:
+        records = await _records(session, COMPLEMENTARY_AGENTS_CYPHER, name=agent_name, taskType=task_type, limit=limit)
+        return _complementary_from_records(records)
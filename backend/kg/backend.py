@@ -0,0 +1,162 @@
+"""
+Pluggable knowledge-graph backend.
+
+`KGBackend` is the set of graph operations the router needs. The Neo4j
+implementation is the module-level functions in queries.py and
+async_queries.py themselves; `EmbeddedGraph` (kg/embedded.py) implements the
+interface in-process from Python dict/set indexes, loaded from the seed
+Cypher or a Turtle file.
+
+`KG_BACKEND` selects the backend. The functions in queries.py and
+async_queries.py are decorated with `backend_dispatch`, which sends a call to
+the embedded graph's method of the same name when KG_BACKEND=embedded, so
+callers keep importing them and transparently use the configured backend.
+"""
+
+import inspect
+from abc import ABC, abstractmethod
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config import settings
+from ..models.domain import Agent
+
+NEO4J = "neo4j"
+EMBEDDED = "embedded"
+
+
+class KGBackend(ABC):
+    @abstractmethod
+    def get_agents_by_task_type(self, task_type_name: str, min_threshold: float = 0.0, domain: str | None = None,
+                                query_text: str | None = None) -> List[Agent]: ...
+
+    @abstractmethod
+    def get_agents_for_queries(self, task_type_name: str, query_texts: List[str | None], min_threshold: float = 0.0,
+                               domain: str | None = None) -> List[List[Agent]]: ...
+
+    @abstractmethod
+    def get_fallback_agent(self, agent_name: str) -> Agent | None: ...
+
+    @abstractmethod
+    def write_routing_decisions(self, decisions: List[Dict[str, Any]]) -> None: ...
+
+    @abstractmethod
+    def create_routing_decision(self, query_text: str, agent_name: str, confidence: float,
+                                task_type: str | None = None, domain: str | None = None,
+                                rationale: Dict[str, Any] | None = None) -> str: ...
+
+    @abstractmethod
+    def create_routing_decisions(self, decisions: List[Tuple]) -> List[str]: ...
+
+    @abstractmethod
+    def update_routing_outcome(self, rd_id: str, outcome: str) -> None: ...
+
+    @abstractmethod
+    def update_agent_stats(self, agent_name: str, success: bool) -> None: ...
+
+    @abstractmethod
+    def apply_feedback(self, feedback: List[Tuple[str, bool]]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def merge_context_accuracy(self, cells: List[Dict[str, Any]], half_life_seconds: float) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_context_accuracy(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_agent_name_for_routing_decision(self, routing_decision_id: str) -> str | None: ...
+
+    @abstractmethod
+    def list_agents(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_agent_details(self, agent_name: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_similar_agents(self, agent_name: str) -> List[Agent]: ...
+
+    @abstractmethod
+    def get_historical_decisions(self, agent_name: str, limit: int = 50) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_routed_queries(self, limit: int = 10000) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_agents_by_domain(self, domain: str) -> List[Agent]: ...
+
+    @abstractmethod
+    def get_routing_explanation(self, rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_routing_path(self, rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def get_routing_details(self, rd_id: str, task_type: str | None = None, limit: int = 5) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def iter_kg_for_visualization(self, node_id: Optional[str] = None, hops: int = 1, **filters) -> Iterator[Tuple[str, Any]]: ...
+
+    @abstractmethod
+    def get_kg_for_visualization(self, **filters) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def get_routing_metrics(self, days: int = 30, granularity: str = "day") -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def get_shared_graph_version(self) -> Tuple[int, int, int] | None: ...
+
+    @abstractmethod
+    def get_required_capabilities_for_task(self, task_type: str) -> List[str]: ...
+
+    @abstractmethod
+    def get_agent_capabilities(self, agent_name: str) -> List[str]: ...
+
+    @abstractmethod
+    def get_complementary_agents(self, agent_name: str, task_type: str | None = None, limit: int = 5) -> List[Dict[str, Any]]: ...
+
+
+def is_embedded() -> bool:
+    return settings.kg_backend == EMBEDDED
+
+
+def get_kg_backend() -> KGBackend:
+    """The in-process backend that calls are sent to when KG_BACKEND=embedded."""
+    from .embedded import get_embedded_graph
+
+    return get_embedded_graph()
+
+
+def backend_dispatch(func):
+    """
+    Send calls to the embedded graph's method of the same name when
+    KG_BACKEND=embedded; otherwise run the decorated Neo4j implementation.
+    Works for plain functions, coroutines and async generators (the embedded
+    graph is in-process, so its methods are always synchronous).
+    """
+    name = func.__name__
+
+    if inspect.isasyncgenfunction(func):
+        @wraps(func)
+        async def async_gen_wrapper(*args, **kwargs):
+            if is_embedded():
+                for item in getattr(get_kg_backend(), name)(*args, **kwargs):
+                    yield item
+            else:
+                async for item in func(*args, **kwargs):
+                    yield item
+        return async_gen_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if is_embedded():
+                return getattr(get_kg_backend(), name)(*args, **kwargs)
+            return await func(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if is_embedded():
+            return getattr(get_kg_backend(), name)(*args, **kwargs)
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,485 @@
+"""
+Bulk loader for seed data and agent catalogs.
+
+Sources are first staged, in the order given, into an in-memory
+EmbeddedGraph:
+
+- Cypher seed scripts (kg/seed_data.cypher and files like it) and Turtle data
+  (artifacts/semantic/*.ttl) are read with the embedded backend's parsers;
+  ontology and SHACL definitions in Turtle describe the graph and are skipped;
+- JSON and CSV agent catalogs are read by `read_catalog` / `read_csv_catalog`.
+
+The staged graph is then turned into parameter batches: nodes grouped by
+label set and key property (name, else id, hash or text), relationships by type
+and the labels and keys of both ends. Every batch is one
+`UNWIND $rows ... MERGE ... SET += row.props` statement in its own write
+transaction (retried by the driver on transient errors such as deadlocks), so
+loading the same sources twice leaves the graph unchanged. Batches of a phase
+do not depend on each other and run on BULK_LOAD_WORKERS sessions in
+parallel: all nodes first, then all relationships. --replace empties the
+database first, which is what the seed script always did.
+
+A failed batch does not stop the others. Failures are collected and raised
+together as a BulkLoadError after the load, whose report says what was
+written; the CLI exits with status 1.
+
+    python -m backend.kg.bulk_load                                # schema + seed_data.cypher, replacing the graph
+    python -m backend.kg.bulk_load catalog.json agents.csv --workers 8
+    python -m backend.kg.bulk_load artifacts/semantic/sample_graph.ttl --dry-run
+"""
+
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from .embedded import KG_DIR, EmbeddedGraph, EmbeddedNode
+from .graph_version import bump_graph_version
+from .migrations import run_migrations
+from .queries import query_hash
+from ..config import settings
+
+# Property that identifies a node of a label set, in order of preference
+KEY_PROPERTIES = ("name", "id", "hash", "text")
+
+# Catalog fields that are relationships rather than Agent properties
+AGENT_RELATIONSHIPS = {
+    "capabilities": ("HAS_CAPABILITY", "Capability"),
+    "fallbacks": ("FALLBACK_AGENT", "Agent"),
+    "fallbackAgents": ("FALLBACK_AGENT", "Agent"),
+    "worksWith": ("WORKS_WITH", "Agent"),
+    "similarTo": ("SIMILAR_TO", "Agent"),
+    "complements": ("COMPLEMENTS", "Agent"),
+}
+TASK_TYPE_CAPABILITIES = ("requiredCapabilities", "capabilities")
+
+# CSV list columns hold several values separated by one of these
+CSV_LIST_SEPARATOR = re.compile(r"\s*[;|]\s*")
+CSV_LIST_COLUMNS = set(AGENT_RELATIONSHIPS) | {"keywords", "tags", "useCases", "queryPatterns", "examples"}
+
+MERGE_NODES_CYPHER = """
+UNWIND $rows AS row
+MERGE (n{labels} {{{key}: row.key}})
+SET n += row.props
+"""
+
+MERGE_RELATIONSHIPS_CYPHER = """
+UNWIND $rows AS row
+MATCH (a{start_labels} {{{start_key}: row.start}})
+MATCH (b{end_labels} {{{end_key}: row.end}})
+MERGE (a)-[r:{type}]->(b)
+SET r += row.props
+"""
+
+# Auto-commit only: the deletes are committed in chunks by the server
+CLEAR_GRAPH_CYPHER = """
+MATCH (n)
+CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+class BulkLoadError(RuntimeError):
+    def __init__(self, report: Dict[str, Any]):
+        errors = report["errors"]
+        super().__init__(f"{len(errors)} batch(es) failed, first: {errors[0]['group']}: {errors[0]['error']}")
+        self.report = report
+
+
+@dataclass
+class WriteGroup:
+    """Rows written with one statement, `batch_size` rows per transaction."""
+
+    name: str
+    cypher: str
+    rows: List[Dict[str, Any]]
+    parameter: str = "rows"
+
+
+# ----------------------------------------------------------------------
+# Staging
+# ----------------------------------------------------------------------
+
+
+def _camel_case(name: str) -> str:
+    head, *rest = name.strip().split("_")
+    return head + "".join(part[:1].upper() + part[1:] for part in rest)
+
+
+def _property_value(value: Any) -> Any:
+    # Neo4j properties are scalars or lists of scalars
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True, default=str)
+    if isinstance(value, (list, tuple)):
+        return [_property_value(v) for v in value if v is not None]
+    return value
+
+
+def _names(value: Any) -> List[str]:
+    if value is None or value == "":
+        return []
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [str(v["name"] if isinstance(v, dict) else v) for v in values if v not in (None, "")]
+
+
+def _merge_named(graph: EmbeddedGraph, label: str, name: str, properties: Dict[str, Any] | None = None) -> EmbeddedNode:
+    node = graph.find_node(label, name=name)
+    if node is None:
+        return graph.create_node([label], dict(properties or {}, name=name))
+    if properties:
+        graph.set_properties(node, properties)
+    return node
+
+
+def _add_entity(graph: EmbeddedGraph, label: str, entry: Dict[str, Any], relationships: Dict[str, Tuple[str, str]],
+                links: List[Tuple[EmbeddedNode, str, str, str]]) -> None:
+    entry = {_camel_case(k): v for k, v in entry.items()}
+    name = entry.pop("name", None)
+    if not name:
+        raise ValueError(f"{label} without a name: {entry}")
+    targets = {field: _names(entry.pop(field, None)) for field in relationships}
+    node = _merge_named(graph, label, str(name), _props(entry))
+    for field, (rel_type, end_label) in relationships.items():
+        for target in targets[field]:
+            links.append((node, rel_type, end_label, target))
+
+
+def read_catalog(graph: EmbeddedGraph, catalog: Dict[str, Any] | List[Dict[str, Any]]) -> None:
+    """
+    Stage a JSON agent catalog: a list of agents, or an object with `agents`
+    and optionally `capabilities`, `task_types` (or `taskTypes`),
+    `agent_capabilities` ({agent, capability}) and `fallbacks`
+    ({agent, fallback}) lists, the shape benchmarks/catalog.py writes.
+
+    Agent keys may be snake_case or camelCase; `capabilities`, `fallbacks`,
+    `worksWith`, `similarTo` and `complements` hold names and become
+    relationships, capabilities and agents they name are created as needed.
+    Task types link to their `requiredCapabilities` (or `capabilities`).
+    """
+    if isinstance(catalog, list):
+        catalog = {"agents": catalog}
+    links: List[Tuple[EmbeddedNode, str, str, str]] = []
+    for entry in catalog.get("capabilities", []):
+        _add_entity(graph, "Capability", entry if isinstance(entry, dict) else {"name": entry}, {}, links)
+    requirements = {field: ("REQUIRES_CAPABILITY", "Capability") for field in TASK_TYPE_CAPABILITIES}
+    for entry in catalog.get("task_types", catalog.get("taskTypes", [])):
+        _add_entity(graph, "TaskType", entry, requirements, links)
+    for entry in catalog.get("agents", []):
+        _add_entity(graph, "Agent", entry, AGENT_RELATIONSHIPS, links)
+    for row in catalog.get("agent_capabilities", []):
+        links.append((_merge_named(graph, "Agent", row["agent"]), "HAS_CAPABILITY", "Capability", row["capability"]))
+    for row in catalog.get("fallbacks", []):
+        links.append((_merge_named(graph, "Agent", row["agent"]), "FALLBACK_AGENT", "Agent", row["fallback"]))
+    for start, rel_type, end_label, target in links:
+        graph.merge_relationship(start, rel_type, _merge_named(graph, end_label, target))
+
+
+def _csv_value(column: str, text: str) -> Any:
+    text = text.strip()
+    if column in CSV_LIST_COLUMNS:
+        return [v for v in CSV_LIST_SEPARATOR.split(text) if v] if text else []
+    if text == "":
+        return None
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def read_csv_catalog(graph: EmbeddedGraph, text: str) -> None:
+    """
+    Stage a CSV agent catalog: one agent per row, a header with the same
+    fields as a JSON catalog entry. List columns (capabilities, fallbacks,
+    keywords, ...) separate their values with `;` or `|`; numbers and
+    booleans are converted.
+    """
+    agents = [
+        {_camel_case(column): _csv_value(_camel_case(column), value or "") for column, value in row.items() if column}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+    read_catalog(graph, {"agents": agents})
+
+
+SOURCE_SUFFIXES = (".cypher", ".ttl", ".json", ".csv")
+
+
+def _source_files(sources: Iterable[str | Path]) -> Iterator[Path]:
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            yield from sorted(p for p in path.iterdir() if p.suffix in SOURCE_SUFFIXES)
+        else:
+            yield path
+
+
+def read_source(graph: EmbeddedGraph, path: Path) -> None:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".ttl":
+        graph.load_turtle(text)
+    elif path.suffix == ".json":
+        read_catalog(graph, json.loads(text))
+    elif path.suffix == ".csv":
+        read_csv_catalog(graph, text)
+    else:
+        graph.load_cypher(text)
+
+
+def stage_sources(sources: Sequence[str | Path] | None = None) -> Tuple[EmbeddedGraph, List[str]]:
+    """
+    Read `sources` (files or directories; default kg/seed_data.cypher) into
+    one EmbeddedGraph. Returns the graph and the files read.
+    """
+    graph = EmbeddedGraph()
+    files = list(_source_files(sources or [KG_DIR / "seed_data.cypher"]))
+    for path in files:
+        read_source(graph, path)
+    return graph, [str(path) for path in files]
+
+
+# ----------------------------------------------------------------------
+# Planning
+# ----------------------------------------------------------------------
+
+
+def _identifier(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _labels(labels: Iterable[str]) -> str:
+    return "".join(":" + _identifier(label) for label in sorted(labels))
+
+
+def _key(node: EmbeddedNode) -> str:
+    for prop in KEY_PROPERTIES:
+        if node.get(prop) is not None:
+            return prop
+    raise ValueError(f"Node {_labels(node.labels)} {dict(node)} has none of {', '.join(KEY_PROPERTIES)} to merge on")
+
+
+def _props(entity: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _property_value(v) for k, v in entity.items() if v is not None}
+
+
+def plan_writes(graph: EmbeddedGraph) -> List[List[WriteGroup]]:
+    """
+    The writes for a staged graph, as phases of independent groups: node
+    groups, then relationship groups. Rows with the same key are merged,
+    later properties winning.
+    """
+    nodes: Dict[Tuple[Tuple[str, ...], str], Dict[Any, Dict[str, Any]]] = {}
+    for node in graph._nodes.values():
+        if "Query" in node.labels and "hash" not in node and node.get("text") is not None:
+            # Query nodes are merged on the hash of their text (queries.query_hash)
+            node["hash"] = query_hash(node["text"])
+        key = _key(node)
+        rows = nodes.setdefault((tuple(sorted(node.labels)), key), {})
+        rows.setdefault(node[key], {}).update(_props(node))
+
+    rels: Dict[tuple, Dict[tuple, Dict[str, Any]]] = {}
+    for rel in graph._rels.values():
+        start, end = rel.start_node, rel.end_node
+        start_key, end_key = _key(start), _key(end)
+        group = (tuple(sorted(start.labels)), start_key, rel.type, tuple(sorted(end.labels)), end_key)
+        rels.setdefault(group, {}).setdefault((start[start_key], end[end_key]), {}).update(_props(rel))
+
+    node_groups = [
+        WriteGroup(
+            name=f"(:{':'.join(labels)} {{{key}}})",
+            cypher=MERGE_NODES_CYPHER.format(labels=_labels(labels), key=_identifier(key)),
+            rows=[{"key": value, "props": props} for value, props in rows.items()],
+        )
+        for (labels, key), rows in nodes.items()
+    ]
+    rel_groups = [
+        WriteGroup(
+            name=f"(:{':'.join(start_labels)})-[:{rel_type}]->(:{':'.join(end_labels)})",
+            cypher=MERGE_RELATIONSHIPS_CYPHER.format(
+                start_labels=_labels(start_labels), start_key=_identifier(start_key), type=_identifier(rel_type),
+                end_labels=_labels(end_labels), end_key=_identifier(end_key),
+            ),
+            # Sorted by start node, so a node's relationships land in few batches and
+            # parallel transactions rarely wait on each other's locks
+            rows=[{"start": s, "end": e, "props": props} for (s, e), props in sorted(rows.items(), key=lambda item: str(item[0]))],
+        )
+        for (start_labels, start_key, rel_type, end_labels, end_key), rows in rels.items()
+    ]
+    return [phase for phase in (node_groups, rel_groups) if phase]
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+
+class _Progress:
+    def __init__(self, phase: str, total: int, report: Callable[[str], None] | None, interval: float = 1.0):
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self._report = report
+        self._interval = interval
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        return f"{self.phase}: {self.done}/{self.total} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+
+    def add(self, rows: int) -> None:
+        with self._lock:
+            self.done += rows
+            now = time.perf_counter()
+            if self._report is None or now - self._last < self._interval:
+                return
+            self._last = now
+            self._report(self.line())
+
+
+def _batches(rows: List[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def write_phases(phases: Sequence[Sequence[WriteGroup]], batch_size: int | None = None, workers: int | None = None,
+                 progress: Callable[[str], None] | None = print, driver=None) -> Dict[str, Any]:
+    """
+    Write each phase's groups in batches of `batch_size` rows, one write
+    transaction per batch, on `workers` parallel sessions; a phase starts when
+    the previous one is done. Returns the report; failed batches are listed
+    under "errors" (the caller decides whether to raise).
+    """
+    from .client import get_driver
+
+    driver = driver or get_driver()
+    batch_size = batch_size or settings.bulk_load_batch_size
+    workers = workers or settings.bulk_load_workers
+    report: Dict[str, Any] = {"batch_size": batch_size, "workers": workers, "phases": [], "groups": {}, "errors": []}
+    lock = threading.Lock()
+
+    def write(group: WriteGroup, index: int, batch: List[Dict[str, Any]], tracker: _Progress) -> None:
+        started = time.perf_counter()
+        error = None
+        try:
+            with driver.session() as session:
+                session.execute_write(lambda tx: tx.run(group.cypher, {group.parameter: batch}).consume())
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        with lock:
+            stats = report["groups"][group.name]
+            stats["batch_seconds"] += time.perf_counter() - started
+            if error:
+                report["errors"].append({"group": group.name, "batch": index, "rows": len(batch), "error": error})
+                return
+            stats["written"] += len(batch)
+        tracker.add(len(batch))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-load") as pool:
+        for number, phase in enumerate(phases, 1):
+            tracker = _Progress(f"phase {number}/{len(phases)}", sum(len(group.rows) for group in phase), progress)
+            jobs = []
+            for group in phase:
+                stats = report["groups"].setdefault(group.name, {"rows": 0, "written": 0, "batches": 0, "batch_seconds": 0.0})
+                stats["rows"] += len(group.rows)
+                for index, batch in enumerate(_batches(group.rows, batch_size)):
+                    stats["batches"] += 1
+                    jobs.append(pool.submit(write, group, index, batch, tracker))
+            for job in jobs:
+                job.result()
+            seconds = time.perf_counter() - tracker.started
+            report["phases"].append({
+                "groups": [group.name for group in phase],
+                "rows": tracker.total,
+                "written": tracker.done,
+                "batches": len(jobs),
+                "seconds": seconds,
+                "rows_per_second": tracker.done / seconds if seconds else 0.0,
+            })
+            if progress is not None:
+                progress(tracker.line())
+
+    report["seconds"] = time.perf_counter() - started
+    report["rows"] = sum(phase["rows"] for phase in report["phases"])
+    report["written"] = sum(phase["written"] for phase in report["phases"])
+    report["batches"] = sum(phase["batches"] for phase in report["phases"])
+    report["rows_per_second"] = report["written"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def clear_graph(session) -> None:
+    session.run(CLEAR_GRAPH_CYPHER).consume()
+
+
+def bulk_load(sources: Sequence[str | Path] | None = None, batch_size: int | None = None, workers: int | None = None,
+              replace: bool = False, progress: Callable[[str], None] | None = print) -> Dict[str, Any]:
+    """
+    Stage `sources` (default: the seed), apply pending schema migrations
+    (kg/migrations.py) and write everything to Neo4j. With `replace` the database is emptied first.
+    Raises BulkLoadError, carrying the report, when any batch failed.
+    """
+    from .client import get_driver
+
+    started = time.perf_counter()
+    graph, files = stage_sources(sources)
+    phases = plan_writes(graph)
+    staged_seconds = time.perf_counter() - started
+    if progress is not None:
+        progress(f"staged {len(graph._nodes)} nodes and {len(graph._rels)} relationships from {len(files)} file(s) in {staged_seconds:.1f}s")
+
+    driver = get_driver()
+    if replace:
+        with driver.session() as session:
+            clear_graph(session)
+    run_migrations(driver=driver)
+    report = write_phases(phases, batch_size, workers, progress, driver)
+    bump_graph_version()
+    report.update(sources=files, stage_seconds=staged_seconds, total_seconds=time.perf_counter() - started)
+    if report["errors"]:
+        raise BulkLoadError(report)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", help="Cypher, Turtle, JSON or CSV files or directories (default: kg/seed_data.cypher)")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"Rows per transaction (default {settings.bulk_load_batch_size})")
+    parser.add_argument("--workers", type=int, default=None, help=f"Parallel sessions (default {settings.bulk_load_workers})")
+    parser.add_argument("--replace", action="store_true", help="Delete everything in the database first")
+    parser.add_argument("--dry-run", action="store_true", help="Stage and plan only; print the groups without connecting")
+    parser.add_argument("--output", type=Path, help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        graph, files = stage_sources(args.sources)
+        report = {
+            "sources": files,
+            "phases": [{group.name: len(group.rows) for group in phase} for phase in plan_writes(graph)],
+        }
+    else:
+        try:
+            report = bulk_load(args.sources, args.batch_size, args.workers, args.replace)
+        except BulkLoadError as e:
+            report = e.report
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+    if report.get("errors"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from neo4j import GraphDatabase, Driver
+from neo4j import AsyncDriver, AsyncGraphDatabase, GraphDatabase, Driver
 import httpx
 import ssl
 import certifi
@@ -6,6 +6,7 @@ import certifi
 from ..config import settings
 
 _driver: Driver | None = None
+_async_driver: AsyncDriver | None = None
 
 
 def _create_ssl_context() -> ssl.SSLContext:
@@ -57,3 +58,26 @@ def close_driver() -> None:
         _driver = None
 
 
+def get_async_driver() -> AsyncDriver:
+    global _async_driver
+    if _async_driver is None:
+        oauth_token = _get_oauth_token()
+
+        if oauth_token:
+            _async_driver = AsyncGraphDatabase.driver(
+                settings.neo4j_uri,
+                auth=("", oauth_token),
+            )
+        else:
+            _async_driver = AsyncGraphDatabase.driver(
+                settings.neo4j_uri,
+                auth=(settings.neo4j_user, settings.neo4j_password),
+            )
+    return _async_driver
+
+
+async def close_async_driver() -> None:
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
@@ -0,0 +1,278 @@
+"""
+Time-decayed routing accuracy per (agent, task type, domain).
+
+Agent.historicalAccuracy is one lifetime ratio per agent. This store keeps,
+for every (agent, task type, domain) context that has received feedback,
+success and failure counts that decay exponentially with a half-life of
+CONTEXT_ACCURACY_HALF_LIFE_DAYS, so an agent that got worse at one kind of
+request last week is ranked on that, not on its all-time average.
+
+Counts are stored as (successes, failures, as_of): their values at time
+`as_of` (epoch seconds). Decaying to a later time multiplies both by
+0.5 ** (elapsed / half_life), so a feedback event is an O(1) update and two
+sets of counts merge by bringing both to the later reference time and adding.
+Events are weighted by the time of the routing decision they are about;
+re-labelling a decision removes exactly the weight it added.
+
+The estimate is smoothed towards the agent's lifetime accuracy:
+
+    (successes + k * prior) / (successes + failures + k)
+
+with k = CONTEXT_ACCURACY_PRIOR_WEIGHT, so a context with little recent
+evidence scores like the agent overall.
+
+The store lives in memory for the routing path. Changes are merged into
+AgentContextAccuracy nodes in batches by a background thread every
+CONTEXT_ACCURACY_FLUSH_SECONDS; the thread first loads the persisted counts.
+"""
+
+import threading
+import time
+from datetime import timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .metrics_rollups import _to_datetime
+from .queries import get_context_accuracy, merge_context_accuracy
+from ..config import settings
+from ..models.domain import Agent
+
+Key = Tuple[str, str, str]
+
+
+def _epoch_seconds(timestamp) -> float | None:
+    moment = _to_datetime(timestamp)
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def merge_counts(cell: List[float], successes: float, failures: float, as_of: float, half_life_seconds: float) -> None:
+    """
+    Add (successes, failures) counted at `as_of` into `cell`
+    ([successes, failures, as_of]) in place. Deltas may be negative.
+    """
+    merged_as_of = max(cell[2], as_of)
+    cell_decay = 0.5 ** ((merged_as_of - cell[2]) / half_life_seconds)
+    delta_decay = 0.5 ** ((merged_as_of - as_of) / half_life_seconds)
+    cell[0] = cell[0] * cell_decay + successes * delta_decay
+    cell[1] = cell[1] * cell_decay + failures * delta_decay
+    cell[2] = merged_as_of
+
+
+def cell_id(agent: str, task_type: str, domain: str) -> str:
+    return f"{agent}|{task_type}|{domain}"
+
+
+class ContextAccuracyStore:
+    def __init__(self, half_life_days: float = 14.0, prior_weight: float = 4.0):
+        self.half_life_seconds = half_life_days * 86400.0
+        self.prior_weight = prior_weight
+        self._cells: Dict[Key, List[float]] = {}
+        self._pending: Dict[Key, List[float]] = {}
+        # (task type, domain) pairs with at least one cell, so scoring skips the rest
+        self._contexts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._counters = {"events": 0, "flushes": 0, "flushed_cells": 0, "failed_flushes": 0}
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def _cell(self, key: Key) -> List[float]:
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = [0.0, 0.0, 0.0]
+            context = (key[1], key[2])
+            self._contexts[context] = self._contexts.get(context, 0) + 1
+        return cell
+
+    def record_changes(self, changes: Iterable[Dict[str, Any]]) -> int:
+        """
+        Apply outcome changes as returned by apply_feedback: dicts with agent,
+        taskType, domain, previous, outcome and the decision timestamp.
+        Decisions without a task type (written before it was recorded) are
+        skipped. Returns the number of changes applied.
+        """
+        applied = 0
+        with self._lock:
+            for change in changes:
+                task_type, domain = change.get("taskType"), change.get("domain")
+                as_of = _epoch_seconds(change.get("timestamp"))
+                if not change.get("agent") or not task_type or not domain or as_of is None:
+                    continue
+                successes = int(change["outcome"] == "SUCCESS") - int(change.get("previous") == "SUCCESS")
+                failures = int(change["outcome"] == "FAILURE") - int(change.get("previous") == "FAILURE")
+                if not successes and not failures:
+                    continue
+                key = (change["agent"], task_type, domain)
+                merge_counts(self._cell(key), successes, failures, as_of, self.half_life_seconds)
+                merge_counts(self._pending.setdefault(key, [0.0, 0.0, as_of]), successes, failures, as_of, self.half_life_seconds)
+                applied += 1
+            self._counters["events"] += applied
+        return applied
+
+    def counts(self, agent: str, task_type: str, domain: str, now: float | None = None) -> Tuple[float, float]:
+        """Decayed (successes, failures) of one context as of `now` (default: the current time)."""
+        cell = self._cells.get((agent, task_type, domain))
+        if cell is None:
+            return 0.0, 0.0
+        now = time.time() if now is None else now
+        decay = 0.5 ** (max(0.0, now - cell[2]) / self.half_life_seconds)
+        # Removing a re-labelled outcome can leave rounding noise below zero
+        return max(0.0, cell[0] * decay), max(0.0, cell[1] * decay)
+
+    def accuracy(self, agent: str, task_type: str, domain: str, prior: float, now: float | None = None) -> float:
+        successes, failures = self.counts(agent, task_type, domain, now)
+        return (successes + self.prior_weight * prior) / (successes + failures + self.prior_weight)
+
+    def historical_scores(self, agents: Sequence[Agent], task_type: str, domain: str) -> Optional[List[float]]:
+        """
+        Context accuracy of each agent, in order, or None when no agent has
+        feedback for this task type and domain (callers then keep the
+        lifetime historicalAccuracy).
+        """
+        if (task_type, domain) not in self._contexts:
+            return None
+        now = time.time()
+        return [self.accuracy(a.name, task_type, domain, a.historical_accuracy, now) for a in agents]
+
+    # -- persistence ---------------------------------------------------
+
+    def _merge_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            key = (row["agent"], row["taskType"], row["domain"])
+            merge_counts(self._cell(key), row["successes"], row["failures"], row["asOf"], self.half_life_seconds)
+
+    def load(self) -> int:
+        """Merge the persisted counts into memory (once per process); returns the rows read."""
+        if self._loaded:
+            return 0
+        rows = get_context_accuracy()
+        with self._lock:
+            if self._loaded:
+                return 0
+            # Cells already in memory only hold feedback that is not persisted yet
+            self._merge_rows(rows)
+            self._loaded = True
+        return len(rows)
+
+    def flush(self) -> int:
+        """Merge pending changes into the graph in one batch; returns the cells written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        cells = [
+            {"id": cell_id(*key), "agent": key[0], "taskType": key[1], "domain": key[2],
+             "successes": s, "failures": f, "asOf": as_of}
+            for key, (s, f, as_of) in pending.items()
+        ]
+        try:
+            rows = merge_context_accuracy(cells, self.half_life_seconds)
+        except Exception:
+            with self._lock:
+                # Put the batch back, merged with anything recorded since
+                for key, (s, f, as_of) in pending.items():
+                    later = self._pending.get(key)
+                    if later is None:
+                        self._pending[key] = [s, f, as_of]
+                    else:
+                        merge_counts(later, s, f, as_of, self.half_life_seconds)
+                self._counters["failed_flushes"] += 1
+            raise
+        with self._lock:
+            if self._loaded:
+                # The graph now also holds other workers' feedback for these contexts:
+                # adopt it, plus whatever was recorded here while the batch was written
+                for row in rows:
+                    key = (row["agent"], row["taskType"], row["domain"])
+                    cell = self._cell(key)
+                    cell[:] = [row["successes"], row["failures"], row["asOf"]]
+                    later = self._pending.get(key)
+                    if later is not None:
+                        merge_counts(cell, later[0], later[1], later[2], self.half_life_seconds)
+            self._counters["flushes"] += 1
+            self._counters["flushed_cells"] += len(cells)
+        return len(cells)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["cells"] = len(self._cells)
+            stats["pending"] = len(self._pending)
+            stats["loaded"] = self._loaded
+        return stats
+
+
+_store: ContextAccuracyStore | None = None
+_store_lock = threading.Lock()
+_flusher: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def get_context_accuracy_store() -> ContextAccuracyStore | None:
+    """The process-wide store, or None when CONTEXT_ACCURACY_ENABLED is off."""
+    global _store
+    if not settings.context_accuracy_enabled:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ContextAccuracyStore(
+                    half_life_days=settings.context_accuracy_half_life_days,
+                    prior_weight=settings.context_accuracy_prior_weight,
+                )
+    return _store
+
+
+def record_feedback_changes(agent_results: Sequence[Dict[str, Any]]) -> None:
+    """Credit the outcome changes of apply_feedback results to their contexts."""
+    store = get_context_accuracy_store()
+    if store is not None:
+        store.record_changes(change for result in agent_results for change in result.get("changes", ()))
+
+
+def _flush_loop(store: ContextAccuracyStore, interval: float) -> None:
+    while not store._loaded and not _stop.is_set():
+        try:
+            store.load()
+        except Exception as e:
+            print(f"Warning: could not load context accuracy: {e}")
+            _stop.wait(timeout=interval)
+    while not _stop.wait(timeout=interval):
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"Warning: context accuracy flush failed: {e}")
+
+
+def start_context_accuracy_flusher() -> None:
+    global _flusher
+    store = get_context_accuracy_store()
+    if store is None or _flusher is not None:
+        return
+    _stop.clear()
+    _flusher = threading.Thread(
+        target=_flush_loop,
+        args=(store, settings.context_accuracy_flush_seconds),
+        name="context-accuracy-flusher",
+        daemon=True,
+    )
+    _flusher.start()
+
+
+def stop_context_accuracy_flusher() -> None:
+    """Stop the background thread and write whatever is still pending."""
+    global _flusher
+    if _flusher is None:
+        return
+    _stop.set()
+    _flusher.join(timeout=5.0)
+    _flusher = None
+    if _store is not None:
+        try:
+            _store.flush()
+        except Exception as e:
+            print(f"Warning: context accuracy flush failed: {e}")
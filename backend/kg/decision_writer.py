@@ -0,0 +1,293 @@
+"""
+Write-behind buffer for RoutingDecision persistence.
+
+`/routing` only needs the decision id to answer, so decisions are queued and
+written by a background task in UNWIND batches (one transaction per flush)
+instead of one transaction per request. The queue is bounded: when Neo4j
+falls behind, `enqueue` waits, which pushes back on the request handlers.
+
+Decisions that are still buffered are tracked by id, so reads and feedback for
+a fresh decision can flush it first (`ensure_written`) instead of missing it.
+
+The ids have already been returned to clients, so a batch whose transaction
+fails is not dropped: it stays pending and is written again after
+DECISION_RETRY_BACKOFF_SECONDS, doubling each time, up to
+DECISION_WRITE_MAX_RETRIES times. After that (or when it fails during
+shutdown) it is appended to the dead-letter file DECISION_DEAD_LETTER_PATH
+and counted in router_decision_writer_events_total; `ensure_written` then
+raises DecisionWriteError for its ids. Replay the file once Neo4j is back:
+
+    python -m backend.kg.decision_writer replay
+"""
+
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .backend import is_embedded
+from .client import get_async_driver
+from .graph_version import bump_graph_version
+from .metrics_rollups import ROLLUP_MERGE_CYPHER, rollups_gate_async
+from .profiler import profiled_async_session
+from .queries import CREATE_ROUTING_DECISIONS_CYPHER, _live_decision_rollups
+from ..config import settings
+from ..telemetry import DECISION_WRITER_EVENTS_TOTAL
+
+# Dead-lettered ids remembered for ensure_written
+MAX_FAILED_IDS = 10000
+
+
+class DecisionWriteError(Exception):
+    """A routing decision was dead-lettered instead of written to the graph."""
+
+
+class DecisionWriter:
+    def __init__(self, batch_size: int = 500, flush_interval: float = 0.5, max_queue_size: int = 10000,
+                 max_retries: int = 3, retry_backoff: float = 0.5, dead_letter_path: str | Path | None = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.dead_letter_path = Path(dead_letter_path or settings.decision_dead_letter_path)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._failed: "OrderedDict[str, str]" = OrderedDict()
+        self._retries: set = set()
+        self._stopping = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._written = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+        self._counters = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0, "retried": 0, "dead_lettered": 0}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="decision-writer")
+
+    async def stop(self) -> None:
+        """
+        Write everything still buffered, giving batches that wait for a retry
+        one last attempt. Raises DecisionWriteError when any of them had to be
+        dead-lettered.
+        """
+        dead_lettered = self._counters["dead_lettered"]
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # A batch the worker had started is still being written (shielded)
+        async with self._write_lock:
+            pass
+        await self.flush()
+        while self._retries:
+            await asyncio.gather(*self._retries)
+        lost = self._counters["dead_lettered"] - dead_lettered
+        if lost:
+            raise DecisionWriteError(f"{lost} routing decisions could not be written on shutdown; saved to {self.dead_letter_path}")
+
+    async def enqueue(self, decision: Dict[str, Any]) -> None:
+        self._pending[decision["id"]] = decision
+        await self._queue.put(decision)
+        self._counters["enqueued"] += 1
+
+    def pending_decision(self, rd_id: str) -> Optional[Dict[str, Any]]:
+        return self._pending.get(rd_id)
+
+    def failure(self, rd_id: str) -> Optional[str]:
+        """Why `rd_id` was dead-lettered, or None."""
+        return self._failed.get(rd_id)
+
+    def raise_if_failed(self, rd_id: str) -> None:
+        error = self._failed.get(rd_id)
+        if error is not None:
+            raise DecisionWriteError(f"Routing decision {rd_id} could not be written: {error}")
+
+    async def ensure_written(self, rd_id: str) -> None:
+        """Wait until `rd_id` is in the graph; DecisionWriteError if it was dead-lettered."""
+        await self.flush()
+        # Still pending means the worker holds it in a batch that is being
+        # built, or it waits for a retry
+        async with self._written:
+            await self._written.wait_for(lambda: rd_id not in self._pending)
+        self.raise_if_failed(rd_id)
+
+    async def flush(self) -> None:
+        """Write everything currently queued, in batches of batch_size."""
+        while not self._queue.empty():
+            await self._write(self._drain())
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+            try:
+                # Give concurrent requests a moment to join this batch
+                if self._queue.qsize() < self.batch_size - 1:
+                    await asyncio.sleep(self.flush_interval)
+            finally:
+                # Shielded so stop() cannot cancel a batch halfway; it waits
+                # on the write lock for this one to finish.
+                await asyncio.shield(self._write([first] + self._drain()))
+
+    async def _retry_later(self, batch: List[Dict[str, Any]], attempt: int) -> None:
+        delay = self.retry_backoff * 2 ** (attempt - 1)
+        try:
+            # stop() cuts the wait short
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        await self._write(batch, attempt)
+
+    def _schedule_retry(self, batch: List[Dict[str, Any]], attempt: int) -> None:
+        task = asyncio.create_task(self._retry_later(batch, attempt), name="decision-writer-retry")
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+        self._counters["retried"] += len(batch)
+        DECISION_WRITER_EVENTS_TOTAL.inc("retried", amount=len(batch))
+
+    def _dead_letter(self, batch: List[Dict[str, Any]], error: Exception) -> None:
+        failed_at = datetime.now(timezone.utc).isoformat()
+        lines = "".join(
+            json.dumps({"decision": decision, "error": str(error), "failedAt": failed_at}, default=str) + "\n"
+            for decision in batch
+        )
+        try:
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.dead_letter_path.open("a", encoding="utf-8") as file:
+                file.write(lines)
+            self._counters["dead_lettered"] += len(batch)
+            DECISION_WRITER_EVENTS_TOTAL.inc("dead_lettered", amount=len(batch))
+        except OSError as e:
+            self._counters["dead_lettered"] += len(batch)
+            DECISION_WRITER_EVENTS_TOTAL.inc("lost", amount=len(batch))
+            error = RuntimeError(f"{error}; dead-letter file not writable: {e}")
+        for decision in batch:
+            self._failed[decision["id"]] = str(error)
+            self._failed.move_to_end(decision["id"])
+        while len(self._failed) > MAX_FAILED_IDS:
+            self._failed.popitem(last=False)
+
+    async def _write(self, batch: List[Dict[str, Any]], attempt: int = 0) -> None:
+        if not batch:
+            return
+
+        async def _tx(tx):
+            gate = await rollups_gate_async(tx) if settings.metrics_rollups_enabled else None
+            result = await tx.run(CREATE_ROUTING_DECISIONS_CYPHER, decisions=batch)
+            await result.consume()
+            rollups = _live_decision_rollups(batch, gate) if gate is not None else []
+            if rollups:
+                result = await tx.run(ROLLUP_MERGE_CYPHER, rollups=rollups)
+                await result.consume()
+
+        async with self._write_lock:
+            done = True
+            try:
+                async with profiled_async_session(get_async_driver().session()) as session:
+                    await session.execute_write(_tx)
+                self._counters["written"] += len(batch)
+                self._counters["batches"] += 1
+                DECISION_WRITER_EVENTS_TOTAL.inc("written", amount=len(batch))
+                bump_graph_version()
+            except Exception as e:
+                # The transaction rolled back as a whole, so writing the batch again is safe
+                self._counters["failed"] += len(batch)
+                DECISION_WRITER_EVENTS_TOTAL.inc("failed", amount=len(batch))
+                if attempt < self.max_retries and not self._stopping.is_set():
+                    self._schedule_retry(batch, attempt + 1)
+                    done = False
+                else:
+                    self._dead_letter(batch, e)
+            if done:
+                for decision in batch:
+                    self._pending.pop(decision["id"], None)
+        async with self._written:
+            self._written.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._counters)
+        stats["queued"] = self._queue.qsize()
+        stats["retrying"] = len(self._pending) - stats["queued"]
+        return stats
+
+
+_writer: DecisionWriter | None = None
+
+
+def get_decision_writer() -> DecisionWriter | None:
+    """The running writer, or None when decisions should be written inline."""
+    return _writer
+
+
+def start_decision_writer() -> None:
+    """Start the writer on the running event loop (call from an async startup hook)."""
+    global _writer
+    # The embedded graph is written in-process, so there is nothing to batch
+    if not settings.decision_write_behind_enabled or is_embedded() or _writer is not None:
+        return
+    _writer = DecisionWriter(
+        batch_size=settings.decision_flush_batch_size,
+        flush_interval=settings.decision_flush_interval_seconds,
+        max_queue_size=settings.decision_queue_max_size,
+        max_retries=settings.decision_write_max_retries,
+        retry_backoff=settings.decision_retry_backoff_seconds,
+    )
+    _writer.start()
+
+
+async def stop_decision_writer() -> None:
+    """Flush buffered decisions and stop the writer; DecisionWriteError if some were dead-lettered."""
+    global _writer
+    if _writer is None:
+        return
+    writer, _writer = _writer, None
+    await writer.stop()
+
+
+def replay_dead_letters(path: str | Path | None = None, batch_size: int | None = None) -> int:
+    """
+    Write the decisions in the dead-letter file with queries.write_routing_decisions
+    and rename the file to *.replayed. Returns how many were written.
+    """
+    from .queries import write_routing_decisions
+
+    path = Path(path or settings.decision_dead_letter_path)
+    if not path.exists():
+        return 0
+    decisions = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        decision = json.loads(line)["decision"]
+        decision["timestamp"] = datetime.fromisoformat(decision["timestamp"])
+        decisions.append(decision)
+    batch_size = batch_size or settings.decision_flush_batch_size
+    for start in range(0, len(decisions), batch_size):
+        write_routing_decisions(decisions[start:start + batch_size])
+    path.rename(path.with_name(path.name + ".replayed"))
+    return len(decisions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("replay",))
+    parser.add_argument("--path", default=None, help=f"Default {settings.decision_dead_letter_path}")
+    args = parser.parse_args()
+
+    print(f"Replayed {replay_dead_letters(args.path)} routing decisions")
+
+
+if __name__ == "__main__":
+    main()
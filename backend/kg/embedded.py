@@ -0,0 +1,1184 @@
+"""
+Embedded, in-process knowledge graph.
+
+Holds the graph in Python dicts with per-label, per-key and adjacency indexes
+and answers the same operations as the Neo4j functions in queries.py, with
+the same result shapes (the record mappers are shared). It is loaded from
+`schema.cypher` + `seed_data.cypher` or from a Turtle file such as
+`artifacts/semantic/sample_graph.ttl`, which lets edge/sidecar deployments and
+benchmarks run without a database. Writes live in memory only.
+
+The Cypher loader understands the statement subset used by the seed files:
+MATCH / MERGE / CREATE of node and single-relationship patterns with literal
+property maps, `MATCH (n) DETACH DELETE n`, and schema statements (ignored).
+"""
+
+import re
+import threading
+from collections import deque
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .backend import KGBackend
+from .context_accuracy import merge_counts
+from .metrics_rollups import AGENT, DAY, GLOBAL, decision_rollups, feedback_rollups
+from .queries import (
+    MAX_NEIGHBOURHOOD_HOPS,
+    _agent_details_from_record,
+    _complementary_from_records,
+    _decisions_from_records,
+    _edge_to_dict,
+    _explanation_from_record,
+    _feedback_from_records,
+    _feedback_rollups,
+    _metrics_from_records,
+    _metrics_window,
+    _next_cursor,
+    _node_to_dict,
+    _path_from_record,
+    _visualization_params,
+    new_decision,
+    query_hash,
+)
+from .rationale import decision_view, details_from_snapshot, explanation_from_decision, path_from_decision
+from .graph_version import bump_graph_version
+from .snapshot import GraphSnapshot, agent_from_node, build_snapshot, mark_snapshot_stale
+from ..config import settings
+from ..models.domain import Agent
+
+KG_DIR = Path(__file__).parent
+
+# Properties kept in the (label, property, value) -> node index
+INDEXED_PROPERTIES = ("name", "id", "hash")
+
+# What the graph's routing snapshot (kg/snapshot.py) is built from. Writes to
+# it drop the snapshot, except the counters feedback updates: those reach it
+# on its next background refresh (mark_snapshot_stale), as with Neo4j.
+ROUTING_LABELS = frozenset({"Agent", "Capability", "TaskType"})
+ROUTING_RELATIONSHIPS = frozenset({"HAS_CAPABILITY", "REQUIRES_CAPABILITY", "FALLBACK_AGENT"})
+FEEDBACK_PROPERTIES = frozenset({"successCount", "failureCount", "historicalAccuracy"})
+
+
+class EmbeddedNode(dict):
+    """Node properties plus the `id` / `labels` attributes the mappers expect."""
+
+    def __init__(self, node_id: int, labels: Iterable[str], properties: Dict[str, Any]):
+        super().__init__(properties)
+        self.id = node_id
+        self.element_id = str(node_id)
+        self.labels = frozenset(labels)
+
+
+class EmbeddedRelationship(dict):
+    def __init__(self, rel_id: int, rel_type: str, start: EmbeddedNode, end: EmbeddedNode, properties: Dict[str, Any]):
+        super().__init__(properties)
+        self.id = rel_id
+        self.element_id = str(rel_id)
+        self.type = rel_type
+        self.start_node = start
+        self.end_node = end
+
+
+def _desc(value) -> tuple:
+    # Sort key for ORDER BY ... DESC; Neo4j puts nulls first in descending order
+    return (0, 0) if value is None else (1, -value)
+
+
+class EmbeddedGraph(KGBackend):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._nodes: Dict[int, EmbeddedNode] = {}
+        self._rels: Dict[int, EmbeddedRelationship] = {}
+        self._by_label: Dict[str, Dict[int, EmbeddedNode]] = {}
+        self._by_key: Dict[tuple, EmbeddedNode] = {}
+        self._out: Dict[int, Dict[str, List[EmbeddedRelationship]]] = {}
+        self._in: Dict[int, Dict[str, List[EmbeddedRelationship]]] = {}
+        self._next_node_id = 0
+        self._next_rel_id = 0
+        self._rollups: Dict[str, Dict[str, Any]] = {}
+        self._context_accuracy: Dict[str, Dict[str, Any]] = {}
+        # Snapshot of this graph's routing subgraph, rebuilt on first use after a structural write
+        self._snapshot: GraphSnapshot | None = None
+        self._snapshot_stale = True
+
+    # ------------------------------------------------------------------
+    # Storage primitives
+    # ------------------------------------------------------------------
+
+    def clear(self) -> None:
+        with self._lock:
+            self.__init__()
+
+    def create_node(self, labels: Iterable[str], properties: Dict[str, Any]) -> EmbeddedNode:
+        with self._lock:
+            node = EmbeddedNode(self._next_node_id, labels, properties)
+            self._next_node_id += 1
+            self._nodes[node.id] = node
+            self._out[node.id] = {}
+            self._in[node.id] = {}
+            for label in node.labels:
+                self._by_label.setdefault(label, {})[node.id] = node
+            self._index(node)
+            if node.labels & ROUTING_LABELS:
+                self._snapshot_stale = True
+            return node
+
+    def set_properties(self, node: EmbeddedNode, properties: Dict[str, Any]) -> None:
+        with self._lock:
+            self._unindex(node)
+            node.update(properties)
+            self._index(node)
+            if node.labels & ROUTING_LABELS and not FEEDBACK_PROPERTIES.issuperset(properties):
+                self._snapshot_stale = True
+
+    def _index(self, node: EmbeddedNode) -> None:
+        for label in node.labels:
+            for prop in INDEXED_PROPERTIES:
+                value = node.get(prop)
+                if isinstance(value, (str, int, float)):
+                    self._by_key.setdefault((label, prop, value), node)
+
+    def _unindex(self, node: EmbeddedNode) -> None:
+        for label in node.labels:
+            for prop in INDEXED_PROPERTIES:
+                key = (label, prop, node.get(prop))
+                if self._by_key.get(key) is node:
+                    del self._by_key[key]
+
+    def find_nodes(self, label: str | None, properties: Dict[str, Any]) -> List[EmbeddedNode]:
+        with self._lock:
+            for prop in INDEXED_PROPERTIES:
+                if label and prop in properties:
+                    node = self._by_key.get((label, prop, properties[prop]))
+                    candidates = [node] if node is not None else []
+                    break
+            else:
+                candidates = list(self._by_label.get(label, {}).values()) if label else list(self._nodes.values())
+            return [n for n in candidates if all(n.get(k) == v for k, v in properties.items())]
+
+    def find_node(self, label: str, **properties) -> EmbeddedNode | None:
+        nodes = self.find_nodes(label, properties)
+        return nodes[0] if nodes else None
+
+    def merge_node(self, label: str, properties: Dict[str, Any]) -> EmbeddedNode:
+        with self._lock:
+            existing = self.find_nodes(label, properties)
+            return existing[0] if existing else self.create_node([label], properties)
+
+    def create_relationship(self, start: EmbeddedNode, rel_type: str, end: EmbeddedNode, properties: Dict[str, Any] | None = None) -> EmbeddedRelationship:
+        with self._lock:
+            rel = EmbeddedRelationship(self._next_rel_id, rel_type, start, end, properties or {})
+            self._next_rel_id += 1
+            self._rels[rel.id] = rel
+            self._out[start.id].setdefault(rel_type, []).append(rel)
+            self._in[end.id].setdefault(rel_type, []).append(rel)
+            if rel_type in ROUTING_RELATIONSHIPS:
+                self._snapshot_stale = True
+            return rel
+
+    def merge_relationship(self, start: EmbeddedNode, rel_type: str, end: EmbeddedNode, properties: Dict[str, Any] | None = None) -> EmbeddedRelationship:
+        with self._lock:
+            properties = properties or {}
+            for rel in self._out[start.id].get(rel_type, []):
+                if rel.end_node is end and all(rel.get(k) == v for k, v in properties.items()):
+                    return rel
+            return self.create_relationship(start, rel_type, end, properties)
+
+    def outgoing(self, node: EmbeddedNode, rel_type: str) -> List[EmbeddedNode]:
+        return [rel.end_node for rel in self._out.get(node.id, {}).get(rel_type, [])]
+
+    def incoming(self, node: EmbeddedNode, rel_type: str) -> List[EmbeddedNode]:
+        return [rel.start_node for rel in self._in.get(node.id, {}).get(rel_type, [])]
+
+    def nodes(self, label: str) -> List[EmbeddedNode]:
+        return list(self._by_label.get(label, {}).values())
+
+    def _names(self, nodes: Iterable[EmbeddedNode]) -> List[str]:
+        return list(dict.fromkeys(n.get("name") for n in nodes if n.get("name") is not None))
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load_cypher(self, text: str) -> None:
+        for statement in _split_statements(text):
+            _CypherStatement(statement).apply(self)
+
+    def load_turtle(self, text: str) -> None:
+        _load_turtle(self, text)
+
+    # ------------------------------------------------------------------
+    # Routing subgraph
+    # ------------------------------------------------------------------
+
+    def routing_subgraph(self) -> tuple:
+        """(agents, agent_capabilities, task_capabilities, fallbacks), as snapshot.load_snapshot reads them."""
+        with self._lock:
+            agents: Dict[str, Agent] = {}
+            agent_capabilities: Dict[str, List[str]] = {}
+            fallbacks: Dict[str, List[str]] = {}
+            for node in self.nodes("Agent"):
+                agent = agent_from_node(node)
+                agents[agent.name] = agent
+                capabilities = self._names(c for c in self.outgoing(node, "HAS_CAPABILITY") if "Capability" in c.labels)
+                if capabilities:
+                    agent_capabilities[agent.name] = capabilities
+                fallback_names = self._names(fb for fb in self.outgoing(node, "FALLBACK_AGENT") if "Agent" in fb.labels)
+                if fallback_names:
+                    fallbacks[agent.name] = fallback_names
+            task_capabilities: Dict[str, List[str]] = {}
+            for node in self.nodes("TaskType"):
+                capabilities = self._names(c for c in self.outgoing(node, "REQUIRES_CAPABILITY") if "Capability" in c.labels)
+                if capabilities:
+                    task_capabilities[node["name"]] = capabilities
+            return agents, agent_capabilities, task_capabilities, fallbacks
+
+    def routing_snapshot(self) -> GraphSnapshot:
+        """This graph's routing snapshot; after a structural write the first reader rebuilds it."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._snapshot_stale:
+            return snapshot
+        with self._lock:
+            # Concurrent readers wait here and reuse the snapshot the first one built
+            if self._snapshot is None or self._snapshot_stale:
+                self.refresh_routing_snapshot()
+            return self._snapshot
+
+    def refresh_routing_snapshot(self) -> GraphSnapshot:
+        """Rebuild the routing snapshot, e.g. to pick up feedback counters; unchanged content keeps it."""
+        with self._lock:
+            self._snapshot = build_snapshot(self.routing_subgraph(), self._snapshot)
+            self._snapshot_stale = False
+            return self._snapshot
+
+    def get_agents_by_task_type(self, task_type_name: str, min_threshold: float = 0.0, domain: str | None = None,
+                                query_text: str | None = None) -> List[Agent]:
+        return self.routing_snapshot().get_agents_by_task_type(
+            task_type_name, min_threshold=min_threshold, domain=domain, query_text=query_text
+        )
+
+    def get_agents_for_queries(self, task_type_name: str, query_texts: List[str | None], min_threshold: float = 0.0,
+                               domain: str | None = None) -> List[List[Agent]]:
+        return self.routing_snapshot().get_agents_for_queries(
+            task_type_name, query_texts, min_threshold=min_threshold, domain=domain
+        )
+
+    def get_fallback_agent(self, agent_name: str) -> Agent | None:
+        return self.routing_snapshot().get_fallback_agent(agent_name)
+
+    def get_required_capabilities_for_task(self, task_type: str) -> List[str]:
+        return self.routing_snapshot().get_required_capabilities_for_task(task_type)
+
+    def get_agent_capabilities(self, agent_name: str) -> List[str]:
+        return self.routing_snapshot().get_agent_capabilities(agent_name)
+
+    # ------------------------------------------------------------------
+    # Decisions and feedback
+    # ------------------------------------------------------------------
+
+    def write_routing_decisions(self, decisions: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for d in decisions:
+                agent = self.merge_node("Agent", {"name": d["agentName"]})
+                query = self.merge_node("Query", {"hash": d["queryHash"]})
+                query.setdefault("text", d["queryText"])
+                rd = self.create_node(["RoutingDecision"], {
+                    "id": d["id"],
+                    "timestamp": d["timestamp"],
+                    "confidence": d["confidence"],
+                    "taskType": d.get("taskType"),
+                    "domain": d.get("domain"),
+                    "rationale": d.get("rationale"),
+                    "outcome": "PENDING",
+                })
+                self.create_relationship(rd, "SOURCE_QUERY", query)
+                self.create_relationship(rd, "ROUTED_TO", agent)
+            if settings.metrics_rollups_enabled:
+                self._apply_rollups(decision_rollups(decisions))
+        bump_graph_version()
+
+    def create_routing_decision(self, query_text: str, agent_name: str, confidence: float,
+                                task_type: str | None = None, domain: str | None = None,
+                                rationale: Dict[str, Any] | None = None) -> str:
+        decision = new_decision(query_text, agent_name, confidence, task_type, domain, rationale)
+        self.write_routing_decisions([decision])
+        return decision["id"]
+
+    def create_routing_decisions(self, decisions: List[Tuple]) -> List[str]:
+        params = [new_decision(*decision) for decision in decisions]
+        self.write_routing_decisions(params)
+        return [decision["id"] for decision in params]
+
+    def _decision(self, rd_id: str) -> EmbeddedNode | None:
+        return self.find_node("RoutingDecision", id=rd_id)
+
+    def _routed_agent(self, rd: EmbeddedNode) -> EmbeddedNode | None:
+        agents = [a for a in self.outgoing(rd, "ROUTED_TO") if "Agent" in a.labels]
+        return agents[0] if agents else None
+
+    def update_routing_outcome(self, rd_id: str, outcome: str) -> None:
+        rd = self._decision(rd_id)
+        if rd is not None:
+            self.set_properties(rd, {"outcome": outcome})
+            bump_graph_version()
+
+    def update_agent_stats(self, agent_name: str, success: bool) -> None:
+        with self._lock:
+            agent = self.find_node("Agent", name=agent_name)
+            if agent is None:
+                return
+            successes = agent.get("successCount", 0) + (1 if success else 0)
+            failures = agent.get("failureCount", 0) + (0 if success else 1)
+            self.set_properties(agent, {
+                "successCount": successes,
+                "failureCount": failures,
+                "historicalAccuracy": successes / (successes + failures),
+            })
+        bump_graph_version()
+        mark_snapshot_stale()
+
+    def apply_feedback(self, feedback: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            groups: Dict[int, Dict[str, Any]] = {}
+            for rd_id, success in feedback:
+                rd = self._decision(rd_id)
+                agent = self._routed_agent(rd) if rd is not None else None
+                if agent is None:
+                    continue
+                previous = rd.get("outcome")
+                outcome = "SUCCESS" if success else "FAILURE"
+                self.set_properties(rd, {"outcome": outcome})
+                group = groups.setdefault(agent.id, {
+                    "agent": agent["name"], "node": agent, "ids": [], "changes": [], "successes": 0, "failures": 0,
+                })
+                group["ids"].append(rd_id)
+                group["changes"].append({
+                    "previous": previous, "outcome": rd["outcome"], "timestamp": rd.get("timestamp"),
+                    "taskType": rd.get("taskType"), "domain": rd.get("domain"),
+                })
+                # Same arithmetic as APPLY_FEEDBACK_CYPHER: a re-label moves the decision between counters
+                group["successes"] += int(outcome == "SUCCESS") - int(previous == "SUCCESS")
+                group["failures"] += int(outcome == "FAILURE") - int(previous == "FAILURE")
+
+            records = []
+            for group in groups.values():
+                agent = group.pop("node")
+                before = agent.get("historicalAccuracy")
+                before = before if before is not None else 0.5
+                successes = agent.get("successCount", 0) + group["successes"]
+                failures = agent.get("failureCount", 0) + group["failures"]
+                self.set_properties(agent, {
+                    "successCount": successes,
+                    "failureCount": failures,
+                    "historicalAccuracy": successes / (successes + failures) if successes + failures else before,
+                })
+                records.append(dict(group, beforeAccuracy=before, afterAccuracy=agent["historicalAccuracy"]))
+
+            if settings.metrics_rollups_enabled:
+                self._apply_rollups(_feedback_rollups(records))
+        if records:
+            bump_graph_version()
+            mark_snapshot_stale()
+        return _feedback_from_records(records)
+
+    def merge_context_accuracy(self, cells: List[Dict[str, Any]], half_life_seconds: float) -> List[Dict[str, Any]]:
+        rows = []
+        with self._lock:
+            for c in cells:
+                row = self._context_accuracy.setdefault(c["id"], {
+                    "agent": c["agent"], "taskType": c["taskType"], "domain": c["domain"],
+                    "successes": 0.0, "failures": 0.0, "asOf": c["asOf"],
+                })
+                cell = [row["successes"], row["failures"], row["asOf"]]
+                merge_counts(cell, c["successes"], c["failures"], c["asOf"], half_life_seconds)
+                row.update(successes=cell[0], failures=cell[1], asOf=cell[2])
+                rows.append(dict(row))
+        return rows
+
+    def get_context_accuracy(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._context_accuracy.values()]
+
+    def get_agent_name_for_routing_decision(self, routing_decision_id: str) -> str | None:
+        rd = self._decision(routing_decision_id)
+        agent = self._routed_agent(rd) if rd is not None else None
+        return agent["name"] if agent is not None else None
+
+    # ------------------------------------------------------------------
+    # Agents
+    # ------------------------------------------------------------------
+
+    def _capability_names(self, agent: EmbeddedNode) -> List[str]:
+        return self._names(c for c in self.outgoing(agent, "HAS_CAPABILITY") if "Capability" in c.labels)
+
+    def list_agents(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            agents = sorted(self.nodes("Agent"), key=lambda a: a.get("name") or "")
+            return [
+                _agent_details_from_record({"agent": a, "capabilities": self._capability_names(a)}, include_query_matching=True)
+                for a in agents
+            ]
+
+    def get_agent_details(self, agent_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            agent = self.find_node("Agent", name=agent_name)
+            if agent is None:
+                return None
+            return _agent_details_from_record({"agent": agent, "capabilities": self._capability_names(agent)})
+
+    def get_similar_agents(self, agent_name: str) -> List[Agent]:
+        with self._lock:
+            agent = self.find_node("Agent", name=agent_name)
+            if agent is None:
+                return []
+            shared: Dict[int, set] = {}
+            others: Dict[int, EmbeddedNode] = {}
+            for cap in self.outgoing(agent, "HAS_CAPABILITY"):
+                for other in self.incoming(cap, "HAS_CAPABILITY"):
+                    if other is not agent and "Agent" in other.labels:
+                        shared.setdefault(other.id, set()).add(cap.id)
+                        others[other.id] = other
+            ranked = sorted(
+                others.values(),
+                key=lambda a: (-len(shared[a.id]), _desc(a.get("capabilityLevel")), _desc(a.get("historicalAccuracy"))),
+            )
+            return [agent_from_node(a) for a in ranked[:3]]
+
+    def get_historical_decisions(self, agent_name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            agent = self.find_node("Agent", name=agent_name)
+            if agent is None:
+                return []
+            decisions = [rd for rd in self.incoming(agent, "ROUTED_TO") if "RoutingDecision" in rd.labels]
+            decisions.sort(key=lambda rd: rd.get("timestamp") or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+            records = []
+            for rd in decisions[:50]:
+                # Same as Query 3: the outcome filter only applies to the OPTIONAL MATCH
+                judged = rd.get("outcome") not in (None, "PENDING")
+                queries = self.outgoing(rd, "SOURCE_QUERY") if judged else []
+                records.append({
+                    "decisionId": rd.get("id"),
+                    "confidence": rd.get("confidence"),
+                    "outcome": rd.get("outcome"),
+                    "timestamp": rd.get("timestamp"),
+                    "query": queries[0] if queries else None,
+                })
+            return _decisions_from_records(records, limit)
+
+    def get_routed_queries(self, limit: int = 10000) -> List[Dict[str, Any]]:
+        with self._lock:
+            decisions = list(self.nodes("RoutingDecision"))
+            decisions.sort(key=lambda rd: rd.get("timestamp") or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+            records = []
+            for rd in decisions:
+                for query in self.outgoing(rd, "SOURCE_QUERY"):
+                    agents = self.outgoing(rd, "ROUTED_TO")
+                    records.append({
+                        "query": query.get("text"),
+                        "outcome": rd.get("outcome"),
+                        "agent": agents[0].get("name") if agents else None,
+                        "agentDomain": agents[0].get("domainExpertise") if agents else None,
+                    })
+                if len(records) >= limit:
+                    break
+            return records[:limit]
+
+    def get_agents_by_domain(self, domain: str) -> List[Agent]:
+        with self._lock:
+            agents = [a for a in self.nodes("Agent") if a.get("domainExpertise") in (domain, "general")]
+            agents.sort(key=lambda a: (
+                1 if a.get("domainExpertise") == domain else 2,
+                _desc(a.get("historicalAccuracy")),
+                _desc(a.get("capabilityLevel")),
+            ))
+            return [agent_from_node(a) for a in agents]
+
+    def get_complementary_agents(self, agent_name: str, task_type: str | None = None, limit: int = 5) -> List[Dict[str, Any]]:
+        if not task_type:
+            return []
+        with self._lock:
+            task = self.find_node("TaskType", name=task_type)
+            primary = self.find_node("Agent", name=agent_name)
+            if task is None or primary is None:
+                return []
+            required = self._names(self.outgoing(task, "REQUIRES_CAPABILITY"))
+            primary_capabilities = self._capability_names(primary)
+            if not required or not primary_capabilities:
+                return []
+            missing = [c for c in required if c not in primary_capabilities]
+
+            records = []
+            for agent in self.nodes("Agent"):
+                if agent.get("name") == agent_name:
+                    continue
+                capabilities = self._capability_names(agent)
+                provided = [c for c in capabilities if c in missing]
+                if not provided:
+                    continue
+                records.append({
+                    "name": agent.get("name"),
+                    "description": agent.get("description"),
+                    "capabilityLevel": agent.get("capabilityLevel"),
+                    "domainExpertise": agent.get("domainExpertise"),
+                    "historicalAccuracy": agent.get("historicalAccuracy"),
+                    # Like the Cypher, only capabilities among the missing ones are collected
+                    "capabilities": provided,
+                    "missingCapabilitiesProvided": provided,
+                    "missingCapabilityCount": len(provided),
+                })
+            records.sort(key=lambda r: (-r["missingCapabilityCount"], _desc(r["capabilityLevel"]), _desc(r["historicalAccuracy"])))
+            return _complementary_from_records(records[:limit])
+
+    # ------------------------------------------------------------------
+    # Explanations
+    # ------------------------------------------------------------------
+
+    def _required_capabilities(self, task_type: str) -> List[EmbeddedNode]:
+        task = self.find_node("TaskType", name=task_type)
+        return [c for c in self.outgoing(task, "REQUIRES_CAPABILITY") if "Capability" in c.labels] if task else []
+
+    def _decision_view(self, rd: EmbeddedNode) -> Dict[str, Any]:
+        agent = self._routed_agent(rd)
+        queries = self.outgoing(rd, "SOURCE_QUERY")
+        return decision_view({
+            "rationale": rd.get("rationale"),
+            "confidence": rd.get("confidence"),
+            "taskType": rd.get("taskType"),
+            "queryText": queries[0].get("text") if queries else None,
+            "agentName": agent.get("name") if agent is not None else None,
+        })
+
+    def get_routing_explanation(self, rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rd = self._decision(rd_id)
+            agent = self._routed_agent(rd) if rd is not None else None
+            if agent is None:
+                return None
+            explanation = explanation_from_decision(self._decision_view(rd), task_type)
+            if explanation is not None:
+                return explanation
+            task_type = task_type or rd.get("taskType")
+            queries = self.outgoing(rd, "SOURCE_QUERY")
+            all_capabilities = self._capability_names(agent)
+            required = self._names(self._required_capabilities(task_type))
+            matching = [c for c in all_capabilities if c in required]
+            return _explanation_from_record({
+                "agentName": agent.get("name"),
+                "capabilityLevel": agent.get("capabilityLevel", 0.5),
+                "historicalAccuracy": agent.get("historicalAccuracy", 0.5),
+                "domainExpertise": agent.get("domainExpertise", "general"),
+                "queryText": queries[0].get("text", "") if queries else "",
+                "confidence": rd.get("confidence", 0.5),
+                "allCapabilities": all_capabilities,
+                "matchingCapabilities": matching,
+                "matchingCapabilityCount": len(matching),
+            })
+
+    def get_routing_path(self, rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rd = self._decision(rd_id)
+            agent = self._routed_agent(rd) if rd is not None else None
+            queries = self.outgoing(rd, "SOURCE_QUERY") if rd is not None else []
+            if agent is None or not queries:
+                return None
+            path = path_from_decision(self._decision_view(rd), task_type)
+            if path is not None:
+                return path
+            task_type = task_type or rd.get("taskType")
+            required = self._required_capabilities(task_type)
+            agent_capabilities = [c for c in self.outgoing(agent, "HAS_CAPABILITY") if "Capability" in c.labels]
+            return _path_from_record({
+                "queryText": queries[0].get("text"),
+                "taskType": task_type,
+                "requiredCapabilities": self._names(required),
+                "selectedAgent": agent.get("name"),
+                "agentCapabilities": self._names(agent_capabilities),
+                "matchingCapabilities": self._names(c for c in agent_capabilities if c in required),
+            })
+
+    def get_routing_details(self, rd_id: str, task_type: str | None = None, limit: int = 5) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rd = self._decision(rd_id)
+            if rd is None or self._routed_agent(rd) is None:
+                return None
+            return details_from_snapshot(self._decision_view(rd), task_type, self.routing_snapshot(), limit)
+
+    # ------------------------------------------------------------------
+    # Visualization
+    # ------------------------------------------------------------------
+
+    def _neighbourhood(self, node_id: int, hops: int, rel_types: Optional[List[str]]) -> set:
+        if not 0 <= hops <= MAX_NEIGHBOURHOOD_HOPS:
+            raise ValueError(f"hops must be between 0 and {MAX_NEIGHBOURHOOD_HOPS}")
+        if node_id not in self._nodes:
+            return set()
+        seen = {node_id}
+        frontier = deque([(node_id, 0)])
+        while frontier:
+            current, depth = frontier.popleft()
+            if depth == hops:
+                continue
+            for adjacency, end in ((self._out, "end_node"), (self._in, "start_node")):
+                for rel_type, rels in adjacency[current].items():
+                    if rel_types and rel_type not in rel_types:
+                        continue
+                    for rel in rels:
+                        neighbour = getattr(rel, end).id
+                        if neighbour not in seen:
+                            seen.add(neighbour)
+                            frontier.append((neighbour, depth + 1))
+        return seen
+
+    @staticmethod
+    def _visible(node: EmbeddedNode, params: Dict[str, Any]) -> bool:
+        if params["scopeIds"] is not None and node.id not in params["scopeIds"]:
+            return False
+        if params["labels"] and not node.labels & set(params["labels"]):
+            return False
+        if "RoutingDecision" in node.labels:
+            timestamp = node.get("timestamp")
+            if params["since"] is not None and (timestamp is None or timestamp < params["since"]):
+                return False
+            if params["until"] is not None and (timestamp is None or timestamp > params["until"]):
+                return False
+        return True
+
+    def iter_kg_for_visualization(self, node_id: Optional[str] = None, hops: int = 1, **filters) -> Iterator[Tuple[str, Any]]:
+        params = _visualization_params(**filters)
+        with self._lock:
+            if node_id is not None:
+                params["scopeIds"] = self._neighbourhood(int(node_id), hops, params["relTypes"])
+            nodes = [
+                n for n in sorted(self._nodes.values(), key=lambda n: n.id)
+                if (params["after"] is None or n.id > params["after"]) and self._visible(n, params)
+            ]
+            if params["limit"] is not None:
+                nodes = nodes[:params["limit"]]
+                sources = nodes
+            else:
+                sources = [n for n in self._nodes.values() if self._visible(n, params)]
+            edges = [
+                rel
+                for source in sources
+                for rel_type, rels in self._out[source.id].items()
+                if not params["relTypes"] or rel_type in params["relTypes"]
+                for rel in rels
+                if self._visible(rel.end_node, params)
+            ]
+
+        for node in nodes:
+            yield "node", _node_to_dict(node)
+        for rel in edges:
+            yield "edge", _edge_to_dict(rel, str(rel.start_node.id), str(rel.end_node.id))
+        yield "next_cursor", _next_cursor(params, [n.id for n in nodes])
+
+    def get_kg_for_visualization(self, **filters) -> Dict[str, Any]:
+        graph: Dict[str, Any] = {"nodes": [], "edges": [], "next_cursor": None}
+        for kind, item in self.iter_kg_for_visualization(**filters):
+            if kind == "next_cursor":
+                graph["next_cursor"] = item
+            else:
+                graph[kind + "s"].append(item)
+        return graph
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _apply_rollups(self, rollups: List[Dict[str, Any]]) -> None:
+        for delta in rollups:
+            row = self._rollups.setdefault(delta["id"], {
+                "scope": delta["scope"], "key": delta["key"],
+                "decisions": 0, "confidenceSum": 0.0, "successes": 0, "failures": 0,
+            })
+            for name in ("decisions", "confidenceSum", "successes", "failures"):
+                row[name] += delta[name]
+
+    def get_routing_metrics(self, days: int = 30, granularity: str = DAY) -> Dict[str, Any]:
+        window = _metrics_window(days, granularity)
+        with self._lock:
+            if not settings.metrics_rollups_enabled:
+                # Same answer as the Neo4j full-scan path: rebuild the counters from the decisions
+                self._rollups = {}
+                changes = []
+                for rd in self.nodes("RoutingDecision"):
+                    agent = self._routed_agent(rd)
+                    name = agent.get("name") if agent is not None else None
+                    self._apply_rollups(decision_rollups([
+                        {"agentName": name, "timestamp": rd.get("timestamp"), "confidence": rd.get("confidence")}
+                    ]))
+                    changes.append({"agent": name, "previous": None, "outcome": rd.get("outcome"), "timestamp": rd.get("timestamp")})
+                self._apply_rollups(feedback_rollups(changes))
+
+            rows = list(self._rollups.values())
+            overall = self._rollups.get(f"{GLOBAL}:all", {"decisions": 0, "confidenceSum": 0.0})
+            agent_records = sorted(
+                (
+                    {
+                        "agent_name": r["key"],
+                        "total": r["successes"] + r["failures"],
+                        "successes": r["successes"],
+                        "failures": r["failures"],
+                        "success_rate": r["successes"] / (r["successes"] + r["failures"]),
+                    }
+                    for r in rows
+                    if r["scope"] == AGENT and r["successes"] + r["failures"] > 0
+                ),
+                key=lambda r: -r["total"],
+            )
+            trend = sorted(
+                (
+                    {"bucket": r["key"], "total": r["successes"] + r["failures"], "successes": r["successes"]}
+                    for r in rows
+                    if r["scope"] == window["scope"] and r["key"] >= window["since"] and r["successes"] + r["failures"] > 0
+                ),
+                key=lambda r: r["bucket"],
+                reverse=True,
+            )[:window["limit"]]
+        decisions = overall["decisions"]
+        return _metrics_from_records(
+            decisions,
+            overall["confidenceSum"] / decisions if decisions else 0.0,
+            agent_records,
+            trend,
+            granularity,
+        )
+
+    def get_shared_graph_version(self) -> Tuple[int, int, int] | None:
+        # Only this process writes to the in-process graph, so graph_version() already covers it
+        return None
+
+
+# ----------------------------------------------------------------------
+# Cypher seed loader
+# ----------------------------------------------------------------------
+
+
+def _split_statements(text: str) -> List[str]:
+    """Split on `;` outside string literals, dropping `//` comments (also used by bulk_load.py)."""
+    statements, current, quote, i = [], [], None, 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            current.append(ch)
+            if ch == "\\" and i + 1 < len(text):
+                current.append(text[i + 1])
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+            current.append(ch)
+        elif text.startswith("//", i):
+            while i < len(text) and text[i] != "\n":
+                i += 1
+            continue
+        elif ch == ";":
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+class _CypherStatement:
+    """Parser/executor for the seed subset of Cypher."""
+
+    _CLAUSES = ("MATCH", "MERGE", "CREATE")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def fail(self, message: str = "unsupported syntax"):
+        raise ValueError(f"Embedded graph cannot load statement ({message}): {self.text[:120]}")
+
+    def skip_ws(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def peek(self, token: str) -> bool:
+        self.skip_ws()
+        return self.text.startswith(token, self.pos)
+
+    def expect(self, token: str) -> None:
+        if not self.peek(token):
+            self.fail(f"expected {token!r}")
+        self.pos += len(token)
+
+    def identifier(self) -> str:
+        self.skip_ws()
+        if self.peek("`"):
+            end = self.text.index("`", self.pos + 1)
+            name, self.pos = self.text[self.pos + 1:end], end + 1
+            return name
+        match = re.compile(r"[A-Za-z_][A-Za-z0-9_]*").match(self.text, self.pos)
+        if not match:
+            self.fail("expected identifier")
+        self.pos = match.end()
+        return match.group()
+
+    def value(self) -> Any:
+        self.skip_ws()
+        ch = self.text[self.pos] if self.pos < len(self.text) else ""
+        if ch in ("'", '"'):
+            return self.string()
+        if ch == "[":
+            self.pos += 1
+            items = []
+            while not self.peek("]"):
+                items.append(self.value())
+                if self.peek(","):
+                    self.pos += 1
+            self.expect("]")
+            return items
+        if ch == "{":
+            return self.properties()
+        match = re.compile(r"-?\d+(\.\d+)?([eE][-+]?\d+)?").match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            number = match.group()
+            return float(number) if match.group(1) or match.group(2) else int(number)
+        word = self.identifier()
+        literals = {"true": True, "false": False, "null": None}
+        if word.lower() not in literals:
+            self.fail(f"unsupported value {word!r}")
+        return literals[word.lower()]
+
+    def string(self) -> str:
+        quote = self.text[self.pos]
+        self.pos += 1
+        chars = []
+        while self.text[self.pos] != quote:
+            if self.text[self.pos] == "\\":
+                self.pos += 1
+                chars.append({"n": "\n", "t": "\t"}.get(self.text[self.pos], self.text[self.pos]))
+            else:
+                chars.append(self.text[self.pos])
+            self.pos += 1
+        self.pos += 1
+        return "".join(chars)
+
+    def properties(self) -> Dict[str, Any]:
+        self.expect("{")
+        props = {}
+        while not self.peek("}"):
+            key = self.identifier()
+            self.expect(":")
+            props[key] = self.value()
+            if self.peek(","):
+                self.pos += 1
+        self.expect("}")
+        return props
+
+    def node_pattern(self) -> tuple:
+        self.expect("(")
+        var = label = None
+        if not self.peek(":") and not self.peek(")") and not self.peek("{"):
+            var = self.identifier()
+        if self.peek(":"):
+            self.pos += 1
+            label = self.identifier()
+        props = self.properties() if self.peek("{") else {}
+        self.expect(")")
+        return var, label, props
+
+    def pattern(self) -> tuple:
+        start = self.node_pattern()
+        if not (self.peek("-") or self.peek("<-")):
+            return ("node", start)
+        incoming = self.peek("<-")
+        self.expect("<-" if incoming else "-")
+        self.expect("[")
+        if not self.peek(":"):
+            self.identifier()
+        self.expect(":")
+        rel_type = self.identifier()
+        props = self.properties() if self.peek("{") else {}
+        self.expect("]")
+        self.expect("-" if incoming else "->")
+        end = self.node_pattern()
+        if incoming:
+            start, end = end, start
+        return ("rel", start, rel_type, props, end)
+
+    def apply(self, graph: EmbeddedGraph) -> None:
+        upper = self.text.upper()
+        if upper.startswith("CREATE CONSTRAINT") or upper.startswith("CREATE INDEX") or upper.startswith("DROP "):
+            return
+
+        rows: List[Dict[str, EmbeddedNode]] = [{}]
+        while True:
+            self.skip_ws()
+            if self.pos >= len(self.text):
+                return
+            keyword = self.identifier().upper()
+            if keyword == "DETACH":
+                if self.identifier().upper() != "DELETE":
+                    self.fail()
+                self.identifier()
+                if self.text.split() == ["MATCH", "(n)", "DETACH", "DELETE", "n"]:
+                    graph.clear()
+                    return
+                self.fail("only MATCH (n) DETACH DELETE n is supported")
+            if keyword not in self._CLAUSES:
+                self.fail(f"unsupported clause {keyword}")
+            patterns = [self.pattern()]
+            while self.peek(","):
+                self.pos += 1
+                patterns.append(self.pattern())
+            for pattern in patterns:
+                rows = [row for current in rows for row in self._apply_pattern(graph, keyword, pattern, current)]
+            if not rows:
+                return
+
+    def _resolve(self, graph: EmbeddedGraph, keyword: str, node: tuple, row: Dict[str, EmbeddedNode]) -> List[EmbeddedNode]:
+        var, label, props = node
+        if var and var in row:
+            bound = row[var]
+            return [bound] if all(bound.get(k) == v for k, v in props.items()) else []
+        if keyword == "MATCH" or (keyword == "MERGE" and label is None and var):
+            if keyword == "MERGE":
+                self.fail(f"unbound variable {var}")
+            return graph.find_nodes(label, props)
+        if keyword == "MERGE":
+            return [graph.merge_node(label, props)]
+        return [graph.create_node([label] if label else [], props)]
+
+    def _apply_pattern(self, graph: EmbeddedGraph, keyword: str, pattern: tuple, row: Dict[str, EmbeddedNode]) -> List[Dict[str, EmbeddedNode]]:
+        if pattern[0] == "node":
+            node = pattern[1]
+            return [dict(row, **({node[0]: n} if node[0] else {})) for n in self._resolve(graph, keyword, node, row)]
+
+        _, start, rel_type, props, end = pattern
+        rows = []
+        for s in self._resolve(graph, keyword if keyword == "MATCH" else "MERGE", start, row):
+            for e in self._resolve(graph, keyword if keyword == "MATCH" else "MERGE", end, row):
+                if keyword == "MATCH":
+                    if not any(rel.end_node is e and all(rel.get(k) == v for k, v in props.items())
+                               for rel in graph._out[s.id].get(rel_type, [])):
+                        continue
+                elif keyword == "MERGE":
+                    graph.merge_relationship(s, rel_type, e, props)
+                else:
+                    graph.create_relationship(s, rel_type, e, props)
+                bound = dict(row)
+                if start[0]:
+                    bound[start[0]] = s
+                if end[0]:
+                    bound[end[0]] = e
+                rows.append(bound)
+        return rows
+
+
+# ----------------------------------------------------------------------
+# Turtle loader
+# ----------------------------------------------------------------------
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+# rdf:type objects under W3C namespaces (owl:Class, sh:NodeShape, ...) mark ontology
+# and shape definitions, which describe the graph rather than belong to it
+VOCABULARY_NAMESPACE = "http://www.w3.org/"
+
+# RDF predicate -> relationship type, where camelCase -> UPPER_SNAKE is not enough
+TURTLE_RELATIONSHIP_TYPES = {"hasFallbackAgent": "FALLBACK_AGENT"}
+
+_TURTLE_TOKEN = re.compile(
+    r'\s*(?:#[^\n]*\n?\s*)*'
+    r'(?P<token>'
+    r'"(?:[^"\\]|\\.)*"(?:\^\^(?:<[^>]*>|[A-Za-z_][\w-]*:[\w-]*)|@[A-Za-z-]+)?'
+    r'|<[^>]*>'
+    r'|@prefix'
+    r'|[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?'
+    r'|[A-Za-z_][\w-]*:[\w.-]*\w|[A-Za-z_][\w-]*:'
+    r'|\ba\b|true|false'
+    r'|[;,.\[\]()]'
+    r')'
+)
+
+
+_TURTLE_LITERAL = re.compile(r'"(?P<value>(?:[^"\\]|\\.)*)"(?:\^\^(?P<datatype>.+)|@[A-Za-z-]+)?')
+
+
+def _local_name(iri: str) -> str:
+    return re.split(r"[#/]", iri)[-1]
+
+
+def _relationship_type(predicate: str) -> str:
+    name = _local_name(predicate)
+    return TURTLE_RELATIONSHIP_TYPES.get(name) or re.sub(r"(?<!^)(?=[A-Z])", "_", name).upper()
+
+
+def _turtle_triples(text: str) -> Iterator[Tuple[str, str, Any]]:
+    tokens = []
+    pos = 0
+    text = text.rstrip() + "\n"
+    while pos < len(text):
+        match = _TURTLE_TOKEN.match(text, pos)
+        if not match:
+            if text[pos:].strip() == "" or text[pos:].lstrip().startswith("#"):
+                break
+            raise ValueError(f"Embedded graph cannot parse Turtle near: {text[pos:pos + 60]!r}")
+        tokens.append(match.group("token"))
+        pos = match.end()
+
+    prefixes: Dict[str, str] = {}
+
+    def term(token: str) -> Any:
+        if token.startswith("<"):
+            return ("iri", token[1:-1])
+        if token.startswith('"'):
+            match = _TURTLE_LITERAL.fullmatch(token)
+            raw = match.group("value").encode("utf-8").decode("unicode_escape")
+            datatype = term(match.group("datatype"))[1] if match.group("datatype") else ""
+            if datatype == XSD + "dateTime":
+                return datetime.fromisoformat(raw.replace("Z", "+00:00"))
+            if datatype == XSD + "date":
+                return date.fromisoformat(raw)
+            if datatype in (XSD + "integer", XSD + "int", XSD + "long"):
+                return int(raw)
+            if datatype in (XSD + "decimal", XSD + "double", XSD + "float"):
+                return float(raw)
+            if datatype == XSD + "boolean":
+                return raw == "true"
+            return raw
+        if token in ("true", "false"):
+            return token == "true"
+        if re.fullmatch(r"[-+]?\d+", token):
+            return int(token)
+        if re.fullmatch(r"[-+]?\d+(\.\d+)?([eE][-+]?\d+)?", token):
+            return float(token)
+        if token == "a":
+            return ("iri", RDF_TYPE)
+        prefix, _, local = token.partition(":")
+        if prefix not in prefixes:
+            raise ValueError(f"Unknown Turtle prefix: {prefix}")
+        return ("iri", prefixes[prefix] + local)
+
+    i = 0
+    blank_nodes = 0
+
+    def objects(subject: str, predicate: str) -> Iterator[Tuple[str, str, Any]]:
+        nonlocal i, blank_nodes
+        if tokens[i] == "(":
+            # A collection becomes a list value (IRIs as strings)
+            end = tokens.index(")", i)
+            items = [term(token) for token in tokens[i + 1:end]]
+            yield subject, predicate, [item[1] if isinstance(item, tuple) else item for item in items]
+            i = end + 1
+            return
+        if tokens[i] != "[":
+            yield subject, predicate, term(tokens[i])
+            i += 1
+            return
+        # Anonymous blank node ([ ... ]), as in SHACL property shapes
+        blank_nodes += 1
+        node = f"_:b{blank_nodes}"
+        i += 1
+        if tokens[i] != "]":
+            yield from predicate_objects(node)
+        i += 1  # "]"
+        yield subject, predicate, ("iri", node)
+
+    def predicate_objects(subject: str) -> Iterator[Tuple[str, str, Any]]:
+        nonlocal i
+        while True:
+            predicate = term(tokens[i])[1]
+            i += 1
+            while True:
+                yield from objects(subject, predicate)
+                if tokens[i] != ",":
+                    break
+                i += 1
+            if tokens[i] == ";":
+                i += 1
+                if tokens[i] in (".", "]"):
+                    break
+                continue
+            break
+
+    while i < len(tokens):
+        if tokens[i] == "@prefix":
+            prefixes[tokens[i + 1].rstrip(":")] = tokens[i + 2][1:-1]
+            i += 4
+            continue
+        subject = term(tokens[i])[1]
+        i += 1
+        yield from predicate_objects(subject)
+        i += 1  # "."
+
+
+def _load_turtle(graph: EmbeddedGraph, text: str) -> None:
+    labels: Dict[str, List[str]] = {}
+    properties: Dict[str, Dict[str, Any]] = {}
+    links: List[Tuple[str, str, str]] = []
+    vocabulary = set()
+    for subject, predicate, obj in _turtle_triples(text):
+        if predicate == RDF_TYPE:
+            if obj[1].startswith(VOCABULARY_NAMESPACE):
+                vocabulary.add(subject)
+            else:
+                labels.setdefault(subject, []).append(_local_name(obj[1]))
+        elif isinstance(obj, tuple):
+            links.append((subject, predicate, obj[1]))
+        else:
+            properties.setdefault(subject, {})[_local_name(predicate)] = obj
+
+    nodes: Dict[str, EmbeddedNode] = {}
+    for subject, node_labels in labels.items():
+        if subject in vocabulary:
+            continue
+        props = properties.get(subject, {})
+        if "Query" in node_labels and "text" in props:
+            props.setdefault("hash", query_hash(props["text"]))
+        elif "RoutingDecision" not in node_labels:
+            props.setdefault("name", _local_name(subject))
+        nodes[subject] = graph.create_node(node_labels, props)
+    for subject, predicate, obj in links:
+        if subject in nodes and obj in nodes:
+            graph.create_relationship(nodes[subject], _relationship_type(predicate), nodes[obj])
+
+
+# ----------------------------------------------------------------------
+# Module-level graph
+# ----------------------------------------------------------------------
+
+_graph: EmbeddedGraph | None = None
+_graph_lock = threading.Lock()
+
+
+def load_embedded_graph(source: str | None = None) -> EmbeddedGraph:
+    """
+    Build a graph from `source`: a .ttl file, a .cypher file, or (default)
+    kg/schema.cypher followed by kg/seed_data.cypher.
+    """
+    graph = EmbeddedGraph()
+    if source is None:
+        for path in (KG_DIR / "schema.cypher", KG_DIR / "seed_data.cypher"):
+            graph.load_cypher(path.read_text(encoding="utf-8"))
+    elif source.endswith(".ttl"):
+        graph.load_turtle(Path(source).read_text(encoding="utf-8"))
+    else:
+        graph.load_cypher(Path(source).read_text(encoding="utf-8"))
+    return graph
+
+
+def get_embedded_graph() -> EmbeddedGraph:
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = load_embedded_graph(settings.kg_embedded_source)
+    return _graph
+
+
+def set_embedded_graph(graph: EmbeddedGraph) -> None:
+    """Replace the process-wide graph, e.g. with a generated catalog (benchmarks/catalog.py)."""
+    global _graph
+    with _graph_lock:
+        _graph = graph
+    bump_graph_version()
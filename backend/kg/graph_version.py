@@ -0,0 +1,32 @@
+"""
+Graph version counter.
+
+A number that goes up whenever this process writes to the KG: routing
+decisions (inline, batched, or flushed by the write-behind buffer in
+decision_writer.py), outcome and agent stats updates, feedback, seeding and
+bulk loads, and replacing the embedded graph. A snapshot reload that finds
+different agents or capabilities bumps it too, which is how writes made by
+another process (another API worker, a bulk load run from the command line)
+are noticed.
+
+Read endpoints keep their last serialized body per version
+(api/http_cache.py), so a poll that arrives while the version is unchanged
+costs neither a query nor a serialization.
+"""
+
+import threading
+
+_version = 0
+_lock = threading.Lock()
+
+
+def graph_version() -> int:
+    return _version
+
+
+def bump_graph_version() -> int:
+    """Record a write; returns the new version."""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
@@ -0,0 +1,412 @@
+"""
+Pre-aggregated routing metrics.
+
+`MetricsRollup` nodes hold running counters for the whole graph, for each
+agent and for hourly/daily buckets of decision time. They are incremented in
+the same transaction that creates decisions or applies feedback, so
+`/metrics/` reads a handful of small nodes instead of scanning every
+RoutingDecision.
+
+The counters only mean something once they have been built from the history
+already in the graph. That backfill is schema migration 4 (kg/migrations.py),
+so it runs with the others at startup, before the decision writer starts. It
+clears the rollups and rebuilds them one day of decisions per transaction,
+oldest first; the range that reaches the present is written in the same
+transaction that records the `(:MetricsRollupBackfill {status: 'complete'})`
+marker. Until then `/metrics/` scans the decisions, so counters are never
+served half-built.
+
+Writes that move the counters start with `rollups_gate`. While a backfill
+runs, it takes the marker's lock, and so does every backfill transaction,
+which records in `rebuiltUntil` how far the rebuild has got. Each write then
+commits wholly before or after each backfill transaction. It applies its
+deltas only for decisions the rebuild has already passed (`counted_live`);
+the rebuild reads the others later with their final outcome. No decision or
+feedback is lost or counted twice.
+
+To rebuild from scratch (e.g. after restoring a backup), preferably with the
+API stopped:
+
+    python -m backend.kg.metrics_rollups
+
+Decisions deleted by the retention job (kg/retention.py) are kept as
+`compacted` rollups, one per hour, agent, task type and domain; the backfill
+adds them back into the other scopes.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List
+
+from .client import get_driver
+
+GLOBAL = "global"
+AGENT = "agent"
+HOUR = "hour"
+DAY = "day"
+COMPACTED = "compacted"
+
+# Every delta row carries all counters so a single statement applies them
+ROLLUP_MERGE_CYPHER = """
+UNWIND $rollups AS r
+MERGE (m:MetricsRollup {id: r.id})
+ON CREATE SET m.scope = r.scope, m.key = r.key,
+              m.decisions = 0, m.confidenceSum = 0.0, m.successes = 0, m.failures = 0
+SET m.decisions = m.decisions + r.decisions,
+    m.confidenceSum = m.confidenceSum + r.confidenceSum,
+    m.successes = m.successes + r.successes,
+    m.failures = m.failures + r.failures
+"""
+
+# Increments outside the live write paths (e.g. bulk loads): a no-op until
+# the backfill has completed
+ROLLUP_INCREMENT_CYPHER = """
+MATCH (:MetricsRollupBackfill {id: 'metrics', status: 'complete'})
+""" + ROLLUP_MERGE_CYPHER.lstrip("\n")
+
+BACKFILL_COMPLETE_CYPHER = """
+OPTIONAL MATCH (s:MetricsRollupBackfill {id: 'metrics', status: 'complete'})
+RETURN s IS NOT NULL AS complete
+"""
+
+# No row before the backfill has completed: /metrics/ then scans the decisions
+ROLLUP_GLOBAL_CYPHER = """
+MATCH (:MetricsRollupBackfill {id: 'metrics', status: 'complete'})
+MATCH (m:MetricsRollup {id: 'global:all'})
+RETURN m.decisions AS decisions, m.confidenceSum AS confidenceSum
+"""
+
+# Moves whenever any process writes or relabels a decision, so API workers can
+# tell that their cached reads are stale (api/http_cache.py)
+ROLLUP_VERSION_CYPHER = """
+MATCH (:MetricsRollupBackfill {id: 'metrics', status: 'complete'})
+MATCH (m:MetricsRollup {id: 'global:all'})
+RETURN m.decisions AS decisions, m.successes AS successes, m.failures AS failures
+"""
+
+# `key IS NOT NULL` lets the planner seek the (scope, key) index
+ROLLUP_AGENTS_CYPHER = """
+MATCH (m:MetricsRollup)
+WHERE m.scope = 'agent' AND m.key IS NOT NULL
+WITH m.key AS agent_name, m.successes AS successes, m.failures AS failures
+WHERE successes + failures > 0
+RETURN agent_name,
+       successes + failures AS total,
+       successes,
+       failures,
+       toFloat(successes) / (successes + failures) AS success_rate
+ORDER BY total DESC
+"""
+
+ROLLUP_TREND_CYPHER = """
+MATCH (m:MetricsRollup {scope: $scope})
+WHERE m.key >= $since AND m.successes + m.failures > 0
+RETURN m.key AS bucket,
+       m.successes + m.failures AS total,
+       m.successes AS successes
+ORDER BY bucket DESC
+LIMIT $limit
+"""
+
+BACKFILL_CLAIM_CYPHER = """
+MERGE (s:MetricsRollupBackfill {id: 'metrics'})
+RETURN s.status AS status, s.startedAt AS startedAt
+"""
+
+BACKFILL_START_CYPHER = """
+MATCH (s:MetricsRollupBackfill {id: 'metrics'})
+SET s.status = 'running', s.owner = $owner, s.startedAt = datetime(), s.completedAt = null, s.rebuiltUntil = null
+"""
+
+# First statement of every backfill transaction after the clear: takes the
+# marker's lock and records that decisions before $until are rebuilt
+BACKFILL_PROGRESS_CYPHER = """
+MATCH (s:MetricsRollupBackfill {id: 'metrics', owner: $owner})
+SET s.rebuiltUntil = $until
+"""
+
+BACKFILL_STATUS_CYPHER = """
+OPTIONAL MATCH (s:MetricsRollupBackfill {id: 'metrics'})
+RETURN s.status AS status, s.rebuiltUntil AS rebuiltUntil
+"""
+
+# Locks the marker for the rest of the writer's transaction; the values are read under the lock
+BACKFILL_GATE_CYPHER = """
+MATCH (s:MetricsRollupBackfill {id: 'metrics'})
+SET s._lock = true
+REMOVE s._lock
+RETURN s.status AS status, s.rebuiltUntil AS rebuiltUntil
+"""
+
+BACKFILL_FINISH_CYPHER = """
+MATCH (s:MetricsRollupBackfill {id: 'metrics', owner: $owner})
+SET s.status = 'complete', s.completedAt = datetime()
+"""
+
+# Compacted rollups are the only record of deleted decisions and are kept
+BACKFILL_CLEAR_CYPHER = """
+MATCH (m:MetricsRollup)
+WHERE m.scope <> 'compacted'
+WITH m LIMIT $limit
+DETACH DELETE m
+RETURN count(*) AS deleted
+"""
+
+ROLLUP_COUNT_CYPHER = """
+MATCH (m:MetricsRollup {scope: $scope})
+RETURN count(m) AS rollups
+"""
+
+BACKFILL_NEXT_DECISION_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.timestamp >= $start
+RETURN min(rd.timestamp) AS timestamp
+"""
+
+_BACKFILL_RETURN = """
+OPTIONAL MATCH (rd)-[:ROUTED_TO]->(agent:Agent)
+RETURN agent.name AS agent, rd.timestamp AS timestamp, rd.confidence AS confidence, rd.outcome AS outcome
+"""
+
+# $end is null for the last range, which reaches the present
+BACKFILL_DECISIONS_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.timestamp >= $start AND ($end IS NULL OR rd.timestamp < $end)
+""" + _BACKFILL_RETURN.lstrip("\n")
+
+BACKFILL_UNTIMED_DECISIONS_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.timestamp IS NULL
+""" + _BACKFILL_RETURN.lstrip("\n")
+
+BACKFILL_RANGE = timedelta(days=1)
+BACKFILL_CLEAR_BATCH_SIZE = 10000
+
+# Adds the compacted history of deleted decisions into the rebuilt rollups
+BACKFILL_COMPACTED_CYPHER = """
+MATCH (c:MetricsRollup {scope: 'compacted'})
+WITH c,
+     CASE $scope
+         WHEN 'global' THEN 'all'
+         WHEN 'agent' THEN c.agent
+         WHEN 'day' THEN left(c.hour, 10)
+         ELSE c.hour
+     END AS key
+WHERE key IS NOT NULL
+WITH key,
+     sum(c.decisions) AS decisions,
+     sum(c.confidenceSum) AS confidenceSum,
+     sum(c.successes) AS successes,
+     sum(c.failures) AS failures
+MERGE (m:MetricsRollup {id: $scope + ':' + key})
+ON CREATE SET m.scope = $scope, m.key = key,
+              m.decisions = 0, m.confidenceSum = 0.0, m.successes = 0, m.failures = 0
+SET m.decisions = m.decisions + decisions,
+    m.confidenceSum = m.confidenceSum + confidenceSum,
+    m.successes = m.successes + successes,
+    m.failures = m.failures + failures
+RETURN count(m) AS rollups
+"""
+
+
+def _to_datetime(timestamp) -> datetime | None:
+    # neo4j.time.DateTime from the driver, datetime from new_decision
+    if timestamp is None:
+        return None
+    if hasattr(timestamp, "to_native"):
+        return timestamp.to_native()
+    return timestamp
+
+
+def rollup_keys(agent_name: str | None, timestamp) -> List[tuple]:
+    """(scope, key) pairs a single decision contributes to."""
+    keys = [(GLOBAL, "all")]
+    if agent_name:
+        keys.append((AGENT, agent_name))
+    moment = _to_datetime(timestamp)
+    if moment is not None:
+        keys.append((DAY, f"{moment:%Y-%m-%d}"))
+        keys.append((HOUR, f"{moment:%Y-%m-%dT%H}"))
+    return keys
+
+
+def bucket_key(scope: str, moment: datetime) -> str:
+    return f"{moment:%Y-%m-%d}" if scope == DAY else f"{moment:%Y-%m-%dT%H}"
+
+
+def _merge(deltas: Dict[tuple, Dict[str, Any]], scope: str, key: str, **increments) -> None:
+    row = deltas.setdefault(
+        (scope, key),
+        {"id": f"{scope}:{key}", "scope": scope, "key": key,
+         "decisions": 0, "confidenceSum": 0.0, "successes": 0, "failures": 0},
+    )
+    for name, value in increments.items():
+        row[name] += value
+
+
+def decision_rollups(decisions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Counter deltas for new decisions (parameters built by queries.new_decision)."""
+    deltas: Dict[tuple, Dict[str, Any]] = {}
+    for decision in decisions:
+        for scope, key in rollup_keys(decision["agentName"], decision["timestamp"]):
+            _merge(deltas, scope, key, decisions=1, confidenceSum=float(decision["confidence"] or 0.0))
+    return list(deltas.values())
+
+
+def feedback_rollups(changes: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Counter deltas for outcome changes, each a dict with agent, previous,
+    outcome and timestamp. Re-labelling a decision moves it between the
+    success and failure counters instead of counting it twice.
+    """
+    deltas: Dict[tuple, Dict[str, Any]] = {}
+    for change in changes:
+        successes = int(change["outcome"] == "SUCCESS") - int(change["previous"] == "SUCCESS")
+        failures = int(change["outcome"] == "FAILURE") - int(change["previous"] == "FAILURE")
+        if not successes and not failures:
+            continue
+        for scope, key in rollup_keys(change["agent"], change["timestamp"]):
+            _merge(deltas, scope, key, successes=successes, failures=failures)
+    return list(deltas.values())
+
+
+def history_rollups(decisions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Counter rows for decisions that already carry their outcome (parameters
+    with agentName, timestamp, confidence and outcome): decision_rollups and
+    feedback_rollups summed per rollup.
+    """
+    decisions = list(decisions)
+    changes = (
+        {"agent": d["agentName"], "previous": None, "outcome": d.get("outcome"), "timestamp": d["timestamp"]}
+        for d in decisions
+    )
+    rollups: Dict[str, Dict[str, Any]] = {}
+    for delta in decision_rollups(decisions) + feedback_rollups(changes):
+        row = rollups.setdefault(delta["id"], dict(delta, decisions=0, confidenceSum=0.0, successes=0, failures=0))
+        for name in ("decisions", "confidenceSum", "successes", "failures"):
+            row[name] += delta[name]
+    return list(rollups.values())
+
+
+def rollups_gate(tx) -> Dict[str, Any]:
+    """
+    First statement of a write transaction that moves the rollups: the
+    backfill status, read under the marker's lock while a backfill runs.
+    """
+    record = tx.run(BACKFILL_STATUS_CYPHER).single()
+    if record["status"] == "running":
+        record = tx.run(BACKFILL_GATE_CYPHER).single()
+    return dict(record)
+
+
+async def rollups_gate_async(tx) -> Dict[str, Any]:
+    result = await tx.run(BACKFILL_STATUS_CYPHER)
+    record = await result.single()
+    if record["status"] == "running":
+        result = await tx.run(BACKFILL_GATE_CYPHER)
+        record = await result.single()
+    return dict(record)
+
+
+def counted_live(gate: Dict[str, Any] | None, timestamp) -> bool:
+    """
+    Whether a write under `gate` applies the rollup deltas for a decision
+    with this timestamp: always once the backfill is complete (or with no
+    gate, as in the embedded graph), during a backfill only when the rebuild
+    has passed the decision, never before any backfill.
+    """
+    if gate is None or gate["status"] == "complete":
+        return True
+    until = _to_datetime(gate["rebuiltUntil"])
+    if gate["status"] != "running" or until is None:
+        return False
+    return timestamp is None or _to_datetime(timestamp) < until
+
+
+def _apply_history(tx, cypher: str, **params) -> None:
+    decisions = [
+        {"agentName": r["agent"], "timestamp": r["timestamp"], "confidence": r["confidence"], "outcome": r["outcome"]}
+        for r in tx.run(cypher, **params)
+    ]
+    if decisions:
+        tx.run(ROLLUP_MERGE_CYPHER, rollups=history_rollups(decisions)).consume()
+
+
+def _day_start(timestamp) -> datetime:
+    return _to_datetime(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def backfill_rollups(session=None, force: bool = True) -> Dict[str, int] | None:
+    """
+    Rebuild every MetricsRollup node from the existing RoutingDecision history
+    plus the compacted rollups of decisions the retention job deleted, and
+    mark the rollups complete. Returns the rollup count per scope.
+
+    Without `force` (the migration), returns None when the rollups are
+    already complete and raises RuntimeError when another process is
+    building them.
+    """
+    if session is None:
+        with get_driver().session() as session:
+            return backfill_rollups(session, force)
+
+    owner = str(uuid.uuid4())
+
+    def _claim(tx):
+        record = tx.run(BACKFILL_CLAIM_CYPHER).single()
+        if record["status"] is None or force:
+            # From here live increments are no-ops and /metrics/ scans
+            tx.run(BACKFILL_START_CYPHER, owner=owner).consume()
+        return record
+
+    claimed = session.execute_write(_claim)
+    if claimed["status"] == "complete" and not force:
+        return None
+    if claimed["status"] == "running" and not force:
+        raise RuntimeError(
+            f"Metrics rollups are being built by another process since {claimed['startedAt']}; "
+            "if it stopped, rebuild them with python -m backend.kg.metrics_rollups"
+        )
+
+    while session.execute_write(lambda tx: tx.run(BACKFILL_CLEAR_CYPHER, limit=BACKFILL_CLEAR_BATCH_SIZE).single()["deleted"]):
+        pass
+
+    def _compacted(tx):
+        # Untimed decisions are rebuilt from here on, timed ones not yet
+        tx.run(BACKFILL_PROGRESS_CYPHER, owner=owner, until=datetime(1970, 1, 1, tzinfo=timezone.utc)).consume()
+        for scope in (GLOBAL, AGENT, DAY, HOUR):
+            tx.run(BACKFILL_COMPACTED_CYPHER, scope=scope).consume()
+        _apply_history(tx, BACKFILL_UNTIMED_DECISIONS_CYPHER)
+
+    session.execute_write(_compacted)
+
+    def _next_day(start) -> datetime | None:
+        timestamp = session.run(BACKFILL_NEXT_DECISION_CYPHER, start=start).single()["timestamp"]
+        return _day_start(timestamp) if timestamp is not None else None
+
+    start = _next_day(datetime(1970, 1, 1, tzinfo=timezone.utc))
+    while start is not None and start + BACKFILL_RANGE < datetime.now(timezone.utc):
+        end = start + BACKFILL_RANGE
+
+        def _range(tx):
+            tx.run(BACKFILL_PROGRESS_CYPHER, owner=owner, until=end).consume()
+            _apply_history(tx, BACKFILL_DECISIONS_CYPHER, start=start, end=end)
+
+        session.execute_write(_range)
+        start = _next_day(end)
+
+    # The marker is locked and marked complete before the last range is read:
+    # writes that committed earlier are in the range, later ones count live
+    def _finish(tx):
+        tx.run(BACKFILL_FINISH_CYPHER, owner=owner).consume()
+        if start is not None:
+            _apply_history(tx, BACKFILL_DECISIONS_CYPHER, start=start, end=None)
+
+    session.execute_write(_finish)
+    return {scope: session.run(ROLLUP_COUNT_CYPHER, scope=scope).single()["rollups"] for scope in (GLOBAL, AGENT, DAY, HOUR)}
+
+
+if __name__ == "__main__":
+    for scope, count in backfill_rollups().items():
+        print(f"{scope}: {count} rollup nodes")
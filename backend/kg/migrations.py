@@ -0,0 +1,187 @@
+"""
+Versioned schema migrations.
+
+MIGRATIONS lists every change to the Neo4j schema, in order. Migration 1 is
+kg/schema.cypher, the baseline; later changes are added here as new
+migrations instead of edits to that file, so a database created before them
+is brought up to date too. A migration is Cypher statements (constraints and
+indexes, all IF NOT EXISTS) and optionally a Python step for data.
+
+Each applied migration is recorded as a
+(:SchemaMigration {version, name, checksum, appliedAt}) node, so the graph
+says which schema version it is at and only missing migrations run. Every
+step is idempotent, so two workers starting at once do no harm.
+
+The API applies pending migrations at startup (SCHEMA_MIGRATIONS_ON_STARTUP),
+seeding and the bulk loader do too. On demand:
+
+    python -m backend.kg.migrations           # apply pending migrations
+    python -m backend.kg.migrations status
+"""
+
+import argparse
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+
+from neo4j import Session
+
+from .backend import is_embedded
+from .client import get_driver
+from .embedded import KG_DIR, _split_statements
+from .metrics_rollups import backfill_rollups
+from .queries import query_hash
+
+APPLIED_MIGRATIONS_CYPHER = """
+MATCH (m:SchemaMigration)
+RETURN m.version AS version, m.name AS name, m.checksum AS checksum, m.appliedAt AS appliedAt
+ORDER BY version
+"""
+
+RECORD_MIGRATION_CYPHER = """
+MERGE (m:SchemaMigration {version: $version})
+SET m.name = $name, m.checksum = $checksum, m.appliedAt = datetime()
+"""
+
+UNHASHED_QUERIES_CYPHER = """
+MATCH (q:Query)
+WHERE id(q) > $after AND q.hash IS NULL AND q.text IS NOT NULL
+RETURN id(q) AS nodeId, q.text AS text
+ORDER BY nodeId
+LIMIT $limit
+"""
+
+# One node per hash: the decisions of every duplicate are moved to it
+MERGE_QUERIES_CYPHER = """
+UNWIND $groups AS g
+MERGE (keeper:Query {hash: g.hash})
+ON CREATE SET keeper.text = g.text
+WITH keeper, g
+MATCH (duplicate:Query)
+WHERE id(duplicate) IN g.nodeIds AND duplicate <> keeper
+CALL {
+    WITH duplicate, keeper
+    MATCH (rd)-[r:SOURCE_QUERY]->(duplicate)
+    CREATE (rd)-[:SOURCE_QUERY]->(keeper)
+    DELETE r
+}
+DETACH DELETE duplicate
+"""
+
+QUERY_HASH_BATCH_SIZE = 5000
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    statements: Sequence[str] = ()
+    # Data step, run after the statements
+    run: Callable[[Session], None] | None = None
+
+    @property
+    def checksum(self) -> str:
+        text = "\n;\n".join(self.statements) + (f"\n{self.run.__name__}" if self.run else "")
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _hash_queries(session: Session) -> None:
+    """Give Query nodes written before content addressing their hash, merging duplicates."""
+    after = -1
+    while True:
+        records = list(session.run(UNHASHED_QUERIES_CYPHER, after=after, limit=QUERY_HASH_BATCH_SIZE))
+        if not records:
+            return
+        groups: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            digest = query_hash(record["text"])
+            groups.setdefault(digest, {"hash": digest, "text": record["text"], "nodeIds": []})["nodeIds"].append(record["nodeId"])
+        session.execute_write(lambda tx: tx.run(MERGE_QUERIES_CYPHER, groups=list(groups.values())).consume())
+        after = records[-1]["nodeId"]
+
+
+def _backfill_metrics_rollups(session: Session) -> None:
+    """Build the MetricsRollup counters from the history (see kg/metrics_rollups.py)."""
+    # Raises, leaving the migration pending, while another worker builds them
+    backfill_rollups(session, force=False)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema", _split_statements((KG_DIR / "schema.cypher").read_text(encoding="utf-8"))),
+    # Feedback, explanations and outcome updates look decisions up by id
+    Migration(2, "routing decision id", [
+        "CREATE CONSTRAINT routing_decision_id_unique IF NOT EXISTS\n"
+        "FOR (rd:RoutingDecision)\n"
+        "REQUIRE rd.id IS UNIQUE",
+    ]),
+    Migration(3, "content-addressed queries", run=_hash_queries),
+    # Live rollup increments and rollup reads wait for its marker
+    Migration(4, "metrics rollups backfill", [
+        "CREATE CONSTRAINT metrics_rollup_backfill_id_unique IF NOT EXISTS\n"
+        "FOR (s:MetricsRollupBackfill)\n"
+        "REQUIRE s.id IS UNIQUE",
+    ], run=_backfill_metrics_rollups),
+]
+
+
+def applied_migrations(session: Session) -> Dict[int, Dict[str, Any]]:
+    return {record["version"]: dict(record) for record in session.run(APPLIED_MIGRATIONS_CYPHER)}
+
+
+def run_migrations(target: int | None = None, driver=None) -> List[Dict[str, Any]]:
+    """
+    Apply the migrations not recorded in the graph, up to `target` (default:
+    all), in order. Returns the ones applied. Schema statements cannot share
+    a transaction with data writes, so each runs on its own.
+    """
+    if is_embedded():
+        return []
+    applied = []
+    with (driver or get_driver()).session() as session:
+        done = applied_migrations(session)
+        for migration in MIGRATIONS:
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            for statement in migration.statements:
+                session.run(statement).consume()
+            if migration.run is not None:
+                migration.run(session)
+            session.run(RECORD_MIGRATION_CYPHER, version=migration.version, name=migration.name, checksum=migration.checksum).consume()
+            applied.append({"version": migration.version, "name": migration.name})
+    return applied
+
+
+def migration_status(driver=None) -> Dict[str, Any]:
+    """Current and latest version, pending migrations and those whose definition changed since."""
+    with (driver or get_driver()).session() as session:
+        done = applied_migrations(session)
+    return {
+        "current": max(done, default=0),
+        "latest": MIGRATIONS[-1].version,
+        "pending": [{"version": m.version, "name": m.name} for m in MIGRATIONS if m.version not in done],
+        "changed": [
+            {"version": m.version, "name": m.name}
+            for m in MIGRATIONS if m.version in done and done[m.version]["checksum"] != m.checksum
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=("apply", "status"), default="apply")
+    parser.add_argument("--target", type=int, default=None, help="Apply up to this version only")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(migration_status(), indent=2, default=str))
+        return
+    applied = run_migrations(args.target)
+    for migration in applied:
+        print(f"Applied {migration['version']}: {migration['name']}")
+    if not applied:
+        print("Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Query plan check.
+
+Runs `EXPLAIN` on every statement in kg/key_queries.py and kg/queries.py
+against the configured Neo4j and fails if a plan reads a label with
+NodeByLabelScan or the whole graph with AllNodesScan where an index seek is
+expected, e.g. a decision looked up by id without the constraint that
+indexes it. ALLOWED_SCANS lists the statements that read every node of a
+label on purpose (agent listings, visualization, the metrics fallback).
+
+Templates filled in with str.format are checked with TEMPLATE_FIELDS.
+Parameters come from SAMPLE_PARAMETERS; EXPLAIN only plans, it neither reads
+nor writes data, so writes are checked too.
+
+    python -m backend.kg.plan_check             # exits with status 1 on a violation
+    python -m backend.kg.plan_check --migrate --output plans.json
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from . import key_queries, queries
+from .backend import is_embedded
+from .client import get_driver
+from .migrations import run_migrations
+from .profiler import FORMAT_FIELD, _plan_tree
+
+SCAN_OPERATORS = ("NodeByLabelScan", "AllNodesScan")
+
+# Statement -> labels it may scan ("*": AllNodesScan)
+ALLOWED_SCANS: Dict[str, set] = {
+    "QUERY_4_AGENTS_BY_DOMAIN": {"Agent"},
+    "FALLBACK_AGENTS_CYPHER": {"Agent"},
+    "ALL_AGENTS_CYPHER": {"Agent"},
+    "LIST_AGENTS_CYPHER": {"Agent"},
+    "CONTEXT_ACCURACY_CYPHER": {"AgentContextAccuracy"},
+    "KG_NODES_CYPHER": {"*"},
+    "KG_NODES_PAGE_CYPHER": {"*"},
+    "KG_EDGES_CYPHER": {"*"},
+    # Only used while the metrics rollups are disabled
+    "METRICS_AVG_CONFIDENCE_CYPHER": {"RoutingDecision"},
+    "METRICS_BY_AGENT_CYPHER": {"RoutingDecision"},
+}
+
+TEMPLATE_FIELDS = {"hops": 1}
+
+SAMPLE_PARAMETERS: Dict[str, Any] = {
+    "taskType": "Summarization",
+    "domain": "general",
+    "minThreshold": 0.5,
+    "agentName": "SummarizerAgent",
+    "name": "SummarizerAgent",
+    "rdId": "plan-check",
+    "id": "plan-check",
+    "outcome": "SUCCESS",
+    "success": True,
+    "limit": 10,
+    "days": 30,
+    "granularity": "day",
+    "scope": "day",
+    "since": "",
+    "nodeId": 0,
+    "halfLife": 1.0,
+    "decisions": [],
+    "feedback": [],
+    "cells": [],
+    "rollups": [],
+}
+
+STATEMENT_KEYWORDS = re.compile(r"\b(MATCH|MERGE|CREATE)\b")
+PARAMETER = re.compile(r"\$(\w+)")
+
+
+def statements() -> Iterator[tuple]:
+    """(name, cypher) for every statement in key_queries and queries, once per text."""
+    seen = set()
+    for module in (key_queries, queries):
+        for attribute, value in vars(module).items():
+            if not attribute.isupper() or not isinstance(value, str) or not STATEMENT_KEYWORDS.search(value):
+                continue
+            if FORMAT_FIELD.search(value):
+                value = value.format(**TEMPLATE_FIELDS)
+            text = value.strip()
+            if text in seen:
+                continue
+            seen.add(text)
+            yield attribute, text
+
+
+def _scans(plan) -> Iterator[tuple]:
+    """(operator, label) for every scan operator in a raw plan; label "*" for AllNodesScan."""
+    operator = plan.get("operatorType", "").split("@")[0]
+    if operator in SCAN_OPERATORS:
+        details = plan.get("args", {}).get("Details", "")
+        label = details.split(":", 1)[1].strip() if operator == "NodeByLabelScan" and ":" in details else "*"
+        yield operator, label
+    for child in plan.get("children", []):
+        yield from _scans(child)
+
+
+def check_plans(driver=None) -> Dict[str, Any]:
+    """EXPLAIN every statement; the report lists the violations and, per statement, its plan."""
+    if is_embedded():
+        raise RuntimeError("The plan check needs Neo4j: set KG_BACKEND=neo4j")
+    report: Dict[str, Any] = {"statements": {}, "violations": [], "errors": []}
+    with (driver or get_driver()).session() as session:
+        for name, cypher in statements():
+            parameters = {p: SAMPLE_PARAMETERS.get(p) for p in set(PARAMETER.findall(cypher))}
+            try:
+                plan = session.run(f"EXPLAIN {cypher}", parameters).consume().plan
+            except Exception as e:
+                report["errors"].append({"statement": name, "error": str(e)})
+                continue
+            allowed = ALLOWED_SCANS.get(name, set())
+            scans = list(_scans(plan))
+            for operator, label in scans:
+                if label not in allowed:
+                    report["violations"].append({"statement": name, "operator": operator, "label": label})
+            report["statements"][name] = {"scans": [f"{operator} {label}" for operator, label in scans], "plan": _plan_tree(plan)}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--migrate", action="store_true", help="Apply pending schema migrations first")
+    parser.add_argument("--output", type=Path, help="Where to write the JSON report with every plan")
+    args = parser.parse_args()
+
+    if args.migrate:
+        run_migrations()
+    report = check_plans()
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, default=str) + "\n", encoding="utf-8")
+
+    print(f"{len(report['statements'])} statements planned")
+    for violation in report["violations"]:
+        print(f"  {violation['statement']}: {violation['operator']} on {violation['label']}")
+    for error in report["errors"]:
+        print(f"  {error['statement']}: {error['error']}")
+    if report["violations"] or report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Cypher query profiler.
+
+`profiled_session()` / `profiled_async_session()` wrap a Neo4j session so that
+every `run` (on the session or inside `execute_read` / `execute_write`) is
+recorded under a logical name: the module constant that holds the statement,
+e.g. QUERY_1_FIND_AGENTS_BY_TASK or FALLBACK_AGENTS_CYPHER. Per name it keeps
+call and error counts, client time, server time (`result_available_after` +
+`result_consumed_after` from the result summary) and rows.
+
+Calls slower than KG_SLOW_QUERY_MS go to a bounded slow-query log. For a
+KG_PROFILE_SAMPLE_RATE share of them the plan is captured in the background:
+`PROFILE` for read statements, `EXPLAIN` for writes, which must not run twice.
+
+Stats are served by /admin/queries/top and /admin/queries/slow.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+from ..telemetry import CYPHER_SECONDS
+
+WRITE_KEYWORDS = ("CREATE", "MERGE", "SET ", "DELETE", "REMOVE", "DROP")
+
+# A str.format field such as {hops}; Cypher maps always have a colon
+FORMAT_FIELD = re.compile(r"\{[A-Za-z_]\w*\}")
+
+_names: Dict[str, str] | None = None
+_template_names: List[tuple] = []
+_names_lock = threading.Lock()
+
+
+def _load_names() -> Dict[str, str]:
+    # Statement text -> name of the constant that holds it
+    from . import decision_writer, key_queries, metrics_rollups, queries, snapshot
+
+    names: Dict[str, str] = {}
+    for module in (key_queries, queries, metrics_rollups, snapshot, decision_writer):
+        for attribute, value in vars(module).items():
+            if not attribute.isupper() or not isinstance(value, str):
+                continue
+            text = value.strip()
+            field = FORMAT_FIELD.search(text)
+            if field:
+                # Templates filled in with str.format are matched on their fixed prefix
+                _template_names.append((text[:field.start()], attribute))
+            names.setdefault(text, attribute)
+    return names
+
+
+def query_name(cypher: str) -> str:
+    global _names
+    if _names is None:
+        with _names_lock:
+            if _names is None:
+                _names = _load_names()
+    text = cypher.strip()
+    name = _names.get(text)
+    if name is not None:
+        return name
+    for prefix, template_name in _template_names:
+        if text.startswith(prefix):
+            return template_name
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+    return f"inline:{digest}"
+
+
+def is_write(cypher: str) -> bool:
+    upper = cypher.upper()
+    return any(keyword in upper for keyword in WRITE_KEYWORDS)
+
+
+def _plan_tree(plan) -> Optional[Dict[str, Any]]:
+    if not plan:
+        return None
+    arguments = plan.get("args", {})
+    node = {
+        "operator": plan.get("operatorType"),
+        "identifiers": plan.get("identifiers", []),
+        "details": arguments.get("Details"),
+    }
+    for key in ("rows", "dbHits", "pageCacheHits", "pageCacheMisses"):
+        if key in plan:
+            node[key] = plan[key]
+    if "EstimatedRows" in arguments:
+        node["estimatedRows"] = arguments["EstimatedRows"]
+    node["children"] = [_plan_tree(child) for child in plan.get("children", [])]
+    return node
+
+
+class QueryProfiler:
+    def __init__(self, slow_query_ms: float, sample_rate: float, log_size: int):
+        self.slow_query_ms = slow_query_ms
+        self.sample_rate = sample_rate
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._statements: Dict[str, str] = {}
+        self._slow: deque = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+        self._planner: ThreadPoolExecutor | None = None
+
+    def record(self, cypher: str, parameters: Dict[str, Any], client_seconds: float, summary, rows: int, error: Exception | None = None) -> None:
+        name = query_name(cypher)
+        server_ms = None
+        if summary is not None:
+            available = summary.result_available_after
+            consumed = summary.result_consumed_after
+            if available is not None or consumed is not None:
+                server_ms = (available or 0) + (consumed or 0)
+        client_ms = client_seconds * 1000
+        CYPHER_SECONDS.observe(client_seconds, name)
+
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    "name": name,
+                    "calls": 0,
+                    "errors": 0,
+                    "rows": 0,
+                    "total_client_ms": 0.0,
+                    "total_server_ms": 0.0,
+                    "max_client_ms": 0.0,
+                    "slow_calls": 0,
+                }
+                self._statements[name] = cypher.strip()
+            stats["calls"] += 1
+            stats["rows"] += rows
+            stats["total_client_ms"] += client_ms
+            stats["total_server_ms"] += server_ms or 0.0
+            stats["max_client_ms"] = max(stats["max_client_ms"], client_ms)
+            if error is not None:
+                stats["errors"] += 1
+            slow = client_ms >= self.slow_query_ms
+            if slow:
+                stats["slow_calls"] += 1
+
+        if not slow:
+            return
+        entry = {
+            "name": name,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "client_ms": client_ms,
+            "server_ms": server_ms,
+            "rows": rows,
+            "error": str(error) if error is not None else None,
+            "parameters": sorted(parameters),
+            "plan": None,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        print(f"Slow Cypher query {name}: {client_ms:.1f}ms client, {server_ms}ms server, {rows} rows")
+        if random.random() < self.sample_rate:
+            self._capture_plan(entry, cypher, parameters)
+
+    def _capture_plan(self, entry: Dict[str, Any], cypher: str, parameters: Dict[str, Any]) -> None:
+        if self._planner is None:
+            with self._lock:
+                if self._planner is None:
+                    self._planner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cypher-profiler")
+        self._planner.submit(self._plan, entry, cypher, parameters)
+
+    def _plan(self, entry: Dict[str, Any], cypher: str, parameters: Dict[str, Any]) -> None:
+        from .client import get_driver
+
+        mode = "EXPLAIN" if is_write(cypher) else "PROFILE"
+        try:
+            # Unwrapped session: the plan query itself must not be profiled
+            with get_driver().session() as session:
+                summary = session.run(f"{mode} {cypher}", parameters).consume()
+            entry["plan_mode"] = mode
+            entry["plan"] = _plan_tree(summary.profile if mode == "PROFILE" else summary.plan)
+        except Exception as e:
+            entry["plan_error"] = str(e)
+
+    def top(self, limit: int = 20, order_by: str = "total_client_ms") -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [dict(stats, statement=self._statements[name]) for name, stats in self._stats.items()]
+        for row in rows:
+            calls = row["calls"] or 1
+            row["mean_client_ms"] = row["total_client_ms"] / calls
+            row["mean_server_ms"] = row["total_server_ms"] / calls
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:limit]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._statements.clear()
+            self._slow.clear()
+
+
+_profiler: QueryProfiler | None = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> QueryProfiler:
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = QueryProfiler(
+                    slow_query_ms=settings.kg_slow_query_ms,
+                    sample_rate=settings.kg_profile_sample_rate,
+                    log_size=settings.kg_slow_query_log_size,
+                )
+    return _profiler
+
+
+# ----------------------------------------------------------------------
+# Sync wrappers
+# ----------------------------------------------------------------------
+
+
+class _ProfiledResult:
+    """Proxy that records the call once the result has been read or consumed."""
+
+    def __init__(self, result, cypher: str, parameters: Dict[str, Any], started: float):
+        self._result = result
+        self._cypher = cypher
+        self._parameters = parameters
+        self._started = started
+        self._rows = 0
+        self._summary = None
+
+    def _finish(self):
+        if self._summary is None:
+            self._summary = self._result.consume()
+            get_profiler().record(self._cypher, self._parameters, time.perf_counter() - self._started, self._summary, self._rows)
+        return self._summary
+
+    def __iter__(self):
+        for record in self._result:
+            self._rows += 1
+            yield record
+        self._finish()
+
+    def single(self, strict: bool = False):
+        record = self._result.single(strict=strict)
+        self._rows = int(record is not None)
+        self._finish()
+        return record
+
+    def data(self, *keys):
+        data = self._result.data(*keys)
+        self._rows = len(data)
+        self._finish()
+        return data
+
+    def consume(self):
+        return self._finish()
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+
+class _ProfiledRunner:
+    def __init__(self, target):
+        self._target = target
+
+    def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {}, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = self._target.run(query, parameters, **kwargs)
+        except Exception as e:
+            get_profiler().record(query, params, time.perf_counter() - started, None, 0, error=e)
+            raise
+        return _ProfiledResult(result, query, params, started)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class ProfiledSession(_ProfiledRunner):
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._target.__exit__(*exc_info)
+
+    def execute_read(self, transaction_function, *args, **kwargs):
+        return self._target.execute_read(lambda tx, *a, **k: transaction_function(_ProfiledRunner(tx), *a, **k), *args, **kwargs)
+
+    def execute_write(self, transaction_function, *args, **kwargs):
+        return self._target.execute_write(lambda tx, *a, **k: transaction_function(_ProfiledRunner(tx), *a, **k), *args, **kwargs)
+
+
+def profiled_session(session):
+    return ProfiledSession(session) if settings.kg_profiler_enabled else session
+
+
+# ----------------------------------------------------------------------
+# Async wrappers
+# ----------------------------------------------------------------------
+
+
+class _AsyncProfiledResult(_ProfiledResult):
+    async def _finish(self):
+        if self._summary is None:
+            self._summary = await self._result.consume()
+            get_profiler().record(self._cypher, self._parameters, time.perf_counter() - self._started, self._summary, self._rows)
+        return self._summary
+
+    def __iter__(self):
+        raise TypeError("use 'async for' on an async result")
+
+    async def __aiter__(self):
+        async for record in self._result:
+            self._rows += 1
+            yield record
+        await self._finish()
+
+    async def single(self, strict: bool = False):
+        record = await self._result.single(strict=strict)
+        self._rows = int(record is not None)
+        await self._finish()
+        return record
+
+    async def data(self, *keys):
+        data = await self._result.data(*keys)
+        self._rows = len(data)
+        await self._finish()
+        return data
+
+    async def consume(self):
+        return await self._finish()
+
+
+class _AsyncProfiledRunner:
+    def __init__(self, target):
+        self._target = target
+
+    async def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {}, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = await self._target.run(query, parameters, **kwargs)
+        except Exception as e:
+            get_profiler().record(query, params, time.perf_counter() - started, None, 0, error=e)
+            raise
+        return _AsyncProfiledResult(result, query, params, started)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class AsyncProfiledSession(_AsyncProfiledRunner):
+    async def __aenter__(self):
+        await self._target.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._target.__aexit__(*exc_info)
+
+    async def execute_read(self, transaction_function, *args, **kwargs):
+        async def _wrapped(tx, *a, **k):
+            return await transaction_function(_AsyncProfiledRunner(tx), *a, **k)
+        return await self._target.execute_read(_wrapped, *args, **kwargs)
+
+    async def execute_write(self, transaction_function, *args, **kwargs):
+        async def _wrapped(tx, *a, **k):
+            return await transaction_function(_AsyncProfiledRunner(tx), *a, **k)
+        return await self._target.execute_write(_wrapped, *args, **kwargs)
+
+
+def profiled_async_session(session):
+    return AsyncProfiledSession(session) if settings.kg_profiler_enabled else session
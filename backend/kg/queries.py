@@ -1,8 +1,38 @@
-from typing import List, Dict, Any, Optional
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 from neo4j import Session
 
+from .backend import backend_dispatch
 from .client import get_driver
+from .metrics_rollups import (
+    DAY,
+    HOUR,
+    ROLLUP_AGENTS_CYPHER,
+    ROLLUP_GLOBAL_CYPHER,
+    ROLLUP_MERGE_CYPHER,
+    ROLLUP_TREND_CYPHER,
+    ROLLUP_VERSION_CYPHER,
+    bucket_key,
+    counted_live,
+    decision_rollups,
+    feedback_rollups,
+    rollups_gate,
+)
+from .profiler import profiled_session
+from .rationale import (
+    decision_view,
+    details_from_snapshot,
+    encode_rationale,
+    explanation_from_decision,
+    get_decision_cache,
+    path_from_decision,
+    routing_details,
+)
+from .graph_version import bump_graph_version
+from .snapshot import TIER_ALL_AGENTS, TIER_FALLBACK, TIER_TASK_MATCH, agent_from_node, get_snapshot, mark_snapshot_stale
 from .key_queries import (
     QUERY_1_FIND_AGENTS_BY_TASK,
     QUERY_2_FIND_SIMILAR_AGENTS,
@@ -11,180 +41,884 @@ from .key_queries import (
     QUERY_5_ROUTING_EXPLANATION,
     QUERY_6_ROUTING_PATH,
 )
+from ..config import settings
 from ..models.domain import Agent
+from ..telemetry import stage, timed_stage
+
+# Cypher statements shared by the sync functions below and kg/async_queries.py
+
+AGENTS_BY_TASK_AND_DOMAIN_CYPHER = """
+MATCH (tt:TaskType {name: $taskType})-[:REQUIRES_CAPABILITY]->(cap:Capability),
+      (agent:Agent)-[:HAS_CAPABILITY]->(cap)
+WITH DISTINCT agent, agent.capabilityLevel AS capLevel,
+     CASE WHEN agent.domainExpertise = $domain THEN 1 ELSE 0 END AS domainPriority
+WHERE capLevel >= $minThreshold
+RETURN agent, capLevel, agent.historicalAccuracy AS histAcc, agent.domainExpertise AS domain
+ORDER BY domainPriority DESC, capLevel DESC, histAcc DESC
+"""
+
+FALLBACK_AGENTS_CYPHER = """
+MATCH (agent:Agent)
+WHERE agent.capabilityLevel >= $minThreshold
+OPTIONAL MATCH (agent)-[:HAS_CAPABILITY]->(cap:Capability)
+WITH agent, agent.capabilityLevel AS capLevel,
+     collect(DISTINCT cap.name) AS capabilities,
+     CASE WHEN agent.domainExpertise = $domain THEN 1 ELSE 0 END AS domainPriority
+WHERE $domain IS NULL OR agent.domainExpertise = $domain OR agent.domainExpertise = 'general'
+RETURN agent, capLevel, agent.historicalAccuracy AS histAcc, agent.domainExpertise AS domain, capabilities
+ORDER BY domainPriority DESC, capLevel DESC, histAcc DESC
+"""
+
+ALL_AGENTS_CYPHER = """
+MATCH (agent:Agent)
+RETURN agent,
+       agent.capabilityLevel AS capLevel,
+       agent.historicalAccuracy AS histAcc,
+       agent.domainExpertise AS domain
+ORDER BY capLevel DESC, histAcc DESC
+"""
+
+FALLBACK_AGENT_CYPHER = """
+MATCH (a:Agent {name: $name})-[:FALLBACK_AGENT]->(fb:Agent)
+RETURN fb LIMIT 1
+"""
+
+# Decision ids and timestamps are generated client-side (see new_decision) so a
+# decision can be returned before it is written; one statement serves single
+# writes, /routing/batch and the write-behind buffer in decision_writer.py.
+# Query nodes are content-addressed: a repeated query text re-uses its node.
+CREATE_ROUTING_DECISIONS_CYPHER = """
+UNWIND $decisions AS d
+MERGE (agent:Agent {name: d.agentName})
+MERGE (q:Query {hash: d.queryHash})
+ON CREATE SET q.text = d.queryText
+CREATE (rd:RoutingDecision {
+    id: d.id,
+    timestamp: d.timestamp,
+    confidence: d.confidence,
+    taskType: d.taskType,
+    domain: d.domain,
+    rationale: d.rationale,
+    outcome: 'PENDING'
+})
+CREATE (rd)-[:SOURCE_QUERY]->(q)
+CREATE (rd)-[:ROUTED_TO]->(agent)
+"""
+
+UPDATE_ROUTING_OUTCOME_CYPHER = """
+MATCH (rd:RoutingDecision {id: $id})
+SET rd.outcome = $outcome
+"""
+
+# First update the counts
+UPDATE_AGENT_COUNTS_CYPHER = """
+MATCH (a:Agent {name: $name})
+SET a.successCount = coalesce(a.successCount, 0) + CASE WHEN $success THEN 1 ELSE 0 END,
+    a.failureCount = coalesce(a.failureCount, 0) + CASE WHEN $success THEN 0 ELSE 1 END
+"""
+
+# Then calculate accuracy based on updated counts
+UPDATE_AGENT_ACCURACY_CYPHER = """
+MATCH (a:Agent {name: $name})
+WITH a, coalesce(a.successCount, 0) AS successCount, coalesce(a.failureCount, 0) AS failureCount
+SET a.historicalAccuracy =
+    CASE
+        WHEN (successCount + failureCount) > 0
+        THEN toFloat(successCount) / (successCount + failureCount)
+        ELSE 0.5
+    END
+"""
+
+# Feedback in one statement: look up the routed agent, set the outcome, bump
+# the counters and recompute accuracy. Rows are grouped per agent so a batch
+# touches each Agent node once; historicalAccuracy is returned before and after.
+APPLY_FEEDBACK_CYPHER = """
+UNWIND $feedback AS f
+MATCH (rd:RoutingDecision {id: f.id})-[:ROUTED_TO]->(a:Agent)
+WITH f, rd, a, rd.outcome AS previous, CASE WHEN f.success THEN 'SUCCESS' ELSE 'FAILURE' END AS outcome
+SET rd.outcome = outcome
+// Re-labelling a decision moves it from one counter to the other; repeating a label changes nothing
+WITH a,
+     collect(f.id) AS ids,
+     collect({previous: previous, outcome: outcome, timestamp: rd.timestamp,
+              taskType: rd.taskType, domain: rd.domain}) AS changes,
+     sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END - CASE WHEN previous = 'SUCCESS' THEN 1 ELSE 0 END) AS successes,
+     sum(CASE WHEN outcome = 'FAILURE' THEN 1 ELSE 0 END - CASE WHEN previous = 'FAILURE' THEN 1 ELSE 0 END) AS failures
+WITH a, ids, changes, successes, failures, coalesce(a.historicalAccuracy, 0.5) AS beforeAccuracy
+SET a.successCount = coalesce(a.successCount, 0) + successes,
+    a.failureCount = coalesce(a.failureCount, 0) + failures
+SET a.historicalAccuracy = CASE WHEN a.successCount + a.failureCount > 0
+                                THEN toFloat(a.successCount) / (a.successCount + a.failureCount)
+                                ELSE beforeAccuracy END
+RETURN a.name AS agent, ids, changes, successes, failures, beforeAccuracy, a.historicalAccuracy AS afterAccuracy
+"""
+
+# Decayed counts are merged, not overwritten: both sides are brought to the later
+# of their reference times (asOf, epoch seconds) and added, so concurrent
+# flushes from several workers commute. See kg/context_accuracy.py.
+MERGE_CONTEXT_ACCURACY_CYPHER = """
+UNWIND $cells AS c
+MERGE (ca:AgentContextAccuracy {id: c.id})
+ON CREATE SET ca.agent = c.agent, ca.taskType = c.taskType, ca.domain = c.domain,
+              ca.successes = 0.0, ca.failures = 0.0, ca.asOf = c.asOf
+WITH ca, c, CASE WHEN c.asOf > ca.asOf THEN c.asOf ELSE ca.asOf END AS asOf
+SET ca.successes = ca.successes * 0.5 ^ ((asOf - ca.asOf) / $halfLife) + c.successes * 0.5 ^ ((asOf - c.asOf) / $halfLife),
+    ca.failures = ca.failures * 0.5 ^ ((asOf - ca.asOf) / $halfLife) + c.failures * 0.5 ^ ((asOf - c.asOf) / $halfLife)
+SET ca.asOf = asOf
+RETURN ca.agent AS agent, ca.taskType AS taskType, ca.domain AS domain,
+       ca.successes AS successes, ca.failures AS failures, ca.asOf AS asOf
+"""
+
+CONTEXT_ACCURACY_CYPHER = """
+MATCH (ca:AgentContextAccuracy)
+RETURN ca.agent AS agent, ca.taskType AS taskType, ca.domain AS domain,
+       ca.successes AS successes, ca.failures AS failures, ca.asOf AS asOf
+"""
+
+# Everything an explanation needs, from one seek on the RoutingDecision id constraint (see kg/rationale.py)
+ROUTING_RATIONALE_CYPHER = """
+MATCH (rd:RoutingDecision {id: $rdId})
+OPTIONAL MATCH (rd)-[:SOURCE_QUERY]->(q:Query)
+OPTIONAL MATCH (rd)-[:ROUTED_TO]->(agent:Agent)
+RETURN rd.rationale AS rationale, rd.confidence AS confidence, rd.taskType AS taskType,
+       q.text AS queryText, agent.name AS agentName
+"""
+
+ROUTING_DECISION_AGENT_CYPHER = """
+MATCH (rd:RoutingDecision {id: $id})-[:ROUTED_TO]->(a:Agent)
+RETURN a.name AS name
+"""
+
+# The timestamp predicate lets the newest decisions be read in index order, without sorting them all
+ROUTED_QUERIES_CYPHER = """
+MATCH (rd:RoutingDecision)-[:SOURCE_QUERY]->(q:Query)
+WHERE rd.timestamp IS NOT NULL
+OPTIONAL MATCH (rd)-[:ROUTED_TO]->(a:Agent)
+RETURN q.text AS query, rd.outcome AS outcome, a.name AS agent, a.domainExpertise AS agentDomain
+ORDER BY rd.timestamp DESC
+LIMIT $limit
+"""
+
+LIST_AGENTS_CYPHER = """
+MATCH (agent:Agent)
+OPTIONAL MATCH (agent)-[:HAS_CAPABILITY]->(cap:Capability)
+WITH agent, collect(DISTINCT cap.name) AS capabilities
+RETURN agent, capabilities
+ORDER BY agent.name
+"""
+
+AGENT_DETAILS_CYPHER = """
+MATCH (agent:Agent {name: $name})
+OPTIONAL MATCH (agent)-[:HAS_CAPABILITY]->(cap:Capability)
+RETURN agent, collect(DISTINCT cap.name) AS capabilities
+"""
+
+# Visualization export. Every filter is a parameter that may be null; nodes
+# are paged by internal id and each edge is emitted with its source node's page.
+def _kg_node_filter(var: str) -> str:
+    return (
+        f"($scopeIds IS NULL OR id({var}) IN $scopeIds)"
+        f" AND ($labels IS NULL OR any(label IN labels({var}) WHERE label IN $labels))"
+        f" AND (NOT {var}:RoutingDecision"
+        f" OR (($since IS NULL OR {var}.timestamp >= $since) AND ($until IS NULL OR {var}.timestamp <= $until)))"
+    )
+
+
+KG_NODES_CYPHER = f"""
+MATCH (n)
+WHERE {_kg_node_filter("n")}
+  AND ($after IS NULL OR id(n) > $after)
+RETURN n
+ORDER BY id(n)
+"""
+
+KG_NODES_PAGE_CYPHER = KG_NODES_CYPHER + "LIMIT $limit\n"
+
+KG_EDGES_CYPHER = f"""
+MATCH (a)-[r]->(b)
+WHERE ($pageIds IS NULL OR id(a) IN $pageIds)
+  AND ($relTypes IS NULL OR type(r) IN $relTypes)
+  AND {_kg_node_filter("a")}
+  AND {_kg_node_filter("b")}
+RETURN r, id(a) AS source, id(b) AS target
+"""
+
+# Variable-length bounds cannot be parameters; hops is validated before formatting
+KG_NEIGHBOURHOOD_IDS_CYPHER = """
+MATCH (start)
+WHERE id(start) = $nodeId
+MATCH (start)-[rels*0..{hops}]-(n)
+WHERE $relTypes IS NULL OR all(rel IN rels WHERE type(rel) IN $relTypes)
+RETURN collect(DISTINCT id(n)) AS ids
+"""
+
+MAX_NEIGHBOURHOOD_HOPS = 3
+
+METRICS_TOTAL_CYPHER = """
+MATCH (rd:RoutingDecision)
+RETURN count(rd) AS total_decisions
+"""
+
+METRICS_AVG_CONFIDENCE_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.confidence IS NOT NULL
+RETURN avg(rd.confidence) AS avg_confidence
+"""
+
+METRICS_BY_AGENT_CYPHER = """
+MATCH (rd:RoutingDecision)-[:ROUTED_TO]->(agent:Agent)
+WHERE rd.outcome IS NOT NULL AND rd.outcome <> 'PENDING'
+WITH agent, rd.outcome AS outcome
+RETURN agent.name AS agent_name,
+       count(*) AS total,
+       sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END) AS successes,
+       sum(CASE WHEN outcome = 'FAILURE' THEN 1 ELSE 0 END) AS failures,
+       toFloat(sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END)) / count(*) AS success_rate
+ORDER BY total DESC
+"""
+
+# Full-scan trend, used until the MetricsRollup nodes have been backfilled
+METRICS_RECENT_ACCURACY_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.outcome IS NOT NULL AND rd.outcome <> 'PENDING'
+  AND rd.timestamp > datetime() - duration({days: $days})
+WITH CASE $granularity
+         WHEN 'hour' THEN toString(date(rd.timestamp)) + 'T' + right('0' + toString(rd.timestamp.hour), 2)
+         ELSE toString(date(rd.timestamp))
+     END AS bucket,
+     rd.outcome AS outcome
+RETURN bucket,
+       count(*) AS total,
+       sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END) AS successes
+ORDER BY bucket DESC
+LIMIT $limit
+"""
+
+REQUIRED_CAPABILITIES_CYPHER = """
+MATCH (tt:TaskType {name: $taskType})-[:REQUIRES_CAPABILITY]->(cap:Capability)
+RETURN cap.name AS capability
+ORDER BY cap.name
+"""
+
+AGENT_CAPABILITIES_CYPHER = """
+MATCH (agent:Agent {name: $name})-[:HAS_CAPABILITY]->(cap:Capability)
+RETURN cap.name AS capability
+ORDER BY cap.name
+"""
+
+COMPLEMENTARY_AGENTS_CYPHER = """
+// Get required capabilities for the task
+MATCH (tt:TaskType {name: $taskType})-[:REQUIRES_CAPABILITY]->(reqCap:Capability)
+WITH collect(DISTINCT reqCap.name) AS requiredCapabilities
+
+// Get capabilities that the primary agent has
+MATCH (primary:Agent {name: $name})-[:HAS_CAPABILITY]->(primaryCap:Capability)
+WITH requiredCapabilities, collect(DISTINCT primaryCap.name) AS primaryCapabilities
+
+// Find missing capabilities (required but not in primary agent's capabilities)
+WITH requiredCapabilities, primaryCapabilities,
+     [cap IN requiredCapabilities WHERE NOT cap IN primaryCapabilities] AS missingCapabilities
+
+// Find agents that have at least one missing capability
+MATCH (complement:Agent)-[:HAS_CAPABILITY]->(compCap:Capability)
+WHERE compCap.name IN missingCapabilities AND complement.name <> $name
+
+// Collect all capabilities for each complementary agent
+WITH complement, missingCapabilities,
+     collect(DISTINCT compCap.name) AS allCapabilities,
+     [cap IN collect(DISTINCT compCap.name) WHERE cap IN missingCapabilities] AS matchingMissingCapabilities
+
+// Only return agents that have at least one missing capability
+WHERE size(matchingMissingCapabilities) > 0
+
+RETURN complement.name AS name,
+       complement.description AS description,
+       complement.capabilityLevel AS capabilityLevel,
+       complement.domainExpertise AS domainExpertise,
+       complement.historicalAccuracy AS historicalAccuracy,
+       allCapabilities AS capabilities,
+       matchingMissingCapabilities AS missingCapabilitiesProvided,
+       size(matchingMissingCapabilities) AS missingCapabilityCount
+
+ORDER BY missingCapabilityCount DESC, capabilityLevel DESC, historicalAccuracy DESC
+LIMIT $limit
+"""
+
+# Result panel details for one decision in one round trip (used without the snapshot)
+ROUTING_DETAILS_CYPHER = """
+MATCH (rd:RoutingDecision {id: $rdId})
+OPTIONAL MATCH (rd)-[:SOURCE_QUERY]->(q:Query)
+OPTIONAL MATCH (rd)-[:ROUTED_TO]->(agent:Agent)
+WITH rd, q, agent, coalesce($taskType, rd.taskType) AS detailsTaskType
+CALL {
+    WITH detailsTaskType
+    OPTIONAL MATCH (:TaskType {name: detailsTaskType})-[:REQUIRES_CAPABILITY]->(reqCap:Capability)
+    RETURN collect(DISTINCT reqCap.name) AS requiredCapabilities
+}
+CALL {
+    WITH agent
+    OPTIONAL MATCH (agent)-[:HAS_CAPABILITY]->(cap:Capability)
+    RETURN collect(DISTINCT cap.name) AS agentCapabilities
+}
+CALL {
+    WITH agent, requiredCapabilities, agentCapabilities
+    WITH agent, agentCapabilities, [c IN requiredCapabilities WHERE NOT c IN agentCapabilities] AS missingCapabilities
+    OPTIONAL MATCH (complement:Agent)-[:HAS_CAPABILITY]->(compCap:Capability)
+    WHERE size(agentCapabilities) > 0 AND compCap.name IN missingCapabilities AND complement <> agent
+    WITH complement, collect(DISTINCT compCap.name) AS provided
+    WHERE complement IS NOT NULL
+    WITH complement, provided
+    ORDER BY size(provided) DESC, complement.capabilityLevel DESC, complement.historicalAccuracy DESC
+    LIMIT $limit
+    RETURN collect({
+        name: complement.name,
+        description: complement.description,
+        capabilityLevel: complement.capabilityLevel,
+        domainExpertise: complement.domainExpertise,
+        historicalAccuracy: complement.historicalAccuracy,
+        capabilities: provided,
+        missingCapabilitiesProvided: provided
+    }) AS complementary
+}
+RETURN rd.rationale AS rationale, rd.confidence AS confidence, rd.taskType AS taskType,
+       q.text AS queryText, agent.name AS agentName, detailsTaskType,
+       requiredCapabilities, agentCapabilities,
+       coalesce(agent.capabilityLevel, 0.5) AS capabilityLevel,
+       coalesce(agent.historicalAccuracy, 0.5) AS historicalAccuracy,
+       coalesce(agent.domainExpertise, 'general') AS domainExpertise,
+       complementary
+"""
 
 
 def _session() -> Session:
-    return get_driver().session()
-
-
-def get_agents_by_task_type(task_type_name: str, min_threshold: float = 0.0, domain: str | None = None) -> List[Agent]:
-    def _create_agent_from_node(node) -> Agent:
-        return Agent(
-            name=node["name"],
-            capability_level=node.get("capabilityLevel", 0.5),
-            domain_expertise=node.get("domainExpertise", "general"),
-            input_format=node.get("inputFormat", "text"),
-            output_format=node.get("outputFormat", "text"),
-            historical_accuracy=node.get("historicalAccuracy", 0.5),
-            response_time=node.get("responseTime", 1.0),
-            cost_efficiency=node.get("costEfficiency", 0.5),
-            reliability=node.get("reliability", 0.5),
-            specialization_score=node.get("specializationScore", 0.5),
-            description=node.get("description", ""),
-        )
-    
-    if domain:
-        cypher = """
-        MATCH (tt:TaskType {name: $taskType})-[:REQUIRES_CAPABILITY]->(cap:Capability),
-              (agent:Agent)-[:HAS_CAPABILITY]->(cap)
-        WITH DISTINCT agent, agent.capabilityLevel AS capLevel,
-             CASE WHEN agent.domainExpertise = $domain THEN 1 ELSE 0 END AS domainPriority
-        WHERE capLevel >= $minThreshold
-        RETURN agent, capLevel, agent.historicalAccuracy AS histAcc, agent.domainExpertise AS domain
-        ORDER BY domainPriority DESC, capLevel DESC, histAcc DESC
-        """
-        with _session() as session:
+    return profiled_session(get_driver().session())
+
+
+# Record -> dict helpers, shared with kg/async_queries.py
+
+def _decisions_from_records(records, limit: int) -> List[Dict[str, Any]]:
+    decisions = []
+    for record in records:
+        query_node = record.get("query")
+        query_text = None
+        if query_node:
+            # Handle Neo4j node object - access properties like a dict
+            query_text = query_node.get("text") if hasattr(query_node, "get") else (query_node["text"] if isinstance(query_node, dict) else None)
+        decisions.append({
+            "decision_id": record["decisionId"],
+            "confidence": record["confidence"],
+            "outcome": record["outcome"],
+            "timestamp": record["timestamp"],
+            "query_text": query_text,
+        })
+    return decisions[:limit]
+
+
+def _explanation_from_record(record) -> Optional[Dict[str, Any]]:
+    if not record:
+        return None
+    return {
+        "agent_name": record["agentName"],
+        "capability_level": record["capabilityLevel"],
+        "historical_accuracy": record["historicalAccuracy"],
+        "domain_expertise": record["domainExpertise"],
+        "query_text": record["queryText"],
+        "confidence": record["confidence"],
+        "all_capabilities": record["allCapabilities"],
+        "matching_capabilities": record["matchingCapabilities"],
+        "matching_capability_count": record["matchingCapabilityCount"],
+    }
+
+
+def _path_from_record(record) -> Optional[Dict[str, Any]]:
+    if not record:
+        return None
+    return {
+        "query_text": record["queryText"],
+        "task_type": record["taskType"],
+        "required_capabilities": record["requiredCapabilities"],
+        "selected_agent": record["selectedAgent"],
+        "agent_capabilities": record["agentCapabilities"],
+        "matching_capabilities": record["matchingCapabilities"],
+    }
+
+
+def _details_from_record(record, task_type: str | None) -> Optional[Dict[str, Any]]:
+    decision = decision_view(record)
+    if decision is None or decision["agentName"] is None:
+        return None
+    current = {
+        "taskType": record["detailsTaskType"],
+        "requiredCapabilities": record["requiredCapabilities"],
+        "agentCapabilities": record["agentCapabilities"],
+        "capabilityLevel": record["capabilityLevel"],
+        "historicalAccuracy": record["historicalAccuracy"],
+        "domainExpertise": record["domainExpertise"],
+        "candidates": [],
+        "tieBreaking": {},
+    }
+    return routing_details(decision, task_type or decision["taskType"], current, _complementary_from_records(record["complementary"]))
+
+
+def _feedback_params(feedback: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    return [{"id": rd_id, "success": bool(success)} for rd_id, success in feedback]
+
+
+def _feedback_from_records(records) -> List[Dict[str, Any]]:
+    return [
+        {
+            "agent_name": record["agent"],
+            "routing_decision_ids": list(record["ids"]),
+            "successes": record["successes"],
+            "failures": record["failures"],
+            "before_accuracy": record["beforeAccuracy"],
+            "after_accuracy": record["afterAccuracy"],
+            "changes": [dict(change, agent=record["agent"]) for change in record["changes"]],
+        }
+        for record in records
+    ]
+
+
+def _feedback_rollups(records, gate: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+    return feedback_rollups(
+        dict(change, agent=record["agent"])
+        for record in records
+        for change in record["changes"]
+        if counted_live(gate, change["timestamp"])
+    )
+
+
+def _live_decision_rollups(decisions: List[Dict[str, Any]], gate: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return decision_rollups(d for d in decisions if counted_live(gate, d["timestamp"]))
+
+
+def _agent_details_from_record(record, include_query_matching: bool = False) -> Dict[str, Any]:
+    node = record["agent"]
+    capabilities = [c for c in record["capabilities"] if c]  # Filter out None values
+
+    # Parse tags by category
+    tags = node.get("tags", [])
+    tag_categories = {
+        "industry": [],
+        "domain": [],
+        "capability": [],
+        "purpose": []
+    }
+
+    for tag in tags:
+        if isinstance(tag, str) and ":" in tag:
+            category, value = tag.split(":", 1)
+            if category in tag_categories:
+                tag_categories[category].append(value)
+
+    agent_dict = {
+        "name": node.get("name", "Unknown"),
+        "capability_level": node.get("capabilityLevel", 0.5),
+        "domain_expertise": node.get("domainExpertise", "general"),
+        "input_format": node.get("inputFormat", "text"),
+        "output_format": node.get("outputFormat", "text"),
+        "historical_accuracy": node.get("historicalAccuracy", 0.5),
+        "response_time": node.get("responseTime", 1.0),
+        "cost_efficiency": node.get("costEfficiency", 0.5),
+        "reliability": node.get("reliability", 0.5),
+        "specialization_score": node.get("specializationScore", 0.5),
+        "description": node.get("description", ""),
+        "success_count": node.get("successCount", 0),
+        "failure_count": node.get("failureCount", 0),
+        "capabilities": capabilities,
+        "tags": tags,
+        "tag_categories": tag_categories,
+    }
+    if include_query_matching:
+        # Add enhanced query matching properties if they exist
+        if "keywords" in node:
+            agent_dict["keywords"] = node["keywords"]
+        if "queryPatterns" in node:
+            agent_dict["query_patterns"] = node["queryPatterns"]
+        if "useCases" in node:
+            agent_dict["use_cases"] = node["useCases"]
+    return agent_dict
+
+
+def _node_to_dict(node) -> Dict[str, Any]:
+    # Get node label (name property or first label)
+    node_name = node.get("name")
+    if not node_name and node.labels:
+        node_name = list(node.labels)[0]
+    if not node_name:
+        node_name = "Unknown"
+
+    return {
+        "id": str(node.id),
+        "label": str(node_name),
+        "type": list(node.labels)[0] if node.labels else "Unknown",
+        "properties": dict(node),
+    }
+
+
+def _edge_to_dict(edge, source_id: str, target_id: str) -> Dict[str, Any]:
+    edge_data = {
+        "id": str(edge.id),
+        "source": source_id,
+        "target": target_id,
+        "type": edge.type,
+        "properties": {},
+    }
+    # Try to get edge properties if they exist
+    try:
+        edge_data["properties"] = dict(edge)
+    except Exception:
+        pass
+    return edge_data
+
+
+def _visualization_params(
+    labels: Optional[List[str]] = None,
+    rel_types: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    return {
+        "labels": labels or None,
+        "relTypes": rel_types or None,
+        "since": since,
+        "until": until,
+        "after": int(cursor) if cursor else None,
+        "limit": limit,
+        "scopeIds": None,
+        "pageIds": None,
+    }
+
+
+def _neighbourhood_cypher(hops: int) -> str:
+    if not 0 <= hops <= MAX_NEIGHBOURHOOD_HOPS:
+        raise ValueError(f"hops must be between 0 and {MAX_NEIGHBOURHOOD_HOPS}")
+    return KG_NEIGHBOURHOOD_IDS_CYPHER.format(hops=int(hops))
+
+
+def _next_cursor(params: Dict[str, Any], page_ids: List[int]) -> Optional[str]:
+    if params["limit"] is None or len(page_ids) < params["limit"]:
+        return None
+    return str(page_ids[-1])
+
+
+def _metrics_from_records(total_decisions, avg_confidence, agent_records, recent_records, granularity: str = "day") -> Dict[str, Any]:
+    agent_stats = []
+    for record in agent_records:
+        agent_stats.append({
+            "agent_name": record["agent_name"],
+            "total": record["total"],
+            "successes": record["successes"],
+            "failures": record["failures"],
+            "success_rate": float(record["success_rate"]) if record["success_rate"] else 0.0,
+        })
+
+    recent_accuracy = []
+    for record in recent_records:
+        recent_accuracy.append({
+            granularity: str(record["bucket"]),
+            "total": record["total"],
+            "successes": record["successes"],
+            "accuracy": float(record["successes"]) / record["total"] if record["total"] > 0 else 0.0,
+        })
+
+    return {
+        "total_decisions": total_decisions or 0,
+        "average_confidence": float(avg_confidence) if avg_confidence else 0.0,
+        "agent_performance": agent_stats,
+        "recent_accuracy_trend": recent_accuracy,
+    }
+
+
+def _metrics_window(days: int, granularity: str) -> Dict[str, Any]:
+    """Parameters shared by the rollup and full-scan trend queries."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    return {
+        "days": days,
+        "granularity": granularity,
+        "scope": granularity,
+        "since": bucket_key(granularity, since),
+        "limit": days * 24 if granularity == HOUR else days,
+    }
+
+
+def _rollup_global_values(record) -> Tuple[int, float]:
+    decisions = record["decisions"] or 0
+    return decisions, (record["confidenceSum"] / decisions if decisions else 0.0)
+
+
+def _complementary_from_records(records) -> List[Dict[str, Any]]:
+    complementary = []
+    for record in records:
+        complementary.append({
+            "name": record["name"],
+            "description": record.get("description", ""),
+            "capability_level": record.get("capabilityLevel", 0.5),
+            "domain_expertise": record.get("domainExpertise", "general"),
+            "historical_accuracy": record.get("historicalAccuracy", 0.5),
+            "capabilities": [c for c in record["capabilities"] if c],
+            "missing_capabilities": [c for c in record["missingCapabilitiesProvided"] if c],
+        })
+    return complementary
+
+
+@backend_dispatch
+def get_agents_by_task_type(
+    task_type_name: str,
+    min_threshold: float = 0.0,
+    domain: str | None = None,
+    query_text: str | None = None,
+) -> List[Agent]:
+    """
+    Candidate agents for a task type. `query_text` enables the retrieval tier,
+    which needs the snapshot; without one, the Cypher tiers are used.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_agents_by_task_type(task_type_name, min_threshold=min_threshold, domain=domain, query_text=query_text)
+
+    with _session() as session:
+        with stage(TIER_TASK_MATCH):
+            if domain:
+                result = session.run(
+                    AGENTS_BY_TASK_AND_DOMAIN_CYPHER,
+                    taskType=task_type_name,
+                    minThreshold=min_threshold,
+                    domain=domain,
+                )
+            else:
+                result = session.run(
+                    QUERY_1_FIND_AGENTS_BY_TASK,
+                    taskType=task_type_name,
+                    minThreshold=min_threshold,
+                )
+            agents: List[Agent] = [agent_from_node(record["agent"]) for record in result]
+        if agents:
+            return agents
+
+        with stage(TIER_FALLBACK):
             result = session.run(
-                cypher,
-                taskType=task_type_name,
+                FALLBACK_AGENTS_CYPHER,
                 minThreshold=min_threshold,
                 domain=domain,
             )
-            agents: List[Agent] = []
-            for record in result:
-                agents.append(_create_agent_from_node(record["agent"]))
-            
-            if agents:
-                return agents
-    else:
-        with _session() as session:
-            result = session.run(
-                QUERY_1_FIND_AGENTS_BY_TASK,
-                taskType=task_type_name,
-                minThreshold=min_threshold,
-            )
-            agents: List[Agent] = []
-            for record in result:
-                agents.append(_create_agent_from_node(record["agent"]))
-            
-            if agents:
-                return agents
-    
-    fallback_cypher = """
-    MATCH (agent:Agent)
-    WHERE agent.capabilityLevel >= $minThreshold
-    OPTIONAL MATCH (agent)-[:HAS_CAPABILITY]->(cap:Capability)
-    WITH agent, agent.capabilityLevel AS capLevel,
-         collect(DISTINCT cap.name) AS capabilities,
-         CASE WHEN agent.domainExpertise = $domain THEN 1 ELSE 0 END AS domainPriority
-    WHERE $domain IS NULL OR agent.domainExpertise = $domain OR agent.domainExpertise = 'general'
-    RETURN agent, capLevel, agent.historicalAccuracy AS histAcc, agent.domainExpertise AS domain, capabilities
-    ORDER BY domainPriority DESC, capLevel DESC, histAcc DESC
-    """
-    
-    with _session() as session:
-        result = session.run(
-            fallback_cypher,
-            minThreshold=min_threshold,
-            domain=domain,
-        )
-        agents: List[Agent] = []
-        for record in result:
-            agents.append(_create_agent_from_node(record["agent"]))
-        
+            agents = [agent_from_node(record["agent"]) for record in result]
+
         if not agents:
-            all_agents_cypher = """
-            MATCH (agent:Agent)
-            RETURN agent, 
-                   agent.capabilityLevel AS capLevel, 
-                   agent.historicalAccuracy AS histAcc, 
-                   agent.domainExpertise AS domain
-            ORDER BY capLevel DESC, histAcc DESC
-            """
-            result = session.run(all_agents_cypher)
-            for record in result:
-                agents.append(_create_agent_from_node(record["agent"]))
-        
+            with stage(TIER_ALL_AGENTS):
+                result = session.run(ALL_AGENTS_CYPHER)
+                agents = [agent_from_node(record["agent"]) for record in result]
+
         return agents
 
 
-def get_fallback_agent(agent_name: str) -> Agent | None:
-    cypher = """
-    MATCH (a:Agent {name: $name})-[:FALLBACK_AGENT]->(fb:Agent)
-    RETURN fb LIMIT 1
+@backend_dispatch
+def get_agents_for_queries(
+    task_type_name: str,
+    query_texts: List[str | None],
+    min_threshold: float = 0.0,
+    domain: str | None = None,
+) -> List[List[Agent]]:
+    """
+    get_agents_by_task_type for each query of a batch group (one task type
+    and domain). The Cypher tiers ignore the text, so without a snapshot
+    they run once for the whole group.
     """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_agents_for_queries(task_type_name, query_texts, min_threshold=min_threshold, domain=domain)
+    agents = get_agents_by_task_type.__wrapped__(task_type_name, min_threshold=min_threshold, domain=domain)
+    return [agents] * len(query_texts)
+
+
+@backend_dispatch
+def get_fallback_agent(agent_name: str) -> Agent | None:
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_fallback_agent(agent_name)
+
     with _session() as session:
-        record = session.run(cypher, name=agent_name).single()
+        record = session.run(FALLBACK_AGENT_CYPHER, name=agent_name).single()
         if not record:
             return None
-        node = record["fb"]
-        return Agent(
-            name=node["name"],
-            capability_level=node.get("capabilityLevel", 0.5),
-            domain_expertise=node.get("domainExpertise", "general"),
-            input_format=node.get("inputFormat", "text"),
-            output_format=node.get("outputFormat", "text"),
-            historical_accuracy=node.get("historicalAccuracy", 0.5),
-        )
+        return agent_from_node(record["fb"])
 
 
-def create_routing_decision(query_text: str, agent_name: str, confidence: float) -> str:
-    cypher = """
-    MERGE (agent:Agent {name: $agentName})
-    CREATE (q:Query {text: $queryText})
-    CREATE (rd:RoutingDecision {
-        id: randomUUID(),
-        timestamp: datetime(),
-        confidence: $confidence,
-        outcome: 'PENDING'
-    })
-    CREATE (rd)-[:SOURCE_QUERY]->(q)
-    CREATE (rd)-[:ROUTED_TO]->(agent)
-    RETURN rd.id AS id
+def query_hash(text: str) -> str:
+    """Content address of a query text; Query nodes are merged on it."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def new_decision(
+    query_text: str,
+    agent_name: str,
+    confidence: float,
+    task_type: str | None = None,
+    domain: str | None = None,
+    rationale: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
     """
+    Build the parameters of one RoutingDecision, including its id. The
+    extracted task type and domain are kept on the decision so feedback can
+    be credited to that context (see kg/context_accuracy.py), and the
+    rationale so it can be explained without a traversal (see kg/rationale.py).
+    """
+    return {
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc),
+        "queryText": query_text,
+        "queryHash": query_hash(query_text),
+        "agentName": agent_name,
+        "confidence": confidence,
+        "taskType": task_type,
+        "domain": domain,
+        "rationale": encode_rationale(rationale),
+    }
+
+
+@backend_dispatch
+def write_routing_decisions(decisions: List[Dict[str, Any]]) -> None:
+    """Write decisions built by new_decision in one UNWIND transaction."""
+    if not decisions:
+        return
+
+    def _write(tx):
+        gate = rollups_gate(tx) if settings.metrics_rollups_enabled else None
+        tx.run(CREATE_ROUTING_DECISIONS_CYPHER, decisions=decisions).consume()
+        rollups = _live_decision_rollups(decisions, gate) if gate is not None else []
+        if rollups:
+            tx.run(ROLLUP_MERGE_CYPHER, rollups=rollups).consume()
+
     with _session() as session:
-        record = session.run(
-            cypher,
-            agentName=agent_name,
-            queryText=query_text,
-            confidence=confidence,
-        ).single()
-        return record["id"]
+        session.execute_write(_write)
+    bump_graph_version()
 
 
-def update_routing_outcome(rd_id: str, outcome: str) -> None:
-    cypher = """
-    MATCH (rd:RoutingDecision {id: $id})
-    SET rd.outcome = $outcome
+@backend_dispatch
+def create_routing_decision(
+    query_text: str,
+    agent_name: str,
+    confidence: float,
+    task_type: str | None = None,
+    domain: str | None = None,
+    rationale: Dict[str, Any] | None = None,
+) -> str:
+    decision = new_decision(query_text, agent_name, confidence, task_type, domain, rationale)
+    write_routing_decisions([decision])
+    return decision["id"]
+
+
+@backend_dispatch
+def create_routing_decisions(decisions: List[Tuple]) -> List[str]:
+    """
+    Create many RoutingDecision/Query nodes in one UNWIND transaction.
+    `decisions` holds (query_text, agent_name, confidence[, task_type, domain,
+    rationale]) tuples; ids are returned in the same order.
     """
+    params = [new_decision(*decision) for decision in decisions]
+    write_routing_decisions(params)
+    return [decision["id"] for decision in params]
+
+
+@backend_dispatch
+def update_routing_outcome(rd_id: str, outcome: str) -> None:
     with _session() as session:
-        session.run(cypher, id=rd_id, outcome=outcome)
+        session.run(UPDATE_ROUTING_OUTCOME_CYPHER, id=rd_id, outcome=outcome).consume()
+    bump_graph_version()
 
 
+@backend_dispatch
 def update_agent_stats(agent_name: str, success: bool) -> None:
-    # First update the counts
-    cypher_update_counts = """
-    MATCH (a:Agent {name: $name})
-    SET a.successCount = coalesce(a.successCount, 0) + CASE WHEN $success THEN 1 ELSE 0 END,
-        a.failureCount = coalesce(a.failureCount, 0) + CASE WHEN $success THEN 0 ELSE 1 END
-    """
-    # Then calculate accuracy based on updated counts
-    cypher_update_accuracy = """
-    MATCH (a:Agent {name: $name})
-    WITH a, coalesce(a.successCount, 0) AS successCount, coalesce(a.failureCount, 0) AS failureCount
-    SET a.historicalAccuracy =
-        CASE 
-            WHEN (successCount + failureCount) > 0 
-            THEN toFloat(successCount) / (successCount + failureCount)
-            ELSE 0.5
-        END
+    with _session() as session:
+        session.run(UPDATE_AGENT_COUNTS_CYPHER, name=agent_name, success=success).consume()
+        session.run(UPDATE_AGENT_ACCURACY_CYPHER, name=agent_name).consume()
+    bump_graph_version()
+    # historicalAccuracy feeds the candidate ordering, so reload the snapshot
+    mark_snapshot_stale()
+
+
+@backend_dispatch
+def apply_feedback(feedback: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    """
+    Apply (routing_decision_id, success) pairs in one write transaction.
+    Returns one entry per affected agent with its accuracy before and after;
+    ids that match no RoutingDecision are absent from every entry.
+    """
+    if not feedback:
+        return []
+
+    def _write(tx):
+        gate = rollups_gate(tx) if settings.metrics_rollups_enabled else None
+        records = list(tx.run(APPLY_FEEDBACK_CYPHER, feedback=_feedback_params(feedback)))
+        rollups = _feedback_rollups(records, gate) if gate is not None else []
+        if rollups:
+            tx.run(ROLLUP_MERGE_CYPHER, rollups=rollups).consume()
+        return records
+
+    with _session() as session:
+        records = session.execute_write(_write)
+    if records:
+        bump_graph_version()
+        mark_snapshot_stale()
+    return _feedback_from_records(records)
+
+
+@backend_dispatch
+def merge_context_accuracy(cells: List[Dict[str, Any]], half_life_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Merge decayed (agent, taskType, domain) count deltas into the
+    AgentContextAccuracy nodes in one transaction and return the merged rows.
     """
+    if not cells:
+        return []
+    with _session() as session:
+        records = session.execute_write(
+            lambda tx: list(tx.run(MERGE_CONTEXT_ACCURACY_CYPHER, cells=cells, halfLife=half_life_seconds))
+        )
+    return [dict(record) for record in records]
+
+
+@backend_dispatch
+def get_context_accuracy() -> List[Dict[str, Any]]:
+    """Every persisted AgentContextAccuracy row (agent, taskType, domain, successes, failures, asOf)."""
+    with _session() as session:
+        return [dict(record) for record in session.run(CONTEXT_ACCURACY_CYPHER)]
+
+
+@backend_dispatch
+def get_agent_name_for_routing_decision(routing_decision_id: str) -> str | None:
     with _session() as session:
-        session.run(cypher_update_counts, name=agent_name, success=success)
-        session.run(cypher_update_accuracy, name=agent_name)
+        record = session.run(ROUTING_DECISION_AGENT_CYPHER, id=routing_decision_id).single()
+        if not record:
+            return None
+        return record["name"]
+
+
+@backend_dispatch
+def list_agents() -> List[Dict[str, Any]]:
+    """
+    List every agent with its capabilities, tags and query matching properties.
+    """
+    with _session() as session:
+        result = session.run(LIST_AGENTS_CYPHER)
+        return [_agent_details_from_record(record, include_query_matching=True) for record in result]
+
+
+@backend_dispatch
+def get_agent_details(agent_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get detailed information about a specific agent including capabilities and tags.
+    """
+    with _session() as session:
+        record = session.run(AGENT_DETAILS_CYPHER, name=agent_name).single()
+        if not record:
+            return None
+        return _agent_details_from_record(record)
 
 
+@backend_dispatch
 def get_similar_agents(agent_name: str) -> List[Agent]:
     """
     Find similar agents based on shared capabilities.
@@ -192,27 +926,10 @@ def get_similar_agents(agent_name: str) -> List[Agent]:
     """
     with _session() as session:
         result = session.run(QUERY_2_FIND_SIMILAR_AGENTS, agentName=agent_name)
-        agents: List[Agent] = []
-        for record in result:
-            node = record["a2"]
-            agents.append(
-                Agent(
-                    name=node["name"],
-                    capability_level=node.get("capabilityLevel", 0.5),
-                    domain_expertise=node.get("domainExpertise", "general"),
-                    input_format=node.get("inputFormat", "text"),
-                    output_format=node.get("outputFormat", "text"),
-                    historical_accuracy=node.get("historicalAccuracy", 0.5),
-                    response_time=node.get("responseTime", 1.0),
-                    cost_efficiency=node.get("costEfficiency", 0.5),
-                    reliability=node.get("reliability", 0.5),
-                    specialization_score=node.get("specializationScore", 0.5),
-                    description=node.get("description", ""),
-                )
-            )
-        return agents
+        return [agent_from_node(record["a2"]) for record in result]
 
 
+@backend_dispatch
 def get_historical_decisions(agent_name: str, limit: int = 50) -> List[Dict[str, Any]]:
     """
     Retrieve historical routing decisions for an agent.
@@ -220,23 +937,21 @@ def get_historical_decisions(agent_name: str, limit: int = 50) -> List[Dict[str,
     """
     with _session() as session:
         result = session.run(QUERY_3_HISTORICAL_DECISIONS, agentName=agent_name)
-        decisions = []
-        for record in result:
-            query_node = record.get("query")
-            query_text = None
-            if query_node:
-                # Handle Neo4j node object - access properties like a dict
-                query_text = query_node.get("text") if hasattr(query_node, "get") else (query_node["text"] if isinstance(query_node, dict) else None)
-            decisions.append({
-                "decision_id": record["decisionId"],
-                "confidence": record["confidence"],
-                "outcome": record["outcome"],
-                "timestamp": record["timestamp"],
-                "query_text": query_text,
-            })
-        return decisions[:limit]
+        return _decisions_from_records(result, limit)
+
+
+@backend_dispatch
+def get_routed_queries(limit: int = 10000) -> List[Dict[str, Any]]:
+    """
+    Most recent routed queries with their decision outcome and the agent they went to.
+    Used to train the local extraction classifier (extraction/classifier.py).
+    """
+    with _session() as session:
+        result = session.run(ROUTED_QUERIES_CYPHER, limit=limit)
+        return [record.data() for record in result]
 
 
+@backend_dispatch
 def get_agents_by_domain(domain: str) -> List[Agent]:
     """
     Find agents by domain expertise.
@@ -244,353 +959,227 @@ def get_agents_by_domain(domain: str) -> List[Agent]:
     """
     with _session() as session:
         result = session.run(QUERY_4_AGENTS_BY_DOMAIN, domain=domain)
-        agents: List[Agent] = []
-        for record in result:
-            node = record["agent"]
-            agents.append(
-                Agent(
-                    name=node["name"],
-                    capability_level=node.get("capabilityLevel", 0.5),
-                    domain_expertise=node.get("domainExpertise", "general"),
-                    input_format=node.get("inputFormat", "text"),
-                    output_format=node.get("outputFormat", "text"),
-                    historical_accuracy=node.get("historicalAccuracy", 0.5),
-                    response_time=node.get("responseTime", 1.0),
-                    cost_efficiency=node.get("costEfficiency", 0.5),
-                    reliability=node.get("reliability", 0.5),
-                    specialization_score=node.get("specializationScore", 0.5),
-                    description=node.get("description", ""),
-                )
-            )
-        return agents
+        return [agent_from_node(record["agent"]) for record in result]
+
 
+def _routing_decision(rd_id: str) -> Optional[Dict[str, Any]]:
+    cache = get_decision_cache()
+    decision = cache.get(rd_id)
+    if decision is None:
+        with _session() as session:
+            decision = decision_view(session.run(ROUTING_RATIONALE_CYPHER, rdId=rd_id).single())
+        cache.put(rd_id, decision)
+    return decision
 
-def get_routing_explanation(rd_id: str, task_type: str) -> Optional[Dict[str, Any]]:
+
+@backend_dispatch
+def get_routing_explanation(rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]:
     """
-    Get the complete routing explanation showing why an agent was chosen.
-    Uses Query 5 from key_queries.py
+    Get the complete routing explanation showing why an agent was chosen,
+    from the rationale stored with the decision. Without one, or for another
+    `task_type` than the decision's, Query 5 from key_queries.py rebuilds it.
     """
+    decision = _routing_decision(rd_id)
+    if decision is None:
+        return None
+    explanation = explanation_from_decision(decision, task_type)
+    if explanation is not None:
+        return explanation
     with _session() as session:
         result = session.run(
             QUERY_5_ROUTING_EXPLANATION,
             rdId=rd_id,
-            taskType=task_type,
+            taskType=task_type or decision["taskType"],
         )
-        record = result.single()
-        if not record:
-            return None
-        
-        return {
-            "agent_name": record["agentName"],
-            "capability_level": record["capabilityLevel"],
-            "historical_accuracy": record["historicalAccuracy"],
-            "domain_expertise": record["domainExpertise"],
-            "query_text": record["queryText"],
-            "confidence": record["confidence"],
-            "all_capabilities": record["allCapabilities"],
-            "matching_capabilities": record["matchingCapabilities"],
-            "matching_capability_count": record["matchingCapabilityCount"],
-        }
+        return _explanation_from_record(result.single())
 
 
-def get_routing_path(rd_id: str, task_type: str) -> Optional[Dict[str, Any]]:
+@backend_dispatch
+def get_routing_path(rd_id: str, task_type: str | None = None) -> Optional[Dict[str, Any]]:
     """
-    Get the full graph traversal path for visualization.
-    Uses Query 6 from key_queries.py
+    Get the full graph traversal path for visualization, from the stored
+    rationale like get_routing_explanation, else with Query 6 from key_queries.py.
     """
+    decision = _routing_decision(rd_id)
+    if decision is None:
+        return None
+    path = path_from_decision(decision, task_type)
+    if path is not None:
+        return path
     with _session() as session:
         result = session.run(
             QUERY_6_ROUTING_PATH,
             rdId=rd_id,
-            taskType=task_type,
+            taskType=task_type or decision["taskType"],
         )
-        record = result.single()
-        if not record:
+        return _path_from_record(result.single())
+
+
+@backend_dispatch
+def get_routing_details(rd_id: str, task_type: str | None = None, limit: int = 5) -> Optional[Dict[str, Any]]:
+    """
+    Required, agent and matching capabilities, complementary agents and the
+    explanation of a decision, for the result panel: from the stored
+    rationale and the snapshot, else with ROUTING_DETAILS_CYPHER in one query.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        decision = _routing_decision(rd_id)
+        if decision is None or decision["agentName"] is None:
             return None
-        
-        return {
-            "query_text": record["queryText"],
-            "task_type": record["taskType"],
-            "required_capabilities": record["requiredCapabilities"],
-            "selected_agent": record["selectedAgent"],
-            "agent_capabilities": record["agentCapabilities"],
-            "matching_capabilities": record["matchingCapabilities"],
-        }
+        return details_from_snapshot(decision, task_type, snapshot, limit)
+    with _session() as session:
+        record = session.run(ROUTING_DETAILS_CYPHER, rdId=rd_id, taskType=task_type, limit=limit).single()
+    return _details_from_record(record, task_type)
+
 
+@backend_dispatch
+def iter_kg_for_visualization(
+    node_id: Optional[str] = None,
+    hops: int = 1,
+    **filters,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream the (filtered) knowledge graph as ("node", dict), ("edge", dict)
+    and finally ("next_cursor", str | None) items, as the driver returns rows.
+
+    Filters: labels, rel_types, since/until (RoutingDecision timestamps) and a
+    `hops`-neighbourhood around `node_id`. With `limit`, one page of nodes is
+    returned together with the edges leaving them; pass the returned cursor
+    back as `cursor` for the next page.
+    """
+    params = _visualization_params(**filters)
+    with _session() as session:
+        if node_id is not None:
+            record = session.run(_neighbourhood_cypher(hops), nodeId=int(node_id), relTypes=params["relTypes"]).single()
+            params["scopeIds"] = record["ids"] if record else []
+
+        page_ids: List[int] = []
+        cypher = KG_NODES_CYPHER if params["limit"] is None else KG_NODES_PAGE_CYPHER
+        for record in session.run(cypher, **params):
+            node = record["n"]
+            page_ids.append(node.id)
+            yield "node", _node_to_dict(node)
+
+        if params["limit"] is not None:
+            params["pageIds"] = page_ids
+        for record in session.run(KG_EDGES_CYPHER, **params):
+            yield "edge", _edge_to_dict(record["r"], str(record["source"]), str(record["target"]))
+
+        yield "next_cursor", _next_cursor(params, page_ids)
 
-def get_kg_for_visualization() -> Dict[str, Any]:
+
+@backend_dispatch
+def get_kg_for_visualization(**filters) -> Dict[str, Any]:
     """
-    Get the complete knowledge graph structure for visualization.
+    Get the knowledge graph structure for visualization, optionally filtered
+    and paginated (see iter_kg_for_visualization).
     Returns nodes and edges in a format suitable for graph visualization libraries.
     """
-    # First, get all nodes
-    nodes_cypher = """
-    MATCH (n)
-    RETURN n
+    graph: Dict[str, Any] = {"nodes": [], "edges": [], "next_cursor": None}
+    for kind, item in iter_kg_for_visualization(**filters):
+        if kind == "next_cursor":
+            graph["next_cursor"] = item
+        else:
+            graph[kind + "s"].append(item)
+    return graph
+
+
+@timed_stage("get_routing_metrics")
+@backend_dispatch
+def get_routing_metrics(days: int = 30, granularity: str = DAY) -> Dict[str, Any]:
     """
-    
-    # Then, get all relationships
-    edges_cypher = """
-    MATCH (a)-[r]->(b)
-    RETURN a, r, b
+    Get routing metrics for dashboard display.
+    Reads the MetricsRollup counters; falls back to scanning RoutingDecision
+    nodes when rollups are disabled or have not been backfilled yet.
     """
-    
+    window = _metrics_window(days, granularity)
     with _session() as session:
-        nodes = []
-        edges = []
-        node_ids = set()
-        
-        # Get all nodes
-        try:
-            nodes_result = session.run(nodes_cypher)
-            for record in nodes_result:
-                node = record["n"]
-                node_id = str(node.id)
-                if node_id not in node_ids:
-                    node_ids.add(node_id)
-                    # Get node label (name property or first label)
-                    node_name = node.get("name")
-                    if not node_name and node.labels:
-                        node_name = list(node.labels)[0]
-                    if not node_name:
-                        node_name = "Unknown"
-                    
-                    node_data = {
-                        "id": node_id,
-                        "label": str(node_name),
-                        "type": list(node.labels)[0] if node.labels else "Unknown",
-                        "properties": dict(node),
-                    }
-                    nodes.append(node_data)
-        except Exception as e:
-            print(f"Error fetching nodes: {e}")
-            return {"nodes": [], "edges": [], "error": str(e)}
-        
-        # Get all edges
-        try:
-            edges_result = session.run(edges_cypher)
-            edge_count = 0
-            for record in edges_result:
-                edge = record["r"]
-                source_node = record["a"]
-                target_node = record["b"]
-                
-                if edge and source_node and target_node:
-                    try:
-                        source_id = str(source_node.id)
-                        target_id = str(target_node.id)
-                        
-                        # Verify both nodes exist in our nodes list
-                        source_exists = any(n["id"] == source_id for n in nodes)
-                        target_exists = any(n["id"] == target_id for n in nodes)
-                        
-                        if not source_exists:
-                            print(f"Warning: Edge source node {source_id} not in nodes list")
-                        if not target_exists:
-                            print(f"Warning: Edge target node {target_id} not in nodes list")
-                        
-                        edge_data = {
-                            "id": str(edge.id),
-                            "source": source_id,
-                            "target": target_id,
-                            "type": edge.type,
-                            "properties": {},
-                        }
-                        # Try to get edge properties if they exist
-                        try:
-                            edge_data["properties"] = dict(edge)
-                        except:
-                            pass
-                        edges.append(edge_data)
-                        edge_count += 1
-                    except Exception as e:
-                        # Skip edges that can't be processed
-                        print(f"Error processing edge: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        continue
-            
-            print(f"Successfully fetched {edge_count} edges out of {len(edges)} processed")
-        except Exception as e:
-            print(f"Error fetching edges: {e}")
-            import traceback
-            traceback.print_exc()
-            # Return nodes even if edges fail
-            return {"nodes": nodes, "edges": [], "error": f"Error fetching edges: {str(e)}"}
-        
-        print(f"Returning {len(nodes)} nodes and {len(edges)} edges")
-        return {"nodes": nodes, "edges": edges}
-
-
-def get_routing_metrics() -> Dict[str, Any]:
+        if settings.metrics_rollups_enabled:
+            with stage("get_routing_metrics.rollups"):
+                global_record = session.run(ROLLUP_GLOBAL_CYPHER).single()
+                if global_record is not None:
+                    total_decisions, avg_confidence = _rollup_global_values(global_record)
+                    agent_records = list(session.run(ROLLUP_AGENTS_CYPHER))
+                    recent_records = list(session.run(ROLLUP_TREND_CYPHER, **window))
+                    return _metrics_from_records(total_decisions, avg_confidence, agent_records, recent_records, granularity)
+
+        with stage("get_routing_metrics.full_scan"):
+            total_result = session.run(METRICS_TOTAL_CYPHER).single()
+            avg_conf_result = session.run(METRICS_AVG_CONFIDENCE_CYPHER).single()
+            agent_records = list(session.run(METRICS_BY_AGENT_CYPHER))
+            recent_records = list(session.run(METRICS_RECENT_ACCURACY_CYPHER, **window))
+        return _metrics_from_records(
+            total_result["total_decisions"] if total_result else 0,
+            avg_conf_result["avg_confidence"] if avg_conf_result else 0.0,
+            agent_records,
+            recent_records,
+            granularity,
+        )
+
+
+@backend_dispatch
+def get_shared_graph_version() -> Tuple[int, int, int] | None:
     """
-    Get routing metrics for dashboard display.
+    The global rollup counters (decisions, successes, failures), which every
+    process moves when it writes or relabels a decision. None when rollups are
+    disabled or not backfilled yet.
     """
-    cypher_total = """
-    MATCH (rd:RoutingDecision)
-    RETURN count(rd) AS total_decisions
-    """
-    
-    cypher_avg_confidence = """
-    MATCH (rd:RoutingDecision)
-    WHERE rd.confidence IS NOT NULL
-    RETURN avg(rd.confidence) AS avg_confidence
-    """
-    
-    cypher_by_agent = """
-    MATCH (rd:RoutingDecision)-[:ROUTED_TO]->(agent:Agent)
-    WHERE rd.outcome IS NOT NULL AND rd.outcome <> 'PENDING'
-    WITH agent, rd.outcome AS outcome
-    RETURN agent.name AS agent_name,
-           count(*) AS total,
-           sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END) AS successes,
-           sum(CASE WHEN outcome = 'FAILURE' THEN 1 ELSE 0 END) AS failures,
-           toFloat(sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END)) / count(*) AS success_rate
-    ORDER BY total DESC
-    """
-    
-    cypher_recent_accuracy = """
-    MATCH (rd:RoutingDecision)
-    WHERE rd.outcome IS NOT NULL AND rd.outcome <> 'PENDING'
-      AND rd.timestamp > datetime() - duration({days: 30})
-    WITH date(rd.timestamp) AS day, rd.outcome AS outcome
-    RETURN day,
-           count(*) AS total,
-           sum(CASE WHEN outcome = 'SUCCESS' THEN 1 ELSE 0 END) AS successes
-    ORDER BY day DESC
-    LIMIT 30
-    """
-    
+    if not settings.metrics_rollups_enabled:
+        return None
     with _session() as session:
-        total_result = session.run(cypher_total).single()
-        avg_conf_result = session.run(cypher_avg_confidence).single()
-        agent_result = session.run(cypher_by_agent)
-        recent_result = session.run(cypher_recent_accuracy)
-        
-        total_decisions = total_result["total_decisions"] if total_result else 0
-        avg_confidence = float(avg_conf_result["avg_confidence"]) if avg_conf_result and avg_conf_result["avg_confidence"] else 0.0
-        
-        agent_stats = []
-        for record in agent_result:
-            agent_stats.append({
-                "agent_name": record["agent_name"],
-                "total": record["total"],
-                "successes": record["successes"],
-                "failures": record["failures"],
-                "success_rate": float(record["success_rate"]) if record["success_rate"] else 0.0,
-            })
-        
-        recent_accuracy = []
-        for record in recent_result:
-            recent_accuracy.append({
-                "day": str(record["day"]),
-                "total": record["total"],
-                "successes": record["successes"],
-                "accuracy": float(record["successes"]) / record["total"] if record["total"] > 0 else 0.0,
-            })
-        
-        return {
-            "total_decisions": total_decisions,
-            "average_confidence": avg_confidence,
-            "agent_performance": agent_stats,
-            "recent_accuracy_trend": recent_accuracy,
-        }
+        record = session.run(ROLLUP_VERSION_CYPHER).single()
+    if record is None:
+        return None
+    return record["decisions"], record["successes"], record["failures"]
 
 
+@backend_dispatch
 def get_required_capabilities_for_task(task_type: str) -> List[str]:
     """
     Get all capabilities required for a specific task type.
     """
-    cypher = """
-    MATCH (tt:TaskType {name: $taskType})-[:REQUIRES_CAPABILITY]->(cap:Capability)
-    RETURN cap.name AS capability
-    ORDER BY cap.name
-    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_required_capabilities_for_task(task_type)
+
     with _session() as session:
-        result = session.run(cypher, taskType=task_type)
+        result = session.run(REQUIRED_CAPABILITIES_CYPHER, taskType=task_type)
         return [record["capability"] for record in result]
 
 
+@backend_dispatch
 def get_agent_capabilities(agent_name: str) -> List[str]:
     """
     Get all capabilities that an agent has.
     """
-    cypher = """
-    MATCH (agent:Agent {name: $name})-[:HAS_CAPABILITY]->(cap:Capability)
-    RETURN cap.name AS capability
-    ORDER BY cap.name
-    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_agent_capabilities(agent_name)
+
     with _session() as session:
-        result = session.run(cypher, name=agent_name)
+        result = session.run(AGENT_CAPABILITIES_CYPHER, name=agent_name)
         return [record["capability"] for record in result]
 
 
+@backend_dispatch
 def get_complementary_agents(agent_name: str, task_type: str | None = None, limit: int = 5) -> List[Dict[str, Any]]:
     """
     Get agents that complement the given agent based on missing capabilities for the task.
     Finds agents that have capabilities required by the task but not satisfied by the primary agent.
-    
+
     Args:
         agent_name: Name of the primary agent
         task_type: Optional task type to determine required capabilities
         limit: Maximum number of complementary agents to return
-    
+
     Returns:
         List of complementary agents with their details and missing capabilities they provide
     """
     if not task_type:
         # If no task type, return empty list (can't determine missing capabilities)
         return []
-    
-    cypher = """
-    // Get required capabilities for the task
-    MATCH (tt:TaskType {name: $taskType})-[:REQUIRES_CAPABILITY]->(reqCap:Capability)
-    WITH collect(DISTINCT reqCap.name) AS requiredCapabilities
-    
-    // Get capabilities that the primary agent has
-    MATCH (primary:Agent {name: $name})-[:HAS_CAPABILITY]->(primaryCap:Capability)
-    WITH requiredCapabilities, collect(DISTINCT primaryCap.name) AS primaryCapabilities
-    
-    // Find missing capabilities (required but not in primary agent's capabilities)
-    WITH requiredCapabilities, primaryCapabilities,
-         [cap IN requiredCapabilities WHERE NOT cap IN primaryCapabilities] AS missingCapabilities
-    
-    // Find agents that have at least one missing capability
-    MATCH (complement:Agent)-[:HAS_CAPABILITY]->(compCap:Capability)
-    WHERE compCap.name IN missingCapabilities AND complement.name <> $name
-    
-    // Collect all capabilities for each complementary agent
-    WITH complement, missingCapabilities,
-         collect(DISTINCT compCap.name) AS allCapabilities,
-         [cap IN collect(DISTINCT compCap.name) WHERE cap IN missingCapabilities] AS matchingMissingCapabilities
-    
-    // Only return agents that have at least one missing capability
-    WHERE size(matchingMissingCapabilities) > 0
-    
-    RETURN complement.name AS name,
-           complement.description AS description,
-           complement.capabilityLevel AS capabilityLevel,
-           complement.domainExpertise AS domainExpertise,
-           complement.historicalAccuracy AS historicalAccuracy,
-           allCapabilities AS capabilities,
-           matchingMissingCapabilities AS missingCapabilitiesProvided,
-           size(matchingMissingCapabilities) AS missingCapabilityCount
-    
-    ORDER BY missingCapabilityCount DESC, capabilityLevel DESC, historicalAccuracy DESC
-    LIMIT $limit
-    """
-    with _session() as session:
-        result = session.run(cypher, name=agent_name, taskType=task_type, limit=limit)
-        complementary = []
-        for record in result:
-            complementary.append({
-                "name": record["name"],
-                "description": record.get("description", ""),
-                "capability_level": record.get("capabilityLevel", 0.5),
-                "domain_expertise": record.get("domainExpertise", "general"),
-                "historical_accuracy": record.get("historicalAccuracy", 0.5),
-                "capabilities": [c for c in record["capabilities"] if c],
-                "missing_capabilities": [c for c in record["missingCapabilitiesProvided"] if c],
-            })
-        return complementary
 
+    with _session() as session:
+        result = session.run(COMPLEMENTARY_AGENTS_CYPHER, name=agent_name, taskType=task_type, limit=limit)
+        return _complementary_from_records(result)
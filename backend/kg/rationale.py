@@ -0,0 +1,200 @@
+"""
+Routing rationale snapshots.
+
+Explaining a decision used to mean walking the chosen agent's capabilities
+and the task type's requirements again (QUERY_5 / QUERY_6), with the caller
+passing the task type back in. The routing flow has all of it when it
+decides, so `build_rationale` records it then: task type and domain, the
+required and agent capabilities, the chosen agent's levels, the top
+candidates and the tie-breaking features. It is written with the decision
+as compact JSON in RoutingDecision.rationale.
+
+`/explanations/routing/{id}/explanation` and `/path` read it back with one
+lookup on the RoutingDecision id constraint, through a bounded LRU cache
+(EXPLANATION_CACHE_SIZE): a rationale never changes once written. Decisions
+without one (written before it existed, or while the KG snapshot was
+disabled) and requests for a different task type fall back to the
+traversal queries.
+
+`/explanations/routing/{id}/details` adds the complementary agents for the
+result panel, from the snapshot (`details_from_snapshot`) or, without one,
+from ROUTING_DETAILS_CYPHER in a single round trip.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+
+
+def _rounded(value: Any) -> Any:
+    return round(value, 4) if isinstance(value, float) else value
+
+
+def snapshot_rationale(snapshot, task_type: str | None, agent_name: str) -> Dict[str, Any]:
+    """The capability part of a rationale as the snapshot has it now, without candidates."""
+    agent = snapshot.agents.get(agent_name)
+    return {
+        "taskType": task_type,
+        "requiredCapabilities": snapshot.get_required_capabilities_for_task(task_type) if task_type else [],
+        "agentCapabilities": snapshot.get_agent_capabilities(agent_name),
+        # Same defaults as the coalesce() calls in QUERY_5
+        "capabilityLevel": agent.capability_level if agent else 0.5,
+        "historicalAccuracy": agent.historical_accuracy if agent else 0.5,
+        "domainExpertise": agent.domain_expertise if agent else "general",
+        "candidates": [],
+        "tieBreaking": {},
+    }
+
+
+def build_rationale(analyzed, agent_name: str, candidates: List[Dict[str, Any]], tie_breaking_info: Dict[str, Any],
+                    snapshot) -> Optional[Dict[str, Any]]:
+    """What an explanation of this decision needs, read from `snapshot`; None without one."""
+    if snapshot is None:
+        return None
+    return dict(
+        snapshot_rationale(snapshot, analyzed.task_type, agent_name),
+        domain=analyzed.domain,
+        candidates=[[c["name"], _rounded(c["score"])] for c in candidates],
+        tieBreaking={key: _rounded(value) for key, value in tie_breaking_info.items()},
+    )
+
+
+def encode_rationale(rationale: Optional[Dict[str, Any]]) -> Optional[str]:
+    if rationale is None:
+        return None
+    return json.dumps(rationale, separators=(",", ":"))
+
+
+def decision_view(record) -> Optional[Dict[str, Any]]:
+    """
+    The fields explanations are built from, for a ROUTING_RATIONALE_CYPHER
+    record or a decision built by queries.new_decision that is not written yet.
+    """
+    if not record:
+        return None
+    rationale = record["rationale"]
+    return {
+        "queryText": record["queryText"] or "",
+        "confidence": record["confidence"],
+        "taskType": record["taskType"],
+        "agentName": record["agentName"],
+        "rationale": json.loads(rationale) if rationale else None,
+    }
+
+
+def _usable(decision: Dict[str, Any], task_type: str | None) -> Optional[Dict[str, Any]]:
+    rationale = decision["rationale"]
+    if rationale is None or (task_type is not None and task_type != rationale["taskType"]):
+        return None
+    return rationale
+
+
+def explanation_from_decision(decision: Dict[str, Any], task_type: str | None = None) -> Optional[Dict[str, Any]]:
+    """The explanation from the stored rationale; None when the traversal is needed."""
+    rationale = _usable(decision, task_type)
+    if rationale is None:
+        return None
+    required = set(rationale["requiredCapabilities"])
+    matching = [c for c in rationale["agentCapabilities"] if c in required]
+    return {
+        "agent_name": decision["agentName"],
+        "capability_level": rationale["capabilityLevel"],
+        "historical_accuracy": rationale["historicalAccuracy"],
+        "domain_expertise": rationale["domainExpertise"],
+        "query_text": decision["queryText"],
+        "confidence": decision["confidence"] if decision["confidence"] is not None else 0.5,
+        "all_capabilities": rationale["agentCapabilities"],
+        "matching_capabilities": matching,
+        "matching_capability_count": len(matching),
+        "task_type": rationale["taskType"],
+        "top_candidates": [{"name": name, "score": score} for name, score in rationale["candidates"]],
+        "tie_breaking_info": rationale["tieBreaking"],
+    }
+
+
+def path_from_decision(decision: Dict[str, Any], task_type: str | None = None) -> Optional[Dict[str, Any]]:
+    """The traversal path from the stored rationale; None when the traversal is needed."""
+    rationale = _usable(decision, task_type)
+    if rationale is None:
+        return None
+    required = set(rationale["requiredCapabilities"])
+    return {
+        "query_text": decision["queryText"],
+        "task_type": rationale["taskType"],
+        "required_capabilities": rationale["requiredCapabilities"],
+        "selected_agent": decision["agentName"],
+        "agent_capabilities": rationale["agentCapabilities"],
+        "matching_capabilities": [c for c in rationale["agentCapabilities"] if c in required],
+    }
+
+
+def routing_details(decision: Dict[str, Any], task_type: str | None, current: Dict[str, Any],
+                    complementary: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Everything the result panel shows for a decision: capabilities and the
+    explanation from the stored rationale (`current`, the graph as it is now,
+    when there is none) and the complementary agents.
+    """
+    if _usable(decision, task_type) is None:
+        decision = dict(decision, rationale=current)
+    explanation = explanation_from_decision(decision)
+    return {
+        "task_type": explanation["task_type"],
+        "selected_agent": decision["agentName"],
+        "required_capabilities": decision["rationale"]["requiredCapabilities"],
+        "agent_capabilities": explanation["all_capabilities"],
+        "matching_capabilities": explanation["matching_capabilities"],
+        "complementary_agents": complementary,
+        "explanation": explanation,
+    }
+
+
+def details_from_snapshot(decision: Dict[str, Any], task_type: str | None, snapshot, limit: int = 5) -> Dict[str, Any]:
+    """routing_details without a query: the capabilities and complements come from the snapshot."""
+    task_type = task_type or decision["taskType"]
+    current = snapshot_rationale(snapshot, task_type, decision["agentName"])
+    return routing_details(decision, task_type, current, snapshot.get_complementary_agents(decision["agentName"], task_type, limit))
+
+
+class DecisionCache:
+    """Bounded LRU of decision views by id; only views with a rationale are kept."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, rd_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            decision = self._entries.get(rd_id)
+            if decision is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(rd_id)
+            self._counters["hits"] += 1
+            return decision
+
+    def put(self, rd_id: str, decision: Optional[Dict[str, Any]]) -> None:
+        if decision is None or decision["rationale"] is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[rd_id] = decision
+            self._entries.move_to_end(rd_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+
+
+_cache = DecisionCache(settings.explanation_cache_size)
+
+
+def get_decision_cache() -> DecisionCache:
+    return _cache
@@ -0,0 +1,249 @@
+"""
+Retention for routing history: archive, compact and delete old decisions.
+
+Every routed query adds a RoutingDecision node, so the graph grows with
+traffic. `run_retention` removes the decisions older than RETENTION_DAYS,
+oldest first, RETENTION_BATCH_SIZE at a time:
+
+1. a batch is read with its query text and agent (a range seek on the
+   timestamp index);
+2. it is appended to the archive and flushed to disk: gzip-compressed JSONL
+   (one file per run) or Parquet (one file per batch, since a Parquet file is
+   only readable once closed);
+3. one short write transaction deletes the decisions and every Query node no
+   remaining decision refers to, and adds the batch to the `compacted`
+   MetricsRollup counters (decisions, confidence, successes and failures per
+   hour, agent, task type and domain).
+
+The global, agent, day and hour rollups already count the deleted decisions,
+so /metrics/ does not change; the compacted counters keep the per-context
+detail and let the backfill rebuild those scopes later. A batch archived
+before a failed delete is archived again by the next run: archives are
+at-least-once, keyed by decision id.
+
+    python -m backend.kg.retention --days 90
+    python -m backend.kg.retention --days 30 --format parquet --archive-dir /mnt/archive
+    python -m backend.kg.retention --dry-run
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from .client import get_driver
+from .graph_version import bump_graph_version
+from .metrics_rollups import BACKFILL_COMPLETE_CYPHER, COMPACTED, HOUR, _to_datetime, bucket_key
+from ..config import settings
+
+ARCHIVE_FORMATS = ("jsonl", "parquet")
+
+EXPIRED_DECISIONS_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.timestamp < $cutoff
+WITH rd
+ORDER BY rd.timestamp
+LIMIT $limit
+OPTIONAL MATCH (rd)-[:SOURCE_QUERY]->(q:Query)
+OPTIONAL MATCH (rd)-[:ROUTED_TO]->(a:Agent)
+RETURN id(rd) AS nodeId, rd.id AS id, rd.timestamp AS timestamp, rd.confidence AS confidence,
+       rd.taskType AS taskType, rd.domain AS domain, rd.outcome AS outcome, rd.rationale AS rationale,
+       q.text AS queryText, q.hash AS queryHash, a.name AS agentName
+"""
+
+EXPIRED_COUNT_CYPHER = """
+MATCH (rd:RoutingDecision)
+WHERE rd.timestamp < $cutoff
+RETURN count(rd) AS decisions
+"""
+
+# Query nodes are shared by every decision with the same text (queries.query_hash),
+# so one is deleted with the last decision that points at it
+DELETE_DECISIONS_CYPHER = """
+UNWIND $nodeIds AS nodeId
+MATCH (rd:RoutingDecision)
+WHERE id(rd) = nodeId
+OPTIONAL MATCH (rd)-[:SOURCE_QUERY]->(q:Query)
+DETACH DELETE rd
+WITH DISTINCT q
+WHERE q IS NOT NULL AND NOT (q)<-[:SOURCE_QUERY]-()
+DELETE q
+RETURN count(q) AS queries
+"""
+
+COMPACT_ROLLUPS_CYPHER = """
+UNWIND $rollups AS r
+MERGE (m:MetricsRollup {id: r.id})
+ON CREATE SET m.scope = 'compacted', m.key = r.key,
+              m.hour = r.hour, m.agent = r.agent, m.taskType = r.taskType, m.domain = r.domain,
+              m.decisions = 0, m.confidenceSum = 0.0, m.successes = 0, m.failures = 0
+SET m.decisions = m.decisions + r.decisions,
+    m.confidenceSum = m.confidenceSum + r.confidenceSum,
+    m.successes = m.successes + r.successes,
+    m.failures = m.failures + r.failures
+"""
+
+def compacted_rollups(decisions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Counter rows for archived decisions, one per (hour, agent, task type, domain)."""
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for d in decisions:
+        moment = _to_datetime(d["timestamp"])
+        if moment is None:
+            continue
+        hour = bucket_key(HOUR, moment)
+        parts = (hour, d["agentName"], d["taskType"], d["domain"])
+        key = "|".join(str(part) if part is not None else "" for part in parts)
+        row = rows.setdefault(parts, {
+            "id": f"{COMPACTED}:{key}", "key": key, "hour": hour,
+            "agent": d["agentName"], "taskType": d["taskType"], "domain": d["domain"],
+            "decisions": 0, "confidenceSum": 0.0, "successes": 0, "failures": 0,
+        })
+        row["decisions"] += 1
+        row["confidenceSum"] += float(d["confidence"] or 0.0)
+        row["successes"] += int(d["outcome"] == "SUCCESS")
+        row["failures"] += int(d["outcome"] == "FAILURE")
+    return list(rows.values())
+
+
+def _archive_row(record) -> Dict[str, Any]:
+    row = {key: record[key] for key in ("id", "confidence", "taskType", "domain", "outcome", "queryText", "queryHash", "agentName", "rationale")}
+    moment = _to_datetime(record["timestamp"])
+    row["timestamp"] = moment.astimezone(timezone.utc) if moment is not None and moment.tzinfo else moment
+    return row
+
+
+class _JsonlArchive:
+    def __init__(self, path: Path):
+        self.path = path.with_suffix(".jsonl.gz")
+        self._file = gzip.open(self.path, "ab")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        lines = (json.dumps(row, default=lambda value: value.isoformat() if hasattr(value, "isoformat") else str(value)) + "\n" for row in rows)
+        self._file.write("".join(lines).encode("utf-8"))
+        # Durable before the batch is deleted from the graph
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetArchive:
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet archives need pyarrow (pip install pyarrow), or use --format jsonl") from e
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._schema = pa.schema([
+            ("id", pa.string()), ("timestamp", pa.timestamp("us", tz="UTC")), ("confidence", pa.float64()),
+            ("taskType", pa.string()), ("domain", pa.string()), ("outcome", pa.string()),
+            ("queryText", pa.string()), ("queryHash", pa.string()), ("agentName", pa.string()),
+            ("rationale", pa.string()),
+        ])
+        self._files = 0
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        table = self._pa.Table.from_pylist(rows, schema=self._schema)
+        part = self.path / f"part-{self._files:05d}.parquet"
+        self._pq.write_table(table, part, compression="zstd")
+        self._files += 1
+
+    def close(self) -> None:
+        pass
+
+
+def _open_archive(archive_dir: Path, archive_format: str, started: datetime):
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"archive format must be one of {', '.join(ARCHIVE_FORMATS)}")
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"routing-decisions-{started:%Y%m%dT%H%M%SZ}"
+    return _JsonlArchive(path) if archive_format == "jsonl" else _ParquetArchive(path)
+
+
+def run_retention(
+    days: int | None = None,
+    batch_size: int | None = None,
+    archive_dir: str | Path | None = None,
+    archive_format: str | None = None,
+    pause_seconds: float = 0.0,
+    dry_run: bool = False,
+    progress: Callable[[str], None] | None = print,
+) -> Dict[str, Any]:
+    """
+    Archive, compact and delete the decisions older than `days`. With
+    `dry_run`, only count them. `pause_seconds` sleeps between batches to
+    leave room for live traffic.
+    """
+    days = settings.retention_days if days is None else days
+    batch_size = batch_size or settings.retention_batch_size
+    started_at = datetime.now(timezone.utc)
+    cutoff = started_at - timedelta(days=days)
+    report: Dict[str, Any] = {"cutoff": cutoff.isoformat(), "decisions": 0, "queries": 0, "compacted_rollups": 0, "batches": 0}
+
+    driver = get_driver()
+    with driver.session() as session:
+        if dry_run:
+            report["expired"] = session.run(EXPIRED_COUNT_CYPHER, cutoff=cutoff).single()["decisions"]
+            return report
+        if not settings.metrics_rollups_enabled or not session.run(BACKFILL_COMPLETE_CYPHER).single()["complete"]:
+            # /metrics/ would scan the decisions this job deletes
+            raise RuntimeError("Retention needs the metrics rollups: enable METRICS_ROLLUPS_ENABLED and apply schema migration 4 (the rollup backfill) first")
+
+        archive = _open_archive(Path(archive_dir or settings.retention_archive_dir), archive_format or settings.retention_archive_format, started_at)
+        report["archive"] = str(archive.path)
+        started = time.perf_counter()
+        try:
+            while True:
+                records = session.execute_read(lambda tx: list(tx.run(EXPIRED_DECISIONS_CYPHER, cutoff=cutoff, limit=batch_size)))
+                if not records:
+                    break
+                rows = [_archive_row(record) for record in records]
+                archive.write(rows)
+                rollups = compacted_rollups(rows)
+
+                def _delete(tx):
+                    tx.run(COMPACT_ROLLUPS_CYPHER, rollups=rollups).consume()
+                    return tx.run(DELETE_DECISIONS_CYPHER, nodeIds=[record["nodeId"] for record in records]).single()["queries"]
+
+                report["queries"] += session.execute_write(_delete)
+                bump_graph_version()
+                report["decisions"] += len(rows)
+                report["compacted_rollups"] += len(rollups)
+                report["batches"] += 1
+                if progress is not None:
+                    elapsed = time.perf_counter() - started
+                    progress(f"{report['decisions']} decisions archived and deleted ({report['decisions'] / elapsed:,.0f}/s), up to {rows[-1]['timestamp']}")
+                if len(records) < batch_size:
+                    break
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+        finally:
+            archive.close()
+        report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=None, help=f"Keep this many days of decisions (default {settings.retention_days})")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"Decisions per transaction (default {settings.retention_batch_size})")
+    parser.add_argument("--archive-dir", default=None, help=f"Default {settings.retention_archive_dir}")
+    parser.add_argument("--format", choices=ARCHIVE_FORMATS, default=None, help=f"Default {settings.retention_archive_format}")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the expired decisions")
+    args = parser.parse_args()
+
+    report = run_retention(args.days, args.batch_size, args.archive_dir, args.format, args.pause, args.dry_run)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+BM25 index from query text straight to agents.
+
+Each agent is indexed as one document made of its name, description,
+domain, capability names and, where the graph has them, its `keywords`,
+`queryPatterns`, `useCases` and `tags`. The index is built once per
+GraphSnapshot version (see GraphSnapshot.retrieval_index) and holds, per
+term, the agent rows it occurs in and their precomputed BM25 weights, so a
+query costs one dictionary lookup and one vector add per query term.
+
+It is used twice on the routing path:
+
+- as the candidate tier of get_agents_by_task_type when no agent has the
+  capabilities of the extracted task type (instead of the domain and
+  all-agents fallbacks);
+- as the `text_relevance` scoring feature, blended in with
+  RETRIEVAL_SCORE_WEIGHT (see agents/scoring.py).
+"""
+
+import math
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ..models.domain import Agent
+
+# Standard BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STEM_LENGTH = 6
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in into is it its me my of on or our please "
+    "should that the their this to use using what when where which who why will with you your".split()
+)
+
+
+def _stem(token: str) -> str:
+    # Crude but cheap: drop an inflection, then truncate, so "summaries"/"summarize",
+    # "translation"/"translate" and "visualization"/"visualize" share a term
+    for suffix in ("ies", "ing", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[: len(token) - len(suffix)]
+            break
+    return token[:STEM_LENGTH]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split on non-letters and camelCase boundaries, lower-case, drop stopwords, stem."""
+    tokens = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if word not in STOPWORDS:
+            tokens.append(_stem(word))
+    return tokens
+
+
+def agent_document(agent: Agent, capabilities: Sequence[str] = ()) -> str:
+    fields = [agent.name, agent.description, agent.domain_expertise, *capabilities]
+    fields += agent.keywords + agent.query_patterns + agent.use_cases
+    # Tags are "category:value"; only the value says anything about the agent
+    fields += [tag.split(":", 1)[-1] for tag in agent.tags]
+    return " ".join(field for field in fields if field)
+
+
+class AgentRetrievalIndex:
+    def __init__(self, agents: Sequence[Agent], agent_capabilities: Dict[str, List[str]] | None = None):
+        agent_capabilities = agent_capabilities or {}
+        self.agents = list(agents)
+        documents = [tokenize(agent_document(a, agent_capabilities.get(a.name, ()))) for a in self.agents]
+        lengths = np.array([len(doc) for doc in documents], dtype=np.float64)
+        average_length = lengths.mean() if len(documents) and lengths.mean() > 0 else 1.0
+
+        term_counts: Dict[str, Dict[int, int]] = {}
+        for row, doc in enumerate(documents):
+            for term in doc:
+                counts = term_counts.setdefault(term, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        n = len(documents)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, counts in term_counts.items():
+            rows = np.fromiter(counts, dtype=np.int64, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            idf = math.log(1 + (n - len(counts) + 0.5) / (len(counts) + 0.5))
+            norm = K1 * (1 - B + B * lengths[rows] / average_length)
+            self.postings[term] = (rows, idf * tf * (K1 + 1) / (tf + norm))
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def scores(self, text: str) -> np.ndarray:
+        """BM25 score of every agent (in index order) for `text`."""
+        scores = np.zeros(len(self.agents), dtype=np.float64)
+        for term in set(tokenize(text)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                rows, weights = posting
+                scores[rows] += weights
+        return scores
+
+    def relevance(self, text: str) -> np.ndarray | None:
+        """Scores scaled so the best agent is 1.0; None when no query term is indexed."""
+        scores = self.scores(text)
+        best = scores.max() if len(scores) else 0.0
+        if best <= 0:
+            return None
+        return scores / best
+
+    def search(self, text: str, top_k: int = 10) -> List[Tuple[Agent, float]]:
+        """Agents with a positive score, best first (ties keep index order)."""
+        scores = self.scores(text)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            # Keep every agent tied with the k-th score, so the cut below takes
+            # the earliest of them rather than whichever argpartition picked
+            kth = -np.partition(-scores[matched], top_k - 1)[top_k - 1]
+            matched = matched[scores[matched] >= kth]
+        order = matched[np.lexsort((matched, -scores[matched]))][:top_k]
+        return [(self.agents[row], float(scores[row])) for row in order]
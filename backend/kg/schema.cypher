@@ -1,3 +1,6 @@
+// Baseline schema: migration 1 in kg/migrations.py. Add new constraints and
+// indexes there as new migrations, so existing databases get them too.
+
 // Unique constraints
 CREATE CONSTRAINT agent_name_unique IF NOT EXISTS
 FOR (a:Agent)
@@ -11,6 +14,19 @@ CREATE CONSTRAINT tasktype_name_unique IF NOT EXISTS
 FOR (t:TaskType)
 REQUIRE t.name IS UNIQUE;
 
+CREATE CONSTRAINT metrics_rollup_id_unique IF NOT EXISTS
+FOR (m:MetricsRollup)
+REQUIRE m.id IS UNIQUE;
+
+CREATE CONSTRAINT agent_context_accuracy_id_unique IF NOT EXISTS
+FOR (ca:AgentContextAccuracy)
+REQUIRE ca.id IS UNIQUE;
+
+// Query nodes are content-addressed (see queries.query_hash)
+CREATE CONSTRAINT query_hash_unique IF NOT EXISTS
+FOR (q:Query)
+REQUIRE q.hash IS UNIQUE;
+
 // Indexes for faster lookup
 CREATE INDEX query_text_index IF NOT EXISTS
 FOR (q:Query)
@@ -20,4 +36,6 @@ CREATE INDEX routing_timestamp_index IF NOT EXISTS
 FOR (rd:RoutingDecision)
 ON (rd.timestamp);
 
-
+CREATE INDEX metrics_rollup_scope_key_index IF NOT EXISTS
+FOR (m:MetricsRollup)
+ON (m.scope, m.key);
@@ -0,0 +1,414 @@
+"""
+In-memory snapshot of the routing subgraph.
+
+The routing path only ever reads Agents, their Capabilities and the
+TaskType -[:REQUIRES_CAPABILITY]-> Capability edges. That part of the graph
+is small and changes rarely, so it is loaded once into plain Python indexes
+and refreshed in the background. Every rebuild that changes the content bumps
+``GraphSnapshot.version`` so callers can cache derived data per version.
+
+With KG_BACKEND=embedded every EmbeddedGraph keeps the snapshot of its own
+contents, answers its routing reads from it and drops it on structural
+writes (agents, capabilities, their edges); the current snapshot is the one
+of the process-wide graph.
+"""
+
+import hashlib
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .backend import is_embedded
+from .client import get_driver
+from .graph_version import bump_graph_version
+from .profiler import profiled_session
+from .retrieval import AgentRetrievalIndex
+from ..config import settings
+from ..models.domain import Agent
+from ..telemetry import stage
+
+# Telemetry stage names for the candidate tiers of get_agents_by_task_type
+TIER_TASK_MATCH = "get_agents_by_task_type.task_match"
+TIER_RETRIEVAL = "get_agents_by_task_type.retrieval"
+TIER_FALLBACK = "get_agents_by_task_type.domain_fallback"
+TIER_ALL_AGENTS = "get_agents_by_task_type.all_agents"
+
+SNAPSHOT_AGENTS_CYPHER = """
+MATCH (agent:Agent)
+RETURN agent
+"""
+
+SNAPSHOT_AGENT_CAPABILITIES_CYPHER = """
+MATCH (agent:Agent)-[:HAS_CAPABILITY]->(cap:Capability)
+RETURN agent.name AS agent, cap.name AS capability
+"""
+
+SNAPSHOT_TASK_CAPABILITIES_CYPHER = """
+MATCH (tt:TaskType)-[:REQUIRES_CAPABILITY]->(cap:Capability)
+RETURN tt.name AS taskType, cap.name AS capability
+"""
+
+SNAPSHOT_FALLBACKS_CYPHER = """
+MATCH (agent:Agent)-[:FALLBACK_AGENT]->(fb:Agent)
+RETURN agent.name AS agent, fb.name AS fallback
+"""
+
+
+def _string_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+def agent_from_node(node) -> Agent:
+    return Agent(
+        name=node["name"],
+        capability_level=node.get("capabilityLevel", 0.5),
+        domain_expertise=node.get("domainExpertise", "general"),
+        input_format=node.get("inputFormat", "text"),
+        output_format=node.get("outputFormat", "text"),
+        historical_accuracy=node.get("historicalAccuracy", 0.5),
+        response_time=node.get("responseTime", 1.0),
+        cost_efficiency=node.get("costEfficiency", 0.5),
+        reliability=node.get("reliability", 0.5),
+        specialization_score=node.get("specializationScore", 0.5),
+        description=node.get("description", ""),
+        keywords=_string_list(node.get("keywords")),
+        query_patterns=_string_list(node.get("queryPatterns")),
+        use_cases=_string_list(node.get("useCases")),
+        tags=_string_list(node.get("tags")),
+    )
+
+
+def _rank_key(agent: Agent) -> tuple:
+    # Mirrors `ORDER BY capLevel DESC, histAcc DESC` in the Cypher queries
+    return (-agent.capability_level, -agent.historical_accuracy)
+
+
+@dataclass
+class GraphSnapshot:
+    version: int
+    agents: Dict[str, Agent]
+    agent_capabilities: Dict[str, List[str]]
+    task_capabilities: Dict[str, List[str]]
+    fallbacks: Dict[str, List[str]]
+    fingerprint: str = ""
+    # Derived indexes, built in __post_init__
+    ranked_agents: List[Agent] = field(default_factory=list)
+    task_agents: Dict[str, List[Agent]] = field(default_factory=dict)
+    domain_agents: Dict[str, List[Agent]] = field(default_factory=dict)
+    capability_agents: Dict[str, set] = field(default_factory=dict)
+    _retrieval: Optional[AgentRetrievalIndex] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.ranked_agents = sorted(self.agents.values(), key=_rank_key)
+
+        for agent_name, capabilities in self.agent_capabilities.items():
+            for capability in capabilities:
+                self.capability_agents.setdefault(capability, set()).add(agent_name)
+
+        for task_type, capabilities in self.task_capabilities.items():
+            names = set()
+            for capability in capabilities:
+                names |= self.capability_agents.get(capability, set())
+            self.task_agents[task_type] = [a for a in self.ranked_agents if a.name in names]
+
+        for agent in self.ranked_agents:
+            self.domain_agents.setdefault(agent.domain_expertise, []).append(agent)
+
+    def retrieval_index(self) -> AgentRetrievalIndex:
+        """BM25 index over the agents' text fields, in ranked_agents order; built on first use."""
+        if self._retrieval is None:
+            self._retrieval = AgentRetrievalIndex(self.ranked_agents, self.agent_capabilities)
+        return self._retrieval
+
+    def get_agents_by_task_type(
+        self,
+        task_type_name: str,
+        min_threshold: float = 0.0,
+        domain: str | None = None,
+        query_text: str | None = None,
+    ) -> List[Agent]:
+        """
+        Same tiers and ordering as the Cypher implementation:
+        task type match -> domain/general agents -> every agent.
+        With `query_text` (and RETRIEVAL_ENABLED), agents retrieved for the
+        text come between the task match and the domain fallback.
+        """
+        return self.get_agents_for_queries(task_type_name, [query_text], min_threshold, domain)[0]
+
+    def get_agents_for_queries(
+        self,
+        task_type_name: str,
+        query_texts: List[str | None],
+        min_threshold: float = 0.0,
+        domain: str | None = None,
+    ) -> List[List[Agent]]:
+        """
+        get_agents_by_task_type for each of `query_texts` (one task type and
+        domain, as batch routing groups them). Only the retrieval tier depends
+        on the text, so the other tiers run once and their list is shared.
+        """
+        with stage(TIER_TASK_MATCH):
+            agents = [a for a in self.task_agents.get(task_type_name, []) if a.capability_level >= min_threshold]
+            if domain:
+                agents = _domain_first(agents, domain)
+        if agents:
+            return [agents] * len(query_texts)
+
+        results: List[List[Agent]] = []
+        fallback: List[Agent] | None = None
+        for query_text in query_texts:
+            if query_text and settings.retrieval_enabled:
+                with stage(TIER_RETRIEVAL):
+                    hits = self.retrieval_index().search(query_text, top_k=settings.retrieval_top_k)
+                    agents = [a for a, _ in hits if a.capability_level >= min_threshold]
+                if agents:
+                    results.append(agents)
+                    continue
+            if fallback is None:
+                fallback = self._fallback_agents(min_threshold, domain)
+            results.append(fallback)
+        return results
+
+    def _fallback_agents(self, min_threshold: float, domain: str | None) -> List[Agent]:
+        with stage(TIER_FALLBACK):
+            if domain:
+                preferred = self.domain_agents.get(domain, [])
+                general = self.domain_agents.get("general", []) if domain != "general" else []
+                agents = [a for a in preferred + general if a.capability_level >= min_threshold]
+            else:
+                agents = [a for a in self.ranked_agents if a.capability_level >= min_threshold]
+        if agents:
+            return agents
+
+        with stage(TIER_ALL_AGENTS):
+            return list(self.ranked_agents)
+
+    def get_fallback_agent(self, agent_name: str) -> Agent | None:
+        for fallback_name in self.fallbacks.get(agent_name, []):
+            if fallback_name in self.agents:
+                return self.agents[fallback_name]
+        return None
+
+    def get_required_capabilities_for_task(self, task_type: str) -> List[str]:
+        return list(self.task_capabilities.get(task_type, []))
+
+    def get_agent_capabilities(self, agent_name: str) -> List[str]:
+        return list(self.agent_capabilities.get(agent_name, []))
+
+    def get_complementary_agents(self, agent_name: str, task_type: str | None = None, limit: int = 5) -> List[Dict]:
+        """Same result as COMPLEMENTARY_AGENTS_CYPHER: agents with the required capabilities `agent_name` lacks."""
+        required = self.task_capabilities.get(task_type, []) if task_type else []
+        primary = self.agent_capabilities.get(agent_name, [])
+        if not required or not primary:
+            return []
+        missing = [c for c in required if c not in primary]
+        provided: Dict[str, List[str]] = {}
+        for capability in missing:
+            for name in self.capability_agents.get(capability, ()):
+                if name != agent_name:
+                    provided.setdefault(name, []).append(capability)
+        complements = sorted(
+            (self.agents[name] for name in provided if name in self.agents),
+            key=lambda a: (-len(provided[a.name]),) + _rank_key(a),
+        )
+        return [
+            {
+                "name": agent.name,
+                "description": agent.description,
+                "capability_level": agent.capability_level,
+                "domain_expertise": agent.domain_expertise,
+                "historical_accuracy": agent.historical_accuracy,
+                # Like the Cypher, only capabilities among the missing ones are collected
+                "capabilities": provided[agent.name],
+                "missing_capabilities": provided[agent.name],
+            }
+            for agent in complements[:limit]
+        ]
+
+
+def _domain_first(agents: List[Agent], domain: str) -> List[Agent]:
+    # Stable partition, equivalent to `ORDER BY domainPriority DESC, ...`
+    return [a for a in agents if a.domain_expertise == domain] + [a for a in agents if a.domain_expertise != domain]
+
+
+_snapshot: GraphSnapshot | None = None
+# Consecutive failed loads, and when a lookup may try again
+_failures = 0
+_retry_at = 0.0
+_lock = threading.Lock()
+# Held while loading from Neo4j, so concurrent first lookups run one read
+_load_lock = threading.Lock()
+# Versions are unique across graphs, since derived data is cached per version
+_versions = itertools.count(1)
+_stale = threading.Event()
+_stop = threading.Event()
+_refresher: threading.Thread | None = None
+
+
+def _fingerprint(agents: Dict[str, Agent], agent_capabilities, task_capabilities, fallbacks) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(agents):
+        digest.update(repr(sorted(agents[name].__dict__.items())).encode())
+    for mapping in (agent_capabilities, task_capabilities, fallbacks):
+        digest.update(repr(sorted(mapping.items())).encode())
+    return digest.hexdigest()
+
+
+def build_snapshot(subgraph: tuple, previous: GraphSnapshot | None = None) -> GraphSnapshot:
+    """
+    Build a snapshot from (agents, agent_capabilities, task_capabilities,
+    fallbacks); `previous` is returned as is when the content is the same.
+    """
+    agents, agent_capabilities, task_capabilities, fallbacks = subgraph
+    agent_capabilities = {name: sorted(set(caps)) for name, caps in agent_capabilities.items()}
+    task_capabilities = {name: sorted(set(caps)) for name, caps in task_capabilities.items()}
+    fingerprint = _fingerprint(agents, agent_capabilities, task_capabilities, fallbacks)
+    if previous is not None and previous.fingerprint == fingerprint:
+        return previous
+    return GraphSnapshot(
+        version=next(_versions),
+        agents=agents,
+        agent_capabilities=agent_capabilities,
+        task_capabilities=task_capabilities,
+        fallbacks=fallbacks,
+        fingerprint=fingerprint,
+    )
+
+
+def _publish(snapshot: GraphSnapshot) -> GraphSnapshot:
+    global _snapshot, _failures
+    if snapshot is _snapshot and not _failures:
+        return snapshot
+    with _lock:
+        _failures = 0
+        changed = _snapshot is None or _snapshot.fingerprint != snapshot.fingerprint
+        _snapshot = snapshot
+    if changed:
+        # Agents or capabilities changed, possibly written by another process
+        bump_graph_version()
+    return snapshot
+
+
+def load_snapshot() -> GraphSnapshot:
+    """
+    Read the routing subgraph in one read transaction (or rebuild the
+    embedded graph's snapshot when KG_BACKEND=embedded) and make it current.
+    The version only changes when the content differs from the current one.
+    """
+
+    def _read(tx):
+        agents = {}
+        for record in tx.run(SNAPSHOT_AGENTS_CYPHER):
+            agent = agent_from_node(record["agent"])
+            agents[agent.name] = agent
+        agent_capabilities: Dict[str, List[str]] = {}
+        for record in tx.run(SNAPSHOT_AGENT_CAPABILITIES_CYPHER):
+            agent_capabilities.setdefault(record["agent"], []).append(record["capability"])
+        task_capabilities: Dict[str, List[str]] = {}
+        for record in tx.run(SNAPSHOT_TASK_CAPABILITIES_CYPHER):
+            task_capabilities.setdefault(record["taskType"], []).append(record["capability"])
+        fallbacks: Dict[str, List[str]] = {}
+        for record in tx.run(SNAPSHOT_FALLBACKS_CYPHER):
+            fallbacks.setdefault(record["agent"], []).append(record["fallback"])
+        return agents, agent_capabilities, task_capabilities, fallbacks
+
+    if is_embedded():
+        from .embedded import get_embedded_graph
+
+        return _publish(get_embedded_graph().refresh_routing_snapshot())
+
+    with profiled_session(get_driver().session()) as session:
+        subgraph = session.execute_read(_read)
+    return _publish(build_snapshot(subgraph, _snapshot))
+
+
+def _record_failure(e: Exception) -> None:
+    global _failures, _retry_at
+    with _lock:
+        _failures += 1
+        delay = min(settings.kg_snapshot_refresh_seconds, settings.kg_snapshot_retry_seconds * 2 ** (_failures - 1))
+        _retry_at = time.monotonic() + delay
+    print(f"Warning: could not load KG snapshot, retrying in {delay:.1f}s: {e}")
+
+
+def _load_with_backoff(load) -> Optional[GraphSnapshot]:
+    if _failures and time.monotonic() < _retry_at:
+        return _snapshot
+    try:
+        return load()
+    except Exception as e:
+        _record_failure(e)
+        return _snapshot
+
+
+def _embedded_snapshot() -> GraphSnapshot:
+    from .embedded import get_embedded_graph
+
+    return _publish(get_embedded_graph().routing_snapshot())
+
+
+def get_snapshot() -> Optional[GraphSnapshot]:
+    """
+    Return the current snapshot, loading it on first use.
+    A failed load is not retried before its backoff has passed; meanwhile the
+    last good snapshot is served. Returns None when the snapshot is disabled
+    or no load has succeeded yet, in which case callers fall back to querying
+    Neo4j directly.
+    """
+    if not settings.kg_snapshot_enabled:
+        return None
+    if is_embedded():
+        # The graph keeps its own snapshot and rebuilds it once after a structural write
+        return _load_with_backoff(_embedded_snapshot)
+    if _snapshot is None:
+        with _load_lock:
+            if _snapshot is None:
+                return _load_with_backoff(load_snapshot)
+    return _snapshot
+
+
+def mark_snapshot_stale() -> None:
+    """Ask the background refresher to reload as soon as possible."""
+    _stale.set()
+
+
+def _refresh_loop(interval: float) -> None:
+    while not _stop.is_set():
+        _stale.wait(timeout=interval)
+        if _stop.is_set():
+            break
+        _stale.clear()
+        try:
+            load_snapshot()
+        except Exception as e:
+            _record_failure(e)
+
+
+def start_snapshot_refresher() -> None:
+    global _refresher
+    if not settings.kg_snapshot_enabled or _refresher is not None:
+        return
+    _stop.clear()
+    _refresher = threading.Thread(
+        target=_refresh_loop,
+        args=(settings.kg_snapshot_refresh_seconds,),
+        name="kg-snapshot-refresher",
+        daemon=True,
+    )
+    _refresher.start()
+
+
+def stop_snapshot_refresher() -> None:
+    global _refresher
+    if _refresher is None:
+        return
+    _stop.set()
+    _stale.set()
+    _refresher.join(timeout=5.0)
+    _refresher = None
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List
 
 
 @dataclass
@@ -14,6 +15,11 @@ class Agent:
     reliability: float = 0.5  # Reliability score (0-1, higher is better)
     specialization_score: float = 0.5  # How specialized this agent is for the task (0-1)
     description: str = ""  # Agent description
+    # Free-text query matching properties, indexed by kg/retrieval.py when present
+    keywords: List[str] = field(default_factory=list)
+    query_patterns: List[str] = field(default_factory=list)
+    use_cases: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
 
 
 @dataclass
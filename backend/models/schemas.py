@@ -11,6 +11,9 @@ class AnalyzedQuery(BaseModel):
     complexity: float
     domain: str
     output_format: str | None = None
+    # Which extraction tier answered (cache, rules, model or llm) and, for the local tiers, how sure it was
+    extraction_tier: str | None = None
+    extraction_confidence: float | None = None
 
 
 class RoutingResult(BaseModel):
@@ -20,8 +23,26 @@ class RoutingResult(BaseModel):
     rationale: dict
 
 
+class BatchRouteRequest(BaseModel):
+    queries: list[str]
+
+
+class BatchRouteItem(BaseModel):
+    index: int
+    result: RoutingResult | None = None
+    error: str | None = None
+
+
+class BatchRoutingResult(BaseModel):
+    results: list[BatchRouteItem]
+
+
 class FeedbackRequest(BaseModel):
     routing_decision_id: str
     success: bool
 
 
+class BatchFeedbackRequest(BaseModel):
+    feedback: list[FeedbackRequest]
+
+
@@ -0,0 +1,209 @@
+"""
+Latency histograms for the request pipeline, exposed in the Prometheus text
+format on /telemetry/metrics (separate from the /metrics/ business dashboard).
+
+Code marks a stage with `with stage("name"):` or the `@timed_stage("name")`
+decorator. Sub-stages use dotted names, e.g. "extract_query.llm" inside
+"extract_query". Every stage is observed in the
+`router_stage_duration_seconds` histogram. While `collect_stages()` is active
+in the current task, the stages are also recorded per request, which is how
+/routing/?include_stages=true builds its breakdown.
+
+`router_extraction_tier_total` counts which tier of the extraction cascade
+(cache, rules, model, llm or the default extraction) answered each query, and
+`router_llm_client_events_total` what the LLM client did (extraction/llm_client.py),
+and `router_decision_writer_events_total` what happened to buffered routing
+decisions (kg/decision_writer.py).
+"""
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import settings
+
+# Stages range from microseconds (snapshot lookups) to seconds (LLM calls)
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.snapshot().items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = "{" + label_text + "}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label tuple."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._series)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.snapshot().items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            suffix = "{" + label_text + "}" if label_text else ""
+            lines.append(f"{self.name}{suffix} {value!r}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_SECONDS = Histogram(
+    "router_stage_duration_seconds",
+    "Time spent in each stage of the routing, feedback and metrics paths.",
+    ("stage",),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "router_http_request_duration_seconds",
+    "HTTP request duration by route template, method and status code.",
+    ("method", "route", "status"),
+)
+CYPHER_SECONDS = Histogram(
+    "router_cypher_duration_seconds",
+    "Client-side Cypher statement duration by logical query name (see kg/profiler.py).",
+    ("query",),
+)
+HISTOGRAMS = [HTTP_REQUEST_SECONDS, STAGE_SECONDS, CYPHER_SECONDS]
+
+EXTRACTION_TIER_TOTAL = Counter(
+    "router_extraction_tier_total",
+    "Extractions answered by each tier of the cascade: cache, rules, model, llm or default.",
+    ("tier",),
+)
+LLM_CLIENT_EVENTS_TOTAL = Counter(
+    "router_llm_client_events_total",
+    "LLM client events: calls, coalesced, hedged, hedge_won, deadline_exceeded and errors.",
+    ("event",),
+)
+DECISION_WRITER_EVENTS_TOTAL = Counter(
+    "router_decision_writer_events_total",
+    "Routing decisions by write-behind outcome: written, failed, retried, dead_lettered and lost.",
+    ("event",),
+)
+COUNTERS = [EXTRACTION_TIER_TOTAL, LLM_CLIENT_EVENTS_TOTAL, DECISION_WRITER_EVENTS_TOTAL]
+
+_breakdown: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_breakdown", default=None)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    if not settings.telemetry_enabled:
+        return
+    STAGE_SECONDS.observe(seconds, name)
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        # A stage that runs more than once in a request (fallback tiers) is summed
+        breakdown[name] = breakdown.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def timed_stage(name: str):
+    """Decorator form of `stage` for plain functions and coroutines."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """Record the stages run by the current task into the yielded dict (seconds per stage)."""
+    breakdown: Dict[str, float] = {}
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for counter in COUNTERS:
+        lines.extend(counter.render())
+    return "\n".join(lines) + "\n"
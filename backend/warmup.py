@@ -0,0 +1,71 @@
+"""
+Startup warmup.
+
+Run from the FastAPI startup hook so the first routed request does not pay
+for opening Neo4j connections, loading the KG snapshot (or the embedded
+graph), building the scoring matrix, opening the extraction cache, loading
+the local extraction classifier or importing the Gemini SDK. Each step is
+timed, bounded by WARMUP_STEP_TIMEOUT_SECONDS and independent: a failing or
+slow step is logged and the others still run.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict
+
+from .agents.scoring import get_catalog_features
+from .config import settings
+from .extraction import llm_client
+from .extraction.cache import get_extraction_cache
+from .extraction.classifier import get_local_classifier
+from .kg.backend import is_embedded
+from .kg.client import get_async_driver, get_driver
+
+
+async def _prime_async_pool() -> None:
+    driver = get_async_driver()
+    await driver.verify_connectivity()
+
+    async def _ping() -> None:
+        async with driver.session() as session:
+            result = await session.run("RETURN 1")
+            await result.consume()
+
+    # Concurrent sessions force the pool to open that many connections
+    await asyncio.gather(*(_ping() for _ in range(settings.warmup_pool_connections)))
+
+
+def _prime_sync_pool() -> None:
+    get_driver().verify_connectivity()
+
+
+async def warmup() -> Dict[str, float]:
+    """Run every warmup step and return how long each took, in seconds."""
+    steps: Dict[str, Callable] = {} if is_embedded() else {
+        "neo4j_async_pool": _prime_async_pool,
+        "neo4j_sync_pool": _prime_sync_pool,
+    }
+    steps |= {
+        "kg_snapshot": get_catalog_features,
+        "extraction_cache": get_extraction_cache,
+        "extraction_classifier": get_local_classifier,
+        "llm_client": llm_client.warm_up,
+    }
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(step):
+                pending = step()
+            else:
+                pending = asyncio.to_thread(step)
+            await asyncio.wait_for(pending, timeout=settings.warmup_step_timeout_seconds)
+        except asyncio.TimeoutError:
+            print(f"Warning: warmup step {name} timed out after {settings.warmup_step_timeout_seconds}s")
+        except Exception as e:
+            print(f"Warning: warmup step {name} failed: {e}")
+        timings[name] = time.perf_counter() - started
+
+    summary = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items())
+    print(f"Warmup finished: {summary}")
+    return timings
@@ -1,5 +1,5 @@
-import React, { useState } from "react";
-import { RoutingResult } from "./types";
+import React, { useEffect, useState } from "react";
+import { RoutingDetails, RoutingResult } from "./types";
 import { QueryForm } from "./components/QueryForm";
 import { ResultPanel } from "./components/ResultPanel";
 import { MetricsDashboard } from "./components/MetricsDashboard";
@@ -12,6 +12,36 @@ const App: React.FC = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [activeTab, setActiveTab] = useState<Tab>("query");
+  const [details, setDetails] = useState<RoutingDetails | null>(null);
+  const [loadingDetails, setLoadingDetails] = useState(false);
+
+  // One request for the capabilities, complementary agents and explanation
+  // shown by ResultPanel and QueryForm
+  useEffect(() => {
+    if (!result) return;
+    let cancelled = false;
+    const fetchDetails = async () => {
+      setDetails(null);
+      setLoadingDetails(true);
+      try {
+        const response = await fetch(
+          `/explanations/routing/${result.routing_decision_id}/details?limit=5`
+        );
+        if (response.ok && !cancelled) {
+          setDetails((await response.json()) as RoutingDetails);
+        }
+      } catch (err) {
+        console.error("Failed to fetch routing details:", err);
+      } finally {
+        if (!cancelled) setLoadingDetails(false);
+      }
+    };
+
+    fetchDetails();
+    return () => {
+      cancelled = true;
+    };
+  }, [result?.routing_decision_id]);
 
   const handleSubmit = async (query: string) => {
     setLoading(true);
@@ -103,7 +133,12 @@ const App: React.FC = () => {
         {activeTab === "query" && (
           <>
             <section className="panel panel--query-form">
-              <QueryForm onSubmit={handleSubmit} loading={loading} result={result} />
+              <QueryForm
+                onSubmit={handleSubmit}
+                loading={loading}
+                result={result}
+                explanation={details?.explanation ?? null}
+              />
               {error && (
                 <div className="error-banner" style={{ marginTop: "1rem" }}>
                   <strong>Error:</strong> {error}
@@ -118,7 +153,7 @@ const App: React.FC = () => {
 
             {result && (
               <section className="panel panel--result">
-                <ResultPanel result={result} />
+                <ResultPanel result={result} details={details} loadingDetails={loadingDetails} />
               </section>
             )}
           </>
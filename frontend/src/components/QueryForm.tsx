@@ -6,9 +6,11 @@ type Props = {
   onSubmit: (query: string) => void | Promise<void>;
   loading: boolean;
   result: RoutingResult | null;
+  // From the routing details App already fetched; saves a request when present
+  explanation?: RoutingExplanation | null;
 };
 
-export const QueryForm: React.FC<Props> = ({ onSubmit, loading, result }) => {
+export const QueryForm: React.FC<Props> = ({ onSubmit, loading, result, explanation: prefetchedExplanation }) => {
   const [query, setQuery] = useState("");
   const [feedbackSubmitted, setFeedbackSubmitted] = useState(false);
   const [submittingFeedback, setSubmittingFeedback] = useState(false);
@@ -73,18 +75,20 @@ export const QueryForm: React.FC<Props> = ({ onSubmit, loading, result }) => {
 
   const fetchExplanation = async () => {
     if (!result || explanation) return;
+    if (prefetchedExplanation) {
+      setExplanation(prefetchedExplanation);
+      setShowExplanation(true);
+      return;
+    }
 
-    const { routing_decision_id, rationale } = result;
-    const { analyzed_query, task_type } = rationale;
-    const taskTypeToUse = task_type || analyzed_query.task_type;
+    const { routing_decision_id } = result;
 
     setLoadingExplanation(true);
     setExplanationError(null);
     try {
+      // The decision stores its task type and rationale, so the id is enough
       const response = await fetch(
-        `/explanations/routing/${routing_decision_id}/explanation?task_type=${encodeURIComponent(
-          taskTypeToUse
-        )}`
+        `/explanations/routing/${routing_decision_id}/explanation`
       );
       if (response.ok) {
         const data = await response.json();
@@ -1,73 +1,22 @@
-import React, { useState, useEffect } from "react";
-import { RoutingResult } from "../types";
+import React from "react";
+import { RoutingDetails, RoutingResult } from "../types";
 import { WorkflowTile } from "./WorkflowTile";
 
 type Props = {
   result: RoutingResult;
+  // Fetched once per routing decision by App (/explanations/routing/{id}/details)
+  details: RoutingDetails | null;
+  loadingDetails: boolean;
 };
 
-type ComplementaryAgent = {
-  name: string;
-  description: string;
-  capability_level: number;
-  domain_expertise: string;
-  historical_accuracy: number;
-  capabilities: string[];
-  missing_capabilities?: string[];
-};
-
-export const ResultPanel: React.FC<Props> = ({ result }) => {
+export const ResultPanel: React.FC<Props> = ({ result, details, loadingDetails }) => {
   const { chosen_agent, confidence, rationale } = result;
   const { analyzed_query, top_candidates, task_type } = rationale;
 
-  // New state for capabilities and complementary agents
-  const [requiredCapabilities, setRequiredCapabilities] = useState<string[]>([]);
-  const [agentCapabilities, setAgentCapabilities] = useState<string[]>([]);
-  const [complementaryAgents, setComplementaryAgents] = useState<ComplementaryAgent[]>([]);
-  const [loadingCapabilities, setLoadingCapabilities] = useState(false);
-
-  // Fetch capabilities and complementary agents when component mounts or agent changes
-  useEffect(() => {
-    const fetchCapabilities = async () => {
-      setLoadingCapabilities(true);
-      try {
-        const taskTypeToUse = task_type || analyzed_query.task_type;
-        
-        // Fetch required capabilities for task type
-        const reqCapsResponse = await fetch(
-          `/agents/task-types/${encodeURIComponent(taskTypeToUse)}/required-capabilities`
-        );
-        if (reqCapsResponse.ok) {
-          const reqCapsData = await reqCapsResponse.json();
-          setRequiredCapabilities(reqCapsData.required_capabilities || []);
-        }
-
-        // Fetch agent capabilities
-        const agentCapsResponse = await fetch(
-          `/agents/${encodeURIComponent(chosen_agent)}/capabilities`
-        );
-        if (agentCapsResponse.ok) {
-          const agentCapsData = await agentCapsResponse.json();
-          setAgentCapabilities(agentCapsData.capabilities || []);
-        }
-
-        // Fetch complementary agents (based on missing capabilities for the task)
-        const compAgentsResponse = await fetch(
-          `/agents/${encodeURIComponent(chosen_agent)}/complementary?task_type=${encodeURIComponent(taskTypeToUse)}&limit=5`
-        );
-        if (compAgentsResponse.ok) {
-          const compAgentsData = await compAgentsResponse.json();
-          setComplementaryAgents(compAgentsData.complementary_agents || []);
-        }
-      } catch (err) {
-        console.error("Failed to fetch capabilities:", err);
-      } finally {
-        setLoadingCapabilities(false);
-      }
-    };
-
-    fetchCapabilities();
-  }, [chosen_agent, task_type, analyzed_query.task_type]);
+  const requiredCapabilities = details?.required_capabilities ?? [];
+  const agentCapabilities = details?.agent_capabilities ?? [];
+  const complementaryAgents = details?.complementary_agents ?? [];
+  const loadingCapabilities = loadingDetails;
 
   const confidencePct = Math.round(confidence * 100);
 
@@ -34,6 +34,31 @@ export type RoutingExplanation = {
   all_capabilities: string[];
   matching_capabilities: string[];
   matching_capability_count: number;
+  // Present when read from the rationale stored with the decision
+  task_type?: string;
+  top_candidates?: { name: string; score: number }[];
+  tie_breaking_info?: Record<string, number>;
+};
+
+export type ComplementaryAgent = {
+  name: string;
+  description: string;
+  capability_level: number;
+  domain_expertise: string;
+  historical_accuracy: number;
+  capabilities: string[];
+  missing_capabilities?: string[];
+};
+
+// Everything the result view shows for a routing decision, in one request
+export type RoutingDetails = {
+  task_type: string;
+  selected_agent: string;
+  required_capabilities: string[];
+  agent_capabilities: string[];
+  matching_capabilities: string[];
+  complementary_agents: ComplementaryAgent[];
+  explanation: RoutingExplanation;
 };
 
 export type RoutingPath = {
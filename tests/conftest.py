@@ -0,0 +1,6 @@
+import os
+
+# Tests run against the in-process graph; nothing needs a Neo4j server.
+# Set before backend.config is imported, which reads the environment once.
+os.environ.setdefault("KG_BACKEND", "embedded")
+os.environ.setdefault("EXTRACTION_CACHE_PATH", "")
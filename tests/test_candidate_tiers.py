@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from backend.agents import routing_flow
+from backend.kg.embedded import get_embedded_graph
+from backend.kg.retrieval import AgentRetrievalIndex
+from backend.models.domain import Agent
+from backend.models.schemas import AnalyzedQuery
+
+QUERIES = ["translate this contract into French", "plot a chart of sales", "xyzzy", "plot a chart of sales"]
+
+
+def _agent(name, description):
+    return Agent(name=name, capability_level=0.8, domain_expertise="general", input_format="text",
+                 output_format="text", description=description)
+
+
+def test_search_ranks_by_score_and_keeps_index_order_on_ties():
+    index = AgentRetrievalIndex([
+        _agent("Alpha", "chart"),
+        _agent("Bravo", "sales chart"),
+        _agent("Charlie", "chart"),
+        _agent("Delta", "unrelated"),
+        _agent("Echo", "chart"),
+    ])
+    hits = index.search("sales chart")
+    assert [agent.name for agent, _ in hits] == ["Bravo", "Alpha", "Charlie", "Echo"]
+    assert hits[1][1] == hits[2][1] == hits[3][1]
+    # Cutting to top_k keeps the earliest of the tied agents
+    assert [agent.name for agent, _ in index.search("chart", top_k=2)] == ["Alpha", "Charlie"]
+
+
+def test_search_top_k_cut_matches_a_full_sort():
+    index = AgentRetrievalIndex([_agent(f"agent{i}", "chart " * (1 + i % 3)) for i in range(12)])
+    full = index.search("chart", top_k=12)
+    assert index.search("chart", top_k=5) == full[:5]
+
+
+@pytest.fixture
+def snapshot():
+    return get_embedded_graph().routing_snapshot()
+
+
+def test_get_agents_for_queries_matches_per_query_lookup(snapshot):
+    # No agent covers this task type, so the retrieval tier answers per text
+    batch = snapshot.get_agents_for_queries("NoSuchTask", QUERIES, domain="general")
+    single = [snapshot.get_agents_by_task_type("NoSuchTask", domain="general", query_text=q) for q in QUERIES]
+    assert [[a.name for a in agents] for agents in batch] == [[a.name for a in agents] for agents in single]
+    assert batch[0] != batch[1]
+
+
+def test_batch_routing_uses_the_retrieval_tier(monkeypatch):
+    def analyzed(query_text):
+        return AnalyzedQuery(raw_text=query_text, task_type="NoSuchTask", complexity=0.5, domain="general")
+
+    async def extract_query_async(query_text):
+        return analyzed(query_text)
+
+    async def extract_queries_async(query_texts):
+        return [analyzed(q) for q in query_texts]
+
+    monkeypatch.setattr(routing_flow, "extract_query_async", extract_query_async)
+    monkeypatch.setattr(routing_flow, "extract_queries_async", extract_queries_async)
+
+    async def scenario():
+        batch = await routing_flow.run_batch_routing_flow_async(QUERIES)
+        single = [await routing_flow.run_routing_flow_async(q) for q in QUERIES]
+        return batch, single
+
+    batch, single = asyncio.run(scenario())
+    assert [r["chosen_agent"] for r in batch] == [r["chosen_agent"] for r in single]
+    assert [[c["name"] for c in r["top_candidates"]] for r in batch] == \
+        [[c["name"] for c in r["top_candidates"]] for r in single]
+    assert batch[0]["chosen_agent"] != batch[1]["chosen_agent"]
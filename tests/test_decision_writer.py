@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.kg import decision_writer
+from backend.kg.decision_writer import DecisionWriteError, DecisionWriter, replay_dead_letters
+from backend.kg.embedded import get_embedded_graph, load_embedded_graph, set_embedded_graph
+from backend.kg.queries import new_decision
+
+
+class FakeResult:
+    async def consume(self):
+        return None
+
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def run(self, cypher, **params):
+        if "decisions" in params:
+            self.driver.batches.append([d["id"] for d in params["decisions"]])
+        return FakeResult()
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute_write(self, transaction_function):
+        if self.driver.failures > 0:
+            self.driver.failures -= 1
+            raise RuntimeError("Neo4j unavailable")
+        return await transaction_function(FakeTransaction(self.driver))
+
+
+class FakeDriver:
+    """Records the ids of every committed batch; the first `failures` transactions raise."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    fake = FakeDriver()
+    monkeypatch.setattr(decision_writer, "get_async_driver", lambda: fake)
+    monkeypatch.setattr(settings, "kg_profiler_enabled", False)
+    monkeypatch.setattr(settings, "metrics_rollups_enabled", False)
+    return fake
+
+
+def _decisions(count):
+    return [new_decision(f"query {i}", "SummarizerAgent", 0.9, "Summarization", "general") for i in range(count)]
+
+
+def _writer(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0.01)
+    kwargs.setdefault("retry_backoff", 0.01)
+    return DecisionWriter(dead_letter_path=tmp_path / "dead.jsonl", **kwargs)
+
+
+def test_flush_writes_in_batches_of_batch_size(driver, tmp_path):
+    async def scenario():
+        writer = _writer(tmp_path, batch_size=2)
+        decisions = _decisions(5)
+        for decision in decisions:
+            await writer.enqueue(decision)
+        await writer.flush()
+        return writer, decisions
+
+    writer, decisions = asyncio.run(scenario())
+    assert [len(batch) for batch in driver.batches] == [2, 2, 1]
+    assert [i for batch in driver.batches for i in batch] == [d["id"] for d in decisions]
+    assert writer.stats()["written"] == 5 and writer.stats()["batches"] == 3
+    assert all(writer.pending_decision(d["id"]) is None for d in decisions)
+
+
+def test_background_worker_joins_concurrent_decisions(driver, tmp_path):
+    async def scenario():
+        writer = _writer(tmp_path, batch_size=100, flush_interval=0.05)
+        writer.start()
+        decisions = _decisions(10)
+        for decision in decisions:
+            await writer.enqueue(decision)
+        await writer.ensure_written(decisions[-1]["id"])
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in driver.batches] == [10]
+
+
+def test_failed_batch_stays_pending_and_is_retried(driver, tmp_path):
+    driver.failures = 2
+
+    async def scenario():
+        writer = _writer(tmp_path, max_retries=3)
+        decision = _decisions(1)[0]
+        await writer.enqueue(decision)
+        await writer.flush()
+        # The id was handed out already: it must stay visible while it waits for a retry
+        assert writer.pending_decision(decision["id"]) is decision
+        await writer.ensure_written(decision["id"])
+        return writer, decision
+
+    writer, decision = asyncio.run(scenario())
+    assert driver.batches == [[decision["id"]]]
+    stats = writer.stats()
+    assert stats["failed"] == 2 and stats["retried"] == 2 and stats["written"] == 1
+    assert stats["dead_lettered"] == 0
+    assert not (tmp_path / "dead.jsonl").exists()
+
+
+def test_batch_is_dead_lettered_after_max_retries(driver, tmp_path):
+    driver.failures = 100
+
+    async def scenario():
+        writer = _writer(tmp_path, max_retries=2)
+        decisions = _decisions(3)
+        for decision in decisions:
+            await writer.enqueue(decision)
+        with pytest.raises(DecisionWriteError, match="Neo4j unavailable"):
+            await writer.ensure_written(decisions[0]["id"])
+        return writer, decisions
+
+    writer, decisions = asyncio.run(scenario())
+    assert writer.stats()["dead_lettered"] == 3
+    assert writer.pending_decision(decisions[0]["id"]) is None
+    lines = [json.loads(line) for line in (tmp_path / "dead.jsonl").read_text().splitlines()]
+    assert [line["decision"]["id"] for line in lines] == [d["id"] for d in decisions]
+    assert lines[0]["error"] == "Neo4j unavailable"
+
+
+def test_stop_dead_letters_and_raises_instead_of_dropping(driver, tmp_path):
+    driver.failures = 100
+
+    async def scenario():
+        # A long backoff: stop() must not wait for it
+        writer = _writer(tmp_path, max_retries=5, retry_backoff=60.0)
+        for decision in _decisions(2):
+            await writer.enqueue(decision)
+        await writer.flush()
+        assert writer.stats()["retried"] == 2
+        with pytest.raises(DecisionWriteError, match="2 routing decisions"):
+            await asyncio.wait_for(writer.stop(), timeout=5.0)
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert writer.stats()["dead_lettered"] == 2
+    assert len((tmp_path / "dead.jsonl").read_text().splitlines()) == 2
+
+
+def test_replay_writes_dead_lettered_decisions(driver, tmp_path):
+    driver.failures = 100
+
+    async def scenario():
+        writer = _writer(tmp_path, max_retries=0)
+        decisions = _decisions(2)
+        for decision in decisions:
+            await writer.enqueue(decision)
+        await writer.flush()
+        return decisions
+
+    decisions = asyncio.run(scenario())
+    previous = get_embedded_graph()
+    set_embedded_graph(load_embedded_graph())
+    try:
+        assert replay_dead_letters(tmp_path / "dead.jsonl") == 2
+        graph = get_embedded_graph()
+        assert all(graph.find_node("RoutingDecision", id=d["id"]) is not None for d in decisions)
+        assert not (tmp_path / "dead.jsonl").exists()
+        assert (tmp_path / "dead.jsonl.replayed").exists()
+    finally:
+        set_embedded_graph(previous)
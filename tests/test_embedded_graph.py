@@ -0,0 +1,139 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.kg import async_queries, queries, snapshot
+from backend.kg.backend import KGBackend
+from backend.kg.embedded import EmbeddedGraph, get_embedded_graph, set_embedded_graph
+
+GRAPH = """
+MATCH (n) DETACH DELETE n;
+MERGE (a:Agent {name: 'Summarizer', capabilityLevel: 0.9, domainExpertise: 'general', historicalAccuracy: 0.8,
+                description: 'Summarizes long documents'});
+MERGE (b:Agent {name: 'Charter', capabilityLevel: 0.7, domainExpertise: 'analytics', historicalAccuracy: 0.6,
+                description: 'Draws charts'});
+MERGE (c:Capability {name: 'DocumentSummarization'});
+MERGE (v:Capability {name: 'DataVisualization'});
+MERGE (t:TaskType {name: 'SummarizationTask'});
+MATCH (a:Agent {name: 'Summarizer'}), (c:Capability {name: 'DocumentSummarization'})
+MERGE (a)-[:HAS_CAPABILITY]->(c);
+MATCH (b:Agent {name: 'Charter'}), (v:Capability {name: 'DataVisualization'})
+MERGE (b)-[:HAS_CAPABILITY]->(v);
+MATCH (t:TaskType {name: 'SummarizationTask'}), (c:Capability {name: 'DocumentSummarization'})
+MERGE (t)-[:REQUIRES_CAPABILITY]->(c);
+MATCH (b:Agent {name: 'Charter'}), (a:Agent {name: 'Summarizer'})
+MERGE (b)-[:FALLBACK_AGENT]->(a);
+"""
+
+
+@pytest.fixture
+def graph():
+    previous = get_embedded_graph()
+    graph = EmbeddedGraph()
+    graph.load_cypher(GRAPH)
+    set_embedded_graph(graph)
+    yield graph
+    set_embedded_graph(previous)
+
+
+def _abstract_methods():
+    return sorted(name for name, member in vars(KGBackend).items() if getattr(member, "__isabstractmethod__", False))
+
+
+def test_every_backend_operation_has_a_dispatched_neo4j_function():
+    for name in _abstract_methods():
+        function = getattr(queries, name)
+        assert hasattr(function, "__wrapped__"), f"queries.{name} is not decorated with backend_dispatch"
+        assert name in vars(EmbeddedGraph), f"EmbeddedGraph does not implement {name}"
+        if hasattr(async_queries, name):
+            assert hasattr(getattr(async_queries, name), "__wrapped__"), f"async_queries.{name} is not dispatched"
+
+
+def test_dispatch_sends_sync_async_and_generator_calls_to_the_embedded_graph(graph):
+    assert [a.name for a in queries.get_agents_by_task_type("SummarizationTask")] == ["Summarizer"]
+    assert [a.name for a in asyncio.run(async_queries.get_agents_by_task_type("SummarizationTask"))] == ["Summarizer"]
+    assert queries.get_fallback_agent("Charter").name == "Summarizer"
+    assert queries.get_agent_capabilities("Charter") == ["DataVisualization"]
+
+    async def visualization():
+        return [item async for item in async_queries.iter_kg_for_visualization()]
+
+    kinds = {kind for kind, _ in asyncio.run(visualization())}
+    assert {"node", "edge"} <= kinds
+
+
+def test_cypher_loader_builds_nodes_and_relationships(graph):
+    assert {n["name"] for n in graph.nodes("Agent")} == {"Summarizer", "Charter"}
+    summarizer = graph.find_node("Agent", name="Summarizer")
+    assert summarizer["capabilityLevel"] == 0.9
+    assert [c["name"] for c in graph.outgoing(summarizer, "HAS_CAPABILITY")] == ["DocumentSummarization"]
+    # MERGE does not duplicate
+    graph.load_cypher("MERGE (c:Capability {name: 'DocumentSummarization'});")
+    assert len(graph.nodes("Capability")) == 2
+
+
+def test_the_current_snapshot_is_the_process_wide_graphs(graph):
+    assert snapshot.get_snapshot() is graph.routing_snapshot()
+    assert snapshot.load_snapshot() is graph.routing_snapshot()
+
+
+def test_a_graph_that_is_not_the_process_wide_one_routes_from_its_own_contents(graph):
+    live = graph.routing_snapshot()
+    other = EmbeddedGraph()
+    other.load_cypher("""
+MERGE (a:Agent {name: 'Translator', capabilityLevel: 0.8, domainExpertise: 'general'});
+MERGE (c:Capability {name: 'Translation'});
+MERGE (t:TaskType {name: 'TranslationTask'});
+MATCH (a:Agent {name: 'Translator'}), (c:Capability {name: 'Translation'})
+MERGE (a)-[:HAS_CAPABILITY]->(c);
+MATCH (t:TaskType {name: 'TranslationTask'}), (c:Capability {name: 'Translation'})
+MERGE (t)-[:REQUIRES_CAPABILITY]->(c);
+""")
+    assert [a.name for a in other.get_agents_by_task_type("TranslationTask")] == ["Translator"]
+    assert [a.name for a in other.get_agents_by_task_type("SummarizationTask")] == ["Translator"]
+    assert other.get_agent_capabilities("Translator") == ["Translation"]
+    assert other.get_agent_capabilities("Summarizer") == []
+    assert other.routing_snapshot().version != live.version
+
+    # Building and writing to another graph leaves the live one's snapshot alone
+    other.create_node(["Agent"], {"name": "Writer"})
+    assert graph.routing_snapshot() is live
+    assert snapshot.get_snapshot() is live
+
+
+def test_concurrent_readers_after_a_write_share_one_rebuild(graph, monkeypatch):
+    graph.routing_snapshot()
+    graph.set_properties(graph.find_node("Agent", name="Charter"), {"description": "Charts and tables"})
+    builds = []
+    read = graph.routing_subgraph
+
+    def routing_subgraph():
+        builds.append(1)
+        return read()
+
+    monkeypatch.setattr(graph, "routing_subgraph", routing_subgraph)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        snapshots = list(pool.map(lambda _: graph.routing_snapshot(), range(32)))
+    assert len(builds) == 1
+    assert all(s is snapshots[0] for s in snapshots)
+
+
+def test_feedback_does_not_rebuild_the_snapshot(graph):
+    before = graph.routing_snapshot()
+    before.retrieval_index()
+    rd_id = queries.create_routing_decision("summarize this", "Summarizer", 0.9)
+    queries.apply_feedback([(rd_id, True)])
+    assert graph.routing_snapshot() is before
+
+
+def test_structural_writes_rebuild_the_snapshot(graph):
+    before = graph.routing_snapshot()
+    graph.set_properties(graph.find_node("Agent", name="Charter"), {"description": "Summarizes and charts"})
+    after_property = graph.routing_snapshot()
+    assert after_property is not before and after_property.version > before.version
+
+    charter = graph.find_node("Agent", name="Charter")
+    graph.create_relationship(charter, "HAS_CAPABILITY", graph.find_node("Capability", name="DocumentSummarization"))
+    assert [a.name for a in queries.get_agents_by_task_type("SummarizationTask")] == ["Summarizer", "Charter"]
+    assert graph.routing_snapshot().version > after_property.version
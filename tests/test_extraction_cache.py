@@ -0,0 +1,190 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from backend.config import settings
+from backend.extraction import cache as cache_module
+from backend.extraction import llm_extractor
+from backend.extraction.cache import BATCH_TEMPLATE_HASH, ExtractionCache, cache_key
+
+VALUE = {"task_type": "SummarizationTask", "complexity": 0.4, "domain": "general", "output_format": None}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time() as seen by the cache."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_memory_tier_expires_after_ttl(clock):
+    cache = ExtractionCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", VALUE)
+    clock[0] += 59
+    assert cache.get("a") == VALUE
+    clock[0] += 2
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["expirations"] == 1 and stats["misses"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ExtractionCache(max_entries=2)
+    cache.set("a", VALUE)
+    cache.set("b", VALUE)
+    cache.get("a")
+    cache.set("c", VALUE)
+    assert cache.get("b") is None
+    assert cache.get("a") == VALUE and cache.get("c") == VALUE
+    assert cache.stats()["evictions"] == 1
+
+
+def test_returned_values_are_copies():
+    cache = ExtractionCache()
+    cache.set("a", VALUE)
+    cache.get("a")["domain"] = "legal"
+    assert cache.get("a")["domain"] == "general"
+
+
+def test_disk_tier_survives_restart_and_honours_its_ttl(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ExtractionCache(ttl_seconds=60, path=path, disk_ttl_seconds=3600)
+    cache.set("a", VALUE)
+    cache.close()
+
+    reopened = ExtractionCache(ttl_seconds=60, path=path, disk_ttl_seconds=3600)
+    assert reopened.get("a") == VALUE
+    assert reopened.stats()["disk_hits"] == 1
+    # Past the memory TTL the row is read from disk again; past the disk TTL it is gone
+    clock[0] += 3601
+    assert reopened.get("a") is None
+    reopened.close()
+
+
+def test_get_async_reads_the_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ExtractionCache(path=path)
+    cache.set("a", VALUE)
+    cache.close()
+
+    reopened = ExtractionCache(path=path)
+    assert asyncio.run(reopened.get_async("a")) == VALUE
+    assert asyncio.run(reopened.get_async("missing")) is None
+    assert reopened.stats()["disk_hits"] == 1 and reopened.stats()["misses"] == 1
+    reopened.close()
+
+
+def test_set_does_not_wait_for_the_disk(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", VALUE)
+    # Queued for the writer thread, already served from memory
+    assert cache.get("a") == VALUE
+    cache.flush()
+    assert cache.stats()["disk_writes"] == 1
+    cache.close()
+
+
+def test_disk_tier_is_pruned_to_its_row_cap(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ExtractionCache(max_entries=1, path=path, disk_max_entries=3)
+    for i in range(5):
+        clock[0] += 1
+        cache.set(f"k{i}", VALUE)
+    cache.flush(prune=True)
+    assert cache.stats()["disk_pruned"] == 2
+    # The oldest rows went first
+    assert cache.get("k0") is None and cache.get("k1") is None
+    assert all(cache.get(f"k{i}") == VALUE for i in range(2, 5))
+    cache.close()
+
+
+def test_get_many_async_reads_the_disk_once_and_counts_one_lookup_per_group(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ExtractionCache(path=path)
+    cache.set("a-batch", dict(VALUE, domain="batch"))
+    cache.set("b", VALUE)
+    cache.set("b-batch", dict(VALUE, domain="batch"))
+    cache.close()
+
+    reopened = ExtractionCache(path=path)
+    reopened.set("c-batch", VALUE)
+    reads = []
+    disk_rows = reopened._disk_rows
+    monkeypatch.setattr(reopened, "_disk_rows", lambda keys: reads.append(keys) or disk_rows(keys))
+    groups = [["a", "a-batch"], ["b", "b-batch"], ["c", "c-batch"], ["d", "d-batch"]]
+    values = asyncio.run(reopened.get_many_async(groups))
+    assert [v and v["domain"] for v in values] == ["batch", "general", "general", None]
+    # c was answered from memory; the rest share one read
+    assert reads == [["a", "a-batch", "b", "b-batch", "d", "d-batch"]]
+    stats = reopened.stats()
+    assert stats["memory_hits"] == 1 and stats["disk_hits"] == 2 and stats["misses"] == 1
+    reopened.close()
+
+
+def test_flush_gives_up_on_a_dead_or_stuck_writer(tmp_path, monkeypatch):
+    cache = ExtractionCache(path=str(tmp_path / "cache.sqlite3"))
+    release = threading.Event()
+    monkeypatch.setattr(cache, "_write_rows", lambda db, rows: release.wait())
+    cache.set("a", VALUE)
+    assert cache.flush(timeout=0.2) is False
+    release.set()
+    assert cache.flush(timeout=5.0) is True
+
+    cache._writes.put(cache_module._STOP)
+    cache._writer.join()
+    started = time.monotonic()
+    assert cache.flush(timeout=5.0) is False
+    assert time.monotonic() - started < 1.0
+    cache.close()
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", VALUE)
+    cache.clear()
+    assert cache.get("a") is None
+    cache.close()
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    """An in-memory cache, no local classifier and a fake LLM that records its prompts."""
+    cache = ExtractionCache()
+    prompts = []
+
+    async def fake_llm(prompt, max_output_tokens=500, default_on_deadline=True):
+        prompts.append(prompt)
+        if "numbered user queries" in prompt:
+            return json.dumps([dict(VALUE, index=1, domain="research"), dict(VALUE, index=2, domain="research")])
+        return json.dumps(VALUE)
+
+    monkeypatch.setattr(settings, "llm_api_key", "test-key")
+    monkeypatch.setattr(llm_extractor, "get_extraction_cache", lambda: cache)
+    monkeypatch.setattr(llm_extractor, "classify_locally", lambda query_text, threshold: None)
+    monkeypatch.setattr(llm_extractor, "call_llm_async", fake_llm)
+    return cache, prompts
+
+
+def test_batch_results_do_not_answer_single_extractions(extractor):
+    cache, prompts = extractor
+    queries = ["first query", "second query"]
+    batch = asyncio.run(llm_extractor.extract_queries_async(queries))
+    assert [a.domain for a in batch] == ["research", "research"]
+    # One lookup per query, though each checks both prompts' keys
+    assert cache.stats()["misses"] == 2
+    assert cache.get(cache_key(queries[0], template_hash=BATCH_TEMPLATE_HASH)) is not None
+    assert cache.get(cache_key(queries[0])) is None
+
+    single = asyncio.run(llm_extractor.extract_query_async(queries[0]))
+    assert single.extraction_tier == llm_extractor.LLM
+    assert single.domain == "general"
+    assert len(prompts) == 2
+
+    # A repeated batch is served from its own entries without another call
+    again = asyncio.run(llm_extractor.extract_queries_async(queries))
+    assert [a.extraction_tier for a in again] == [llm_extractor.CACHE] * 2
+    assert len(prompts) == 2
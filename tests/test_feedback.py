@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from backend.agents.feedback_collector import record_feedback, record_feedback_async, record_feedback_batch
+from backend.config import settings
+from backend.kg.embedded import get_embedded_graph, load_embedded_graph, set_embedded_graph
+from backend.kg.queries import create_routing_decision, get_routing_metrics
+
+AGENT = "ContentSummarizer"
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_rollups_enabled", True)
+    previous = get_embedded_graph()
+    set_embedded_graph(load_embedded_graph())
+    yield get_embedded_graph()
+    set_embedded_graph(previous)
+
+
+def _counts(graph):
+    agent = graph.find_node("Agent", name=AGENT)
+    return agent.get("successCount", 0), agent.get("failureCount", 0)
+
+
+def _agent_metrics():
+    rows = {row["agent_name"]: row for row in get_routing_metrics()["agent_performance"]}
+    return rows[AGENT]["successes"], rows[AGENT]["failures"]
+
+
+def test_relabelling_moves_the_decision_between_counters(graph):
+    rd_id = create_routing_decision("summarize this report", AGENT, 0.9)
+    start = _counts(graph)
+
+    record_feedback(rd_id, True)
+    assert _counts(graph) == (start[0] + 1, start[1])
+    assert _agent_metrics() == (1, 0)
+
+    record_feedback(rd_id, False)
+    assert _counts(graph) == (start[0], start[1] + 1)
+    assert _agent_metrics() == (0, 1)
+
+    # The same label again changes nothing
+    result = record_feedback_batch([(rd_id, False)])
+    assert result["applied"] == 1
+    assert result["agents"][AGENT]["successes"] == 0 and result["agents"][AGENT]["failures"] == 0
+    assert _counts(graph) == (start[0], start[1] + 1)
+    assert _agent_metrics() == (0, 1)
+
+
+def test_record_feedback_accepts_the_old_signature(graph):
+    rd_id = create_routing_decision("summarize this report", AGENT, 0.9)
+    with pytest.warns(DeprecationWarning, match="agent_name is ignored"):
+        result = record_feedback(rd_id, "SomeOtherAgent", True)
+    # The decision's own agent is credited
+    assert result["agent_name"] == AGENT and result["outcome"] == "SUCCESS"
+
+    with pytest.warns(DeprecationWarning):
+        result = asyncio.run(record_feedback_async(rd_id, agent_name=AGENT, success=False))
+    assert result["outcome"] == "FAILURE"
+
+    assert record_feedback(rd_id, success=True)["outcome"] == "SUCCESS"
+    with pytest.raises(TypeError):
+        record_feedback(rd_id)
+
+
+@pytest.mark.parametrize("args, kwargs, success", [
+    ((True,), {}, True),
+    ((), {"success": False}, False),
+])
+def test_current_call_forms_do_not_warn(graph, recwarn, args, kwargs, success):
+    rd_id = create_routing_decision("summarize this report", AGENT, 0.9)
+    assert record_feedback(rd_id, *args, **kwargs)["outcome"] == ("SUCCESS" if success else "FAILURE")
+    assert asyncio.run(record_feedback_async(rd_id, *args, **kwargs))["outcome"] == ("SUCCESS" if success else "FAILURE")
+    assert not [w for w in recwarn if issubclass(w.category, DeprecationWarning)]
+
+
+LEGACY_CALL_FORMS = [
+    (("SomeOtherAgent", True), {}),
+    (("SomeOtherAgent",), {"success": True}),
+    ((True,), {"agent_name": "SomeOtherAgent"}),
+    ((), {"agent_name": "SomeOtherAgent", "success": True}),
+]
+
+
+@pytest.mark.parametrize("args, kwargs", LEGACY_CALL_FORMS)
+def test_legacy_call_forms_warn_at_the_caller(graph, args, kwargs):
+    rd_id = create_routing_decision("summarize this report", AGENT, 0.9)
+    with pytest.warns(DeprecationWarning, match="agent_name is ignored") as caught:
+        result = record_feedback(rd_id, *args, **kwargs)
+    assert result["agent_name"] == AGENT and result["outcome"] == "SUCCESS"
+    assert caught[0].filename == __file__
+
+    async def scenario():
+        return await record_feedback_async(rd_id, *args, **kwargs)
+
+    with pytest.warns(DeprecationWarning, match="agent_name is ignored") as caught:
+        result = asyncio.run(scenario())
+    assert result["agent_name"] == AGENT and result["outcome"] == "SUCCESS"
+    assert caught[0].filename == __file__
+
+
+@pytest.mark.parametrize("args, kwargs", [
+    ((), {}),
+    (("SomeOtherAgent",), {}),
+    ((True, False), {"success": True}),
+    (("SomeOtherAgent", True, False), {}),
+    ((True,), {"success": True}),
+])
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_malformed_calls_raise_type_error(graph, args, kwargs):
+    rd_id = create_routing_decision("summarize this report", AGENT, 0.9)
+    with pytest.raises(TypeError):
+        record_feedback(rd_id, *args, **kwargs)
+    with pytest.raises(TypeError):
+        asyncio.run(record_feedback_async(rd_id, *args, **kwargs))
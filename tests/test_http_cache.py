@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+
+from backend.api import http_cache
+from backend.api.http_cache import ResponseCache, cached_json, etag_matches
+from backend.config import settings
+from backend.kg.graph_version import bump_graph_version
+
+
+def _request(path="/agents/", query="", if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": headers})
+
+
+class Builds:
+    def __init__(self, body=None, delay=0.0, error=None):
+        self.calls = 0
+        self.body = body if body is not None else {"agents": ["Summarizer"]}
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.body
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    shared = {"version": (10, 4, 1)}
+
+    async def get_shared_graph_version():
+        return shared["version"]
+
+    monkeypatch.setattr(settings, "http_cache_enabled", True)
+    monkeypatch.setattr(settings, "http_cache_version_check_seconds", 0.0)
+    monkeypatch.setattr(http_cache, "_cache", ResponseCache(8, 60.0))
+    monkeypatch.setattr(http_cache, "_shared_version", None)
+    monkeypatch.setattr(http_cache, "get_shared_graph_version", get_shared_graph_version)
+    return shared
+
+
+def test_etag_and_not_modified():
+    build = Builds()
+
+    async def scenario():
+        first = await cached_json(_request(), build)
+        etag = first.headers["etag"]
+        revalidated = await cached_json(_request(if_none_match=etag), build)
+        weak = await cached_json(_request(if_none_match=f'"other", W/{etag}'), build)
+        other = await cached_json(_request(if_none_match='"other"'), build)
+        return first, revalidated, weak, other
+
+    first, revalidated, weak, other = asyncio.run(scenario())
+    assert first.status_code == 200 and first.body == b'{"agents":["Summarizer"]}'
+    assert first.headers["cache-control"] == "no-cache"
+    assert revalidated.status_code == 304 and revalidated.body == b""
+    assert revalidated.headers["etag"] == first.headers["etag"]
+    assert weak.status_code == 304
+    assert other.status_code == 200 and other.body == first.body
+    assert build.calls == 1
+    assert etag_matches("*", first.headers["etag"])
+    assert not etag_matches(None, first.headers["etag"])
+
+
+def test_bodies_are_keyed_by_path_and_query_string():
+    build = Builds()
+
+    async def scenario():
+        await cached_json(_request(query="task_type=a&x=1"), build)
+        await cached_json(_request(query="x=1&task_type=a"), build)
+        await cached_json(_request(query="task_type=b"), build)
+
+    asyncio.run(scenario())
+    assert build.calls == 2
+
+
+def test_local_writes_and_other_workers_writes_rebuild_the_body(cache):
+    build = Builds()
+
+    async def scenario():
+        await cached_json(_request(), build)
+        bump_graph_version()
+        await cached_json(_request(), build)
+        # A decision written by another API worker moves the shared rollup counters
+        cache["version"] = (11, 4, 1)
+        await cached_json(_request(), build)
+        await cached_json(_request(), build)
+
+    asyncio.run(scenario())
+    assert build.calls == 3
+
+
+def test_shared_version_is_reread_only_after_the_check_interval(cache, monkeypatch):
+    monkeypatch.setattr(settings, "http_cache_version_check_seconds", 60.0)
+    build = Builds()
+
+    async def scenario():
+        await cached_json(_request(), build)
+        cache["version"] = (11, 4, 1)
+        await cached_json(_request(), build)
+
+    asyncio.run(scenario())
+    assert build.calls == 1
+
+
+def test_concurrent_misses_share_one_build():
+    build = Builds(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(cached_json(_request(), build) for _ in range(10)))
+
+    responses = asyncio.run(scenario())
+    assert build.calls == 1
+    assert {r.body for r in responses} == {b'{"agents":["Summarizer"]}'}
+    assert http_cache.get_response_cache().stats()["coalesced"] == 9
+
+
+def test_a_failed_build_reaches_every_waiter_and_is_not_cached():
+    failing = Builds(delay=0.02, error=HTTPException(status_code=404, detail="Agent X not found"))
+
+    async def scenario():
+        return await asyncio.gather(*(cached_json(_request("/agents/X"), failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert failing.calls == 1
+    assert all(isinstance(e, HTTPException) and e.status_code == 404 for e in errors)
+
+    build = Builds()
+    assert asyncio.run(cached_json(_request("/agents/X"), build)).status_code == 200
+    assert build.calls == 1
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_build():
+    build = Builds(delay=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(cached_json(_request(), build))
+        second = asyncio.ensure_future(cached_json(_request(), build))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert build.calls == 1
+
+
+def test_response_cache_evicts_least_recently_used_and_expires(monkeypatch):
+    cache = ResponseCache(max_entries=2, max_age_seconds=30.0)
+    for key in ("a", "b"):
+        cache.put(key, 1, key.encode())
+    assert cache.get("a", 1) is not None
+    cache.put("c", 1, b"c")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None and cache.get("c", 1) is not None
+    assert cache.get("a", 2) is None
+    assert cache.stats()["evictions"] == 1
+
+    now = http_cache.time.monotonic()
+    monkeypatch.setattr(http_cache.time, "monotonic", lambda: now + 31.0)
+    assert cache.get("a", 1) is None
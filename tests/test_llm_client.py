@@ -0,0 +1,61 @@
+import asyncio
+
+from backend.extraction.llm_client import MIN_HEDGE_SAMPLES, LLMClient
+
+
+def _client(**kwargs):
+    kwargs.setdefault("hedge_min_delay_seconds", 0.0)
+    return LLMClient(send=None, send_async=None, **kwargs)
+
+
+def test_hedge_delay_needs_enough_samples():
+    client = _client()
+    for _ in range(MIN_HEDGE_SAMPLES - 1):
+        client._observe(0.1)
+    assert client.hedge_delay() is None
+    client._observe(0.1)
+    assert client.hedge_delay() == 0.1
+
+
+def test_hedge_delay_is_the_quantile_of_completed_calls():
+    client = _client(hedge_quantile=0.9)
+    for i in range(1, 101):
+        client._observe(i / 100)
+    assert client.hedge_delay() == 0.9
+
+
+def test_cancelled_calls_keep_the_hedge_delay_from_drifting_down():
+    client = _client(hedge_quantile=0.95)
+    for _ in range(80):
+        client._observe(0.1)
+    # Every slow call lost to its hedge; all that is known is it ran 0.5s or more
+    for _ in range(20):
+        client._observe(0.5, censored=True)
+    assert client.hedge_delay() == 0.5
+
+    # Censored samples below the quantile only shrink the risk set
+    client = _client(hedge_quantile=0.5)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        client._observe(seconds)
+    for _ in range(MIN_HEDGE_SAMPLES):
+        client._observe(0.05, censored=True)
+    assert client.hedge_delay() == 0.2
+
+
+def test_the_attempt_that_loses_to_a_hedge_is_recorded_as_censored():
+    calls = []
+
+    async def send_async(prompt, max_output_tokens):
+        calls.append(prompt)
+        # The first request stalls, the hedge answers
+        await asyncio.sleep(5.0 if len(calls) == 1 else 0.01)
+        return "answer"
+
+    client = LLMClient(send=None, send_async=send_async, hedge_min_delay_seconds=0.02, timeout_seconds=2.0)
+    for _ in range(MIN_HEDGE_SAMPLES):
+        client._observe(0.02)
+
+    assert asyncio.run(client.generate_async("prompt")) == "answer"
+    assert len(calls) == 2
+    censored = [seconds for seconds, is_censored in client._latencies if is_censored]
+    assert len(censored) == 1 and censored[0] >= 0.02
@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.kg import metrics_rollups as mr
+from backend.kg.metrics_rollups import backfill_rollups, counted_live, decision_rollups, feedback_rollups, history_rollups
+
+MORNING = datetime(2026, 3, 1, 9, 30, tzinfo=timezone.utc)
+
+
+def _by_id(rollups):
+    return {r["id"]: r for r in rollups}
+
+
+def test_decision_rollups_count_every_scope():
+    rollups = _by_id(decision_rollups([
+        {"agentName": "Summarizer", "timestamp": MORNING, "confidence": 0.8},
+        {"agentName": "Summarizer", "timestamp": MORNING + timedelta(hours=1), "confidence": 0.4},
+        {"agentName": None, "timestamp": MORNING, "confidence": None},
+    ]))
+    assert rollups["global:all"]["decisions"] == 3
+    assert rollups["global:all"]["confidenceSum"] == pytest.approx(1.2)
+    assert rollups["agent:Summarizer"]["decisions"] == 2
+    assert rollups["day:2026-03-01"]["decisions"] == 3
+    assert rollups["hour:2026-03-01T09"]["decisions"] == 2 and rollups["hour:2026-03-01T10"]["decisions"] == 1
+    assert all(r["successes"] == r["failures"] == 0 for r in rollups.values())
+
+
+def test_feedback_rollups_move_relabelled_decisions():
+    def change(previous, outcome):
+        return {"agent": "Summarizer", "previous": previous, "outcome": outcome, "timestamp": MORNING}
+
+    first = _by_id(feedback_rollups([change("PENDING", "SUCCESS")]))
+    assert (first["agent:Summarizer"]["successes"], first["agent:Summarizer"]["failures"]) == (1, 0)
+
+    moved = _by_id(feedback_rollups([change("SUCCESS", "FAILURE")]))
+    for row in moved.values():
+        assert (row["decisions"], row["successes"], row["failures"]) == (0, -1, 1)
+
+    assert feedback_rollups([change("FAILURE", "FAILURE")]) == []
+
+
+def test_history_rollups_sum_decisions_and_outcomes():
+    rollups = _by_id(history_rollups([
+        {"agentName": "Summarizer", "timestamp": MORNING, "confidence": 0.5, "outcome": "SUCCESS"},
+        {"agentName": "Summarizer", "timestamp": MORNING, "confidence": 0.5, "outcome": "FAILURE"},
+        {"agentName": "Summarizer", "timestamp": MORNING, "confidence": 0.5, "outcome": "PENDING"},
+    ]))
+    row = rollups["agent:Summarizer"]
+    assert (row["decisions"], row["confidenceSum"], row["successes"], row["failures"]) == (3, 1.5, 1, 1)
+
+
+class FakeResult:
+    def __init__(self, records=()):
+        self.records = list(records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def consume(self):
+        return None
+
+
+class FakeGraph:
+    """Answers the backfill's statements from a list of decisions; records each write transaction."""
+
+    def __init__(self, decisions, status=None):
+        self.decisions = decisions
+        self.status = status
+        self.rollups = {}
+        self.transactions = []
+        self.rebuilt_until = None
+        # Called after each committed write transaction, to interleave live writes
+        self.after_commit = None
+
+    def run(self, cypher, **params):
+        if self.transactions and self.transactions[-1] is not None:
+            self.transactions[-1].append((cypher, params))
+        if cypher == mr.BACKFILL_CLAIM_CYPHER:
+            return FakeResult([{"status": self.status, "startedAt": None}])
+        if cypher == mr.BACKFILL_START_CYPHER:
+            self.status = "running"
+            self.rebuilt_until = None
+        elif cypher == mr.BACKFILL_PROGRESS_CYPHER:
+            self.rebuilt_until = params["until"]
+        elif cypher == mr.BACKFILL_FINISH_CYPHER:
+            self.status = "complete"
+        elif cypher == mr.BACKFILL_CLEAR_CYPHER:
+            deleted = len([r for r in self.rollups.values() if r["scope"] != mr.COMPACTED])
+            self.rollups = {}
+            return FakeResult([{"deleted": deleted}])
+        elif cypher == mr.BACKFILL_NEXT_DECISION_CYPHER:
+            later = [d["timestamp"] for d in self.decisions if d["timestamp"] and d["timestamp"] >= params["start"]]
+            return FakeResult([{"timestamp": min(later, default=None)}])
+        elif cypher in (mr.BACKFILL_DECISIONS_CYPHER, mr.BACKFILL_UNTIMED_DECISIONS_CYPHER):
+            return FakeResult(self._matching(cypher, params))
+        elif cypher == mr.ROLLUP_MERGE_CYPHER:
+            self.merge(params["rollups"])
+        elif cypher == mr.ROLLUP_COUNT_CYPHER:
+            return FakeResult([{"rollups": len([r for r in self.rollups.values() if r["scope"] == params["scope"]])}])
+        return FakeResult()
+
+    def merge(self, deltas):
+        for delta in deltas:
+            row = self.rollups.setdefault(delta["id"], dict(delta, decisions=0, confidenceSum=0.0, successes=0, failures=0))
+            for name in ("decisions", "confidenceSum", "successes", "failures"):
+                row[name] += delta[name]
+
+    def gate(self):
+        return {"status": self.status, "rebuiltUntil": self.rebuilt_until}
+
+    def _matching(self, cypher, params):
+        rows = []
+        for d in self.decisions:
+            if cypher == mr.BACKFILL_UNTIMED_DECISIONS_CYPHER:
+                matched = d["timestamp"] is None
+            else:
+                matched = d["timestamp"] is not None and d["timestamp"] >= params["start"] and (
+                    params["end"] is None or d["timestamp"] < params["end"])
+            if matched:
+                rows.append({"agent": d["agentName"], "timestamp": d["timestamp"],
+                             "confidence": d["confidence"], "outcome": d["outcome"]})
+        return rows
+
+    def execute_write(self, transaction_function):
+        self.transactions.append([])
+        try:
+            return transaction_function(self)
+        finally:
+            self.transactions.append(None)
+            if self.after_commit is not None:
+                self.after_commit(self)
+
+
+def _history(now):
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    three_days_ago = midnight - timedelta(days=3)
+    days = [midnight - timedelta(days=40), three_days_ago + timedelta(hours=1), three_days_ago + timedelta(hours=2), now]
+    decisions = [
+        {"agentName": f"Agent{i % 2}", "timestamp": moment, "confidence": 0.5, "outcome": ("SUCCESS", "FAILURE", "PENDING")[i % 3]}
+        for i, moment in enumerate(days)
+    ]
+    decisions.append({"agentName": "Agent0", "timestamp": None, "confidence": 0.9, "outcome": "SUCCESS"})
+    return decisions
+
+
+def test_backfill_rebuilds_one_day_per_transaction_and_marks_complete_with_the_last():
+    now = datetime.now(timezone.utc)
+    graph = FakeGraph(_history(now))
+    counts = backfill_rollups(graph)
+
+    assert graph.status == "complete"
+    expected = _by_id(history_rollups(graph.decisions))
+    assert {k: (r["decisions"], r["successes"], r["failures"]) for k, r in graph.rollups.items()} == \
+        {k: (r["decisions"], r["successes"], r["failures"]) for k, r in expected.items()}
+    assert counts[mr.GLOBAL] == 1 and counts[mr.AGENT] == 2
+
+    writes = [tx for tx in graph.transactions if tx]
+    ranges = [params for tx in writes for cypher, params in tx if cypher == mr.BACKFILL_DECISIONS_CYPHER]
+    # Two past days with decisions (empty days are skipped), then the open range
+    assert len(ranges) == 3 and ranges[-1]["end"] is None
+    assert all(p["end"] - p["start"] == mr.BACKFILL_RANGE for p in ranges[:-1])
+    # Each rebuild transaction locks the marker before it reads, the last one marking it complete
+    rebuilds = [tx for tx in writes if tx[0][0] != mr.BACKFILL_CLEAR_CYPHER][1:]
+    assert [tx[0][0] for tx in rebuilds] == [mr.BACKFILL_PROGRESS_CYPHER] * 3 + [mr.BACKFILL_FINISH_CYPHER]
+    assert mr.BACKFILL_DECISIONS_CYPHER in [cypher for cypher, _ in rebuilds[-1]]
+
+
+def test_live_writes_during_the_backfill_are_counted_exactly_once():
+    now = datetime.now(timezone.utc)
+    graph = FakeGraph(_history(now))
+    decisions = graph.decisions
+    old, pending_day = decisions[0], decisions[2]
+    live = {"done": False}
+
+    def relabel(decision, outcome):
+        change = {"agent": decision["agentName"], "previous": decision["outcome"], "outcome": outcome,
+                  "timestamp": decision["timestamp"]}
+        decision["outcome"] = outcome
+        return change
+
+    def write_while_running(graph):
+        # After the first day is rebuilt: feedback on it and on a later day, and a new decision
+        if live["done"] or graph.status != "running" or graph.rebuilt_until is None or \
+                graph.rebuilt_until <= old["timestamp"]:
+            return
+        live["done"] = True
+        gate = graph.gate()
+        changes = [relabel(old, "FAILURE"), relabel(pending_day, "SUCCESS")]
+        graph.merge(feedback_rollups(c for c in changes if counted_live(gate, c["timestamp"])))
+        new = {"agentName": "Agent1", "timestamp": now, "confidence": 0.7, "outcome": "PENDING"}
+        decisions.append(new)
+        graph.merge(decision_rollups(d for d in [new] if counted_live(gate, d["timestamp"])))
+
+    graph.after_commit = write_while_running
+    backfill_rollups(graph)
+
+    assert live["done"] and graph.status == "complete"
+    expected = _by_id(history_rollups(decisions))
+    assert {k: (r["decisions"], r["successes"], r["failures"]) for k, r in graph.rollups.items()} == \
+        {k: (r["decisions"], r["successes"], r["failures"]) for k, r in expected.items()}
+
+
+def test_counted_live_follows_the_rebuild():
+    midnight = datetime(2026, 3, 2, tzinfo=timezone.utc)
+    running = {"status": "running", "rebuiltUntil": midnight}
+    assert counted_live(running, MORNING) and counted_live(running, None)
+    assert not counted_live(running, midnight)
+    assert not counted_live({"status": "running", "rebuiltUntil": None}, None)
+    assert not counted_live({"status": None, "rebuiltUntil": None}, MORNING)
+    assert counted_live({"status": "complete", "rebuiltUntil": midnight}, midnight)
+    assert counted_live(None, midnight)
+
+
+def test_backfill_migration_skips_complete_rollups_and_refuses_a_concurrent_run():
+    now = datetime.now(timezone.utc)
+    assert backfill_rollups(FakeGraph(_history(now), status="complete"), force=False) is None
+    with pytest.raises(RuntimeError, match="another process"):
+        backfill_rollups(FakeGraph(_history(now), status="running"), force=False)
+    # A forced rebuild takes over
+    graph = FakeGraph(_history(now), status="complete")
+    backfill_rollups(graph, force=True)
+    assert graph.status == "complete" and graph.rollups["global:all"]["decisions"] == 5
+
+
+def test_bulk_increments_and_reads_wait_for_the_backfill_marker():
+    assert mr.ROLLUP_INCREMENT_CYPHER.startswith("\nMATCH (:MetricsRollupBackfill {id: 'metrics', status: 'complete'})")
+    assert "MetricsRollupBackfill" in mr.ROLLUP_GLOBAL_CYPHER
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.config import settings
+from backend.kg import profiler, queries
+from backend.kg.profiler import QueryProfiler, query_name
+
+
+class FakeResult:
+    def __init__(self, session):
+        self.session = session
+
+    def consume(self):
+        self.session.consumed += 1
+        return SimpleNamespace(result_available_after=1, result_consumed_after=2)
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+        self.consumed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, cypher, parameters=None, **kwargs):
+        self.statements.append(cypher)
+        return FakeResult(self)
+
+
+@pytest.fixture
+def neo4j(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(settings, "kg_backend", "neo4j")
+    monkeypatch.setattr(settings, "kg_profiler_enabled", True)
+    monkeypatch.setattr(queries, "get_driver", lambda: SimpleNamespace(session=lambda: session))
+    monkeypatch.setattr(queries, "mark_snapshot_stale", lambda: None)
+    monkeypatch.setattr(profiler, "_profiler", QueryProfiler(slow_query_ms=1e9, sample_rate=0.0, log_size=10))
+    return session
+
+
+def test_outcome_and_agent_stats_writes_are_profiled(neo4j):
+    queries.update_routing_outcome("rd-1", "SUCCESS")
+    queries.update_agent_stats("Summarizer", True)
+
+    assert neo4j.consumed == len(neo4j.statements) == 3
+    calls = {row["name"]: row["calls"] for row in profiler.get_profiler().top()}
+    assert calls == {query_name(cypher): 1 for cypher in neo4j.statements}
+    assert all(row["total_server_ms"] == 3 for row in profiler.get_profiler().top())
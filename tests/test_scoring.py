@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from backend.agents.kg_query_agent import score_agent
+from backend.agents.scoring import SCORE_DECIMALS, rank_agents, rank_agents_batch
+from backend.models.domain import Agent
+from backend.models.schemas import AnalyzedQuery
+
+DOMAINS = ["general", "finance", "legal"]
+
+
+def _agents(seed, count=40):
+    # Few distinct values so scores and tie-breakers collide often
+    rng = random.Random(seed)
+    levels = [0.5, 0.7, 0.9]
+    return [
+        Agent(
+            name=f"scoring-agent-{seed}-{i}",
+            capability_level=rng.choice(levels),
+            domain_expertise=rng.choice(DOMAINS),
+            input_format="text",
+            output_format=rng.choice(["text", "json"]),
+            description="",
+            historical_accuracy=rng.choice(levels),
+            response_time=rng.choice([0.1, 0.3]),
+            cost_efficiency=rng.choice(levels),
+            reliability=rng.choice(levels),
+            specialization_score=rng.choice(levels),
+        )
+        for i in range(count)
+    ]
+
+
+def _tuple_sort(candidates, analyzed, historical=None):
+    """The ranking before scoring was vectorized: score_agent plus a reversed tuple sort."""
+    scored = [
+        (agent, score, tie_info)
+        for i, agent in enumerate(candidates)
+        for score, tie_info in [score_agent(agent, analyzed, historical[i] if historical else None)]
+    ]
+    scored.sort(
+        key=lambda x: (
+            round(x[1], SCORE_DECIMALS),
+            x[2]["domain_exact_match"],
+            x[2]["capability_level"],
+            x[2]["historical_accuracy"],
+            x[2]["reliability"],
+            x[2]["specialization_score"],
+            x[2]["response_time_score"],
+            x[2]["cost_efficiency"],
+        ),
+        reverse=True,
+    )
+    return scored
+
+
+def _query(domain, output_format=None):
+    return AnalyzedQuery(raw_text="", task_type="AnyTask", complexity=0.5, domain=domain, output_format=output_format)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("domain", DOMAINS + ["unknown"])
+def test_lexsort_ranking_matches_the_tuple_sort(seed, domain):
+    candidates = _agents(seed)
+    analyzed = _query(domain, output_format="json")
+    expected = _tuple_sort(candidates, analyzed)
+    ranked = rank_agents(candidates, analyzed)
+
+    assert [a.name for a, _, _ in ranked] == [a.name for a, _, _ in expected]
+    for (_, score, info), (_, expected_score, expected_info) in zip(ranked, expected):
+        assert score == pytest.approx(expected_score)
+        assert info == pytest.approx(expected_info)
+
+
+def test_historical_override_and_batch_ranking_match_the_tuple_sort():
+    candidates = _agents(7)
+    historical = [random.Random(i).choice([0.2, 0.8]) for i in range(len(candidates))]
+    queries = [_query(domain) for domain in DOMAINS]
+
+    batch = rank_agents_batch(candidates, queries, top_k=10, historical_scores=historical)
+    for analyzed, ranked in zip(queries, batch):
+        expected = _tuple_sort(candidates, analyzed, historical)[:10]
+        assert [a.name for a, _, _ in ranked] == [a.name for a, _, _ in expected]
+        assert ranked == rank_agents(candidates, analyzed, top_k=10, historical_scores=historical)
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.config import settings
+from backend.kg import snapshot
+from backend.kg.embedded import get_embedded_graph, load_embedded_graph, set_embedded_graph
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    """A graph whose routing reads fail while `down` is set; counts load attempts."""
+    previous = get_embedded_graph()
+    graph = load_embedded_graph()
+    set_embedded_graph(graph)
+    read = graph.routing_subgraph
+    state = {"down": True, "loads": 0}
+
+    def routing_subgraph():
+        state["loads"] += 1
+        if state["down"]:
+            raise ConnectionError("graph unreachable")
+        return read()
+
+    clock = Clock()
+    monkeypatch.setattr(graph, "routing_subgraph", routing_subgraph)
+    monkeypatch.setattr(snapshot.time, "monotonic", clock)
+    monkeypatch.setattr(settings, "kg_snapshot_enabled", True)
+    monkeypatch.setattr(settings, "kg_snapshot_retry_seconds", 1.0)
+    monkeypatch.setattr(settings, "kg_snapshot_refresh_seconds", 30.0)
+    for name, value in (("_snapshot", None), ("_failures", 0), ("_retry_at", 0.0)):
+        monkeypatch.setattr(snapshot, name, value)
+    yield graph, state, clock
+    set_embedded_graph(previous)
+
+
+def test_failed_loads_back_off_instead_of_retrying_on_every_lookup(unreachable, capsys):
+    _, state, clock = unreachable
+    assert snapshot.get_snapshot() is None
+    assert snapshot.get_snapshot() is None
+    assert state["loads"] == 1
+
+    clock.now += 1.0
+    assert snapshot.get_snapshot() is None
+    assert state["loads"] == 2
+    # The wait doubles
+    clock.now += 1.5
+    snapshot.get_snapshot()
+    assert state["loads"] == 2
+    clock.now += 0.5
+    snapshot.get_snapshot()
+    assert state["loads"] == 3
+    assert capsys.readouterr().out.count("Warning: could not load KG snapshot") == 3
+
+    state["down"] = False
+    clock.now += 4.0
+    assert snapshot.get_snapshot() is not None
+    assert snapshot._failures == 0
+
+
+def test_the_last_good_snapshot_is_served_while_a_rebuild_fails(unreachable):
+    graph, state, clock = unreachable
+    state["down"] = False
+    good = snapshot.get_snapshot()
+
+    state["down"] = True
+    graph.set_properties(graph.find_node("Agent", name="DebugMaster"), {"description": "Summaries"})
+    assert snapshot.get_snapshot() is good
+    assert snapshot.get_snapshot() is good
+    assert state["loads"] == 2
+
+    state["down"] = False
+    clock.now += 1.0
+    rebuilt = snapshot.get_snapshot()
+    assert rebuilt is not good and rebuilt.agents["DebugMaster"].description == "Summaries"
+    assert state["loads"] == 3 and snapshot._failures == 0
+
+
+def test_concurrent_first_lookups_share_one_neo4j_load(monkeypatch):
+    loads = []
+    loaded = snapshot.GraphSnapshot(version=0, agents={}, agent_capabilities={}, task_capabilities={}, fallbacks={})
+
+    def load_snapshot():
+        loads.append(threading.get_ident())
+        time.sleep(0.05)
+        monkeypatch.setattr(snapshot, "_snapshot", loaded)
+        return loaded
+
+    monkeypatch.setattr(settings, "kg_snapshot_enabled", True)
+    monkeypatch.setattr(snapshot, "is_embedded", lambda: False)
+    monkeypatch.setattr(snapshot, "load_snapshot", load_snapshot)
+    monkeypatch.setattr(snapshot, "_snapshot", None)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: snapshot.get_snapshot(), range(16)))
+    assert len(loads) == 1
+    assert all(result is loaded for result in results)